@@ -194,3 +194,71 @@ UPLOAD_SECRET = os.environ.get('UPLOAD_SECRET', '')
 # Multiplier for OCAD-derived editor scale. Keep at 1.0 unless a side-by-side
 # comparison with an image import shows a systematic mismatch.
 OCAD_EDITOR_SCALE_FACTOR = float(os.environ.get('OCAD_EDITOR_SCALE_FACTOR', '1.0'))
+
+# OCAD conversions go to one long-lived `convert_ocad.js --worker` process per
+# web process (restarted after OCAD_WORKER_MAX_JOBS requests); a conversion
+# arriving while it is busy runs one-shot. OCAD_CONVERTER_WORKER=0 always runs
+# one-shot. The worker and its parsed-file cache live outside the heavy-job
+# budget, so it is stopped OCAD_WORKER_IDLE_SECONDS after its last request
+# (0 = after every request).
+OCAD_CONVERTER_WORKER = os.environ.get('OCAD_CONVERTER_WORKER', '1').strip().lower() not in ('0', 'false', 'no', 'off', '')
+OCAD_WORKER_MAX_JOBS = int(os.environ.get('OCAD_WORKER_MAX_JOBS', '50'))
+OCAD_WORKER_IDLE_SECONDS = int(os.environ.get('OCAD_WORKER_IDLE_SECONDS', '120'))
+
+# Heavy in-process jobs (navgraph builds, UNet mask generation) are admitted
+# while their estimated peak footprints sum to at most this many MB per
+# container (project/services/heavy_jobs.py); 0 runs one at a time. A job
+# waiting STARVATION_SECONDS is no longer overtaken by smaller ones.
+HEAVY_JOB_MEMORY_BUDGET_MB = int(os.environ.get('HEAVY_JOB_MEMORY_BUDGET_MB', '0'))
+HEAVY_JOB_STARVATION_SECONDS = int(os.environ.get('HEAVY_JOB_STARVATION_SECONDS', '300'))
+
+# UNet mask generation runs this many 2048 px tiles per inference call. Each
+# extra tile adds roughly 0.6 GB of class scores to the job's peak, which the
+# heavy-job estimate only learns from measured history, so raise it together
+# with the memory budget.
+MASK_INFERENCE_BATCH_SIZE = int(os.environ.get('MASK_INFERENCE_BATCH_SIZE', '1'))
+
+# The UNet session is kept between mask generations and dropped this many
+# seconds after the last one finishes (0 = drop after every job). An idle
+# session's memory is outside the heavy-job budget. MASK_ONNX_CACHE_DIR, when
+# set, stores the pre-optimised model so a reload skips graph optimisation.
+MASK_SESSION_IDLE_SECONDS = int(os.environ.get('MASK_SESSION_IDLE_SECONDS', '600'))
+MASK_ONNX_CACHE_DIR = os.environ.get('MASK_ONNX_CACHE_DIR', '')
+
+# UNet model variant used for mask generation: "float32" (the reference
+# export) or "int8" (statically quantized, smaller and faster on CPU). Only switch
+# once `manage.py compare_mask_models` passes on the reference maps.
+MASK_MODEL_VARIANT = os.environ.get('MASK_MODEL_VARIANT', 'float32').strip().lower()
+
+# Predicted class tiles of each map's latest mask generation, keyed by their
+# resized input, so a regeneration after a map correction only re-infers the
+# tiles that changed. Least recently used maps are evicted beyond
+# MASK_TILE_CACHE_MB; 0 disables it. An empty directory means
+# <MEDIA_ROOT>/mask_tile_cache.
+MASK_TILE_CACHE_DIR = os.environ.get('MASK_TILE_CACHE_DIR', '')
+MASK_TILE_CACHE_MB = int(os.environ.get('MASK_TILE_CACHE_MB', '512'))
+
+# Navgraph builds run in a web-worker thread by default ("thread"). With
+# "queue", toggle_infinite only records a NavgraphBuildJob and a separate
+# `manage.py navgraph_worker` process runs the build. The worker admits
+# min(NAVGRAPH_BUILD_WORKERS, MEMORY_BUDGET // JOB_MEMORY) builds at once.
+# JOB_MEMORY also sizes each build: masks whose label/EDT peak exceeds half of
+# it (~42 Mpx at the default) run those stages tiled. The skeleton and graph
+# stages stay full resolution, so it is an estimate, not a hard RSS cap.
+NAVGRAPH_BUILD_MODE = os.environ.get('NAVGRAPH_BUILD_MODE', 'thread').strip().lower()
+NAVGRAPH_BUILD_WORKERS = int(os.environ.get('NAVGRAPH_BUILD_WORKERS', '1'))
+NAVGRAPH_BUILD_MEMORY_BUDGET_MB = int(os.environ.get('NAVGRAPH_BUILD_MEMORY_BUDGET_MB', '0'))
+NAVGRAPH_BUILD_JOB_MEMORY_MB = int(os.environ.get('NAVGRAPH_BUILD_JOB_MEMORY_MB', '3072'))
+NAVGRAPH_BUILD_STALE_SECONDS = int(os.environ.get('NAVGRAPH_BUILD_STALE_SECONDS', '120'))
+NAVGRAPH_BUILD_MAX_ATTEMPTS = int(os.environ.get('NAVGRAPH_BUILD_MAX_ATTEMPTS', '3'))
+
+# Processes per build for bounded fallback edge solves (1 = in-process). Each
+# build, including every navgraph_worker child, may start this many more.
+NAVGRAPH_EDGE_WORKERS = int(os.environ.get('NAVGRAPH_EDGE_WORKERS', '1'))
+
+# Content-addressed cache of mask-only raster stages (labels, EDT, skeleton,
+# sampling grids) shared by every build of an unchanged mask. Least recently
+# used entries are evicted beyond NAVGRAPH_RASTER_CACHE_MB; 0 disables it.
+# An empty directory means <MEDIA_ROOT>/navgraph_cache.
+NAVGRAPH_RASTER_CACHE_DIR = os.environ.get('NAVGRAPH_RASTER_CACHE_DIR', '')
+NAVGRAPH_RASTER_CACHE_MB = int(os.environ.get('NAVGRAPH_RASTER_CACHE_MB', '2048'))
@@ -662,6 +662,10 @@ DJANGOJS.update({
         "Knoten werden verbunden…",
         "Connexion des nœuds…",
         "Collegamento dei nodi…"),
+    "Waiting for a free build slot…": (
+        "Warten auf freien Rechenplatz…",
+        "En attente d'une place de calcul libre…",
+        "In attesa di uno slot di calcolo libero…"),
     "Could not enable infinite play.": (
         "Infinity-Modus konnte nicht aktiviert werden.",
         "Impossible d'activer le mode infini.",
@@ -1,6 +1,8 @@
 import os
 import threading
 import logging
+import time
+from contextlib import contextmanager
 
 from asgiref.sync import sync_to_async
 from django.conf import settings
@@ -10,7 +12,7 @@ from django.utils.translation import gettext as _
 from django.views.decorators.http import require_POST
 
 from account.decorators import role_required
-from .services.heavy_jobs import HEAVY_JOB_SLOT
+from .services.heavy_jobs import HEAVY_JOBS
 from .services.media_access import safe_media_filename, user_can_access_file
 from .models import File
 
@@ -23,22 +25,774 @@ logger = logging.getLogger(__name__)
 MASK_IMPASSABLE = 0
 MASK_OUTLINE = 200
 
+# Inclusive UNet class-id ranges and the mask value each maps to; any other id
+# (including ids the model never emits) becomes 255.
+MASK_CLASS_RANGES = (
+    (0, 9, MASK_IMPASSABLE),
+    (10, 21, 135),   # very slow
+    (22, 25, 231),   # slow
+    (26, 27, 241),   # cross
+    (28, 28, 242),   # stairs
+    (29, 31, 243),   # fast
+    (32, 32, 241),   # cross
+    (33, 33, 243),   # fast
+    (34, 34, MASK_IMPASSABLE),
+)
+# zlib settings for mask PNGs: Z_FILTERED suits the adaptively filtered rows
+# and level 6 is the knee before encode time grows much faster than the
+# saving (level 9 is ~4% smaller but ~6x slower).
+MASK_PNG_COMPRESS_LEVEL = 6
+
 
 def _add_impassable_outline(vis):
     """Darken the one-pixel border around impassable mask pixels in place."""
-    import numpy as np
-
-    impassable_mask = vis == MASK_IMPASSABLE
-    padded = np.pad(impassable_mask, 1, mode="constant", constant_values=False)
-    dilated = (
-        padded[:-2, :-2] | padded[:-2, 1:-1] | padded[:-2, 2:] |
-        padded[1:-1, :-2] | padded[1:-1, 1:-1] | padded[1:-1, 2:] |
-        padded[2:, :-2] | padded[2:, 1:-1] | padded[2:, 2:]
-    )
+    # 3x3 dilation as a horizontal then a vertical 3-tap OR.
+    impassable = vis == MASK_IMPASSABLE
+    rows = impassable.copy()
+    rows[:, 1:] |= impassable[:, :-1]
+    rows[:, :-1] |= impassable[:, 1:]
+    dilated = rows.copy()
+    dilated[1:] |= rows[:-1]
+    dilated[:-1] |= rows[1:]
     vis[dilated & (vis > MASK_OUTLINE)] = MASK_OUTLINE
     return vis
 
 
+MASK_MODEL_PATH = "best_model_300dpi.onnx"
+# Model files per ``MASK_MODEL_VARIANT``. ``int8`` is the statically quantized
+# copy written by ``quantize_mask_model`` (``compare_mask_models --quantize``).
+MASK_MODEL_VARIANTS = {
+    "float32": MASK_MODEL_PATH,
+    "int8": "best_model_300dpi.int8.onnx",
+}
+
+
+def _load_onnx_session(model_path):
+    """Create the UNet ``InferenceSession``, via the optimised-model cache if set.
+
+    With ``MASK_ONNX_CACHE_DIR`` the portable (``ORT_ENABLE_EXTENDED``) graph
+    is serialized once per model file and onnxruntime version; later loads
+    skip those passes and only apply the hardware-specific layout ones.
+    """
+    import onnxruntime as ort
+
+    def options():
+        # arena off so freed inference buffers return to the OS (long-lived web workers); 2 threads for the shared Railway vCPU
+        so = ort.SessionOptions()
+        so.enable_cpu_mem_arena = False
+        so.intra_op_num_threads = 2
+        return so
+
+    cache_dir = getattr(settings, "MASK_ONNX_CACHE_DIR", "")
+    if not cache_dir:
+        return ort.InferenceSession(model_path, sess_options=options())
+
+    stat = os.stat(model_path)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    optimized = os.path.join(
+        cache_dir, f"{stem}.{stat.st_size}-{stat.st_mtime_ns}.ort{ort.__version__}.onnx")
+    if not os.path.isfile(optimized):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{optimized}.{os.getpid()}.{threading.get_ident()}.tmp"
+        so = options()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        so.optimized_model_filepath = tmp_path
+        try:
+            ort.InferenceSession(model_path, sess_options=so)
+            os.replace(tmp_path, optimized)
+        except Exception:
+            logger.warning("Could not write optimised ONNX model %s", optimized,
+                           exc_info=True)
+            return ort.InferenceSession(model_path, sess_options=options())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    try:
+        return ort.InferenceSession(optimized, sess_options=options())
+    except Exception:
+        logger.warning("Discarding unreadable optimised ONNX model %s", optimized,
+                       exc_info=True)
+        try:
+            os.remove(optimized)
+        except OSError:
+            pass
+        return ort.InferenceSession(model_path, sess_options=options())
+
+
+class _InferenceSessionCache:
+    """Process-wide UNet session shared by mask generations.
+
+    ``InferenceSession.run`` is thread-safe, so concurrent jobs share one
+    session. It is dropped ``MASK_SESSION_IDLE_SECONDS`` after the last job
+    releases it (immediately when that is 0) to give the memory back.
+    """
+
+    def __init__(self, model_path, loader=_load_onnx_session):
+        self.model_path = model_path
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._session = None
+        self._users = 0
+        self._generation = 0
+        self._timer = None
+
+    @contextmanager
+    def session(self):
+        """Yield ``(session, load_seconds)``; ``load_seconds`` is 0.0 on reuse."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            load_seconds = 0.0
+            if self._session is None:
+                t0 = time.perf_counter()
+                # Loading under the lock makes concurrent first jobs wait for
+                # one load instead of each building their own session.
+                self._session = self.loader(self.model_path)
+                load_seconds = time.perf_counter() - t0
+            self._users += 1
+            self._generation += 1
+            session = self._session
+        try:
+            yield session, load_seconds
+        finally:
+            session = None
+            with self._lock:
+                self._users -= 1
+                if self._users == 0:
+                    self._schedule_eviction()
+
+    def _schedule_eviction(self):
+        idle = float(getattr(settings, "MASK_SESSION_IDLE_SECONDS", 0))
+        if idle <= 0:
+            self._session = None
+            return
+        self._timer = threading.Timer(idle, self._evict_idle, args=(self._generation,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _evict_idle(self, generation):
+        with self._lock:
+            # A job that started after this timer was armed owns the session.
+            if self._users or generation != self._generation:
+                return
+            self._timer = None
+            self._session = None
+
+    def evict(self):
+        """Drop the cached session now unless a job is using it."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._users:
+                self._session = None
+
+    @property
+    def loaded(self):
+        return self._session is not None
+
+
+_UNET_SESSIONS = _InferenceSessionCache(MASK_MODEL_PATH)
+_variant_sessions = {"float32": _UNET_SESSIONS}
+_variant_sessions_lock = threading.Lock()
+
+
+def _session_cache(variant=None):
+    """The session cache of a model variant (default ``MASK_MODEL_VARIANT``)."""
+    variant = variant or getattr(settings, "MASK_MODEL_VARIANT", "float32")
+    if variant not in MASK_MODEL_VARIANTS:
+        raise ValueError(f"Unknown mask model variant {variant!r}")
+    with _variant_sessions_lock:
+        cache = _variant_sessions.get(variant)
+        if cache is None:
+            cache = _variant_sessions[variant] = _InferenceSessionCache(
+                MASK_MODEL_VARIANTS[variant])
+        return cache
+
+
+def quantize_mask_model(source, target, calibration_tiles):
+    """Write a statically INT8-quantized (QDQ) copy of the UNet ``source``.
+
+    ``calibration_tiles`` yields ``(3, H, W)`` float32 inputs exactly as the
+    tile engine feeds them; activation ranges are calibrated (MinMax) on
+    them and weights are quantized per channel. Requires the ``onnx``
+    package next to onnxruntime. ``target`` is replaced atomically.
+    """
+    import tempfile
+
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class _Tiles(CalibrationDataReader):
+        def __init__(self):
+            self._tiles = iter(calibration_tiles)
+
+        def get_next(self):
+            tile = next(self._tiles, None)
+            if tile is None:
+                return None
+            return {_TileInferenceEngine.INPUT_NAME: tile[None]}
+
+    directory = os.path.dirname(os.path.abspath(target))
+    with tempfile.TemporaryDirectory(prefix=".quantize-", dir=directory) as scratch:
+        prepared = os.path.join(scratch, "prepared.onnx")
+        quantized = os.path.join(scratch, "quantized.onnx")
+        quant_pre_process(source, prepared)
+        quantize_static(
+            prepared, quantized, _Tiles(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+        os.replace(quantized, target)
+
+
+MASK_TILE_SIZE = 2048
+MASK_TILE_OVERLAP = int(MASK_TILE_SIZE * 0.2)
+
+
+def _mask_tiles(img_h, img_w, tile_size=MASK_TILE_SIZE, overlap=MASK_TILE_OVERLAP):
+    """Overlapping inference windows in raster order.
+
+    Each entry is ``(y0, y1, x0, x1, oy0, oy1, ox0, ox1)``: the input window
+    and the part of the output it owns (half the overlap is trimmed from every
+    interior edge).
+    """
+    step = tile_size - overlap
+    tiles = []
+    for y0 in range(0, img_h, step):
+        for x0 in range(0, img_w, step):
+            y1 = min(y0 + tile_size, img_h)
+            x1 = min(x0 + tile_size, img_w)
+            oy0 = y0 if y0 == 0 else y0 + overlap // 2
+            oy1 = y1 if y1 == img_h else y1 - overlap // 2
+            ox0 = x0 if x0 == 0 else x0 + overlap // 2
+            ox1 = x1 if x1 == img_w else x1 - overlap // 2
+            tiles.append((y0, y1, x0, x1, oy0, oy1, ox0, ox1))
+    return tiles
+
+
+class _TileInferenceEngine:
+    """Batched UNet inference over the tiles of one resized RGB map.
+
+    Tiles are grouped by shape (interior tiles, the right/bottom edges and the
+    corner) so every batch is a single dense tensor, and each batch is filled
+    in place into a reused float32 buffer straight from the uint8 image. A
+    single worker thread prepares the next batch and argmax/pastes the previous
+    one while ``session.run`` (which releases the GIL) infers the current one.
+    Output is identical to running the tiles one by one.
+    """
+
+    INPUT_NAME = "input"
+
+    def __init__(self, session, batch_size=1):
+        import numpy as np
+
+        self.session = session
+        self.batch_size = max(1, int(batch_size))
+        # A model exported with a fixed batch dimension always gets that many
+        # rows; a partial batch leaves stale rows whose outputs are ignored.
+        self.fixed_batch = None
+        try:
+            dim = session.get_inputs()[0].shape[0]
+        except Exception:
+            dim = None
+        if isinstance(dim, int) and dim > 0:
+            self.fixed_batch = self.batch_size = dim
+        # uint8 -> float32 in [0, 1]; the same values as ``x / 255.0`` cast down.
+        self._scale = np.arange(256, dtype=np.float32) / np.float32(255)
+        self._buffers = [None, None]
+
+    def batches(self, tiles):
+        groups = {}
+        for tile in tiles:
+            groups.setdefault((tile[1] - tile[0], tile[3] - tile[2]), []).append(tile)
+        return [group[i:i + self.batch_size]
+                for group in groups.values()
+                for i in range(0, len(group), self.batch_size)]
+
+    def _fill(self, rgb, batch, slot):
+        import numpy as np
+
+        y0, y1, x0, x1 = batch[0][:4]
+        shape = (self.batch_size, 3, y1 - y0, x1 - x0)
+        buf = self._buffers[slot]
+        if buf is None or buf.shape != shape:
+            self._buffers[slot] = None
+            buf = self._buffers[slot] = np.empty(shape, dtype=np.float32)
+        for row, (y0, y1, x0, x1, *_owned) in enumerate(batch):
+            np.take(self._scale, rgb[y0:y1, x0:x1].transpose(2, 0, 1),
+                    out=buf[row], mode="clip")
+        return buf if self.fixed_batch else buf[:len(batch)]
+
+    @staticmethod
+    def _paste(output, batch, out):
+        import numpy as np
+
+        if out.ndim == 3:
+            out = out[:, np.newaxis]
+        for row, (y0, _y1, x0, _x1, oy0, oy1, ox0, ox1) in enumerate(batch):
+            scores = out[row]
+            if scores.shape[0] > 1:
+                tile_pred = scores.argmax(axis=0).astype(np.uint8)
+            else:
+                tile_pred = np.clip(np.floor(scores[0]), 0, 255).astype(np.uint8)
+            ty0, tx0 = oy0 - y0, ox0 - x0
+            ty1 = min(ty0 + (oy1 - oy0), tile_pred.shape[0])
+            tx1 = min(tx0 + (ox1 - ox0), tile_pred.shape[1])
+            output[oy0:oy0 + (ty1 - ty0), ox0:ox0 + (tx1 - tx0)] = tile_pred[ty0:ty1, tx0:tx1]
+        return len(batch)
+
+    def run(self, rgb, output, tiles, on_progress=None):
+        """Infer ``tiles`` of ``rgb`` (H x W x 3 uint8) into ``output`` (H x W
+        uint8 class map); ``on_progress(done_tiles)`` runs after each batch."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        batches = self.batches(tiles)
+        if not batches:
+            return output
+        processed = 0
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="mask-tiles") as pool:
+            fill = pool.submit(self._fill, rgb, batches[0], 0)
+            paste = None
+            for index, batch in enumerate(batches):
+                batch_input = fill.result()
+                if index + 1 < len(batches):
+                    # The other slot's batch finished inferring last iteration.
+                    fill = pool.submit(self._fill, rgb, batches[index + 1], (index + 1) % 2)
+                out = self.session.run(None, {self.INPUT_NAME: batch_input})[0]
+                if paste is not None:
+                    processed += paste.result()
+                    if on_progress:
+                        on_progress(processed)
+                paste = pool.submit(self._paste, output, batch, out)
+                del out, batch_input
+            processed += paste.result()
+            if on_progress:
+                on_progress(processed)
+        return output
+
+    def run_rows(self, read_rows, write_rows, width, tiles, on_progress=None,
+                 tile_cache=None):
+        """``run`` one tile row at a time without materialising the whole map.
+
+        ``read_rows(y0, y1)`` returns rows ``y0:y1`` of the H x W x 3 uint8
+        input and ``write_rows(y0, classes)`` receives the output rows each
+        tile row owns, top to bottom. Only one tile row is alive at once.
+        With a ``_MaskTileCache``, tiles whose input is unchanged are pasted
+        from it and only the others are inferred (and then stored)."""
+        import numpy as np
+
+        rows = {}
+        for tile in tiles:
+            rows.setdefault(tile[:2], []).append(tile)
+        done = 0
+        for (y0, y1), row_tiles in rows.items():
+            band = read_rows(y0, y1)
+            output = np.zeros((y1 - y0, width), dtype=np.uint8)
+            local = [(ty0 - y0, ty1 - y0, x0, x1, oy0 - y0, oy1 - y0, ox0, ox1)
+                     for (ty0, ty1, x0, x1, oy0, oy1, ox0, ox1) in row_tiles]
+            pending = local
+            if tile_cache is not None:
+                pending, keys = [], {}
+                for tile, (ty0, ty1, x0, x1, oy0, oy1, ox0, ox1) in zip(row_tiles, local):
+                    key = tile_cache.key(tile, band[ty0:ty1, x0:x1])
+                    if not tile_cache.load(key, output[oy0:oy1, ox0:ox1]):
+                        pending.append((ty0, ty1, x0, x1, oy0, oy1, ox0, ox1))
+                        keys[pending[-1]] = key
+                done += len(local) - len(pending)
+                if on_progress and len(pending) < len(local):
+                    on_progress(done)
+            report = None
+            if on_progress:
+                report = lambda n, base=done: on_progress(base + n)  # noqa: E731
+            self.run(band, output, pending, on_progress=report)
+            if tile_cache is not None:
+                for tile in pending:
+                    tile_cache.store(keys[tile], output[tile[4]:tile[5], tile[6]:tile[7]])
+            # Tiles of one row share their owned rows.
+            oy0, oy1 = row_tiles[0][4], row_tiles[0][5]
+            write_rows(oy0, output[oy0 - y0:oy1 - y0])
+            done += len(pending)
+            band = output = None
+
+
+class _MaskTileCache:
+    """Predicted class tiles of one map, keyed by their resized input pixels.
+
+    Regenerating after a small map correction (or at the same scale) only
+    re-infers tiles whose input changed. Keys hash the model identity, scale,
+    tile geometry and the tile's resized RGB pixels, so any change simply
+    misses. Each map (``scope``, the File) keeps only the tiles of its latest
+    generation, and whole scopes are evicted least recently used beyond
+    ``max_bytes``. Reads and writes are best-effort: an unreadable entry is a
+    miss and a full volume only costs the reuse.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root, scope, identity, max_bytes):
+        self.root = root
+        self.scope = scope
+        self.directory = os.path.join(root, scope)
+        self.identity = identity
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._used = set()
+
+    def key(self, tile, pixels):
+        import hashlib
+        import json
+
+        import numpy as np
+
+        pixels = np.ascontiguousarray(pixels)
+        digest = hashlib.sha256(json.dumps(
+            [self.VERSION, self.identity, [int(v) for v in tile], list(pixels.shape)]
+        ).encode("utf-8"))
+        digest.update(pixels.data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".cls")
+
+    def load(self, key, out):
+        """Fill ``out`` (the tile's owned output) from the cache; False on a miss."""
+        import zlib
+
+        import numpy as np
+
+        try:
+            with open(self._path(key), "rb") as handle:
+                data = zlib.decompress(handle.read())
+        except (OSError, zlib.error):
+            self.misses += 1
+            return False
+        if len(data) != out.size:
+            self.misses += 1
+            return False
+        out[...] = np.frombuffer(data, dtype=np.uint8).reshape(out.shape)
+        self._used.add(key)
+        self.hits += 1
+        return True
+
+    def store(self, key, owned):
+        import tempfile
+        import zlib
+
+        import numpy as np
+
+        self._used.add(key)
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tile-", dir=self.directory)
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(zlib.compress(np.ascontiguousarray(owned, dtype=np.uint8).data, 1))
+            os.replace(tmp_path, self._path(key))
+            tmp_path = None
+        except OSError:
+            pass
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def finish(self):
+        """Drop this map's tiles the generation did not use, then evict maps."""
+        import shutil
+
+        try:
+            for name in os.listdir(self.directory):
+                if name.endswith(".cls") and name[:-4] not in self._used:
+                    os.remove(os.path.join(self.directory, name))
+            os.utime(self.directory)  # LRU recency
+        except OSError:
+            return
+        scopes, total = [], 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                scopes.append((os.path.getmtime(path), name, size))
+            except OSError:
+                continue
+            total += size
+        for _mtime, name, size in sorted(scopes):
+            if total <= self.max_bytes:
+                break
+            if name != self.scope:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                total -= size
+
+
+def _mask_tile_cache(scope, identity):
+    """The ``_MaskTileCache`` for one map, or ``None`` when disabled."""
+    max_mb = int(getattr(settings, "MASK_TILE_CACHE_MB", 0))
+    if max_mb <= 0:
+        return None
+    root = (getattr(settings, "MASK_TILE_CACHE_DIR", "")
+            or os.path.join(settings.MEDIA_ROOT, "mask_tile_cache"))
+    return _MaskTileCache(root, scope, identity, max_mb * 1024 * 1024)
+
+
+def _model_identity(model_path):
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+    return [os.path.basename(model_path), stat.st_size, stat.st_mtime_ns]
+
+
+class _ScratchRows:
+    """Disk-backed row array for one mask generation.
+
+    Rows are moved with ``pread``/``pwrite`` rather than ``mmap`` so they sit
+    in the page cache instead of the job's resident set. Supports ``shape``
+    and row slicing (``rows[y0:y1]`` returns a fresh array).
+    """
+
+    def __init__(self, shape, dtype, directory):
+        import math
+        import tempfile
+
+        import numpy as np
+
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = math.prod(self.shape[1:]) * self.dtype.itemsize
+        self._file = tempfile.TemporaryFile(prefix=".mask-scratch-", dir=directory)
+        self._file.truncate(self.shape[0] * self.row_bytes)
+
+    def write(self, y0, rows):
+        import numpy as np
+
+        data = np.ascontiguousarray(rows, dtype=self.dtype)
+        os.pwrite(self._file.fileno(), data.data, y0 * self.row_bytes)
+
+    def __getitem__(self, rows):
+        import numpy as np
+
+        y0, y1, _step = rows.indices(self.shape[0])
+        size = max(0, y1 - y0) * self.row_bytes
+        data = os.pread(self._file.fileno(), size, y0 * self.row_bytes)
+        return np.frombuffer(bytearray(data), dtype=self.dtype).reshape(
+            (max(0, y1 - y0),) + self.shape[1:])
+
+    def close(self):
+        self._file.close()
+
+
+def _decode_map_rows(map_path, directory):
+    """Decode the map once into ``_ScratchRows`` of RGB pixels.
+
+    Pillow must decode the whole file, but the decoded image is copied out
+    (and converted to RGB) strip by strip and released straight away, so it
+    never coexists with the resized map or the inference buffers.
+    """
+    import numpy as np
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = None
+    with open(map_path, 'rb') as f:
+        img = Image.open(f)
+        img.load()
+    source = _ScratchRows((img.height, img.width, 3), np.uint8, directory)
+    for y0 in range(0, img.height, MASK_BAND_ROWS):
+        strip = img.crop((0, y0, img.width, min(y0 + MASK_BAND_ROWS, img.height)))
+        source.write(y0, np.asarray(strip.convert("RGB")))
+    return source
+
+
+def _resample_rows(source, size, y0, y1):
+    """Rows ``y0:y1`` of ``source`` (H x W x 3 rows) bicubically resized to ``size``.
+
+    Only the source strip under those rows (plus the filter support) is
+    handed to Pillow; values match a whole-image resize up to rare +-1
+    rounding differences.
+    """
+    import math
+
+    import numpy as np
+    from PIL import Image
+
+    width, height = size
+    src_h, src_w = source.shape[:2]
+    ratio = src_h / height
+    margin = int(math.ceil(2 * max(ratio, 1.0))) + 2
+    s0 = max(0, int(y0 * ratio) - margin)
+    s1 = min(src_h, int(math.ceil(y1 * ratio)) + margin)
+    strip = Image.fromarray(np.ascontiguousarray(source[s0:s1]))
+    strip = strip.resize((width, y1 - y0), resample=Image.BICUBIC,
+                         box=(0, y0 * ratio - s0, src_w, y1 * ratio - s0))
+    return np.asarray(strip)
+
+
+MASK_BAND_ROWS = 512
+
+
+_mask_class_lut = None
+
+
+def _class_map_to_mask(classes):
+    """UNet class ids -> mask greyscale values via a 256-entry lookup table."""
+    global _mask_class_lut
+    import numpy as np
+
+    if _mask_class_lut is None:
+        lut = np.full(256, 255, dtype=np.uint8)
+        for first, last, value in MASK_CLASS_RANGES:
+            lut[first:last + 1] = value
+        _mask_class_lut = lut
+    return np.take(_mask_class_lut, np.asarray(classes, dtype=np.uint8))
+
+
+def _mask_bands(classes, band_rows=MASK_BAND_ROWS):
+    """Yield the finished mask in row bands, remapped and outlined.
+
+    Each band is computed with a one-row halo so the 3x3 outline matches a
+    whole-image ``_add_impassable_outline``.
+    """
+    import numpy as np
+
+    height = classes.shape[0]
+    for b0 in range(0, height, band_rows):
+        b1 = min(b0 + band_rows, height)
+        h0, h1 = max(0, b0 - 1), min(height, b1 + 1)
+        vis = _add_impassable_outline(_class_map_to_mask(np.asarray(classes[h0:h1])))
+        yield vis[b0 - h0:b1 - h0]
+
+
+def _png_chunk(handle, kind, data):
+    import struct
+    import zlib
+
+    handle.write(struct.pack(">I", len(data)) + kind + data)
+    handle.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def _png_filter_rows(rows, previous, bpp):
+    """PNG-filter ``rows`` (uint8, one scanline per row) for encoding.
+
+    Every row gets the filter type (None, Sub, Up, Average or Paeth) with the
+    smallest sum of absolute signed residuals, the usual adaptive heuristic.
+    Encoding only reads raw neighbours, so all five are vectorised per band.
+    Returns the rows with their leading filter-type byte.
+    """
+    import numpy as np
+
+    up = np.empty_like(rows)
+    up[0] = previous
+    up[1:] = rows[:-1]
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    up_left = np.zeros_like(rows)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    a = left.astype(np.int16)
+    b = up.astype(np.int16)
+    c = up_left.astype(np.int16)
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c)).astype(np.uint8)
+    candidates = np.stack([
+        rows,
+        rows - left,
+        rows - up,
+        rows - ((a + b) >> 1).astype(np.uint8),
+        rows - paeth,
+    ])
+    scores = np.abs(candidates.view(np.int8).astype(np.int16)).sum(axis=2, dtype=np.int64)
+    best = scores.argmin(axis=0)
+    out = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = best
+    out[:, 1:] = candidates[best, np.arange(len(rows))]
+    return out
+
+
+def _write_png_stream(handle, width, height, bands, *, channels,
+                      level=MASK_PNG_COMPRESS_LEVEL, idat_bytes=1 << 20):
+    """Encode an 8-bit greyscale (1) or RGB (3) PNG from row bands.
+
+    ``bands`` yields ``(rows, width * channels)`` uint8 arrays top to bottom.
+    Rows are adaptively filtered (``_png_filter_rows``) and compressed data
+    is flushed in ``idat_bytes`` IDAT chunks, so nothing larger than one band
+    is buffered.
+    """
+    import struct
+    import zlib
+
+    import numpy as np
+
+    color_type = {1: 0, 3: 2}[channels]
+    handle.write(b"\x89PNG\r\n\x1a\n")
+    _png_chunk(handle, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib.Z_FILTERED)
+    pending = bytearray()
+    previous = np.zeros(width * channels, dtype=np.uint8)
+    written = 0
+    for band in bands:
+        rows = np.ascontiguousarray(band, dtype=np.uint8).reshape(len(band), width * channels)
+        if not len(rows):
+            continue
+        filtered = _png_filter_rows(rows, previous, channels)
+        previous = rows[-1].copy()
+        written += len(rows)
+        pending += compressor.compress(filtered.data)
+        while len(pending) >= idat_bytes:
+            _png_chunk(handle, b"IDAT", bytes(pending[:idat_bytes]))
+            del pending[:idat_bytes]
+    if written != height:
+        raise ValueError(f"PNG stream produced {written} rows, expected {height}")
+    pending += compressor.flush()
+    if pending:
+        _png_chunk(handle, b"IDAT", bytes(pending))
+    _png_chunk(handle, b"IEND", b"")
+
+
+def write_grey_png(path, width, height, bands, *, mtime_ns=None):
+    """Atomically write a single-channel mask PNG from row bands.
+
+    Encodes into a temporary sibling that replaces ``path`` only once
+    complete. ``mtime_ns`` stamps the file before the rename, so a re-encode
+    of unchanged pixels never looks newer than artifacts derived from it.
+    """
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".mask-", suffix=".pngtmp", dir=os.path.dirname(path) or ".")
+    try:
+        # mkstemp creates 0600; keep masks readable like other media files.
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as handle:
+            _write_png_stream(handle, width, height, bands, channels=1)
+        if mtime_ns is not None:
+            os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_mask_png(mask_path, classes, band_rows=MASK_BAND_ROWS):
+    """Write the mask for the ``classes`` map to ``mask_path`` atomically.
+
+    Bands are remapped, outlined and encoded as an ``L`` PNG on the fly.
+    """
+    height, width = classes.shape
+    write_grey_png(mask_path, width, height, _mask_bands(classes, band_rows))
+
+
 class _MaskGenerationJob:
     """Pub/sub progress relay for one background mask-generation run."""
 
@@ -95,106 +849,78 @@ def _run_mask_generation(*, job, job_key, map_path, scale, mask_filename,
                          filename, file_id, language=None):
     """Heavy UNet mask generation, run in a non-daemon background thread."""
     import gc
-    import math
-    import time
-    from io import BytesIO
-    from types import SimpleNamespace
 
     import numpy as np
     from django.db import close_old_connections, connection
     from PIL import Image
 
     t0 = time.time()
-    img = output_img = ort_session = None
+    img = output_img = ort_session = engine = admission = None
     close_old_connections()
     if language:
         translation.activate(language)
-    # Wait for the process-wide heavy-job slot (services.heavy_jobs) so at most
-    # one mask generation or navgraph build holds large arrays at a time. The
-    # SSE stream is already attached, so subscribers simply see progress start
-    # once the slot frees.
-    HEAVY_JOB_SLOT.acquire()
+    Image.MAX_IMAGE_PIXELS = None
     try:
-        import onnxruntime as ort
-
-        Image.MAX_IMAGE_PIXELS = None
+        # Wait for admission under the heavy-job memory budget
+        # (services.heavy_jobs), estimated from the resized image size. The SSE
+        # stream is already attached, so subscribers see the queue position/ETA
+        # until the job starts.
+        try:
+            with Image.open(map_path) as probe:
+                mpx = probe.width * probe.height * (scale / 0.710) ** 2 / 1e6
+        except Exception:
+            mpx = 0.0
+        admission = HEAVY_JOBS.acquire('mask', mpx, on_wait=lambda position, eta: job.publish(
+            {'queued': True, 'queue_position': position, 'eta_seconds': eta}))
         scale_factor = scale / 0.710
-        with open(map_path, 'rb') as f:
-            img = Image.open(f)
-            img.load()
-            img = img.convert("RGB")
-        new_size = (int(img.width * scale_factor), int(img.height * scale_factor))
+        with Image.open(map_path) as probe:
+            new_size = (int(probe.width * scale_factor), int(probe.height * scale_factor))
         if new_size[0] > 16000 or new_size[1] > 16000:
             raise ValueError(_("Map too large for the neural network. Check the scale."))
-        img = img.resize(new_size, resample=Image.BICUBIC)
-        # arena off so freed inference buffers return to the OS (long-lived web workers); 2 threads for the shared Railway vCPU
-        so = ort.SessionOptions()
-        so.enable_cpu_mem_arena = False
-        so.intra_op_num_threads = 2
-        ort_session = ort.InferenceSession("best_model_300dpi.onnx", sess_options=so)
 
-        img_w, img_h = img.size
-        output_img = np.zeros((img_h, img_w), dtype=np.uint8)
-        tile_size = 2048
-        overlap = int(tile_size * 0.2)
-        step = tile_size - overlap
-        total_tiles = max(1, max(1, math.ceil(img_h / step)) * max(1, math.ceil(img_w / step)))
-        job.publish({'current': 0, 'total': total_tiles})
-        print(f"[MASK] START file={filename} tiles={total_tiles}", flush=True)
+        # Beyond Pillow's one-off decode, the peak is a few tile rows: the
+        # decoded map and the class ids live in disk-backed scratch files, each
+        # tile row is resampled on demand, and the mask is encoded in bands.
+        img_w, img_h = new_size
+        masks_dir = os.path.join(settings.MEDIA_ROOT, 'masks')
+        os.makedirs(masks_dir, exist_ok=True)
+        img = _decode_map_rows(map_path, masks_dir)
+        output_img = _ScratchRows((img_h, img_w), np.uint8, masks_dir)
+        tiles = _mask_tiles(img_h, img_w)
+        total_tiles = len(tiles)
+        sessions = _session_cache()
+        # Re-uploads get a new map filename, so tiles are kept per File.
+        tile_cache = _mask_tile_cache(
+            f"file_{file_id}" if file_id is not None else f"map_{os.path.splitext(filename)[0]}",
+            [_model_identity(sessions.model_path), scale])
 
-        processed = 0
-        for y0 in range(0, img_h, step):
-            for x0 in range(0, img_w, step):
-                y1 = min(y0 + tile_size, img_h)
-                x1 = min(x0 + tile_size, img_w)
-                tile = img.crop((x0, y0, x1, y1))
-                tile_np = np.transpose(np.array(tile) / 255.0, (2, 0, 1))[np.newaxis].astype(np.float32)
-
-                out = ort_session.run(None, {"input": tile_np})[0]
-                if out.ndim == 4:
-                    out = out[0]
-                if out.shape[0] > 1:
-                    out = out.argmax(axis=0)
-                    tile_pred = out.astype(np.uint8)
-                else:
-                    tile_pred = np.clip(np.floor(out), 0, 255).astype(np.uint8)
-
-                oy0 = y0 if y0 == 0 else y0 + overlap // 2
-                oy1 = y1 if y1 == img_h else y1 - overlap // 2
-                ox0 = x0 if x0 == 0 else x0 + overlap // 2
-                ox1 = x1 if x1 == img_w else x1 - overlap // 2
-                ty0, tx0 = oy0 - y0, ox0 - x0
-                ty1 = min(ty0 + (oy1 - oy0), tile_pred.shape[0])
-                tx1 = min(tx0 + (ox1 - ox0), tile_pred.shape[1])
-                output_img[oy0:oy0 + (ty1 - ty0), ox0:ox0 + (tx1 - tx0)] = tile_pred[ty0:ty1, tx0:tx1]
-
-                processed += 1
-                print(f"[MASK] tile {processed}/{total_tiles} ({time.time() - t0:.1f}s)", flush=True)
-                job.publish({'current': processed, 'total': total_tiles})
-
-        img = None
-        mo = SimpleNamespace(impassable=MASK_IMPASSABLE, very_slow=135, slow=231, cross=241, stairs=242, fast=243)
-        vis = 255 * np.ones((img_h, img_w), dtype=np.uint8)
-        vis[output_img < 10] = mo.impassable
-        vis[(output_img >= 10) & (output_img < 22)] = mo.very_slow
-        vis[(output_img >= 22) & (output_img < 26)] = mo.slow
-        vis[(output_img >= 26) & (output_img < 28)] = mo.cross
-        vis[output_img == 28] = mo.stairs
-        vis[(output_img >= 29) & (output_img < 32)] = mo.fast
-        vis[output_img == 32] = mo.cross
-        vis[output_img == 33] = mo.fast
-        vis[output_img == 34] = mo.impassable
-
-        _add_impassable_outline(vis)
-        final = Image.fromarray(vis, mode="L").convert("RGB")
-        buf = BytesIO()
-        final.save(buf, format="PNG")
-        buf.seek(0)
-        mask_path = os.path.join(settings.MEDIA_ROOT, 'masks', mask_filename)
-        os.makedirs(os.path.dirname(mask_path), exist_ok=True)
-        with open(mask_path, 'wb') as f:
-            f.write(buf.read())
-        del vis, final, buf
+        def report(processed):
+            print(f"[MASK] tile {processed}/{total_tiles} ({time.time() - t0:.1f}s)", flush=True)
+            job.publish({'current': processed, 'total': total_tiles})
+
+        with sessions.session() as (ort_session, load_seconds):
+            timing = {'model_load_seconds': round(load_seconds, 2),
+                      'model_reused': load_seconds == 0.0}
+            job.publish({'current': 0, 'total': total_tiles, **timing})
+            print(f"[MASK] START file={filename} tiles={total_tiles} "
+                  f"model_load={load_seconds:.1f}s", flush=True)
+            t_infer = time.time()
+            engine = _TileInferenceEngine(
+                ort_session, batch_size=settings.MASK_INFERENCE_BATCH_SIZE)
+            engine.run_rows(lambda y0, y1: _resample_rows(img, new_size, y0, y1),
+                            output_img.write, img_w, tiles, on_progress=report,
+                            tile_cache=tile_cache)
+            timing['inference_seconds'] = round(time.time() - t_infer, 2)
+            if tile_cache is not None:
+                timing['tiles_reused'] = tile_cache.hits
+            ort_session = None
+
+        img.close()
+        img = engine = None
+        _write_mask_png(os.path.join(masks_dir, mask_filename), output_img)
+
+        if tile_cache is not None:
+            tile_cache.finish()
 
         if file_id is not None:
             File.objects.filter(id=file_id, deleted=False, map_file=filename).update(has_mask=True)
@@ -202,7 +928,7 @@ def _run_mask_generation(*, job, job_key, map_path, scale, mask_filename,
             File.objects.filter(map_file=filename, deleted=False).update(has_mask=True)
 
         print(f"[MASK] DONE {time.time() - t0:.1f}s", flush=True)
-        job.publish({'done': True})
+        job.publish({'done': True, **timing})
 
     except Exception:
         logger.exception("Mask generation failed for %s", filename)
@@ -212,9 +938,11 @@ def _run_mask_generation(*, job, job_key, map_path, scale, mask_filename,
             with _mask_generation_jobs_lock:
                 if _mask_generation_jobs.get(job_key) is job:
                     _mask_generation_jobs.pop(job_key, None)
-            img = None
-            output_img = None
-            ort_session = None
+            for rows in (img, output_img):
+                if rows is not None:
+                    rows.close()
+            img = output_img = None
+            ort_session = engine = None
             if language:
                 translation.deactivate()
             gc.collect()
@@ -222,9 +950,10 @@ def _run_mask_generation(*, job, job_key, map_path, scale, mask_filename,
         finally:
             # Release only after gc.collect() has freed this run's buffers, so
             # the next queued heavy job never overlaps with them — but release
-            # unconditionally, or one failed cleanup would starve every later
-            # heavy job in this process.
-            HEAVY_JOB_SLOT.release()
+            # whenever admission was granted, or one failed cleanup would hold
+            # its share of the budget forever.
+            if admission is not None:
+                admission.release()
 
 
 @role_required('Trainer')
@@ -0,0 +1,395 @@
+"""Benchmark navgraph builds over a fixed mask corpus.
+
+Builds every corpus mask ``--repeat`` times, each run in a freshly spawned
+process (like ``navgraph_worker``) so peak RSS is per build rather than a
+high-water mark of the whole benchmark. Records per run:
+
+* per-stage wall time (``stats["timings"]``) and total build time;
+* peak RSS, and the peak RSS / ``tracemalloc`` peak of every build phase
+  (the phases reported to ``progress_callback``);
+* node/edge counts and the ``.bin`` size.
+
+Per mask, times are aggregated as the median over repeats and memory as the
+maximum. The report is written as ``<output>.json`` (full detail) and
+``<output>.csv`` (one row per mask). ``--baseline`` compares the report with a
+stored one and exits non-zero when a metric regresses beyond its threshold.
+
+Builds use a scratch copy of each mask, so served artifacts are never
+touched, and bypass the raster cache unless ``--raster-cache`` is given.
+``tracemalloc`` slows allocation-heavy stages; use ``--no-tracemalloc`` when
+only wall times matter.
+
+Usage:
+    python manage.py benchmark_navgraph media/masks/mask_A.png media/masks/mask_B.png
+    python manage.py benchmark_navgraph --corpus benchmarks/navgraph_corpus.txt --repeat 3
+    python manage.py benchmark_navgraph --limit 5 --random --seed 1
+    python manage.py benchmark_navgraph --corpus corpus.txt --baseline navgraph-baseline.json
+    python manage.py benchmark_navgraph --corpus corpus.txt --output navgraph-baseline
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from project.management.commands.build_navgraph import (
+    _build_inputs_for_mask_path,
+    _iter_all_masks,
+    _resolve_file_id_job,
+)
+from project.services.media_access import navgraph_raster_cache
+from project.services.navgraph_jobs import init_navgraph_worker_process
+
+REPORT_VERSION = 1
+
+# Relative regressions tolerated by --baseline unless overridden.
+DEFAULT_TIME_THRESHOLD = 0.15
+DEFAULT_MEMORY_THRESHOLD = 0.10
+DEFAULT_SIZE_THRESHOLD = 0.05
+# Stages faster than this in the baseline are too noisy to gate on.
+DEFAULT_MIN_STAGE_SECONDS = 0.5
+
+
+def _rss_mb():
+    """Peak resident set size of this process in MB (Linux reports KB)."""
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def benchmark_build(mask_path, region, level_passages, options):
+    """Build one mask and measure it; runs inside a spawned benchmark child."""
+    import tracemalloc
+
+    from project.navgraph import build_navgraph, save_navgraph
+
+    trace = options.get("tracemalloc", True)
+    rss_start = _rss_mb()
+    phases = []
+    current = {"phase": "starting", "t": time.perf_counter()}
+
+    def close_phase(next_phase):
+        now = time.perf_counter()
+        record = {
+            "phase": current["phase"],
+            "seconds": round(now - current["t"], 3),
+            "peak_rss_mb": round(_rss_mb(), 1),
+        }
+        if trace:
+            record["tracemalloc_peak_mb"] = round(
+                tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.reset_peak()
+        phases.append(record)
+        current.update(phase=next_phase, t=now)
+
+    def on_progress(payload):
+        if payload["phase"] != current["phase"]:
+            close_phase(payload["phase"])
+
+    raster_cache = navgraph_raster_cache() if options.get("raster_cache") else None
+    with tempfile.TemporaryDirectory(prefix="navgraph-bench-") as scratch:
+        local_mask = os.path.join(scratch, os.path.basename(mask_path))
+        shutil.copyfile(mask_path, local_mask)
+        if trace:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            artifact = build_navgraph(
+                local_mask, region_polygon=region, level_passages=level_passages,
+                progress_callback=on_progress, raster_cache=raster_cache,
+                memory_budget_mb=options.get("memory_budget_mb"),
+                edge_workers=options.get("edge_workers") or 1)
+            _, bin_path = save_navgraph(artifact, local_mask, include_npz=False)
+            wall = time.perf_counter() - t0
+            close_phase("done")
+            tracemalloc_peak = max(
+                (p["tracemalloc_peak_mb"] for p in phases), default=None) if trace else None
+        finally:
+            if trace:
+                tracemalloc.stop()
+        bin_bytes = os.path.getsize(bin_path)
+
+    stats = artifact["stats"]
+    return {
+        "mpx": stats["mpx"],
+        "seconds": round(wall, 3),
+        "build_seconds": stats["build_seconds"],
+        "stages": dict(stats["timings"]),
+        "phases": phases,
+        "rss_start_mb": round(rss_start, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "tracemalloc_peak_mb": tracemalloc_peak,
+        "n_nodes": stats["n_nodes"],
+        "n_edges": stats["n_edges"],
+        "bin_bytes": bin_bytes,
+        "tiled": bool(stats.get("tiled")),
+    }
+
+
+def summarize_runs(runs):
+    """Per-mask aggregate: median times, maximum memory, last counts/size."""
+    stage_names = []
+    for run in runs:
+        stage_names.extend(k for k in run["stages"] if k not in stage_names)
+    traced = [r["tracemalloc_peak_mb"] for r in runs if r["tracemalloc_peak_mb"] is not None]
+    return {
+        "mpx": runs[-1]["mpx"],
+        "repeats": len(runs),
+        "seconds": round(statistics.median(r["seconds"] for r in runs), 3),
+        "seconds_min": min(r["seconds"] for r in runs),
+        "seconds_max": max(r["seconds"] for r in runs),
+        "stages": {
+            name: round(statistics.median(r["stages"].get(name, 0.0) for r in runs), 3)
+            for name in stage_names
+        },
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+        "tracemalloc_peak_mb": max(traced) if traced else None,
+        "n_nodes": runs[-1]["n_nodes"],
+        "n_edges": runs[-1]["n_edges"],
+        "bin_bytes": runs[-1]["bin_bytes"],
+    }
+
+
+def compare_to_baseline(report, baseline, *, time_threshold=DEFAULT_TIME_THRESHOLD,
+                        memory_threshold=DEFAULT_MEMORY_THRESHOLD,
+                        size_threshold=DEFAULT_SIZE_THRESHOLD,
+                        min_stage_seconds=DEFAULT_MIN_STAGE_SECONDS):
+    """Return ``(regressions, notes)`` comparing two reports mask by mask.
+
+    A regression is a metric that grew by more than its relative threshold;
+    notes cover masks missing from either side and changed node/edge counts.
+    """
+    regressions, notes = [], []
+    old_masks = baseline.get("masks", {})
+
+    def check(name, metric, old, new, threshold, unit, floor=0.0):
+        if old is None or new is None or old < floor or old <= 0:
+            return
+        change = (new - old) / old
+        if change > threshold:
+            regressions.append(
+                f"{name}: {metric} {old:g}{unit} -> {new:g}{unit} "
+                f"(+{change:.0%} > {threshold:.0%})")
+
+    for name, new in report["masks"].items():
+        old = old_masks.get(name)
+        if old is None:
+            notes.append(f"{name}: not in baseline")
+            continue
+        new_sum, old_sum = new["summary"], old["summary"]
+        check(name, "seconds", old_sum["seconds"], new_sum["seconds"],
+              time_threshold, "s", min_stage_seconds)
+        for stage, seconds in new_sum["stages"].items():
+            check(name, f"stage {stage}", old_sum["stages"].get(stage), seconds,
+                  time_threshold, "s", min_stage_seconds)
+        check(name, "peak RSS", old_sum["peak_rss_mb"], new_sum["peak_rss_mb"],
+              memory_threshold, " MB")
+        check(name, "tracemalloc peak", old_sum.get("tracemalloc_peak_mb"),
+              new_sum.get("tracemalloc_peak_mb"), memory_threshold, " MB")
+        check(name, ".bin size", old_sum["bin_bytes"], new_sum["bin_bytes"],
+              size_threshold, " B")
+        for key in ("n_nodes", "n_edges"):
+            if old_sum[key] != new_sum[key]:
+                notes.append(f"{name}: {key} {old_sum[key]} -> {new_sum[key]}")
+    for name in old_masks:
+        if name not in report["masks"]:
+            notes.append(f"{name}: in baseline but not benchmarked")
+    return regressions, notes
+
+
+CSV_FIELDS = [
+    "mask", "mpx", "repeats", "seconds", "seconds_min", "seconds_max",
+    "peak_rss_mb", "tracemalloc_peak_mb", "n_nodes", "n_edges", "bin_bytes",
+]
+
+
+def write_report(report, prefix):
+    """Write ``<prefix>.json`` and ``<prefix>.csv``; returns both paths."""
+    directory = os.path.dirname(os.path.abspath(prefix))
+    os.makedirs(directory, exist_ok=True)
+    json_path, csv_path = f"{prefix}.json", f"{prefix}.csv"
+    with open(json_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+    stage_names = []
+    for entry in report["masks"].values():
+        stage_names.extend(k for k in entry["summary"]["stages"] if k not in stage_names)
+    with open(csv_path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(CSV_FIELDS + [f"stage_{name}" for name in stage_names])
+        for name, entry in report["masks"].items():
+            summary = entry["summary"]
+            row = [name] + [summary.get(field) for field in CSV_FIELDS[1:]]
+            row += [summary["stages"].get(stage, "") for stage in stage_names]
+            writer.writerow(row)
+    return json_path, csv_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark navgraph builds over a mask corpus: per-stage wall time, "
+        "peak RSS, tracemalloc peaks, node/edge counts and .bin size, with "
+        "optional regression gates against a stored baseline report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "masks", nargs="*",
+            help="Mask PNG paths or File ids to benchmark.")
+        parser.add_argument(
+            "--corpus", default=None,
+            help="Text file listing mask paths or File ids, one per line "
+                 "(# starts a comment).")
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Benchmark N masks from media/masks/ (with --random/--seed).")
+        parser.add_argument("--random", action="store_true",
+                            help="Randomize the media/masks/ order before --limit.")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Seed for --random.")
+        parser.add_argument("--repeat", type=int, default=3,
+                            help="Builds per mask (default 3).")
+        parser.add_argument(
+            "--output", default=None,
+            help="Report path prefix; writes <prefix>.json and <prefix>.csv "
+                 "(default navgraph-benchmark-<timestamp>).")
+        parser.add_argument("--baseline", default=None,
+                            help="Baseline report JSON to compare against.")
+        parser.add_argument(
+            "--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD,
+            help=f"Allowed relative wall-time growth (default {DEFAULT_TIME_THRESHOLD}).")
+        parser.add_argument(
+            "--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+            help=f"Allowed relative RSS/tracemalloc growth (default {DEFAULT_MEMORY_THRESHOLD}).")
+        parser.add_argument(
+            "--size-threshold", type=float, default=DEFAULT_SIZE_THRESHOLD,
+            help=f"Allowed relative .bin size growth (default {DEFAULT_SIZE_THRESHOLD}).")
+        parser.add_argument(
+            "--min-stage-seconds", type=float, default=DEFAULT_MIN_STAGE_SECONDS,
+            help="Ignore times below this in the baseline when gating "
+                 f"(default {DEFAULT_MIN_STAGE_SECONDS}).")
+        parser.add_argument("--no-tracemalloc", action="store_true",
+                            help="Skip tracemalloc (cleaner wall times).")
+        parser.add_argument("--raster-cache", action="store_true",
+                            help="Serve raster stages from the shared raster cache.")
+        parser.add_argument(
+            "--memory-budget-mb", type=int, default=None,
+            help="Tiling budget passed to the build (default: "
+                 "NAVGRAPH_BUILD_JOB_MEMORY_MB).")
+        parser.add_argument("--edge-workers", type=int, default=None,
+                            help="Fallback edge-solve processes (default: NAVGRAPH_EDGE_WORKERS).")
+        parser.add_argument(
+            "--inline", action="store_true",
+            help="Build in this process (debugging; peak RSS becomes cumulative).")
+
+    def _corpus(self, opts):
+        """``[(name, mask_path, region, level_passages)]`` in corpus order."""
+        entries = list(opts["masks"])
+        if opts["corpus"]:
+            with open(opts["corpus"], encoding="utf-8") as handle:
+                for line in handle:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        entries.append(line)
+        if opts["limit"] is not None or opts["random"]:
+            entries.extend(_iter_all_masks(
+                limit=opts["limit"], randomize=opts["random"], seed=opts["seed"]))
+        if not entries:
+            raise CommandError("Give mask paths/File ids, --corpus, or --limit.")
+
+        jobs = []
+        for entry in entries:
+            if entry.isdigit():
+                mask_path, region, passages = _resolve_file_id_job(int(entry))
+                name = f"file-{entry}"
+            else:
+                if not os.path.isfile(entry):
+                    raise CommandError(f"Mask file not found: {entry}")
+                region, passages, err = _build_inputs_for_mask_path(entry)
+                if err:
+                    raise CommandError(f"{entry}: {err}")
+                mask_path, name = entry, os.path.basename(entry)
+            jobs.append((name, mask_path, region, passages))
+        return jobs
+
+    def handle(self, *args, **opts):
+        if opts["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+        baseline = None
+        if opts["baseline"]:
+            with open(opts["baseline"], encoding="utf-8") as handle:
+                baseline = json.load(handle)
+        jobs = self._corpus(opts)
+        memory_budget_mb = opts["memory_budget_mb"]
+        if memory_budget_mb is None:
+            memory_budget_mb = settings.NAVGRAPH_BUILD_JOB_MEMORY_MB
+        options = {
+            "tracemalloc": not opts["no_tracemalloc"],
+            "raster_cache": opts["raster_cache"],
+            "memory_budget_mb": memory_budget_mb,
+            "edge_workers": opts["edge_workers"] or settings.NAVGRAPH_EDGE_WORKERS,
+        }
+
+        report = {
+            "version": REPORT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": opts["repeat"],
+            "options": options,
+            "masks": {},
+        }
+        for name, mask_path, region, passages in jobs:
+            runs = []
+            for attempt in range(opts["repeat"]):
+                run = self._run(mask_path, region, passages, options, opts["inline"])
+                runs.append(run)
+                self.stdout.write(
+                    f"RUN   {name} #{attempt + 1}: {run['seconds']:.1f}s, "
+                    f"rss={run['peak_rss_mb']:.0f} MB, "
+                    f"traced={run['tracemalloc_peak_mb'] or 0:.0f} MB, "
+                    f"nodes={run['n_nodes']}, edges={run['n_edges']}, "
+                    f"bin={run['bin_bytes']}B")
+            summary = summarize_runs(runs)
+            report["masks"][name] = {"mask": mask_path, "summary": summary, "runs": runs}
+            slowest = sorted(summary["stages"].items(), key=lambda kv: -kv[1])[:3]
+            self.stdout.write(self.style.SUCCESS(
+                f"DONE  {name}: {summary['mpx']} Mpx, median {summary['seconds']:.1f}s "
+                f"({', '.join(f'{k}={v:.1f}s' for k, v in slowest)}), "
+                f"peak rss={summary['peak_rss_mb']:.0f} MB"))
+
+        prefix = opts["output"] or time.strftime("navgraph-benchmark-%Y%m%d-%H%M%S")
+        json_path, csv_path = write_report(report, prefix)
+        self.stdout.write(f"Wrote {json_path} and {csv_path}.")
+
+        if baseline is None:
+            return
+        regressions, notes = compare_to_baseline(
+            report, baseline,
+            time_threshold=opts["time_threshold"],
+            memory_threshold=opts["memory_threshold"],
+            size_threshold=opts["size_threshold"],
+            min_stage_seconds=opts["min_stage_seconds"])
+        for note in notes:
+            self.stdout.write(self.style.WARNING(f"NOTE  {note}"))
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {opts['baseline']}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {opts['baseline']}."))
+
+    def _run(self, mask_path, region, passages, options, inline):
+        if inline:
+            return benchmark_build(mask_path, region, passages, options)
+        # One fresh process per build: ru_maxrss is a per-process high-water mark.
+        with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_navgraph_worker_process) as executor:
+            return executor.submit(
+                benchmark_build, mask_path, region, passages, options).result()
@@ -14,6 +14,13 @@ Usage:
     python manage.py build_navgraph --all --random --limit 10 --force --debug
     python manage.py build_navgraph --all --limit 5
     python manage.py build_navgraph --all --force
+    python manage.py build_navgraph --all --force --no-raster-cache
+    python manage.py build_navgraph --file 7 --memory-budget-mb 1024
+    python manage.py build_navgraph --all --edge-workers 4
+
+Builds share the content-addressed raster cache (``NAVGRAPH_RASTER_CACHE_DIR``)
+with the web builds, so re-running a backfill over unchanged masks skips the
+label/EDT/skeleton stages.
 """
 
 import os
@@ -25,6 +32,9 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import DatabaseError
 
 from project.navgraph import build_navgraph, region_revision, save_navgraph
+from project.services.media_access import (
+    forget_navgraph_artifacts, navgraph_raster_cache,
+)
 
 # Marker used by any derived artifact (npz/bin/debug overlay/...) so --all
 # never mistakes one for a mask, regardless of where the marker falls.
@@ -139,6 +149,20 @@ def _resolve_file_id_job(file_id):
     return mask_path, row.infinite_region, row.level_passages
 
 
+def _forget_registered_artifacts(mask_path):
+    """Drop the ``NavgraphArtifact`` rows vouching for the binary just rewritten.
+
+    The web listing trusts those rows without a stat; the next currency check
+    of each File re-registers it if the new binary matches its revisions."""
+    rows = _file_rows_for_mask_path(mask_path)
+    if not rows:
+        return
+    try:
+        forget_navgraph_artifacts(row.id for row in rows)
+    except DatabaseError:
+        pass
+
+
 def _bin_path(mask_path):
     base, _ = os.path.splitext(mask_path)
     return base + ".navgraph.bin"
@@ -239,6 +263,22 @@ class Command(BaseCommand):
             '--seed', type=int, default=None,
             help="Optional seed for --random, useful for repeatable samples.",
         )
+        parser.add_argument(
+            '--memory-budget-mb', type=int, default=None,
+            help="Run the label/EDT stages tiled when a mask would exceed "
+                 "this many MB (default: NAVGRAPH_BUILD_JOB_MEMORY_MB; 0 "
+                 "disables tiling).",
+        )
+        parser.add_argument(
+            '--edge-workers', type=int, default=None,
+            help="Processes for fallback edge solves (default: "
+                 "NAVGRAPH_EDGE_WORKERS).",
+        )
+        parser.add_argument(
+            '--no-raster-cache', action='store_true',
+            help="Recompute labels/EDT/skeleton instead of using the shared "
+                 "raster cache.",
+        )
         parser.add_argument(
             '--debug', action='store_true',
             help="Also retain <mask>.navgraph.npz and write a debug PNG "
@@ -255,6 +295,11 @@ class Command(BaseCommand):
         randomize = opts['random']
         seed = opts['seed']
         debug = opts['debug']
+        raster_cache = None if opts['no_raster_cache'] else navgraph_raster_cache()
+        memory_budget_mb = opts['memory_budget_mb']
+        if memory_budget_mb is None:
+            memory_budget_mb = settings.NAVGRAPH_BUILD_JOB_MEMORY_MB
+        edge_workers = opts['edge_workers'] or settings.NAVGRAPH_EDGE_WORKERS
 
         if bool(file_arg) == bool(all_flag):
             raise CommandError("Specify exactly one of --file or --all.")
@@ -309,8 +354,12 @@ class Command(BaseCommand):
                     artifact = build_navgraph(
                         mask_path, region_polygon=region,
                         level_passages=passages,
-                        collect_diagnostics=debug)
+                        collect_diagnostics=debug,
+                        raster_cache=raster_cache,
+                        memory_budget_mb=memory_budget_mb,
+                        edge_workers=edge_workers)
                     save_navgraph(artifact, mask_path, include_npz=debug)
+                    _forget_registered_artifacts(mask_path)
                     elapsed = time.time() - t0
                     stats = artifact["stats"]
                     bin_bytes = os.path.getsize(_bin_path(mask_path))
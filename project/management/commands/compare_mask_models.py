@@ -0,0 +1,269 @@
+"""Compare two UNet model variants on reference maps before switching.
+
+Runs the ``--reference`` (default ``float32``) and ``--candidate`` (default
+``int8``) variants of ``project.UNet.MASK_MODEL_VARIANTS`` over the same
+resized tiles of every map and reports:
+
+* pixel agreement per mask class (impassable, very slow, ... as the mask
+  encodes them) and overall, measured against the reference;
+* inference time of both variants and the speedup;
+* with ``--navgraph``, node/edge counts of navgraphs built from both masks.
+
+The gate passes when the overall agreement reaches ``--min-agreement`` and
+every class covering at least ``MIN_CLASS_PIXELS`` reference pixels reaches
+``--min-class-agreement``; otherwise the command exits non-zero. Set
+``MASK_MODEL_VARIANT`` to the candidate only after it passes.
+
+``--quantize`` (re)writes the int8 model from the float32 one first,
+calibrated on tiles of the same maps (needs the ``onnx`` package).
+
+Usage:
+    python manage.py compare_mask_models media/maps/A.png media/maps/B.png --scale 0.71
+    python manage.py compare_mask_models media/maps/A.png --quantize --calibration-tiles 16
+    python manage.py compare_mask_models media/maps/A.png --navgraph --output int8-gate.json
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from project import UNet
+
+# Classes rarer than this in the reference are reported but not gated on.
+MIN_CLASS_PIXELS = 10_000
+MASK_CLASS_NAMES = {
+    UNet.MASK_IMPASSABLE: "impassable",
+    135: "very slow",
+    231: "slow",
+    241: "cross",
+    242: "stairs",
+    243: "fast",
+    255: "unclassified",
+}
+
+
+def _resized_rows(map_path, scale, directory):
+    """The map resized for the model, as ``_ScratchRows``, plus its tiles."""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = None
+    with Image.open(map_path) as probe:
+        factor = scale / 0.710
+        width, height = int(probe.width * factor), int(probe.height * factor)
+    source = UNet._decode_map_rows(map_path, directory)
+    try:
+        resized = UNet._ScratchRows((height, width, 3), np.uint8, directory)
+        for y0 in range(0, height, UNet.MASK_BAND_ROWS):
+            y1 = min(y0 + UNet.MASK_BAND_ROWS, height)
+            resized.write(y0, UNet._resample_rows(source, (width, height), y0, y1))
+    finally:
+        source.close()
+    return resized, UNet._mask_tiles(height, width)
+
+
+def _calibration_tiles(map_paths, scale, limit, directory):
+    """Model inputs of up to ``limit`` tiles, spread over ``map_paths``."""
+    per_map = max(1, -(-limit // len(map_paths)))
+    lut = np.arange(256, dtype=np.float32) / np.float32(255)
+    produced = 0
+    for map_path in map_paths:
+        resized, tiles = _resized_rows(map_path, scale, directory)
+        try:
+            step = max(1, len(tiles) // per_map)
+            for y0, y1, x0, x1, *_owned in tiles[::step][:per_map]:
+                if produced >= limit:
+                    return
+                yield np.take(lut, resized[y0:y1][:, x0:x1].transpose(2, 0, 1))
+                produced += 1
+        finally:
+            resized.close()
+
+
+def _infer(variant, resized, tiles, directory):
+    """Class ids of one variant as ``_ScratchRows`` and the inference seconds."""
+    height, width = resized.shape[:2]
+    classes = UNet._ScratchRows((height, width), np.uint8, directory)
+    with UNet._session_cache(variant).session() as (session, _load_seconds):
+        engine = UNet._TileInferenceEngine(
+            session, batch_size=settings.MASK_INFERENCE_BATCH_SIZE)
+        t0 = time.perf_counter()
+        engine.run_rows(lambda y0, y1: resized[y0:y1], classes.write, width, tiles)
+        return classes, time.perf_counter() - t0
+
+
+def _agreement_counts(reference, candidate):
+    """Per mask value: reference pixel count and pixels the candidate matches."""
+    total = np.zeros(256, dtype=np.int64)
+    agree = np.zeros(256, dtype=np.int64)
+    for y0 in range(0, reference.shape[0], UNet.MASK_BAND_ROWS):
+        rows = slice(y0, y0 + UNet.MASK_BAND_ROWS)
+        ref = UNet._class_map_to_mask(reference[rows]).ravel()
+        cand = UNet._class_map_to_mask(candidate[rows]).ravel()
+        total += np.bincount(ref, minlength=256)
+        agree += np.bincount(ref[ref == cand], minlength=256)
+    return total, agree
+
+
+def _navgraph_counts(classes, mask_path):
+    from project.navgraph import build_navgraph
+
+    UNet._write_mask_png(mask_path, classes)
+    stats = build_navgraph(mask_path)["stats"]
+    return {"nodes": int(stats.get("n_nodes") or 0), "edges": int(stats.get("n_edges") or 0)}
+
+
+class Command(BaseCommand):
+    help = "Compare UNet model variants on reference maps (agreement, navgraph deltas, speedup)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("maps", nargs="+", help="Reference map images.")
+        parser.add_argument("--scale", type=float, default=0.710,
+                            help="Map scale as passed to mask generation (default 0.710).")
+        parser.add_argument("--reference", default="float32",
+                            help="Reference model variant (default float32).")
+        parser.add_argument("--candidate", default="int8",
+                            help="Candidate model variant (default int8).")
+        parser.add_argument("--quantize", action="store_true",
+                            help="Write the int8 model from the float32 one before comparing.")
+        parser.add_argument("--calibration-tiles", type=int, default=8,
+                            help="Tiles used to calibrate --quantize (default 8).")
+        parser.add_argument("--navgraph", action="store_true",
+                            help="Also build navgraphs from both masks and compare node/edge counts.")
+        parser.add_argument("--min-agreement", type=float, default=0.99,
+                            help="Required overall pixel agreement (default 0.99).")
+        parser.add_argument("--min-class-agreement", type=float, default=0.95,
+                            help="Required agreement of every common class (default 0.95).")
+        parser.add_argument("--output", default=None, help="Also write the report as JSON.")
+
+    def handle(self, *args, **opts):
+        for variant in (opts["reference"], opts["candidate"]):
+            if variant not in UNet.MASK_MODEL_VARIANTS:
+                raise CommandError(
+                    f"Unknown variant {variant!r}; choose from {sorted(UNet.MASK_MODEL_VARIANTS)}.")
+        for map_path in opts["maps"]:
+            if not os.path.isfile(map_path):
+                raise CommandError(f"Map not found: {map_path}")
+        if opts["scale"] <= 0:
+            raise CommandError("--scale must be positive")
+
+        with tempfile.TemporaryDirectory(prefix="mask-compare-") as directory:
+            if opts["quantize"]:
+                self._quantize(opts, directory)
+            for variant in (opts["reference"], opts["candidate"]):
+                model_path = UNet._session_cache(variant).model_path
+                if not os.path.isfile(model_path):
+                    hint = " (use --quantize)" if variant == "int8" else ""
+                    raise CommandError(f"Model for {variant} not found: {model_path}{hint}")
+            report = self._compare(opts, directory)
+
+        self._print_report(report)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, indent=2)
+        if report["failures"]:
+            raise CommandError(f"Gate failed: {'; '.join(report['failures'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Gate passed: {opts['candidate']} may replace {opts['reference']}."))
+
+    def _quantize(self, opts, directory):
+        source = UNet.MASK_MODEL_VARIANTS["float32"]
+        target = UNet.MASK_MODEL_VARIANTS["int8"]
+        if not os.path.isfile(source):
+            raise CommandError(f"float32 model not found: {source}")
+        t0 = time.perf_counter()
+        try:
+            UNet.quantize_mask_model(source, target, _calibration_tiles(
+                opts["maps"], opts["scale"], max(1, opts["calibration_tiles"]), directory))
+        except ImportError as err:
+            raise CommandError(f"Quantization needs onnxruntime and onnx: {err}") from err
+        # A running process would otherwise keep serving the previous file.
+        UNet._session_cache("int8").evict()
+        self.stdout.write(f"Quantized {source} -> {target} in {time.perf_counter() - t0:.1f} s")
+
+    def _compare(self, opts, directory):
+        reference, candidate = opts["reference"], opts["candidate"]
+        total = np.zeros(256, dtype=np.int64)
+        agree = np.zeros(256, dtype=np.int64)
+        seconds = {reference: 0.0, candidate: 0.0}
+        maps = []
+        for map_path in opts["maps"]:
+            resized, tiles = _resized_rows(map_path, opts["scale"], directory)
+            classes = {}
+            entry = {"map": map_path, "tiles": len(tiles), "seconds": {}}
+            try:
+                for variant in (reference, candidate):
+                    classes[variant], entry["seconds"][variant] = _infer(
+                        variant, resized, tiles, directory)
+                    seconds[variant] += entry["seconds"][variant]
+            finally:
+                resized.close()
+            try:
+                map_total, map_agree = _agreement_counts(classes[reference], classes[candidate])
+                total += map_total
+                agree += map_agree
+                entry["agreement"] = float(map_agree.sum() / max(1, map_total.sum()))
+                if opts["navgraph"]:
+                    entry["navgraph"] = {
+                        variant: _navgraph_counts(
+                            classes[variant], os.path.join(directory, f"mask_{variant}.png"))
+                        for variant in (reference, candidate)
+                    }
+            finally:
+                for rows in classes.values():
+                    rows.close()
+            maps.append(entry)
+
+        classes_report = {
+            MASK_CLASS_NAMES.get(value, str(value)): {
+                "pixels": int(total[value]),
+                "agreement": float(agree[value] / total[value]),
+            }
+            for value in np.flatnonzero(total)
+        }
+        overall = float(agree.sum() / max(1, total.sum()))
+        failures = []
+        if overall < opts["min_agreement"]:
+            failures.append(f"overall agreement {overall:.4f} < {opts['min_agreement']}")
+        for name, row in classes_report.items():
+            if row["pixels"] >= MIN_CLASS_PIXELS and row["agreement"] < opts["min_class_agreement"]:
+                failures.append(
+                    f"{name} agreement {row['agreement']:.4f} < {opts['min_class_agreement']}")
+        return {
+            "reference": reference,
+            "candidate": candidate,
+            "scale": opts["scale"],
+            "maps": maps,
+            "classes": classes_report,
+            "agreement": overall,
+            "seconds": seconds,
+            "speedup": seconds[reference] / seconds[candidate] if seconds[candidate] else None,
+            "failures": failures,
+        }
+
+    def _print_report(self, report):
+        reference, candidate = report["reference"], report["candidate"]
+        for entry in report["maps"]:
+            line = (f"{os.path.basename(entry['map'])}: {entry['tiles']} tiles, "
+                    f"agreement {entry['agreement']:.4f}, "
+                    f"{reference} {entry['seconds'][reference]:.1f} s, "
+                    f"{candidate} {entry['seconds'][candidate]:.1f} s")
+            graphs = entry.get("navgraph")
+            if graphs:
+                ref, cand = graphs[reference], graphs[candidate]
+                line += (f", nodes {ref['nodes']} -> {cand['nodes']} "
+                         f"({cand['nodes'] - ref['nodes']:+d}), edges {ref['edges']} -> "
+                         f"{cand['edges']} ({cand['edges'] - ref['edges']:+d})")
+            self.stdout.write(line)
+        for name, row in report["classes"].items():
+            self.stdout.write(f"  {name:<13} {row['pixels']:>12} px  agreement {row['agreement']:.4f}")
+        speedup = report["speedup"]
+        self.stdout.write(
+            f"Overall agreement {report['agreement']:.4f}; speedup "
+            + (f"{speedup:.2f}x" if speedup else "n/a"))
+        for failure in report["failures"]:
+            self.stdout.write(self.style.ERROR(f"FAIL {failure}"))
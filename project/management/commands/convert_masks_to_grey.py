@@ -0,0 +1,100 @@
+"""Re-encode legacy RGB/RGBA mask PNGs as single-channel ``L`` PNGs.
+
+Masks generated before the greyscale encoder stored every value three (or
+four) times. Only masks whose channels are identical and fully opaque are
+converted, so the pixels every consumer reads (``_load_mask`` converts to
+``L``) stay exactly the same; anything else is reported and left alone.
+
+Usage:
+    python manage.py convert_masks_to_grey --dry-run
+    python manage.py convert_masks_to_grey
+    python manage.py convert_masks_to_grey --limit 20
+
+Each rewrite keeps the mask's modification time, so navgraph artifacts built
+from it remain current; the artifact registry notices the new size and
+re-validates once. The content-addressed raster cache and build checkpoints
+are keyed by file bytes and miss once per converted mask. Re-run the command
+after editor saves, which still upload RGBA.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project.UNet import MASK_BAND_ROWS, write_grey_png
+
+NAVGRAPH_INFIX = ".navgraph."
+
+
+def _grey_pixels(img):
+    """The mask as a ``uint8`` greyscale array, or None when conversion is lossy."""
+    import numpy as np
+
+    if img.mode not in ("RGB", "RGBA"):
+        return None
+    pixels = np.asarray(img)
+    grey = pixels[..., 0]
+    if not ((pixels[..., 1] == grey).all() and (pixels[..., 2] == grey).all()):
+        return None
+    if img.mode == "RGBA" and not (pixels[..., 3] == 255).all():
+        return None
+    return np.ascontiguousarray(grey)
+
+
+class Command(BaseCommand):
+    help = "Rewrite RGB/RGBA mask PNGs as lossless single-channel greyscale PNGs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be converted without writing.")
+        parser.add_argument("--limit", type=int, default=None,
+                            help="Convert at most N masks.")
+
+    def handle(self, *args, **opts):
+        from PIL import Image
+
+        Image.MAX_IMAGE_PIXELS = None
+        masks_dir = os.path.join(settings.MEDIA_ROOT, "masks")
+        if not os.path.isdir(masks_dir):
+            self.stdout.write("No masks directory.")
+            return
+
+        names = sorted(
+            name for name in os.listdir(masks_dir)
+            if name.startswith("mask_") and name.endswith(".png")
+            and NAVGRAPH_INFIX not in name
+        )
+        converted = skipped = saved = 0
+        for name in names:
+            if opts["limit"] is not None and converted >= opts["limit"]:
+                break
+            path = os.path.join(masks_dir, name)
+            with Image.open(path) as img:
+                if img.mode == "L":
+                    continue
+                img.load()
+                grey = _grey_pixels(img)
+            if grey is None:
+                skipped += 1
+                self.stderr.write(f"{name}: not a lossless greyscale mask, skipped")
+                continue
+
+            before = os.stat(path)
+            if opts["dry_run"]:
+                converted += 1
+                self.stdout.write(f"{name}: would convert ({before.st_size} bytes)")
+                continue
+            height, width = grey.shape
+            write_grey_png(
+                path, width, height,
+                (grey[y0:y0 + MASK_BAND_ROWS] for y0 in range(0, height, MASK_BAND_ROWS)),
+                mtime_ns=before.st_mtime_ns)
+            after = os.path.getsize(path)
+            converted += 1
+            saved += before.st_size - after
+            self.stdout.write(f"{name}: {before.st_size} -> {after} bytes")
+
+        verb = "Would convert" if opts["dry_run"] else "Converted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {converted} mask(s), skipped {skipped}, saved {saved} bytes."))
@@ -0,0 +1,178 @@
+"""Run queued navgraph builds outside the web workers.
+
+Pairs with ``NAVGRAPH_BUILD_MODE=queue`` (see ``project.services.navgraph_jobs``).
+Each build runs in a freshly spawned child process that exits afterwards, so
+its arrays are returned to the OS instead of fragmenting a long-lived heap.
+Concurrency defaults to ``navgraph_build_concurrency()`` — the configured
+worker count capped by the container memory budget.
+
+Usage:
+    python manage.py navgraph_worker
+    python manage.py navgraph_worker --concurrency 2
+    python manage.py navgraph_worker --once            # drain the queue, then exit
+    python manage.py navgraph_worker --once --inline   # debug: build in this process
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from project.services.navgraph_jobs import (
+    claim_navgraph_build_job,
+    finish_navgraph_build_job,
+    heartbeat_navgraph_build_jobs,
+    init_navgraph_worker_process,
+    navgraph_build_concurrency,
+    release_crashed_navgraph_build_job,
+    requeue_stale_navgraph_build_jobs,
+    run_navgraph_build_job,
+)
+
+
+class Command(BaseCommand):
+    help = "Claim and run queued navgraph builds (NAVGRAPH_BUILD_MODE=queue)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None,
+                            help="Builds run at once (default: from memory budget settings).")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds between queue polls/heartbeats (default 2).")
+        parser.add_argument("--worker-id", default=None,
+                            help="Id recorded on claimed jobs (default: hostname:pid). "
+                                 "A stable id lets a restarted worker reclaim its "
+                                 "orphaned jobs at once; it must be unique per process.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty and no build is running.")
+        parser.add_argument("--inline", action="store_true",
+                            help="Run builds in this process, one at a time (debugging).")
+
+    def handle(self, *args, **opts):
+        concurrency = opts["concurrency"] or navgraph_build_concurrency()
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1")
+        poll = max(0.1, float(opts["poll_interval"]))
+        # The pid keeps two workers on one host (or an --inline debug run)
+        # from requeueing each other's live jobs as their own orphans.
+        worker = opts["worker_id"] or f"{socket.gethostname() or 'pid'}:{os.getpid()}"
+
+        stopping = {"flag": False}
+
+        def _stop(_signum, _frame):
+            stopping["flag"] = True
+
+        if not opts["inline"]:
+            signal.signal(signal.SIGTERM, _stop)
+            signal.signal(signal.SIGINT, _stop)
+
+        # Jobs still marked running under this id were orphaned by our own
+        # previous run (deploy/restart); put them back before claiming.
+        requeue_stale_navgraph_build_jobs(worker=worker)
+        self.stdout.write(f"navgraph worker {worker}: concurrency={concurrency}")
+
+        if opts["inline"]:
+            self._run_inline(worker, opts["once"], poll)
+            return
+
+        executor = self._executor(concurrency)
+        running = {}
+        try:
+            while True:
+                broken = False
+                for job_id, (claimed, future) in list(running.items()):
+                    if not future.done():
+                        continue
+                    running.pop(job_id)
+                    exc = future.exception()
+                    error = f"{type(exc).__name__}: {exc}" if exc else ""
+                    if isinstance(exc, BrokenProcessPool):
+                        # A child died (OOM kill, segfault); every build the
+                        # pool held fails with it. Retry them like lost jobs.
+                        broken = True
+                        job = release_crashed_navgraph_build_job(claimed, error=error)
+                    else:
+                        job = finish_navgraph_build_job(claimed, error=error)
+                    self._report(job)
+                if broken:
+                    executor.shutdown(wait=True)
+                    executor = self._executor(concurrency)
+
+                heartbeat_navgraph_build_jobs(running.keys())
+                requeue_stale_navgraph_build_jobs()
+
+                while not stopping["flag"] and len(running) < concurrency:
+                    job = claim_navgraph_build_job(worker)
+                    if job is None:
+                        break
+                    self.stdout.write(f"build {job.build_token[:8]} file={job.file_id} attempt={job.attempts}")
+                    try:
+                        running[job.id] = (job, executor.submit(run_navgraph_build_job, job.id))
+                    except BrokenProcessPool as exc:
+                        self._report(release_crashed_navgraph_build_job(
+                            job, error=f"{type(exc).__name__}: {exc}"))
+                        executor.shutdown(wait=True)
+                        executor = self._executor(concurrency)
+                        break
+
+                if not running and (stopping["flag"] or opts["once"]):
+                    break
+                close_old_connections()
+                time.sleep(poll)
+        finally:
+            executor.shutdown(wait=True)
+
+    def _executor(self, concurrency):
+        return ProcessPoolExecutor(
+            max_workers=concurrency,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_navgraph_worker_process,
+            max_tasks_per_child=1,
+        )
+
+    def _run_inline(self, worker, once, poll):
+        while True:
+            job = claim_navgraph_build_job(worker)
+            if job is None:
+                if once:
+                    return
+                close_old_connections()
+                time.sleep(poll)
+                continue
+            self.stdout.write(f"build {job.build_token[:8]} file={job.file_id} attempt={job.attempts}")
+            error = ""
+            stop_heartbeat = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat, args=(job.id, poll, stop_heartbeat), daemon=True)
+            heartbeat.start()
+            try:
+                run_navgraph_build_job(job.id)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            finally:
+                stop_heartbeat.set()
+                heartbeat.join()
+            self._report(finish_navgraph_build_job(job, error=error))
+
+    def _heartbeat(self, job_id, interval, stop):
+        """Keep an inline build from looking lost to other workers."""
+        try:
+            while not stop.wait(interval):
+                heartbeat_navgraph_build_jobs([job_id])
+        finally:
+            connection.close()
+
+    def _report(self, job):
+        if job is None:
+            return
+        line = f"build {job.build_token[:8]} file={job.file_id} {job.status}"
+        if job.error:
+            self.stderr.write(f"{line}: {job.error}")
+        else:
+            self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 13:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0008_navgraphbuildjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NavgraphArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mask_size', models.BigIntegerField()),
+                ('mask_mtime_ns', models.BigIntegerField()),
+                ('bin_size', models.BigIntegerField()),
+                ('bin_mtime_ns', models.BigIntegerField()),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('passage_revision', models.CharField(max_length=256)),
+                ('region_revision', models.CharField(blank=True, max_length=256)),
+                ('node_count', models.PositiveIntegerField(default=0)),
+                ('edge_count', models.PositiveIntegerField(default=0)),
+                ('build_seconds', models.FloatField(blank=True, null=True)),
+                ('published_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='navgraph_artifact', to='project.file')),
+            ],
+        ),
+    ]
@@ -174,3 +174,71 @@ class FileSnapshot(models.Model):
 
     def __str__(self):
         return f"{self.file.name} — {self.created_at}"
+
+
+class NavgraphBuildJob(models.Model):
+    """Persistent queue entry for an out-of-process navgraph build.
+
+    Rows are written by ``toggle_infinite`` when ``NAVGRAPH_BUILD_MODE`` is
+    ``queue`` and claimed by the ``navgraph_worker`` management command. The
+    job only carries *which* build to run: the File's ``batch_progress`` build
+    token stays authoritative, so a job superseded while queued no-ops exactly
+    like a superseded in-process thread.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='navgraph_build_jobs')
+    build_token = models.CharField(max_length=64, unique=True)
+    enable_on_success = models.BooleanField(default=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='navgraph_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Navgraph build {self.build_token[:8]} - {self.file_id} ({self.status})"
+
+
+class NavgraphArtifact(models.Model):
+    """Registry row for a File's published ``.navgraph.bin``.
+
+    Written in the same transaction that publishes the artifact and deleted by
+    ``delete_navgraph_artifacts``, so "has a current artifact" is a join rather
+    than a filesystem/PNG/revision check per File. The recorded mask and binary
+    stats let the single-file serving path detect out-of-band replacement.
+    """
+    file = models.OneToOneField(File, on_delete=models.CASCADE, related_name='navgraph_artifact')
+    mask_size = models.BigIntegerField()
+    mask_mtime_ns = models.BigIntegerField()
+    bin_size = models.BigIntegerField()
+    bin_mtime_ns = models.BigIntegerField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    passage_revision = models.CharField(max_length=256)
+    region_revision = models.CharField(max_length=256, blank=True)
+    node_count = models.PositiveIntegerField(default=0)
+    edge_count = models.PositiveIntegerField(default=0)
+    build_seconds = models.FloatField(null=True, blank=True)
+    published_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Navgraph artifact - {self.file_id} ({self.passage_revision})"
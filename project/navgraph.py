@@ -42,6 +42,15 @@ full resolution. Node coordinates are snapped back to a genuinely passable
 full-resolution pixel. On the median ~8.6 Mpx mask this still gives a fine graph;
 the 75 Mpx outliers get a coarser but valid one (they are opt-in gated anyway).
 
+The clearance (EDT) raster is uint16 fixed point saturated at 255 px and is
+computed over bounded windows, so its float64 working set never spans a large
+mask. The full-resolution labels and the EDT peak at ~38 B per pixel. When
+they would exceed half of ``memory_budget_mb`` they run over halo windows into
+disk-backed memmaps instead, with an identical artifact (see "Tiled raster
+stages"); the coarse skeleton grid is unchanged because it also bounds the
+node count. The skeleton and graph stages still hold mask-sized arrays, so the
+budget bounds the label/EDT peak rather than the whole build's RSS.
+
 
 Off-map hit zone
 ----------------
@@ -71,7 +80,20 @@ served binary and can optionally write the full debug artifact next to the
 mask:
 
 * ``<mask>.navgraph.npz`` — optional full arrays for Python/debug tooling.
-* ``<mask>.navgraph.bin`` — compact little-endian binary for the JS worker.
+* ``<mask>.navgraph.bin`` — compact little-endian binary for the JS worker;
+  ``NavgraphView`` maps it read-only for server-side tooling.
+
+``build_navgraph(reuse_base=True)`` additionally keeps
+``<mask>.navgraph.base.npz``: the finished base graph before passage topology,
+keyed by mask SHA-256, region revision and builder constants, so passage-only
+edits skip every raster and base-graph stage. The checkpoint also keeps
+per-tile digests of its mask: after a brush edit only windows around the
+changed tiles are rebuilt and stitched into the previous base graph. A
+``RasterCache`` passed as
+``build_navgraph(raster_cache=...)`` keeps the mask-only rasters (labels, EDT,
+skeleton, sampling grids) in a shared, size-bounded, content-addressed
+directory, so region edits and backfills of an unchanged mask skip those
+stages too.
 
 Compact served graph and sampling metadata (v6)
 -----------------------------------------------
@@ -163,6 +185,7 @@ v6 passes the production serving gate.
 
 import heapq
 import hashlib
+import itertools
 import json
 import math
 import os
@@ -192,6 +215,11 @@ NAVGRAPH_MAGIC = b"NVG1"
 # Cap on the serialized passage-revision string (bounds check for every reader).
 NAVGRAPH_REVISION_MAX_LEN = 256
 
+# Precompressed siblings of the served binary, in server preference order:
+# ``(Content-Encoding, filename suffix)``. Each sibling carries the binary's
+# exact mtime so the serving path can tell it belongs to the current build.
+NAVGRAPH_BIN_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
 
 class NavgraphBuildCancelled(RuntimeError):
     """Raised when the owner reports that this build token was superseded."""
@@ -343,6 +371,18 @@ EDGE_DETOUR_RATIO = 3.0      # drop a k-NN edge whose A* path is > this * straig
 EDGE_SKELETON_MARGIN = 40    # px; subgrid margin for skeleton backbone A*
 EDGE_SKELETON_DETOUR = 6.0   # detour tolerance for skeleton backbone A*
 
+# Bounded fallback solves may run on a process pool (``edge_workers``). Below
+# EDGE_PARALLEL_MIN_JOBS solves the pool's start-up outweighs the gain.
+EDGE_PARALLEL_MIN_JOBS = 64
+EDGE_PARALLEL_CHUNK = 16
+
+# Straight-segment line integrals (``_line_integrals``). Batches are flattened
+# to one sample per pixel step, LINE_KERNEL_CHUNK_SAMPLES at a time, so one long
+# edge no longer pads every other segment of its chunk. Single segments up to
+# LINE_KERNEL_SCALAR_MAX_STEPS are cheaper as a plain loop.
+LINE_KERNEL_CHUNK_SAMPLES = 1 << 18
+LINE_KERNEL_SCALAR_MAX_STEPS = 96
+
 # --- Redundancy pruning ------------------------------------------------------
 # Only non-topological open-lattice nodes are considered. A node is removable
 # when every route through it already has a short local witness path that avoids
@@ -365,6 +405,46 @@ SAMPLE_DS = 4                # ÷4 sampling grids, matching the plan
 ENDPOINT_CLEARANCE_MIN_PX = 12
 ENDPOINT_TERRAIN_MIN_VALUE = 200
 
+# --- Base checkpoint ---------------------------------------------------------
+# Bump when the checkpoint layout or the meaning of a stored array changes.
+# Constant changes are covered separately by ``_builder_fingerprint``.
+BASE_CHECKPOINT_VERSION = 2
+
+# --- Raster cache ------------------------------------------------------------
+# Bump when a cached raster's layout or meaning changes. Each stage key also
+# carries the constants that stage depends on (see ``_build_base_graph``).
+RASTER_CACHE_VERSION = 2
+
+# --- Clearance raster --------------------------------------------------------
+# Full-resolution clearance is kept as uint16 fixed point (1/CLEARANCE_SCALE px)
+# saturated at CLEARANCE_CAP_PX, which doubles as the window halo. Every
+# consumer already saturates at or below the cap (coarse_clear is uint8), and
+# 1/256 px keeps every integer-threshold comparison of the exact EDT.
+CLEARANCE_CAP_PX = 255
+CLEARANCE_SCALE = 256
+# Longest window side of the clearance pass; longer axes are split with halos.
+CLEARANCE_WINDOW_PX = 4096
+
+# --- Tiled raster stages -----------------------------------------------------
+# Per-pixel peak of the monolithic label + EDT stages and of one EDT window
+# (float64 distances, int32 feature transform, temporaries), measured.
+MONOLITHIC_RASTER_BYTES_PER_PX = 38
+TILE_WINDOW_BYTES_PER_PX = 32
+TILE_MIN_CORE_PX = 512
+
+# --- Dirty-region rebuild ----------------------------------------------------
+# A mask edit is diffed against the base checkpoint per DIRTY_TILE_PX tile (see
+# ``_dirty_region_base``). Nodes within DIRTY_HALO_PX of a changed tile are
+# re-derived by a window build; the halo covers an edge candidate
+# (EDGE_MAX_DIST) plus its skeleton fallback margin, and the clearance cap. The
+# window build gets the same margin again as raster context.
+DIRTY_TILE_PX = 256
+DIRTY_HALO_PX = max(EDGE_MAX_DIST + EDGE_SKELETON_MARGIN, CLEARANCE_CAP_PX + 1)
+# Above this share of the map in context windows a full build is as cheap.
+DIRTY_MAX_WINDOW_FRACTION = 0.25
+# Consecutive dirty rebuilds on one lineage before a full build resets drift.
+DIRTY_MAX_GENERATIONS = 8
+
 
 # =============================================================================
 # Passage document normalization + canonical revision
@@ -837,6 +917,68 @@ def _point_in_polygon(x, y, polygon):
     return inside
 
 
+def _points_in_polygon(xs, ys, polygon):
+    """Vectorized ``_point_in_polygon`` over coordinate arrays.
+
+    Evaluates the same boundary and crossing expressions edge by edge, so every
+    point gets exactly the scalar test's answer.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if polygon is None:
+        return np.ones(xs.shape, dtype=bool)
+    eps = PASSAGE_GEOMETRY_EPSILON
+    inside = np.zeros(xs.shape, dtype=bool)
+    boundary = np.zeros(xs.shape, dtype=bool)
+    j = len(polygon) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(len(polygon)):
+            a, b = polygon[j], polygon[i]
+            orientation = ((b[0] - a[0]) * (ys - a[1])
+                           - (b[1] - a[1]) * (xs - a[0]))
+            boundary |= (
+                (np.abs(orientation) <= eps)
+                & (xs >= min(a[0], b[0]) - eps) & (xs <= max(a[0], b[0]) + eps)
+                & (ys >= min(a[1], b[1]) - eps) & (ys <= max(a[1], b[1]) + eps)
+            )
+            straddles = (a[1] > ys) != (b[1] > ys)
+            if straddles.any():
+                cross_x = (b[0] - a[0]) * (ys - a[1]) / (b[1] - a[1]) + a[0]
+                inside ^= straddles & (xs < cross_x)
+            j = i
+    return inside | boundary
+
+
+def _points_in_passage_body(passage, xs, ys):
+    """Vectorized ``_point_in_passage_body`` over coordinate arrays."""
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    min_x, min_y, max_x, max_y = passage["body_bounds"]
+    candidate = (xs >= min_x) & (xs <= max_x) & (ys >= min_y) & (ys <= max_y)
+    hit = np.zeros(xs.shape, dtype=bool)
+    if not candidate.any():
+        return hit
+    radius2 = passage["radius"] ** 2 + PASSAGE_GEOMETRY_EPSILON
+    segments = list(zip(passage["points"], passage["points"][1:]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for index, (a, b) in enumerate(segments):
+            dx, dy = b[0] - a[0], b[1] - a[1]
+            length2 = dx * dx + dy * dy
+            raw_t = ((xs - a[0]) * dx + (ys - a[1]) * dy) / length2
+            open_end = candidate & ~hit
+            if index == 0:
+                open_end &= ~(raw_t < -PASSAGE_GEOMETRY_EPSILON)
+            if index == len(segments) - 1:
+                open_end &= ~(raw_t > 1 + PASSAGE_GEOMETRY_EPSILON)
+            if length2 <= PASSAGE_GEOMETRY_EPSILON:
+                distance2 = (xs - a[0]) ** 2 + (ys - a[1]) ** 2
+            else:
+                t = np.minimum(1.0, np.maximum(0.0, raw_t))
+                distance2 = (xs - (a[0] + t * dx)) ** 2 + (ys - (a[1] + t * dy)) ** 2
+            hit |= open_end & (distance2 <= radius2)
+    return hit
+
+
 def _segment_in_polygon(a, b, polygon):
     if polygon is None:
         return True
@@ -1585,7 +1727,7 @@ def _obstacle_offset_nodes(mask, dist_full, simplify_px=CONTOUR_SIMPLIFY_PX,
                 x = int(round(qx + nx * distance))
                 if not (0 <= y < H and 0 <= x < W and allowed_full[y, x]):
                     continue
-                clearance = float(dist_full[y, x])
+                clearance = float(clearance_px(dist_full[y, x]))
                 if clearance > max(4.0, offset_px + 2.0):
                     continue
                 score = (
@@ -1873,7 +2015,7 @@ def _very_slow_offset_nodes(mask):
             "area_spacing_px": CONTOUR_AREA_SPACING_PX,
             "area_suppressed_candidates": 0,
         }
-    boundary_clearance = ndi.distance_transform_edt(~inside).astype(np.float32)
+    boundary_clearance = _capped_clearance(mask, blocked_value=VERY_SLOW)
     allowed = (mask != IMPASSABLE) & ~inside
     return _obstacle_offset_nodes(
         mask, boundary_clearance,
@@ -1923,112 +2065,156 @@ def _weighted_subgrid_path(sub, start, goal):
     eight-neighbour sparse graph for every candidate edge and then ran
     Dijkstra over the whole subgrid, although only one target was needed.
     """
+    return _weighted_subgrid_paths(sub, start, [goal])[0]
+
+
+def _weighted_subgrid_paths(sub, start, goals):
+    """``_weighted_subgrid_path`` for several goals from one start.
+
+    One cost-raster conversion and one Dijkstra settle every goal; each goal
+    gets ``(cost, geometric_length)`` or ``None`` when unreachable.
+    """
+    return _cost_raster_paths(_subgrid_costs(sub), start, goals)
+
+
+def _subgrid_costs(sub):
     costs = (255 - sub).astype(np.float64)
     costs[sub == IMPASSABLE] = np.inf
+    return costs
+
+
+def _cost_raster_paths(costs, start, goals):
+    """``_weighted_subgrid_paths`` on an already converted cost raster.
+
+    Dijkstra never revises a settled pixel, so each goal's cost and traceback
+    are those of a single-goal solve on the same raster.
+    """
     solver = _sk_mcp_geometric(costs, fully_connected=True)
-    cumulative, _ = solver.find_costs([start], [goal])
-    cost = float(cumulative[goal])
-    if not math.isfinite(cost):
-        return None
-    path = solver.traceback(goal)
-    geom = sum(
-        math.hypot(y1 - y0, x1 - x0)
-        for (y0, x0), (y1, x1) in zip(path, path[1:])
-    )
-    return cost, geom
+    cumulative, _ = solver.find_costs([start], list(goals))
+    out = []
+    for goal in goals:
+        cost = float(cumulative[goal])
+        if not math.isfinite(cost):
+            out.append(None)
+            continue
+        path = solver.traceback(goal)
+        geom = sum(
+            math.hypot(y1 - y0, x1 - x0)
+            for (y0, x0), (y1, x1) in zip(path, path[1:])
+        )
+        out.append((cost, geom))
+    return out
 
 
 def _line_cost(mask, x0, y0, x1, y1):
     """Terrain-weighted cost of the straight segment, or ``None`` if it crosses
     an impassable pixel.
 
-    Samples ~1 px steps and accumulates ``substep_len * (255 - value)`` matching
+    Samples ~1 px steps and returns ``substep_len * sum(255 - value)`` matching
     the graph's terrain cost model. Because candidate edges are short and
     mostly clear, this is the fast path; selected blocked segments fall back to
-    the bounded weighted raster solver.
+    the bounded weighted raster solver. Short segments run as a plain loop that
+    stops at the first blocked sample, longer ones go through
+    ``_line_integrals``; both give bit-identical costs.
     """
-    import math
     dx = x1 - x0
     dy = y1 - y0
     steps = int(max(abs(dx), abs(dy)))
     if steps == 0:
         return 0.0
-    seg = math.hypot(dx, dy) / steps  # length of one sampling substep
+    if steps > LINE_KERNEL_SCALAR_MAX_STEPS:
+        costs, blocked, _ = _line_integrals(mask, [x0], [y0], [x1], [y1])
+        return None if blocked[0] else float(costs[0])
+    seg = math.sqrt(dx * dx + dy * dy) / steps  # length of one sampling substep
     sx = dx / steps
     sy = dy / steps
-    cost = 0.0
+    total = 0
     for k in range(1, steps + 1):
-        xi = int(round(x0 + sx * k))
-        yi = int(round(y0 + sy * k))
-        val = mask[yi, xi]
+        val = int(mask[int(round(y0 + sy * k)), int(round(x0 + sx * k))])
         if val == IMPASSABLE:
             return None
-        cost += seg * (255 - int(val))
-    return cost
+        total += 255 - val
+    return seg * total
+
+
+def _line_integrals(mask, x0_arr, y0_arr, x1_arr, y1_arr,
+                    chunk_samples=LINE_KERNEL_CHUNK_SAMPLES):
+    """Line integrals of many straight segments over the terrain mask.
 
+    Segment ``i`` is sampled at ``round(p0 + k * (p1 - p0) / steps)`` for
+    ``k = 1..steps`` with ``steps = max(|dx|, |dy|)`` (a DDA walk). The
+    terrain sum ``sum(255 - value)`` is accumulated exactly in integers and
+    scaled once by the substep length, so the result does not depend on
+    summation order or on which other segments share a pass.
 
-def _line_cost_batch(mask, x0_arr, y0_arr, x1_arr, y1_arr, chunk=4096,
+    Samples of all segments are laid out back to back — no ``(n, max_steps)``
+    padding — and processed ``chunk_samples`` at a time. Returns
+    ``(costs, blocked, blocked_counts)``: ``costs[i]`` is 0.0 when
+    ``blocked[i]``, and ``blocked_counts[i]`` is the number of sampled
+    impassable pixels.
+    """
+    x0 = np.asarray(x0_arr, dtype=np.float64).ravel()
+    y0 = np.asarray(y0_arr, dtype=np.float64).ravel()
+    dx = np.asarray(x1_arr, dtype=np.float64).ravel() - x0
+    dy = np.asarray(y1_arr, dtype=np.float64).ravel() - y0
+    N = len(x0)
+    costs = np.zeros(N, dtype=np.float64)
+    blocked = np.zeros(N, dtype=bool)
+    blocked_counts = np.zeros(N, dtype=np.int32)
+    if N == 0:
+        return costs, blocked, blocked_counts
+    H, W = mask.shape
+    steps = np.maximum(np.abs(dx), np.abs(dy)).astype(np.int64)
+    sample_end = np.cumsum(steps)
+    chunk_samples = max(1, int(chunk_samples))
+
+    start = 0
+    while start < N:
+        done = int(sample_end[start - 1]) if start else 0
+        end = int(np.searchsorted(sample_end, done + chunk_samples, side="right"))
+        end = min(N, max(end, start + 1))
+        s = steps[start:end]
+        total = int(sample_end[end - 1]) - done
+        if total:
+            n = end - start
+            safe_s = np.maximum(s, 1).astype(np.float64)
+            bdx = dx[start:end]
+            bdy = dy[start:end]
+            seg_len = np.sqrt(bdx * bdx + bdy * bdy) / safe_s
+            owner = np.repeat(np.arange(n), s)
+            k = (np.arange(total, dtype=np.int64)
+                 - np.repeat(np.cumsum(s) - s, s) + 1).astype(np.float64)
+            xi = np.round(x0[start:end][owner] + (bdx / safe_s)[owner] * k)
+            yi = np.round(y0[start:end][owner] + (bdy / safe_s)[owner] * k)
+            xi = np.clip(xi.astype(np.intp), 0, W - 1)
+            yi = np.clip(yi.astype(np.intp), 0, H - 1)
+            vals = mask[yi, xi]
+            impass = vals == IMPASSABLE
+            counts = np.bincount(owner[impass], minlength=n)
+            # Sums of at most a few thousand 8-bit terms are exact in float64.
+            terrain = np.bincount(
+                owner, weights=255 - vals.astype(np.float64), minlength=n)
+            hit = counts > 0
+            costs[start:end] = np.where(hit, 0.0, seg_len * terrain)
+            blocked[start:end] = hit
+            blocked_counts[start:end] = counts
+        start = end
+    return costs, blocked, blocked_counts
+
+
+def _line_cost_batch(mask, x0_arr, y0_arr, x1_arr, y1_arr,
                      return_blocked_counts=False):
     """Vectorized batch version of _line_cost for many segments at once.
 
-    Identical math: steps = max(|dx|, |dy|), sample at round(k * substep)
-    for k = 1..steps, accumulate seg_len * (255 - val), blocked if any
-    sample == IMPASSABLE. Processes ``chunk`` segments per numpy pass to
-    bound peak memory. Returns ``(costs, blocked)`` arrays of shape (N,);
+    Returns ``(costs, blocked)`` arrays of shape (N,) from ``_line_integrals``;
     ``costs[i]`` is 0.0 when ``blocked[i]`` is True. With
     ``return_blocked_counts=True`` a third array reports how many sampled
     impassable pixels each segment crossed, allowing cheap rejection of edges
     through a whole obstacle before bounded A* is attempted.
     """
-    N = len(x0_arr)
-    if N == 0:
-        empty = (np.empty(0, dtype=np.float64), np.empty(0, dtype=bool))
-        if return_blocked_counts:
-            return empty + (np.empty(0, dtype=np.int32),)
-        return empty
-    H, W = mask.shape
-    x0 = np.asarray(x0_arr, dtype=np.float64)
-    y0 = np.asarray(y0_arr, dtype=np.float64)
-    x1 = np.asarray(x1_arr, dtype=np.float64)
-    y1 = np.asarray(y1_arr, dtype=np.float64)
-    costs = np.empty(N, dtype=np.float64)
-    blocked = np.empty(N, dtype=bool)
-    blocked_counts = np.empty(N, dtype=np.int32) if return_blocked_counts else None
-
-    for start in range(0, N, chunk):
-        end = min(start + chunk, N)
-        bx0 = x0[start:end]
-        by0 = y0[start:end]
-        dx = x1[start:end] - bx0
-        dy = y1[start:end] - by0
-        steps = np.maximum(np.abs(dx), np.abs(dy)).astype(np.int32)
-        max_s = int(steps.max()) if steps.size else 0
-        if max_s == 0:
-            costs[start:end] = 0.0
-            blocked[start:end] = False
-            if blocked_counts is not None:
-                blocked_counts[start:end] = 0
-            continue
-        safe_s = np.where(steps > 0, steps, 1).astype(np.float64)
-        seg_len = np.hypot(dx, dy) / safe_s   # geometric length per substep
-        sx = dx / safe_s
-        sy = dy / safe_s
-        k = np.arange(1, max_s + 1, dtype=np.float64)[None, :]     # (1, max_s)
-        valid = k <= steps[:, None].astype(np.float64)               # (n, max_s)
-        xi = np.round(bx0[:, None] + sx[:, None] * k).astype(np.int32)
-        yi = np.round(by0[:, None] + sy[:, None] * k).astype(np.int32)
-        xi = np.clip(xi, 0, W - 1)
-        yi = np.clip(yi, 0, H - 1)
-        vals = mask[yi, xi].astype(np.int32)
-        is_impass = valid & (vals == 0)
-        chunk_blocked = is_impass.any(axis=1)
-        contrib = np.where(valid & ~is_impass, seg_len[:, None] * (255 - vals), 0.0)
-        costs[start:end] = np.where(chunk_blocked, 0.0, contrib.sum(axis=1))
-        blocked[start:end] = chunk_blocked
-        if blocked_counts is not None:
-            blocked_counts[start:end] = is_impass.sum(axis=1, dtype=np.int32)
-
-    if blocked_counts is not None:
+    costs, blocked, blocked_counts = _line_integrals(
+        mask, x0_arr, y0_arr, x1_arr, y1_arr)
+    if return_blocked_counts:
         return costs, blocked, blocked_counts
     return costs, blocked
 
@@ -2265,20 +2451,171 @@ def _dedupe_appended_nodes(mask, nodes_xy, fixed_count, min_distance,
 def _weighted_edge_path(mask, xi, yi, xj, yj, straight, margin=EDGE_MARGIN,
                         detour_ratio=EDGE_DETOUR_RATIO):
     """Solve an edge on its bounded raster; reject absent/excessive detours."""
+    return _weighted_edge_paths(
+        mask, xi, yi, [(xj, yj, straight, margin, detour_ratio)])[0]
+
+
+def _weighted_edge_paths(mask, xi, yi, targets):
+    """Solve every ``(xj, yj, straight, margin, detour_ratio)`` target from
+    ``(xi, yi)``; one cost or ``None`` per target, as ``_weighted_edge_path``.
+
+    Consecutive targets share one cost-raster conversion over the union of
+    their bounding boxes as long as that union is no larger than the boxes
+    would be separately, so batching never converts more raster than per-edge
+    solves. The Dijkstra itself runs on each target's own box, one multi-goal
+    run per distinct box: a search over a wider window could settle an
+    equal-cost path of different geometric length and flip the detour check.
+    Results therefore match ``_weighted_edge_path`` target by target.
+    """
     H, W = mask.shape
-    y0 = max(0, min(yi, yj) - margin)
-    y1 = min(H, max(yi, yj) + margin + 1)
-    x0 = max(0, min(xi, xj) - margin)
-    x1 = min(W, max(xi, xj) + margin + 1)
-    sub = mask[y0:y1, x0:x1]
-    res = _weighted_subgrid_path(
-        sub, (yi - y0, xi - x0), (yj - y0, xj - x0))
-    if res is None:
-        return None
-    cost, geom = res
-    if geom > detour_ratio * straight:
-        return None
-    return cost
+    groups = []  # [box, member indices, summed member area]
+    boxes = []
+    for index, (xj, yj, _straight, margin, _ratio) in enumerate(targets):
+        box = (max(0, min(yi, yj) - margin), min(H, max(yi, yj) + margin + 1),
+               max(0, min(xi, xj) - margin), min(W, max(xi, xj) + margin + 1))
+        boxes.append(box)
+        area = (box[1] - box[0]) * (box[3] - box[2])
+        if groups:
+            (gy0, gy1, gx0, gx1), members, group_area = groups[-1]
+            union = (min(gy0, box[0]), max(gy1, box[1]),
+                     min(gx0, box[2]), max(gx1, box[3]))
+            if (union[1] - union[0]) * (union[3] - union[2]) <= group_area + area:
+                groups[-1] = [union, members + [index], group_area + area]
+                continue
+        groups.append([box, [index], area])
+
+    results = [None] * len(targets)
+    for (y0, y1, x0, x1), members, _area in groups:
+        costs = _subgrid_costs(mask[y0:y1, x0:x1])
+        by_box = {}
+        for m in members:
+            by_box.setdefault(boxes[m], []).append(m)
+        for (by0, by1, bx0, bx1), box_members in by_box.items():
+            solved = _cost_raster_paths(
+                costs[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0],
+                (yi - by0, xi - bx0),
+                [(targets[m][1] - by0, targets[m][0] - bx0) for m in box_members])
+            for m, res in zip(box_members, solved):
+                if res is None:
+                    continue
+                cost, geom = res
+                _xj, _yj, straight, _margin, detour_ratio = targets[m]
+                if geom > detour_ratio * straight:
+                    continue
+                results[m] = cost
+    return results
+
+
+# Worker-process state for ``_EdgePathSolver`` pools: the build's mask, mapped
+# read-only from the solver's scratch ``.npy`` so it is never pickled.
+_EDGE_POOL_MASK = None
+
+
+def _edge_pool_init(mask_path):
+    global _EDGE_POOL_MASK
+    _EDGE_POOL_MASK = np.load(mask_path, mmap_mode="r")
+
+
+def _edge_pool_solve(tasks):
+    return [_weighted_edge_paths(_EDGE_POOL_MASK, xi, yi, targets)
+            for xi, yi, targets in tasks]
+
+
+class _EdgePathSolver:
+    """Run batches of ``_weighted_edge_path`` jobs, optionally on processes.
+
+    A job is the positional tail ``(xi, yi, xj, yj, straight, margin,
+    detour_ratio)``. Jobs sharing a source are solved together by
+    ``_weighted_edge_paths``. ``solve`` returns one cost (or ``None``) per job
+    in job order whatever the completion order, so parallel builds stay
+    byte-identical to serial ones. The process pool is started lazily for the
+    first batch of at least ``EDGE_PARALLEL_MIN_JOBS`` jobs; workers map the
+    mask from a scratch file instead of receiving a pickled copy. Always
+    ``close()`` the solver (it is a context manager).
+    """
+
+    def __init__(self, mask, workers=1):
+        self.mask = mask
+        self.workers = max(1, int(workers or 1))
+        self._pool = None
+        self._scratch = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._scratch is not None:
+            self._scratch.cleanup()
+            self._scratch = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            import multiprocessing
+            import tempfile
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._scratch = tempfile.TemporaryDirectory(prefix="navgraph-edges-")
+            mask_path = os.path.join(self._scratch.name, "mask.npy")
+            np.save(mask_path, np.ascontiguousarray(self.mask))
+            # spawn: builds also run inside threaded web workers, where
+            # forking would copy held locks into the children.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_edge_pool_init, initargs=(mask_path,))
+        return self._pool
+
+    def solve(self, jobs, progress_callback=None):
+        """Return the cost of every job; ``progress_callback(done)`` as they finish."""
+        jobs = list(jobs)
+        by_source = {}
+        for index, (xi, yi, *target) in enumerate(jobs):
+            by_source.setdefault((xi, yi), []).append((index, tuple(target)))
+        tasks = [
+            ((xi, yi, [target for _, target in members]),
+             [index for index, _ in members])
+            for (xi, yi), members in by_source.items()
+        ]
+        results = [None] * len(jobs)
+        done = 0
+
+        def collect(indices, costs):
+            nonlocal done
+            for index, cost in zip(indices, costs):
+                results[index] = cost
+            done += len(indices)
+            if progress_callback:
+                progress_callback(done)
+
+        if self.workers <= 1 or len(jobs) < EDGE_PARALLEL_MIN_JOBS:
+            for (xi, yi, targets), indices in tasks:
+                collect(indices, _weighted_edge_paths(self.mask, xi, yi, targets))
+            return results
+
+        from concurrent.futures import as_completed
+
+        pool = self._ensure_pool()
+        futures = {}
+        batch = []
+        batch_jobs = 0
+        for task in tasks:
+            batch.append(task)
+            batch_jobs += len(task[1])
+            if batch_jobs >= EDGE_PARALLEL_CHUNK or task is tasks[-1]:
+                future = pool.submit(_edge_pool_solve, [t for t, _ in batch])
+                futures[future] = [indices for _, indices in batch]
+                batch = []
+                batch_jobs = 0
+        for future in as_completed(futures):
+            for indices, costs in zip(futures[future], future.result()):
+                collect(indices, costs)
+        return results
 
 
 def _passage_connector_cost(mask, a, b, margin=None):
@@ -2294,37 +2631,45 @@ def _passage_connector_cost(mask, a, b, margin=None):
     grid is preferable to making the passage unusable because of a wall tip or
     a slightly offset doorway.
     """
-    ax, ay = map(int, a)
-    bx, by = map(int, b)
-    direct = _line_cost(mask, ax, ay, bx, by)
-    if direct is not None:
-        return float(direct), False
+    return _passage_connector_costs(mask, a, [b], margin=margin)[0]
+
 
-    if margin is None:
+def _passage_connector_costs(mask, a, targets, margin=None):
+    """``_passage_connector_cost`` from one endpoint ``a`` to every target.
+
+    Blocked chords are solved together by ``_weighted_edge_paths`` without a
+    detour limit; each result is ``(cost, used_grid_path)`` or ``None``.
+    """
+    ax, ay = map(int, a)
+    results = [None] * len(targets)
+    blocked = []
+    grid_targets = []
+    for index, b in enumerate(targets):
+        bx, by = map(int, b)
+        direct = _line_cost(mask, ax, ay, bx, by)
+        if direct is not None:
+            results[index] = (float(direct), False)
+            continue
         span = math.hypot(bx - ax, by - ay)
-        margin = min(
-            PASSAGE_CONNECTOR_GRID_MARGIN_MAX_PX,
-            max(PASSAGE_CONNECTOR_GRID_MARGIN_MIN_PX, round(0.75 * span)),
-        )
-    H, W = mask.shape
-    y0 = max(0, min(ay, by) - margin)
-    y1 = min(H, max(ay, by) + margin + 1)
-    x0 = max(0, min(ax, bx) - margin)
-    x1 = min(W, max(ax, bx) + margin + 1)
-    result = _weighted_subgrid_path(
-        mask[y0:y1, x0:x1],
-        (ay - y0, ax - x0),
-        (by - y0, bx - x0),
-    )
-    if result is None:
-        return None
-    cost, _geom = result
-    return float(cost), True
+        target_margin = margin
+        if target_margin is None:
+            target_margin = min(
+                PASSAGE_CONNECTOR_GRID_MARGIN_MAX_PX,
+                max(PASSAGE_CONNECTOR_GRID_MARGIN_MIN_PX, round(0.75 * span)),
+            )
+        blocked.append(index)
+        grid_targets.append((bx, by, span, target_margin, math.inf))
+    if grid_targets:
+        costs = _weighted_edge_paths(mask, ax, ay, grid_targets)
+        for index, cost in zip(blocked, costs):
+            if cost is not None:
+                results[index] = (float(cost), True)
+    return results
 
 
 def _weight_edges(mask, nodes_xy, candidate_edges, astar_pairs,
                   local_detour_pairs=None, precomputed_line_results=None,
-                  progress_callback=None):
+                  progress_callback=None, solver=None):
     """Measure each candidate edge's terrain-weighted cost + legality.
 
     ``candidate_edges`` is an iterable of (i, j) node-index pairs (i < j).
@@ -2332,8 +2677,10 @@ def _weight_edges(mask, nodes_xy, candidate_edges, astar_pairs,
     only the remaining backbone segments. Backbone edges (``astar_pairs``)
     retain their broad weighted-raster fallback. A small, pre-screened set of
     ordinary neighbour pairs may use a much tighter fallback
-    (``local_detour_pairs``); all other blocked shortcuts are dropped. Returns
-    parallel lists ``(edges, weights)``.
+    (``local_detour_pairs``); all other blocked shortcuts are dropped. The
+    fallbacks are collected first and solved as one batch by ``solver`` (an
+    ``_EdgePathSolver``; serial when omitted). Returns parallel lists
+    ``(edges, weights)`` in candidate order.
     """
     import math
     cand_list = list(candidate_edges)
@@ -2376,9 +2723,11 @@ def _weight_edges(mask, nodes_xy, candidate_edges, astar_pairs,
         batch_costs[missing] = missing_costs
         batch_blocked[missing] = missing_blocked
 
-    edges_out = []
-    weights_out = []
-    progress_step = max(1, len(cand_list) // 100)
+    # weights[k] stays None for dropped candidates; blocked candidates that
+    # qualify for a fallback are solved together below.
+    weights = [None] * len(cand_list)
+    fallback_index = []
+    fallback_jobs = []
     for k, (i, j) in enumerate(cand_list):
         xi, yi = int(x0_arr[k]), int(y0_arr[k])
         xj, yj = int(x1_arr[k]), int(y1_arr[k])
@@ -2386,30 +2735,50 @@ def _weight_edges(mask, nodes_xy, candidate_edges, astar_pairs,
         if straight == 0:
             continue
         if not batch_blocked[k]:
-            edges_out.append((i, j))
-            weights_out.append(float(batch_costs[k]))
+            weights[k] = float(batch_costs[k])
+            continue
+        pair = (i, j)
+        if pair in astar_pairs:
+            margin = EDGE_SKELETON_MARGIN
+            detour_ratio = EDGE_SKELETON_DETOUR
+        elif pair in local_detour_pairs:
+            margin = EDGE_LOCAL_DETOUR_MARGIN
+            detour_ratio = min(
+                EDGE_LOCAL_DETOUR_RATIO,
+                1.0 + EDGE_LOCAL_DETOUR_MAX_EXTRA_PX / straight)
         else:
-            pair = (i, j)
-            if pair in astar_pairs:
-                margin = EDGE_SKELETON_MARGIN
-                detour_ratio = EDGE_SKELETON_DETOUR
-            elif pair in local_detour_pairs:
-                margin = EDGE_LOCAL_DETOUR_MARGIN
-                detour_ratio = min(
-                    EDGE_LOCAL_DETOUR_RATIO,
-                    1.0 + EDGE_LOCAL_DETOUR_MAX_EXTRA_PX / straight)
-            else:
-                continue
-            cost = _weighted_edge_path(
-                mask, xi, yi, xj, yj, straight,
-                margin=margin, detour_ratio=detour_ratio)
-            if cost is not None:
-                edges_out.append((i, j))
-                weights_out.append(cost)
-        processed = k + 1
-        if (progress_callback and
-                (processed == len(cand_list) or processed % progress_step == 0)):
-            progress_callback(processed, len(cand_list))
+            continue
+        fallback_index.append(k)
+        fallback_jobs.append((xi, yi, xj, yj, straight, margin, detour_ratio))
+
+    total = len(cand_list)
+    settled = total - len(fallback_jobs)
+    progress_step = max(1, total // 100)
+    if progress_callback:
+        progress_callback(settled, total)
+
+    last_reported = settled
+
+    def report(solved):
+        nonlocal last_reported
+        current = settled + solved
+        if progress_callback and (
+                current == total or current - last_reported >= progress_step):
+            last_reported = current
+            progress_callback(current, total)
+
+    if solver is None:
+        solver = _EdgePathSolver(mask)
+    for k, cost in zip(fallback_index,
+                       solver.solve(fallback_jobs, progress_callback=report)):
+        weights[k] = cost
+
+    edges_out = []
+    weights_out = []
+    for pair, weight in zip(cand_list, weights):
+        if weight is not None:
+            edges_out.append(pair)
+            weights_out.append(weight)
     return edges_out, weights_out
 
 
@@ -2580,7 +2949,8 @@ class _UnionFind:
         return False
 
 
-def _repair_connectivity(mask, nodes_xy, edges, weights, components, main_comp):
+def _repair_connectivity(mask, nodes_xy, edges, weights, components, main_comp,
+                         solver=None):
     """Bridge graph fragments that share the main free-space component.
 
     Fragments arise when the downsampled skeleton misses a genuine (usually
@@ -2588,6 +2958,11 @@ def _repair_connectivity(mask, nodes_xy, edges, weights, components, main_comp):
     main free component, find its closest node to the main graph component and
     try to connect them with a straight line, then A*. Adds bridge edges
     in-place (returns extended ``edges, weights``).
+
+    Candidates only ever target the original main component, so fragments are
+    independent: round ``r`` tries the ``r``-th candidate of every fragment
+    still unbridged, with all blocked lines solved as one ``solver`` batch.
+    Bridges are appended in fragment order, as a one-at-a-time pass would.
     """
     import math
     n = len(nodes_xy)
@@ -2617,10 +2992,10 @@ def _repair_connectivity(mask, nodes_xy, edges, weights, components, main_comp):
 
     edges = list(edges)
     weights = list(weights)
-    bridged = 0
     # Bridge larger fragments first — they recover the most nodes.
     ordered = sorted((r for r in groups if r != main_root),
                      key=lambda r: -len(groups[r]))
+    fragment_cands = []
     for root in ordered:
         members = groups[root]
         # Gather candidate (distance, fragment node, main node) pairs in range.
@@ -2635,57 +3010,150 @@ def _repair_connectivity(mask, nodes_xy, edges, weights, components, main_comp):
                         d = math.hypot(vx - ux, vy - uy)
                         if d <= BRIDGE_MAX_DIST:
                             cands.append((d, u, v))
-        if not cands:
-            continue
         cands.sort(key=lambda c: c[0])
         # Try the nearest few pairs; a slightly farther pair may have a clear
-        # path where the very nearest is walled off. A* margin grows with the
-        # gap so a bridge can route around an obstacle.
-        for d, u, v in cands[:BRIDGE_TRIES]:
+        # path where the very nearest is walled off.
+        fragment_cands.append(cands[:BRIDGE_TRIES])
+
+    if solver is None:
+        solver = _EdgePathSolver(mask)
+    bridges = [None] * len(fragment_cands)
+    for attempt in range(BRIDGE_TRIES):
+        pending = [
+            f for f, cands in enumerate(fragment_cands)
+            if bridges[f] is None and attempt < len(cands)]
+        if not pending:
+            break
+        blocked = []
+        jobs = []
+        for f in pending:
+            d, u, v = fragment_cands[f][attempt]
             ux, uy = nodes_xy[u]
             vx, vy = nodes_xy[v]
             cost = _line_cost(mask, ux, uy, vx, vy)
-            if cost is None:
-                margin = min(BRIDGE_MAX_MARGIN, max(BRIDGE_MARGIN, int(0.75 * d)))
-                cost = _weighted_edge_path(
-                    mask, ux, uy, vx, vy, d, margin=margin,
-                    detour_ratio=EDGE_SKELETON_DETOUR)
-            if cost is None:
+            if cost is not None:
+                bridges[f] = (u, v, cost)
                 continue
-            a, b = (u, v) if u < v else (v, u)
-            edges.append((a, b))
-            weights.append(cost)
-            uf.union(u, v)
-            bridged += 1
-            break
+            # A* margin grows with the gap so a bridge can route around an
+            # obstacle.
+            margin = min(BRIDGE_MAX_MARGIN, max(BRIDGE_MARGIN, int(0.75 * d)))
+            blocked.append(f)
+            jobs.append((ux, uy, vx, vy, d, margin, EDGE_SKELETON_DETOUR))
+        for f, cost in zip(blocked, solver.solve(jobs)):
+            if cost is not None:
+                d, u, v = fragment_cands[f][attempt]
+                bridges[f] = (u, v, cost)
+
+    for bridge in bridges:
+        if bridge is None:
+            continue
+        u, v, cost = bridge
+        edges.append((u, v) if u < v else (v, u))
+        weights.append(cost)
     return edges, weights
 
 
-def _witness_path_exists(adjacency, active, nodes_xy, source, target, avoid,
-                         max_cost, center, radius):
-    """Bounded local Dijkstra used by redundancy pruning."""
-    cx, cy = center
-    radius2 = radius * radius
-    dist = {source: 0.0}
-    heap = [(0.0, source)]
-    while heap:
-        cost, node = heapq.heappop(heap)
-        if cost != dist.get(node) or cost > max_cost:
-            continue
-        if node == target:
-            return True
-        for nxt, weight in adjacency[node].items():
-            if nxt == avoid or not active[nxt]:
+def _csr_adjacency(node_count, edges, weights, skip=None):
+    """Symmetric, deduplicated adjacency as CSR ``(indptr, indices, data)``.
+
+    Parallel edges collapse to their minimum weight. Each node's neighbours
+    keep first-insertion order over ``edges``, i.e. the iteration order of the
+    dict-of-dicts adjacency this replaces, so outputs derived from neighbour
+    order stay byte-identical. Edges flagged in ``skip`` are left out.
+    """
+    if isinstance(edges, np.ndarray):
+        edges = edges.astype(np.int64).reshape(-1, 2)
+    else:
+        edges = np.fromiter(itertools.chain.from_iterable(edges), dtype=np.int64,
+                            count=2 * len(edges)).reshape(-1, 2)
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1)
+    order = np.arange(len(edges), dtype=np.int64)
+    seq_stride = 2 * len(edges) + 2
+    if skip is not None:
+        keep = ~np.asarray(skip, dtype=bool)
+        edges, weights, order = edges[keep], weights[keep], order[keep]
+    # Directed entries (u -> v, then v -> u), interleaved in insertion order.
+    src = edges.ravel()
+    dst = edges[:, ::-1].ravel()
+    data = np.repeat(weights, 2)
+    seq = np.stack([2 * order, 2 * order + 1], axis=1).ravel()
+    by_pair = np.argsort(src * node_count + dst, kind="stable")
+    src, dst, data, seq = src[by_pair], dst[by_pair], data[by_pair], seq[by_pair]
+    if len(src):
+        starts = np.flatnonzero(np.r_[True, (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])])
+        data = np.minimum.reduceat(data, starts)
+        src, dst, seq = src[starts], dst[starts], seq[starts]
+    by_insertion = np.argsort(src * seq_stride + seq)
+    src, dst, data = src[by_insertion], dst[by_insertion], data[by_insertion]
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(src, minlength=node_count))
+    return indptr, dst, data
+
+
+class _WitnessSearch:
+    """Bounded local Dijkstra over CSR adjacency, used by redundancy pruning.
+
+    Distance and visit stamps live in buffers sized once per graph; each search
+    bumps an epoch instead of clearing or re-allocating them.
+    """
+
+    def __init__(self, indptr, indices, data, nodes_xy, active):
+        self.indptr = indptr.tolist()
+        self.indices = indices.tolist()
+        self.data = data.tolist()
+        self.xs = [int(x) for x, _ in nodes_xy]
+        self.ys = [int(y) for _, y in nodes_xy]
+        self.active = active
+        self.dist = [0.0] * len(nodes_xy)
+        self.stamp = [0] * len(nodes_xy)
+        self.epoch = 0
+
+    def reaches_all(self, source, limits, avoid, center, radius):
+        """True if every target in ``limits`` (``{node: max_cost}``) is
+        reachable from ``source`` within its cost without ``avoid``.
+
+        Intermediate nodes must lie in the ``radius`` disc around ``center``;
+        the source and the targets themselves are exempt, but a target outside
+        the disc is only an endpoint, never expanded. One search settles every
+        target with the same distances as one bounded search per target.
+        """
+        indptr, indices, data = self.indptr, self.indices, self.data
+        xs, ys, active, dist, stamp = self.xs, self.ys, self.active, self.dist, self.stamp
+        cx, cy = center
+        radius2 = radius * radius
+        remaining = dict(limits)
+        bound = max(remaining.values())
+        self.epoch += 1
+        epoch = self.epoch
+        stamp[source] = epoch
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if cost != dist[node]:
                 continue
-            if nxt not in (source, target):
-                x, y = nodes_xy[nxt]
-                if (x - cx) ** 2 + (y - cy) ** 2 > radius2:
+            if cost > min(remaining.values()):
+                return False
+            if node in remaining:
+                del remaining[node]
+                if not remaining:
+                    return True
+                if (xs[node] - cx) ** 2 + (ys[node] - cy) ** 2 > radius2:
                     continue
-            tentative = cost + weight
-            if tentative <= max_cost and tentative < dist.get(nxt, float("inf")):
-                dist[nxt] = tentative
-                heapq.heappush(heap, (tentative, nxt))
-    return False
+            for k in range(indptr[node], indptr[node + 1]):
+                nxt = indices[k]
+                if nxt == avoid or not active[nxt]:
+                    continue
+                if nxt != source and nxt not in limits:
+                    if (xs[nxt] - cx) ** 2 + (ys[nxt] - cy) ** 2 > radius2:
+                        continue
+                tentative = cost + data[k]
+                if tentative <= bound and (
+                        stamp[nxt] != epoch or tentative < dist[nxt]):
+                    stamp[nxt] = epoch
+                    dist[nxt] = tentative
+                    heapq.heappush(heap, (tentative, nxt))
+        return False
 
 
 def _prune_redundant_nodes(nodes_xy, edges, weights, components,
@@ -2699,30 +3167,30 @@ def _prune_redundant_nodes(nodes_xy, edges, weights, components,
     check is sequential: later removals see earlier changes, so a witness cannot
     silently depend on a node that has already gone. No shortcut edges are
     created, which keeps the serialized endpoint-only edge geometry truthful.
+    Removing a node only clears its ``active`` flag; searches skip inactive
+    nodes, so the CSR adjacency is never rebuilt.
     """
     n = len(nodes_xy)
     if not n or not edges:
         return list(nodes_xy), list(edges), list(weights), components, 0
 
-    adjacency = [dict() for _ in range(n)]
-    for (u, v), weight in zip(edges, weights):
-        u, v, weight = int(u), int(v), float(weight)
-        previous = adjacency[u].get(v)
-        if previous is None or weight < previous:
-            adjacency[u][v] = weight
-            adjacency[v][u] = weight
+    indptr, indices, data = _csr_adjacency(n, edges, weights)
+    active = [True] * n
+    search = _WitnessSearch(indptr, indices, data, nodes_xy, active)
+    indptr, indices, data = search.indptr, search.indices, search.data
 
     protected = set(int(v) for v in protected_nodes)
-    active = [True] * n
     removed = 0
     # Open nodes with the fewest choices are cheapest to prove redundant; hubs
     # and all topology/feature nodes are deliberately left intact.
     candidates = sorted(
         (v for v in range(n) if v not in protected),
-        key=lambda v: (len(adjacency[v]), v),
+        key=lambda v: (indptr[v + 1] - indptr[v], v),
     )
     for v in candidates:
-        neighbours = [(u, w) for u, w in adjacency[v].items() if active[u]]
+        neighbours = [
+            (indices[k], data[k]) for k in range(indptr[v], indptr[v + 1])
+            if active[indices[k]]]
         degree = len(neighbours)
         if degree == 0:
             active[v] = False
@@ -2731,25 +3199,15 @@ def _prune_redundant_nodes(nodes_xy, edges, weights, components,
         if degree < 2 or degree > max_degree:
             continue
         center = nodes_xy[v]
-        redundant = True
-        for i in range(degree):
-            source, source_w = neighbours[i]
-            for j in range(i + 1, degree):
-                target, target_w = neighbours[j]
-                limit = stretch * (source_w + target_w)
-                if not _witness_path_exists(
-                        adjacency, active, nodes_xy, source, target, v,
-                        limit, center, radius):
-                    redundant = False
-                    break
-            if not redundant:
-                break
-        if not redundant:
+        if not all(
+                search.reaches_all(
+                    source,
+                    {target: stretch * (source_w + target_w)
+                     for target, target_w in neighbours[i + 1:]},
+                    v, center, radius)
+                for i, (source, source_w) in enumerate(neighbours[:-1])):
             continue
         active[v] = False
-        for neighbour, _ in neighbours:
-            adjacency[neighbour].pop(v, None)
-        adjacency[v].clear()
         removed += 1
 
     if not removed:
@@ -2763,13 +3221,73 @@ def _prune_redundant_nodes(nodes_xy, edges, weights, components,
     new_edges = []
     new_weights = []
     for u in kept:
-        for v, weight in adjacency[u].items():
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
             if active[v] and u < v:
                 new_edges.append((int(remap[u]), int(remap[v])))
-                new_weights.append(float(weight))
+                new_weights.append(float(data[k]))
     return new_nodes, new_edges, new_weights, new_components, removed
 
 
+# Upper bound on the wedges (two-edge paths) enumerated per vectorized batch.
+_SPANNER_WEDGE_BATCH = 1 << 21
+
+
+def _spanner_witnesses(indptr, indices, data, pair_keys, pair_limit, node_count):
+    """Two-edge witnesses per undirected pair, grouped CSR-style by pair.
+
+    Enumerates every wedge ``a - m - b`` of the adjacency in vectorized
+    batches and keeps those whose endpoints form a pair and whose cost
+    ``w(a, m) + w(m, b)`` is within ``pair_limit`` of that pair. Returns
+    ``(offsets, first_pair, second_pair, cost)``; pair ``p``'s witnesses are
+    ``offsets[p]:offsets[p + 1]``.
+    """
+    src = np.repeat(np.arange(node_count, dtype=np.int64), np.diff(indptr))
+    slot_pair = np.searchsorted(
+        pair_keys, np.minimum(src, indices) * node_count + np.maximum(src, indices))
+    # A witness of pair (a, b) costs at most the largest limit at a and at b,
+    # which discards most wedges before the pair lookup.
+    node_limit = np.full(node_count, -np.inf)
+    np.maximum.at(node_limit, src, pair_limit[slot_pair])
+    # Later siblings of each slot in its node's neighbour list.
+    later = indptr[src + 1] - np.arange(len(indices), dtype=np.int64) - 1
+    parts = []
+    slot = 0
+    total = len(indices)
+    while slot < total:
+        cumulative = np.cumsum(later[slot:])
+        stop = slot + max(1, int(np.searchsorted(cumulative, _SPANNER_WEDGE_BATCH, "right")))
+        counts = later[slot:stop]
+        wedges = int(counts.sum())
+        if wedges:
+            first = np.repeat(np.arange(slot, stop, dtype=np.int64), counts)
+            offsets = np.arange(wedges, dtype=np.int64) - np.repeat(
+                np.cumsum(counts) - counts, counts)
+            second = first + 1 + offsets
+            a, b = indices[first], indices[second]
+            cost = data[first] + data[second]
+            near = np.flatnonzero(
+                (cost <= node_limit[a]) & (cost <= node_limit[b]))
+            first, second, a, b, cost = (
+                first[near], second[near], a[near], b[near], cost[near])
+            key = np.minimum(a, b) * node_count + np.maximum(a, b)
+            pair = np.minimum(np.searchsorted(pair_keys, key), len(pair_keys) - 1)
+            hit = (pair_keys[pair] == key) & (cost <= pair_limit[pair])
+            parts.append((pair[hit], slot_pair[first[hit]],
+                          slot_pair[second[hit]], cost[hit]))
+        slot = stop
+    if parts:
+        pair, first_pair, second_pair, cost = (
+            np.concatenate(column) for column in zip(*parts))
+    else:
+        pair = first_pair = second_pair = np.zeros(0, dtype=np.int64)
+        cost = np.zeros(0, dtype=np.float64)
+    order = np.argsort(pair, kind="stable")
+    offsets = np.zeros(len(pair_keys) + 1, dtype=np.int64)
+    np.add.at(offsets, pair + 1, 1)
+    return (np.cumsum(offsets), first_pair[order], second_pair[order], cost[order])
+
+
 def _sparsify_redundant_edges(edges, weights, protected_mask=None,
                               stretch=EDGE_SPANNER_STRETCH):
     """Remove only edges with an active near-equal two-edge cost witness.
@@ -2777,9 +3295,16 @@ def _sparsify_redundant_edges(edges, weights, protected_mask=None,
     This runs on the final typed graph, after passage-body shadowing, so a
     witness can never disappear in a later topology stage. Passage and
     transition edges are protected by the caller. Longer/more expensive edges
-    are considered first; every removal immediately mutates the adjacency, so
+    are considered first; every removal immediately retires its node pair, so
     subsequent decisions can rely only on edges that still exist.
 
+    Every two-edge path that could ever witness a pair is enumerated up front
+    over the CSR adjacency (see ``_spanner_witnesses``); the sequential pass
+    then only checks that both of a witness's pairs are still present.
+    Parallel edges share one pair at their minimum weight, and a later
+    duplicate of an already removed pair is removed with it. Base edges never
+    contain self-loops (every producer emits ``u != v``).
+
     Returns ``(edges, weights, kept_indices, removed_count)`` as numpy arrays.
     ``kept_indices`` lets the caller filter parallel edge metadata without
     weakening the binary-format invariants.
@@ -2797,49 +3322,51 @@ def _sparsify_redundant_edges(edges, weights, protected_mask=None,
         if len(protected) != count:
             raise ValueError("protected edge mask length mismatch")
 
+    # Protected typed edges must not remove a base edge by acting as its
+    # witness: that would silently force a formerly base-only route through
+    # a passage surface. They remain serialized, but outside this base
+    # sparsifier's adjacency.
     node_count = int(edges_arr.max()) + 1
-    adjacency = [dict() for _ in range(node_count)]
-    for edge_index, ((u, v), weight) in enumerate(zip(edges_arr, weights_arr)):
-        # Protected typed edges must not remove a base edge by acting as its
-        # witness: that would silently force a formerly base-only route through
-        # a passage surface. They remain serialized, but outside this base
-        # sparsifier's adjacency.
-        if protected[edge_index]:
-            continue
-        u, v, weight = int(u), int(v), float(weight)
-        previous = adjacency[u].get(v)
-        if previous is None or weight < previous:
-            adjacency[u][v] = weight
-            adjacency[v][u] = weight
-
+    u64 = edges_arr[:, 0].astype(np.int64)
+    v64 = edges_arr[:, 1].astype(np.int64)
+    weights64 = weights_arr.astype(np.float64)
+    limits = stretch * weights64
+    edge_keys = np.minimum(u64, v64) * node_count + np.maximum(u64, v64)
+    pair_keys, edge_pair = np.unique(edge_keys[~protected], return_inverse=True)
+    pair_limit = np.full(len(pair_keys), -np.inf)
+    np.maximum.at(pair_limit, edge_pair, limits[~protected])
+    offsets, first_pair, second_pair, cost = _spanner_witnesses(
+        *_csr_adjacency(node_count, edges_arr, weights_arr, skip=protected),
+        pair_keys, pair_limit, node_count)
+
+    pair_of_edge = np.full(count, -1, dtype=np.int64)
+    pair_of_edge[~protected] = edge_pair
+    offsets = offsets.tolist()
+    first_pair = first_pair.tolist()
+    second_pair = second_pair.tolist()
+    cost = cost.tolist()
+    pair_of_edge = pair_of_edge.tolist()
+    limits = limits.tolist()
+    pair_alive = [True] * len(pair_keys)
     active = np.ones(count, dtype=bool)
-    order = sorted(
-        range(count),
-        key=lambda idx: (-float(weights_arr[idx]),
-                         int(edges_arr[idx, 0]), int(edges_arr[idx, 1])))
+    order = np.lexsort((edges_arr[:, 1], edges_arr[:, 0], -weights64)).tolist()
     removed = 0
     for edge_index in order:
-        if protected[edge_index]:
+        pair = pair_of_edge[edge_index]
+        if pair < 0:
             continue
-        u, v = map(int, edges_arr[edge_index])
-        weight = float(weights_arr[edge_index])
-        if v not in adjacency[u]:
+        if not pair_alive[pair]:
             active[edge_index] = False
             removed += 1
             continue
-        left, right = ((adjacency[u], adjacency[v])
-                       if len(adjacency[u]) <= len(adjacency[v])
-                       else (adjacency[v], adjacency[u]))
-        limit = stretch * weight
-        has_witness = any(
-            middle in right and first_weight + right[middle] <= limit
-            for middle, first_weight in left.items())
-        if not has_witness:
-            continue
-        del adjacency[u][v]
-        del adjacency[v][u]
-        active[edge_index] = False
-        removed += 1
+        limit = limits[edge_index]
+        for k in range(offsets[pair], offsets[pair + 1]):
+            if (cost[k] <= limit and pair_alive[first_pair[k]]
+                    and pair_alive[second_pair[k]]):
+                pair_alive[pair] = False
+                active[edge_index] = False
+                removed += 1
+                break
 
     kept = np.flatnonzero(active)
     return edges_arr[kept], weights_arr[kept], kept, removed
@@ -2866,11 +3393,21 @@ def _sampling_grids(mask, dist_full, labels_full):
     coarse_minval = mv.min(axis=(1, 3)).astype(np.uint8)
     coarse_maxval = mv.max(axis=(1, 3)).astype(np.uint8)
 
+    # Fixed-point floor: the same whole pixels as clipping the exact EDT.
     dv = dist_full[:hh, :ww].reshape(ch, ds, cw, ds)
-    coarse_clear = np.clip(dv.max(axis=(1, 3)), 0, 255).astype(np.uint8)
+    coarse_clear = (dv.max(axis=(1, 3)) // CLEARANCE_SCALE).astype(np.uint8)
+    coarse_labels = _coarse_label_grid(mask, labels_full)
+    return coarse_minval, coarse_maxval, coarse_clear, coarse_labels
 
-    # Label at the freest (max-value) pixel of each block.
-    val_blocks = mv  # (ch, ds, cw, ds)
+
+def _coarse_label_grid(mask, labels_full):
+    """``coarse_labels`` of ``_sampling_grids``: the free-space component id
+    at the freest (max-value) pixel of each ÷SAMPLE_DS block, 0 if none."""
+    ds = SAMPLE_DS
+    H, W = mask.shape
+    hh, ww = (H // ds) * ds, (W // ds) * ds
+    ch, cw = hh // ds, ww // ds
+    val_blocks = mask[:hh, :ww].reshape(ch, ds, cw, ds)
     val_flat = val_blocks.transpose(0, 2, 1, 3).reshape(ch, cw, ds * ds)
     lbl_blocks = labels_full[:hh, :ww].reshape(ch, ds, cw, ds)
     lbl_flat = lbl_blocks.transpose(0, 2, 1, 3).reshape(ch, cw, ds * ds)
@@ -2878,17 +3415,21 @@ def _sampling_grids(mask, dist_full, labels_full):
     coarse_labels = np.take_along_axis(lbl_flat, argmax[:, :, None], axis=2)[:, :, 0]
     # Blocks with no passable pixel get label 0 (== "not free space").
     coarse_labels[val_flat.max(axis=2) == IMPASSABLE] = 0
-    return coarse_minval, coarse_maxval, coarse_clear, coarse_labels.astype(np.int32)
+    return coarse_labels.astype(np.int32)
 
 
 def _apply_passage_topology(artifact, mask, passages, level_passages,
-                            region_polygon=None, graph_labels=None):
+                            region_polygon=None, graph_labels=None,
+                            graph_labels_origin=(0, 0)):
     """Isolate projected base topology, then append protected passage chains.
 
     This is deliberately a final build stage.  All generic base-node creation,
     k-NN, witness pruning and repair have already finished, and the result is
     compacted and filtered here.  Passage nodes are appended afterwards, so no
     generic pass can ever deduplicate them or invent an intermediate connector.
+
+    ``graph_labels`` may be a crop of the region labels whose top-left pixel is
+    ``graph_labels_origin`` (x, y); pixels outside the crop are label 0.
     """
     t_start = time.time()
     old_nodes = np.asarray(artifact["nodes"], dtype=np.int32).reshape(-1, 2)
@@ -2896,20 +3437,26 @@ def _apply_passage_topology(artifact, mask, passages, level_passages,
     old_weights = np.asarray(artifact["weights"], dtype=np.float32).reshape(-1)
     old_components = np.asarray(artifact["components"], dtype=np.int32).reshape(-1)
 
-    shadowed_per_passage = []
-    shadowed = set()
+    node_x = old_nodes[:, 0].astype(np.float64)
+    node_y = old_nodes[:, 1].astype(np.float64)
     outside_region = set()
-    for node_index, (x, y) in enumerate(old_nodes):
-        if region_polygon is not None and not _point_in_polygon(x, y, region_polygon):
-            outside_region.add(node_index)
-        for passage_index, passage in enumerate(passages):
-            if _point_in_passage_body(passage, float(x), float(y)):
-                while len(shadowed_per_passage) <= passage_index:
-                    shadowed_per_passage.append(0)
-                shadowed_per_passage[passage_index] += 1
-                shadowed.add(node_index)
-    while len(shadowed_per_passage) < len(passages):
-        shadowed_per_passage.append(0)
+    if region_polygon is not None:
+        outside_region = set(np.flatnonzero(
+            ~_points_in_polygon(node_x, node_y, region_polygon)).tolist())
+    # Nodes sorted by x form the spatial index: each passage only tests the
+    # strip of nodes inside its body bounds instead of every base node.
+    by_x = np.argsort(node_x, kind="stable")
+    sorted_x = node_x[by_x]
+    shadowed_mask = np.zeros(len(old_nodes), dtype=bool)
+    shadowed_per_passage = []
+    for passage in passages:
+        min_x, _, max_x, _ = passage["body_bounds"]
+        strip = by_x[np.searchsorted(sorted_x, min_x, side="left"):
+                     np.searchsorted(sorted_x, max_x, side="right")]
+        inside = strip[_points_in_passage_body(passage, node_x[strip], node_y[strip])]
+        shadowed_per_passage.append(int(len(inside)))
+        shadowed_mask[inside] = True
+    shadowed = set(np.flatnonzero(shadowed_mask).tolist())
 
     removed = shadowed | outside_region
     kept = [idx for idx in range(len(old_nodes)) if idx not in removed]
@@ -3092,8 +3639,11 @@ def _apply_passage_topology(artifact, mask, passages, level_passages,
             graph_endpoint = all_nodes[passage_node]
             endpoint_component = 0
             if graph_labels is not None:
-                endpoint_component = int(
-                    graph_labels[graph_endpoint[1], graph_endpoint[0]])
+                label_y = graph_endpoint[1] - graph_labels_origin[1]
+                label_x = graph_endpoint[0] - graph_labels_origin[0]
+                if (0 <= label_y < graph_labels.shape[0]
+                        and 0 <= label_x < graph_labels.shape[1]):
+                    endpoint_component = int(graph_labels[label_y, label_x])
             # Base nodes inside the corridor were shadowed above. Wide passages
             # therefore need a search radius that reaches beyond their own
             # footprint before applying the ordinary graph-neighbour span.
@@ -3117,15 +3667,26 @@ def _apply_passage_topology(artifact, mask, passages, level_passages,
             # same rule. Surface transitions still occur only at the serialized
             # endpoint; a base connector may cross a projected passage footprint
             # because it remains on the base surface throughout.
+            # Candidates are costed in nearest-first windows of exactly as many
+            # as are still missing, so the selection and the work done match a
+            # one-by-one scan while blocked chords share grid solves.
             selected = []
-            for distance, base_index, base_point in sorted(nearby_candidates):
-                result = _passage_connector_cost(mask, graph_endpoint, base_point)
-                if result is None:
-                    continue
-                cost, used_grid_path = result
-                selected.append((distance, base_index, cost, used_grid_path))
-                if len(selected) >= PASSAGE_CONNECTOR_MAX_PER_ENDPOINT:
-                    break
+            ordered_candidates = sorted(nearby_candidates)
+            position = 0
+            while (len(selected) < PASSAGE_CONNECTOR_MAX_PER_ENDPOINT
+                   and position < len(ordered_candidates)):
+                window = ordered_candidates[
+                    position:position
+                    + PASSAGE_CONNECTOR_MAX_PER_ENDPOINT - len(selected)]
+                position += len(window)
+                results = _passage_connector_costs(
+                    mask, graph_endpoint,
+                    [base_point for _, _, base_point in window])
+                for (distance, base_index, _), result in zip(window, results):
+                    if result is None:
+                        continue
+                    cost, used_grid_path = result
+                    selected.append((distance, base_index, cost, used_grid_path))
             if not selected:
                 unusable_endpoints.append({"id": passage["id"], "endpoint": endpoint_name})
                 raise PassageConnectorError(
@@ -3214,138 +3775,375 @@ def _apply_passage_topology(artifact, mask, passages, level_passages,
 
 
 # =============================================================================
-# Build
+# Tiled raster stages (very large masks)
 # =============================================================================
+#
+# Monolithic labelling and EDT hold ~38 B per mask pixel at their peak, about
+# 2.8 GB on the 75 Mpx worst case. When ``build_navgraph`` is given a memory
+# budget whose raster half the mask exceeds, these stages instead run over
+# halo windows and write into disk-backed ``.npy`` memmaps in a scratch
+# directory, so only the uint8/bool mask-sized arrays and one window stay
+# resident. Every tiled
+# result is identical to the monolithic one (labels are renumbered into the
+# same raster first-occurrence order; clearance is capped at
+# ``CLEARANCE_CAP_PX`` in every build), so tiling
+# never changes an artifact. Graph stages need no seam stitching: nodes come
+# from the global coarse skeleton and edges from bounded sub-grid searches.
+
+def _tile_plan(H, W, ds, memory_budget_bytes):
+    """Window/band sizes for a tiled raster pass, or ``None`` if unneeded.
+
+    Half of the budget is granted to the label/EDT stages; the rest stays
+    available to the mask-sized arrays of the skeleton and graph stages, which
+    always run at full resolution. A mask whose monolithic label/EDT peak
+    exceeds that half is tiled, so at the default 3 GB job budget masks from
+    ~42 Mpx up (including the 75 Mpx maps) take the tiled path. Tile cores
+    are aligned to both the skeleton factor and ``SAMPLE_DS`` so block
+    reductions never straddle a seam.
+    """
+    window_bytes = memory_budget_bytes // 2
+    if not memory_budget_bytes or H * W * MONOLITHIC_RASTER_BYTES_PER_PX <= window_bytes:
+        return None
+    align = ds * SAMPLE_DS // math.gcd(ds, SAMPLE_DS)
+    side = math.isqrt(max(1, window_bytes // TILE_WINDOW_BYTES_PER_PX))
+    core = (side - 2 * CLEARANCE_CAP_PX) // align * align
+    core = max(TILE_MIN_CORE_PX // align * align, core)
+    # Row bands for block reductions hold a float32 and an int32 band plus
+    # their reshape copies.
+    band_rows = max(align, window_bytes // (16 * W) // align * align)
+    return {"core": int(core), "band_rows": int(band_rows),
+            "halo": CLEARANCE_CAP_PX}
 
-def build_navgraph(mask_path, region_polygon=None, level_passages=None,
-                   verbose=False, prune_region=True,
-                   collect_diagnostics=False, progress_callback=None):
-    """Build the navgraph artifact dict for one mask PNG.
 
-    ``region_polygon`` (optional) is a coach-drawn map-region polygon: a sequence
-    of full-res ``(x, y)`` vertices. When given it is the *authoritative* hit zone
-    (rasterized into ``coarse_hitzone`` and used to confine the open-area lattice);
-    the automatic ``_hitzone`` detection is used only as a fallback / suggestion
-    when no polygon is supplied. See the module "Off-map hit zone" note.
+def _raster_tiles(H, W, core):
+    for y0 in range(0, H, core):
+        for x0 in range(0, W, core):
+            yield y0, min(H, y0 + core), x0, min(W, x0 + core)
 
-    ``prune_region=False`` is a benchmark-only switch: it keeps the polygon as
-    the endpoint/hitzone authority while retaining the pre-WP-6.1 topology.
-    Production builds must leave it enabled.
 
-    ``collect_diagnostics=True`` enables graph-wide measurements used by debug
-    overlays. They never alter the artifact topology and are skipped in normal
-    production builds.
+def _scratch_array(scratch_dir, name, shape, dtype):
+    return np.lib.format.open_memmap(
+        os.path.join(scratch_dir, name + ".npy"), mode="w+",
+        dtype=dtype, shape=shape)
 
-    ``progress_callback`` (optional) receives JSON-friendly dictionaries with
-    a monotonic estimated ``percent`` and an internal ``phase``. During
-    candidate connection it also receives the exact processed ``current`` and
-    ``total`` node counts. The overall percentage is phase-weighted because
-    loading, raster analysis, edge weighting and serialization are not
-    node-based work.
 
-    Returns a dict with all arrays + stats (see module docstring). Pure
-    computation; use ``save_navgraph()`` to persist.
+def _tiled_label(arr, plan, scratch_dir, name="labels"):
+    """``ndi.label(arr != IMPASSABLE)`` with 8-connectivity, tile by tile.
+
+    Tiles are labelled independently, components touching across a seam are
+    merged with a connected-components pass over the seam pairs, and the final
+    ids follow the first pixel of each component in raster order — exactly the
+    numbering of a monolithic ``ndi.label``. Returns ``(labels, ncomp)``.
     """
-    if not _HAVE_SKIMAGE:
-        raise RuntimeError(
-            "scikit-image is required for navgraph skeletonization; add it to "
-            "requirements.txt."
-        )
-    t_start = time.time()
-    timings = {}
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
 
-    def _log(msg):
-        if verbose:
-            print(f"[navgraph] {msg}", flush=True)
+    H, W = arr.shape
+    core = plan["core"]
+    struct8 = np.ones((3, 3), dtype=np.uint8)
+    out = _scratch_array(scratch_dir, name, (H, W), np.int32)
+    first_index = [np.zeros(1, dtype=np.int64)]  # provisional label 0
+    count = 0
+    for y0, y1, x0, x1 in _raster_tiles(H, W, core):
+        lab, n = ndi.label(arr[y0:y1, x0:x1] != IMPASSABLE, structure=struct8)
+        if n:
+            ids, idx = np.unique(lab.ravel(), return_index=True)
+            idx = idx[ids > 0]
+            ty, tx = np.divmod(idx, x1 - x0)
+            first_index.append((ty + y0).astype(np.int64) * W + (tx + x0))
+            lab[lab > 0] += count
+            count += n
+        out[y0:y1, x0:x1] = lab
+    if count == 0:
+        return out, 0
+
+    # Seam pairs: each pixel on one side of a seam against its three
+    # 8-neighbours on the other side (the full-length rows/columns also
+    # cover diagonal contacts across tile corners).
+    pairs = []
+
+    def seam(a, b):
+        for shift in (-1, 0, 1):
+            if shift < 0:
+                u, v = a[1:], b[:-1]
+            elif shift > 0:
+                u, v = a[:-1], b[1:]
+            else:
+                u, v = a, b
+            hit = (u > 0) & (v > 0)
+            if hit.any():
+                pairs.append(np.stack([u[hit], v[hit]]))
+
+    for y in range(core, H, core):
+        seam(np.asarray(out[y - 1]), np.asarray(out[y]))
+    for x in range(core, W, core):
+        seam(np.asarray(out[:, x - 1]), np.asarray(out[:, x]))
+    n_prov = count + 1
+    if pairs:
+        uv = np.unique(np.concatenate(pairs, axis=1), axis=1)
+        graph = coo_matrix(
+            (np.ones(uv.shape[1], dtype=np.int8), (uv[0], uv[1])),
+            shape=(n_prov, n_prov))
+        _, root = connected_components(graph, directed=False)
+    else:
+        root = np.arange(n_prov)
+
+    # Renumber merged components by their first pixel in raster order.
+    first = np.concatenate(first_index)
+    first[0] = -1
+    comp_first = np.full(int(root.max()) + 1, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(comp_first, root, first)
+    order = np.argsort(comp_first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    remap = rank[root].astype(np.int32)  # label 0 sorts first -> stays 0
+    for y0, y1, x0, x1 in _raster_tiles(H, W, core):
+        out[y0:y1, x0:x1] = remap[out[y0:y1, x0:x1]]
+    return out, int(remap.max())
+
+
+def _clearance_spans(n, window_px):
+    """Core spans of one axis: the whole axis if it fits in one window."""
+    if n <= window_px:
+        yield 0, n
+        return
+    core = max(1, window_px - 2 * CLEARANCE_CAP_PX)
+    for start in range(0, n, core):
+        yield start, min(n, start + core)
+
+
+def _capped_clearance(arr, window_px=CLEARANCE_WINDOW_PX, out=None,
+                      blocked_value=IMPASSABLE):
+    """Fixed-point EDT of ``arr != blocked_value`` saturated at the cap.
+
+    Returns ``rint(min(EDT, CLEARANCE_CAP_PX) * CLEARANCE_SCALE)`` as uint16
+    (into ``out`` if given, e.g. a scratch memmap). Axes longer than
+    ``window_px`` are split into cores padded by the cap: a pixel whose nearest
+    obstacle is within the cap finds it inside its window, so saturated window
+    values equal the saturated global EDT. Only one window's float64 distances
+    and feature transform are ever resident. A window without any obstacle is
+    at the cap everywhere.
+    """
+    H, W = arr.shape
+    halo = CLEARANCE_CAP_PX
+    if out is None:
+        out = np.empty((H, W), dtype=np.uint16)
+    for y0, y1 in _clearance_spans(H, window_px):
+        for x0, x1 in _clearance_spans(W, window_px):
+            wy0, wy1 = max(0, y0 - halo), min(H, y1 + halo)
+            wx0, wx1 = max(0, x0 - halo), min(W, x1 + halo)
+            passable = arr[wy0:wy1, wx0:wx1] != blocked_value
+            if passable.all():
+                out[y0:y1, x0:x1] = CLEARANCE_CAP_PX * CLEARANCE_SCALE
+                continue
+            dist = ndi.distance_transform_edt(passable)
+            del passable
+            core_dist = dist[y0 - wy0:y1 - wy0, x0 - wx0:x1 - wx0]
+            np.minimum(core_dist, CLEARANCE_CAP_PX, out=core_dist)
+            core_dist *= CLEARANCE_SCALE
+            out[y0:y1, x0:x1] = np.rint(core_dist, out=core_dist)
+            del dist, core_dist
+    return out
 
-    def _progress(percent, phase, current=None, total=None):
-        if progress_callback is None:
-            return
-        payload = {
-            "percent": max(0, min(99, int(round(percent)))),
-            "phase": phase,
-        }
-        if current is not None:
-            payload["current"] = int(current)
-        if total is not None:
-            payload["total"] = int(total)
-        try:
-            keep_building = progress_callback(payload)
-            if keep_building is False:
-                raise NavgraphBuildCancelled()
-        except NavgraphBuildCancelled:
-            raise
-        except Exception as exc:  # progress reporting must never break a build
-            _log(f"progress callback failed: {exc!r}")
 
-    _progress(0, "starting")
+def clearance_px(clearance):
+    """Fixed-point clearance (scalar or array) back to float pixels."""
+    return np.asarray(clearance, dtype=np.float32) / np.float32(CLEARANCE_SCALE)
 
-    # 1. Load mask.
-    t = time.time()
-    mask = _load_mask(mask_path)
-    H, W = mask.shape
-    timings["load"] = time.time() - t
-    _log(f"loaded {W}x{H} ({H*W/1e6:.1f} Mpx)")
-    _progress(4, "loading")
 
-    # Editor coordinates can overshoot the raster edge by a few pixels due to
-    # display scaling/rounding. Normalize before passages, revisions, hit-zone
-    # rasterization, and topology all consume the polygon so every stage uses
-    # the same bounded region.
-    if isinstance(region_polygon, (list, tuple)) and len(region_polygon) >= 3:
-        region_polygon = clip_region_polygon(region_polygon, W, H)
+def _row_bands(H, band_rows):
+    for y0 in range(0, H, band_rows):
+        yield y0, min(H, y0 + band_rows)
 
-    # Normalize the complete canonical document before skeletonization or any
-    # other expensive build stage. Structurally invalid geometry aborts the
-    # whole build. Valid passages outside this Infinity region are deliberately
-    # omitted as whole objects: they may belong to another game mode.
-    t = time.time()
-    effective_passages, ignored_passage_ids = filter_level_passages_for_region(
-        level_passages, region_polygon, W, H)
-    canonical_passages, build_passages = _normalize_passages_for_build(
-        effective_passages, W, H)
-    timings["passage_normalization"] = time.time() - t
-    _log(f"passages: {len(build_passages)} included, "
-         f"{len(ignored_passage_ids)} outside region")
-    _progress(7, "preparing")
 
-    min_cost_per_px = _min_cost_per_px(mask)
+def _banded_block_reduce(arr, ds, op, band_rows, prepare=None):
+    """``_block_reduce`` computed one ds-aligned row band at a time.
 
-    # 2. Unfiltered free-space labels (for node component ids + coarse labels).
-    t = time.time()
-    struct8 = np.ones((3, 3), dtype=np.uint8)
-    labels_full, ncomp = ndi.label(mask != IMPASSABLE, structure=struct8)
-    comp_sizes = np.bincount(labels_full.ravel())
-    main_comp = int(comp_sizes[1:].argmax()) + 1 if ncomp > 0 else 0
-    timings["label"] = time.time() - t
-    _log(f"labelled {ncomp} free components; main={main_comp}")
-    _progress(13, "analysing")
+    ``prepare`` (optional) maps each band before reduction, e.g. to the
+    passability test, so the full-size intermediate never exists.
+    """
+    prepare = prepare or np.asarray
+    parts = [_block_reduce(prepare(arr[y0:y1]), ds, op)
+             for y0, y1 in _row_bands(arr.shape[0], band_rows)]
+    return np.concatenate(parts, axis=0)
 
-    # 3. Hit zone: the coach-drawn region polygon is authoritative if supplied;
-    #    otherwise fall back to automatic class-structure detection. Footprint
-    #    confines the lattice; sample mask is the stored endpoint zone.
-    t = time.time()
-    has_polygon = region_polygon is not None and len(region_polygon) > 0
-    region_full = None
-    if has_polygon:
-        hz_ds = HITZONE_DS
-        region_full = _rasterize_region_full(region_polygon, H, W)
-        region = _rasterize_region(
-            region_polygon, H, W, hz_ds, full_raster=region_full)
-        hz_footprint = hz_sample = region
-        hz_source = "polygon"
-    else:
-        hz_footprint, hz_sample, hz_ds = _hitzone(mask)
-        hz_source = "auto"
-    timings["hitzone"] = time.time() - t
-    _log(f"hitzone[{hz_source}]: footprint {hz_footprint.mean()*100:.0f}% "
-         f"sample {hz_sample.mean()*100:.0f}% (ds={hz_ds})")
-    _progress(19, "analysing")
 
-    # Full-image EDT and skeletonization intentionally remain global.  From the
-    # topology stage onward, polygon-exterior pixels are terrain-impassable, so
-    # straight rays, skeleton A* and connectivity-repair A* share one legality
-    # definition and cannot cut across a concavity or repair through the margin.
+def _banded_sampling_grids(mask, dist_full, labels_full, band_rows):
+    """``_sampling_grids`` computed one SAMPLE_DS-aligned row band at a time."""
+    parts = [
+        _sampling_grids(mask[y0:y1], np.asarray(dist_full[y0:y1]),
+                        np.asarray(labels_full[y0:y1]))
+        for y0, y1 in _row_bands(mask.shape[0], band_rows)
+    ]
+    return tuple(np.concatenate(grids, axis=0) for grids in zip(*parts))
+
+
+def _compact_label(arr, structure):
+    """``ndi.label(arr != IMPASSABLE)`` in the smallest sufficient dtype.
+
+    Labels are written as uint16 directly (scipy retries in int32 only when
+    there are more than 65535 components) and narrowed to uint8 when there
+    are at most 255, instead of the default int32 raster. Returns
+    ``(labels, ncomp)`` with the same numbering as ``ndi.label``.
+    """
+    passable = arr != IMPASSABLE
+    try:
+        labels = np.empty(passable.shape, dtype=np.uint16)
+        ncomp = ndi.label(passable, structure=structure, output=labels)
+    except RuntimeError:
+        labels, ncomp = ndi.label(passable, structure=structure)
+    del passable
+    if ncomp <= 0xFF:
+        labels = labels.astype(np.uint8)
+    return labels, int(ncomp)
+
+
+def _region_bbox(region_full):
+    """``(y0, y1, x0, x1)`` bounding box of a region raster (empty: all 0)."""
+    rows = np.flatnonzero(region_full.any(axis=1))
+    if not rows.size:
+        return 0, 0, 0, 0
+    cols = np.flatnonzero(region_full.any(axis=0))
+    return int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+
+
+def _labels_at(labels, origin, xs, ys):
+    """Label ids at full-resolution pixels of a label crop at ``origin`` (x, y).
+
+    Pixels outside the crop are label 0, as everywhere outside a pruned region.
+    """
+    xs = np.asarray(xs, dtype=np.int64) - origin[0]
+    ys = np.asarray(ys, dtype=np.int64) - origin[1]
+    inside = ((ys >= 0) & (ys < labels.shape[0])
+              & (xs >= 0) & (xs < labels.shape[1]))
+    out = np.zeros(len(xs), dtype=np.int32)
+    out[inside] = labels[ys[inside], xs[inside]]
+    return out
+
+
+def _resident_bytes(*arrays):
+    """In-memory bytes of distinct ndarrays (memmaps are disk-backed: 0)."""
+    seen = set()
+    total = 0
+    for arr in arrays:
+        if (not isinstance(arr, np.ndarray) or isinstance(arr, np.memmap)
+                or id(arr) in seen):
+            continue
+        seen.add(id(arr))
+        total += arr.nbytes
+    return int(total)
+
+
+def _component_sizes(labels, ncomp, band_rows=None):
+    """Pixel count per label id (``np.bincount``), optionally band by band."""
+    if band_rows is None:
+        return np.bincount(labels.ravel(), minlength=ncomp + 1)
+    sizes = np.zeros(ncomp + 1, dtype=np.int64)
+    for y0, y1 in _row_bands(labels.shape[0], band_rows):
+        sizes += np.bincount(
+            np.asarray(labels[y0:y1]).ravel(), minlength=ncomp + 1)
+    return sizes
+
+
+# =============================================================================
+# Build
+# =============================================================================
+
+def _build_base_graph(mask, region_polygon, prune_region, collect_diagnostics,
+                      timings, t_start, progress, log,
+                      raster_cache=None, mask_digest=None,
+                      tile_plan=None, scratch_dir=None, edge_workers=1,
+                      downsample=None, hitzone=None, region_raster=None):
+    """Run every raster and graph stage that precedes passage topology.
+
+    Returns ``(artifact, topology_mask, graph_labels, graph_labels_origin,
+    main_conn)``; ``graph_labels`` is the region-pruned component raster,
+    cropped to the region's bounding box at ``graph_labels_origin`` (x, y).
+    The artifact is the finished base-only graph with its sampling grids and stats;
+    it depends on the mask bytes, the clipped region polygon and the builder
+    constants, but never on the passage document. ``build_navgraph`` may
+    therefore persist it as a base checkpoint (see ``_save_base_checkpoint``).
+
+    With a ``raster_cache`` the region-independent rasters (labels, EDT,
+    skeleton, sampling grids) are looked up by ``mask_digest`` first. With a
+    ``tile_plan`` (see ``_tile_plan``) the full-resolution raster stages run
+    tiled into memmaps under ``scratch_dir``. ``edge_workers`` > 1 solves
+    fallback edge paths on that many processes (see ``_EdgePathSolver``).
+
+    ``downsample``, ``hitzone`` (``(footprint, sample, ds)``) and
+    ``region_raster`` replace the values otherwise derived from ``mask`` and
+    ``region_polygon``. A dirty-region window build (see
+    ``_dirty_region_base``) passes the full map's, so the window is skeletonized
+    and filtered exactly like the map around it.
+
+    Each full-resolution raster is dropped as soon as its last consumer stage
+    has run; ``stats["live_raster_bytes"]`` records the resident bytes of the
+    rasters still alive after every stage.
+    """
+    H, W = mask.shape
+    band_rows = tile_plan["band_rows"] if tile_plan else None
+    min_cost_per_px = _min_cost_per_px(mask)
+    raster_states = {}
+    live_raster_bytes = {}
+
+    def cached(stage, params, compute, mmap=True):
+        if raster_cache is None:
+            return compute()
+        arrays, hit = raster_cache.fetch(
+            mask_digest, stage, params, compute, mmap=mmap)
+        raster_states[stage] = "hit" if hit else "miss"
+        return arrays
+
+    # 2. Unfiltered free-space labels (for node component ids + coarse labels).
+    t = time.time()
+    struct8 = np.ones((3, 3), dtype=np.uint8)
+
+    def compute_labels():
+        if tile_plan:
+            labels, n = _tiled_label(mask, tile_plan, scratch_dir)
+        else:
+            labels, n = _compact_label(mask, struct8)
+        return {"labels": labels, "ncomp": np.int64(n)}
+
+    labelled = cached("labels", {"impassable": IMPASSABLE}, compute_labels)
+    labels_full, ncomp = labelled["labels"], int(labelled["ncomp"])
+    comp_sizes = _component_sizes(labels_full, ncomp, band_rows)
+    main_comp = int(comp_sizes[1:].argmax()) + 1 if ncomp > 0 else 0
+    timings["label"] = time.time() - t
+    log(f"labelled {ncomp} free components; main={main_comp}")
+    live_raster_bytes["label"] = _resident_bytes(mask, labels_full)
+    progress(13, "analysing")
+
+    # 3. Hit zone: the coach-drawn region polygon is authoritative if supplied;
+    #    otherwise fall back to automatic class-structure detection. Footprint
+    #    confines the lattice; sample mask is the stored endpoint zone.
+    t = time.time()
+    has_polygon = region_polygon is not None and len(region_polygon) > 0
+    region_full = None
+    region_bbox = None
+    if has_polygon:
+        region_full = (region_raster if region_raster is not None
+                       else _rasterize_region_full(region_polygon, H, W))
+        region_bbox = _region_bbox(region_full)
+        if hitzone is None:
+            region = _rasterize_region(
+                region_polygon, H, W, HITZONE_DS, full_raster=region_full)
+            hitzone = (region, region, HITZONE_DS)
+        hz_source = "polygon"
+    else:
+        if hitzone is None:
+            hitzone = _hitzone(mask)
+        hz_source = "auto"
+    hz_footprint, hz_sample, hz_ds = hitzone
+    timings["hitzone"] = time.time() - t
+    log(f"hitzone[{hz_source}]: footprint {hz_footprint.mean()*100:.0f}% "
+         f"sample {hz_sample.mean()*100:.0f}% (ds={hz_ds})")
+    progress(19, "analysing")
+
+    # Full-image EDT and skeletonization intentionally remain global.  From the
+    # topology stage onward, polygon-exterior pixels are terrain-impassable, so
+    # straight rays, skeleton A* and connectivity-repair A* share one legality
+    # definition and cannot cut across a concavity or repair through the margin.
     topology_mask = mask
     if region_full is not None and prune_region:
         topology_mask = mask.copy()
@@ -3353,35 +4151,110 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
 
     # The polygon can split one globally connected terrain label when its old
     # connection ran through the surrounding margin.  Use polygon-masked labels
-    # for node components, repair and connectivity metrics.
+    # for node components, repair and connectivity metrics. Every pixel outside
+    # the region is impassable there, so they are labelled over the region's
+    # bounding box only: raster order within the crop is the full raster's
+    # order, so the ids equal those of labelling the whole topology mask.
     graph_labels = labels_full
+    graph_labels_origin = (0, 0)
     graph_ncomp = ncomp
     graph_comp_sizes = comp_sizes
     if region_full is not None and prune_region:
         t = time.time()
-        graph_labels, graph_ncomp = ndi.label(
-            topology_mask != IMPASSABLE, structure=struct8)
-        graph_comp_sizes = np.bincount(graph_labels.ravel())
+        ry0, ry1, rx0, rx1 = region_bbox
+        region_window = topology_mask[ry0:ry1, rx0:rx1]
+        if not region_window.size:
+            graph_labels, graph_ncomp = np.zeros((0, 0), dtype=np.uint8), 0
+        elif tile_plan:
+            graph_labels, graph_ncomp = _tiled_label(
+                region_window, tile_plan, scratch_dir, name="graph_labels")
+        else:
+            graph_labels, graph_ncomp = _compact_label(region_window, struct8)
+        del region_window
+        graph_labels_origin = (rx0, ry0)
+        graph_comp_sizes = _component_sizes(
+            graph_labels, graph_ncomp, band_rows)
         main_comp = (
             int(graph_comp_sizes[1:].argmax()) + 1 if graph_ncomp > 0 else 0)
         timings["region_components"] = time.time() - t
+        live_raster_bytes["region_components"] = _resident_bytes(
+            mask, labels_full, region_full, topology_mask, graph_labels)
 
-    # 4. Full-res distance transform (clearance) on the true free space.
+    # 4. Full-res distance transform (clearance) on the true free space,
+    #    capped uint16 fixed point (see ``_capped_clearance``).
     t = time.time()
-    topo_passable = mask != IMPASSABLE
-    dist_full = ndi.distance_transform_edt(topo_passable).astype(np.float32)
+    dist_full = cached("edt", {
+        "impassable": IMPASSABLE,
+        "clearance_cap_px": CLEARANCE_CAP_PX,
+        "clearance_scale": CLEARANCE_SCALE,
+    }, lambda: {
+        "dist": _capped_clearance(
+            mask, window_px=tile_plan["core"] + 2 * tile_plan["halo"],
+            out=_scratch_array(scratch_dir, "clearance", (H, W), np.uint16))
+        if tile_plan else _capped_clearance(mask),
+    })["dist"]
     timings["edt"] = time.time() - t
-    _progress(31, "clearance")
+    live_raster_bytes["edt"] = _resident_bytes(
+        mask, labels_full, region_full, topology_mask, graph_labels, dist_full)
+
+    # 4b. Sampling metadata. Computed here because it is the last consumer of
+    #     the unfiltered labels, which are dropped right after unless they are
+    #     also the graph labels (no pruned region).
+    t = time.time()
+    grids = cached("sampling", {
+        "impassable": IMPASSABLE, "sample_ds": SAMPLE_DS,
+    }, lambda dist=dist_full, labels=labels_full: dict(zip(
+        ("minval", "maxval", "clear", "labels"),
+        _banded_sampling_grids(mask, dist, labels, band_rows)
+        if tile_plan else _sampling_grids(mask, dist, labels),
+    )), mmap=False)
+    del labels_full
+    coarse_minval, coarse_maxval, coarse_clear, coarse_labels = (
+        grids["minval"], grids["maxval"], grids["clear"], grids["labels"])
+    coarse_origin = np.asarray([0, 0], dtype=np.int32)
+    if prune_region and region_bbox is not None and region_bbox[1] > region_bbox[0]:
+        ry0, ry1, rx0, rx1 = region_bbox
+        gy0 = max(0, ry0 // SAMPLE_DS)
+        gx0 = max(0, rx0 // SAMPLE_DS)
+        gy1 = min(coarse_minval.shape[0], (ry1 - 1) // SAMPLE_DS + 1)
+        gx1 = min(coarse_minval.shape[1], (rx1 - 1) // SAMPLE_DS + 1)
+        coarse_minval = coarse_minval[gy0:gy1, gx0:gx1].copy()
+        coarse_maxval = coarse_maxval[gy0:gy1, gx0:gx1].copy()
+        coarse_clear = coarse_clear[gy0:gy1, gx0:gx1].copy()
+        coarse_labels = coarse_labels[gy0:gy1, gx0:gx1].copy()
+        coarse_origin = np.asarray(
+            [gx0 * SAMPLE_DS, gy0 * SAMPLE_DS], dtype=np.int32)
+    timings["sampling"] = time.time() - t
+    live_raster_bytes["sampling"] = _resident_bytes(
+        mask, region_full, topology_mask, graph_labels, dist_full)
+    progress(31, "clearance")
 
     # 5. Adaptive downsample + skeletonize.
-    ds = _downsample_factor(H, W)
+    ds = downsample or _downsample_factor(H, W)
     t = time.time()
-    coarse_passable = _block_reduce(topo_passable, ds, "max") if ds > 1 else topo_passable
-    skel = _sk_skeletonize(coarse_passable)
-    skel = _prune_spurs(skel, SPUR_MIN_LEN)
+
+    def compute_skeleton():
+        if tile_plan and ds > 1:
+            coarse_passable = _banded_block_reduce(
+                mask, ds, "max", band_rows,
+                prepare=lambda band: band != IMPASSABLE)
+        else:
+            passable = mask != IMPASSABLE
+            coarse_passable = _block_reduce(passable, ds, "max") if ds > 1 else passable
+        return {"skel": _prune_spurs(_sk_skeletonize(coarse_passable), SPUR_MIN_LEN)}
+
+    skel = cached("skeleton", {
+        "impassable": IMPASSABLE,
+        "downsample": int(ds),
+        "skeleton_target_px": SKELETON_TARGET_PX,
+        "skeleton_max_ds": SKELETON_MAX_DS,
+        "spur_min_len": SPUR_MIN_LEN,
+    }, compute_skeleton, mmap=False)["skel"]
     timings["skeleton"] = time.time() - t
-    _log(f"ds={ds} skeleton px={int(skel.sum())} ({timings['skeleton']:.1f}s)")
-    _progress(43, "skeleton")
+    log(f"ds={ds} skeleton px={int(skel.sum())} ({timings['skeleton']:.1f}s)")
+    live_raster_bytes["skeleton"] = _resident_bytes(
+        mask, region_full, topology_mask, graph_labels, dist_full, skel)
+    progress(43, "skeleton")
 
     # 6. Nodes from skeleton (coarse coords) + resample + lattice. Spacings are
     #    specified in full-res px and converted to coarse px for this stage.
@@ -3397,7 +4270,13 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
     # Bottleneck anchors and sparse open candidates remain in skeleton-grid
     # coordinates. Obstacle contour nodes are generated separately in full-res
     # coordinates so their 2 px side-preserving offset is not destroyed by snap.
-    coarse_dist = _block_reduce(dist_full, ds, "max") if ds > 1 else dist_full
+    if ds == 1:
+        coarse_dist = clearance_px(dist_full)
+    elif tile_plan:
+        coarse_dist = clearance_px(
+            _banded_block_reduce(dist_full, ds, "max", band_rows))
+    else:
+        coarse_dist = clearance_px(_block_reduce(dist_full, ds, "max"))
     raw_bottleneck_yx, raw_open_yx, obstacle_sampling = _adaptive_lattice_nodes(
         coarse_dist, skel,
         bottleneck_spacing_coarse,
@@ -3463,7 +4342,7 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
     # absorb contour/bottleneck nodes.
     narrow_dense_skeleton_xy = [
         (x, y) for x, y in dense_skeleton_xy
-        if dist_full[y, x] <= NARROW_BACKBONE_CLEARANCE_PX
+        if dist_full[y, x] <= NARROW_BACKBONE_CLEARANCE_PX * CLEARANCE_SCALE
     ]
     # NARROW_ALLEY_REDUCTION: bottleneck minima are useful only when they fill a
     # gap between skeleton samples. Remove ones already represented by a nearby
@@ -3576,6 +4455,8 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
         n_skeleton_nodes = sum(old < n_skeleton_nodes for old in kept_old)
         n_lattice_nodes = len(nodes_xy) - n_skeleton_nodes
     nodes_after_region_prune = len(nodes_xy)
+    # Last region raster consumer; the topology mask carries the region on.
+    region_full = None
     timings["region_prune"] = time.time() - region_prune_started
     region_pruned_fraction = (
         (nodes_before_region_prune - nodes_after_region_prune)
@@ -3603,19 +4484,16 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
         "deduped_contour_pairs": len(contour_pairs),
     })
     timings["nodes"] = time.time() - t
-    _log(f"nodes: {len(nodes_xy)} ({n_skeleton_nodes} skeleton, "
+    log(f"nodes: {len(nodes_xy)} ({n_skeleton_nodes} skeleton, "
          f"{len(feature_nodes)} protected contour/gate, "
          f"{n_lattice_nodes - len(feature_nodes)} open lattice, "
          f"{obstacle_sampling['deduplicated_count']} deduplicated)")
-    _progress(60, "nodes", len(nodes_xy), len(nodes_xy))
+    progress(60, "nodes", len(nodes_xy), len(nodes_xy))
 
-    # 8. Component id per node (from unfiltered labels) — needed for repair.
+    # 8. Component id per node (from the region labels) — needed for repair.
     nodes_arr = np.asarray(nodes_xy, dtype=np.int32).reshape(-1, 2)
-    if len(nodes_arr):
-        components = graph_labels[
-            nodes_arr[:, 1], nodes_arr[:, 0]].astype(np.int32)
-    else:
-        components = np.zeros(0, dtype=np.int32)
+    components = _labels_at(
+        graph_labels, graph_labels_origin, nodes_arr[:, 0], nodes_arr[:, 1])
 
     # 9. Candidate edges -> weighting. Skeleton edges retain the broad A*
     # fallback; a bounded set of local neighbour pairs may use the strict
@@ -3627,9 +4505,13 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
     # connection when the downsampled backbone misses one.
     narrow_backbone_nodes = {
         idx for idx, (x, y) in enumerate(nodes_xy[:n_skeleton_nodes])
-        if dist_full[y, x] <= NARROW_BACKBONE_CLEARANCE_PX
+        if dist_full[y, x] <= NARROW_BACKBONE_CLEARANCE_PX * CLEARANCE_SCALE
     } if NARROW_ALLEY_REDUCTION_ENABLED else set()
     obstacle_sampling["narrow_backbone_only_nodes"] = len(narrow_backbone_nodes)
+    # Last clearance consumer: the edge stage only needs the topology mask.
+    del dist_full
+    live_raster_bytes["nodes"] = _resident_bytes(
+        mask, topology_mask, graph_labels)
     backbone_edges = list(skeleton_edges) + [
         (u, v, 0.0) for u, v in contour_pairs]
     skeleton_pairs = {
@@ -3638,21 +4520,24 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
         nodes_xy, backbone_edges, obstacle_edge_nodes, mask=topology_mask,
         backbone_only_nodes=narrow_backbone_nodes,
         return_local_detours=True, return_line_results=True,
-        progress_callback=lambda current, total: _progress(
+        progress_callback=lambda current, total: progress(
             60 + (14 * current / total if total else 14),
             "connect_nodes", current, total))
-    edges, weights = _weight_edges(
-        topology_mask, nodes_xy, cand, skeleton_pairs, local_detour_pairs,
-        candidate_line_results,
-        progress_callback=lambda current, total: _progress(
-            74 + (8 * current / total if total else 8),
-            "weight_edges", current, total))
-    obstacle_sampling["local_detour_candidates"] = len(local_detour_pairs)
-    obstacle_sampling["local_detour_edges_kept"] = len(
-        set(edges) & local_detour_pairs)
-    n_before = len(edges)
-    edges, weights = _repair_connectivity(
-        topology_mask, nodes_xy, edges, weights, components, main_comp)
+    with _EdgePathSolver(topology_mask, workers=edge_workers) as solver:
+        edges, weights = _weight_edges(
+            topology_mask, nodes_xy, cand, skeleton_pairs, local_detour_pairs,
+            candidate_line_results,
+            progress_callback=lambda current, total: progress(
+                74 + (8 * current / total if total else 8),
+                "weight_edges", current, total),
+            solver=solver)
+        obstacle_sampling["local_detour_candidates"] = len(local_detour_pairs)
+        obstacle_sampling["local_detour_edges_kept"] = len(
+            set(edges) & local_detour_pairs)
+        n_before = len(edges)
+        edges, weights = _repair_connectivity(
+            topology_mask, nodes_xy, edges, weights, components, main_comp,
+            solver=solver)
     nodes_xy, edges, weights, components, pruned_nodes = _prune_redundant_nodes(
         nodes_xy, edges, weights, components, protected_nodes)
     if pruned_nodes:
@@ -3661,30 +4546,12 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
     obstacle_sampling["witness_pruned_nodes"] = pruned_nodes
     nodes_arr = np.asarray(nodes_xy, dtype=np.int32).reshape(-1, 2)
     timings["edges"] = time.time() - t
-    _log(f"edges: {len(edges)} kept of {len(cand)} candidates "
+    log(f"edges: {len(edges)} kept of {len(cand)} candidates "
          f"(+{len(edges) - n_before} net after bridges/pruning, "
          f"{pruned_nodes} nodes pruned) ({timings['edges']:.1f}s)")
-    _progress(84, "repairing")
-
-    # 10. Sampling metadata.
-    t = time.time()
-    coarse_minval, coarse_maxval, coarse_clear, coarse_labels = _sampling_grids(
-        mask, dist_full, labels_full)
-    coarse_origin = np.asarray([0, 0], dtype=np.int32)
-    if has_polygon and prune_region and region_full is not None and region_full.any():
-        region_y, region_x = np.where(region_full)
-        gy0 = max(0, int(region_y.min()) // SAMPLE_DS)
-        gx0 = max(0, int(region_x.min()) // SAMPLE_DS)
-        gy1 = min(coarse_minval.shape[0], int(region_y.max()) // SAMPLE_DS + 1)
-        gx1 = min(coarse_minval.shape[1], int(region_x.max()) // SAMPLE_DS + 1)
-        coarse_minval = coarse_minval[gy0:gy1, gx0:gx1].copy()
-        coarse_maxval = coarse_maxval[gy0:gy1, gx0:gx1].copy()
-        coarse_clear = coarse_clear[gy0:gy1, gx0:gx1].copy()
-        coarse_labels = coarse_labels[gy0:gy1, gx0:gx1].copy()
-        coarse_origin = np.asarray(
-            [gx0 * SAMPLE_DS, gy0 * SAMPLE_DS], dtype=np.int32)
-    timings["sampling"] = time.time() - t
-    _progress(88, "sampling")
+    live_raster_bytes["edges"] = _resident_bytes(
+        mask, topology_mask, graph_labels)
+    progress(84, "repairing")
 
     edges_arr = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
     weights_arr = np.asarray(weights, dtype=np.float32).reshape(-1)
@@ -3745,6 +4612,9 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
             "far_spacing_px": int(LATTICE_SPACING_FAR_PX),
         },
         "obstacle_sampling": obstacle_sampling,
+        "raster_cache": raster_states or None,
+        "tiled": dict(tile_plan) if tile_plan else None,
+        "live_raster_bytes": live_raster_bytes,
         "build_seconds": round(time.time() - t_start, 2),
         "timings": {k: round(v, 2) for k, v in timings.items()},
     }
@@ -3767,11 +4637,533 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
         "region_revision": stats["region_revision"] or "",
         "stats": stats,
     }
+    return artifact, topology_mask, graph_labels, graph_labels_origin, main_conn
+
+
+# =============================================================================
+# Dirty-region rebuild
+# =============================================================================
+
+def _mask_tile_digests(mask):
+    """64-bit BLAKE2b digest of every DIRTY_TILE_PX tile of ``mask``.
+
+    Two masks of one shape differ exactly in the tiles whose digests differ,
+    so a checkpoint can be diffed against an edit without keeping the old mask.
+    """
+    H, W = mask.shape
+    tile = DIRTY_TILE_PX
+    digests = np.empty((-(-H // tile), -(-W // tile)), dtype=np.uint64)
+    for ty in range(digests.shape[0]):
+        for tx in range(digests.shape[1]):
+            block = np.ascontiguousarray(
+                mask[ty * tile:(ty + 1) * tile, tx * tile:(tx + 1) * tile])
+            digests[ty, tx] = int.from_bytes(
+                hashlib.blake2b(block.tobytes(), digest_size=8).digest(),
+                "little")
+    return digests
+
+
+def _grow_rect(rect, margin, align, H, W):
+    """``(x0, y0, x1, y1)`` grown by ``margin``, outward to ``align``, clipped."""
+    x0, y0, x1, y1 = rect
+    return (max(0, (x0 - margin) // align * align),
+            max(0, (y0 - margin) // align * align),
+            min(W, -(-(x1 + margin) // align) * align),
+            min(H, -(-(y1 + margin) // align) * align))
+
+
+def _dirty_windows(dirty, H, W, align):
+    """Group changed tiles into ``(dirty, rebuild, context)`` rectangles.
+
+    ``dirty`` is the bool tile grid. Each rectangle is ``(x0, y0, x1, y1)`` in
+    full-res px, clipped to the mask: the bounding box of one group of changed
+    tiles, that box plus DIRTY_HALO_PX on SAMPLE_DS boundaries, and the rebuild
+    box plus DIRTY_HALO_PX again on ``align`` boundaries. Tiles are grouped
+    whenever their halos meet, so rebuild boxes of different windows never
+    overlap.
+    """
+    reach = -(-DIRTY_HALO_PX // DIRTY_TILE_PX)
+    square = np.ones((3, 3), dtype=bool)
+    groups, _ = ndi.label(
+        ndi.binary_dilation(dirty, structure=square, iterations=reach),
+        structure=square)
+    windows = []
+    for rows, cols in filter(None, ndi.find_objects(np.where(dirty, groups, 0))):
+        dirty_rect = (cols.start * DIRTY_TILE_PX, rows.start * DIRTY_TILE_PX,
+                      min(W, cols.stop * DIRTY_TILE_PX),
+                      min(H, rows.stop * DIRTY_TILE_PX))
+        rebuild = _grow_rect(dirty_rect, DIRTY_HALO_PX, SAMPLE_DS, H, W)
+        context = _grow_rect(rebuild, DIRTY_HALO_PX, align, H, W)
+        windows.append((dirty_rect, rebuild, context))
+    return windows
+
+
+def _in_rect(xy, rect, grow=0):
+    x0, y0, x1, y1 = rect
+    return ((xy[:, 0] >= x0 - grow) & (xy[:, 0] < x1 + grow)
+            & (xy[:, 1] >= y0 - grow) & (xy[:, 1] < y1 + grow))
+
+
+def _paste_cells(grid, grid_origin, patch, patch_origin, rect):
+    """Copy the ÷SAMPLE_DS cells of ``patch`` inside full-res ``rect`` into
+    ``grid``; both origins are the full-res (x, y) of their cell (0, 0)."""
+    spans = []
+    for axis, (lo, hi) in ((1, (rect[0], rect[2])), (0, (rect[1], rect[3]))):
+        g0 = int(grid_origin[1 - axis]) // SAMPLE_DS
+        p0 = int(patch_origin[1 - axis]) // SAMPLE_DS
+        start = max(lo // SAMPLE_DS, g0, p0)
+        stop = min(hi // SAMPLE_DS, g0 + grid.shape[axis], p0 + patch.shape[axis])
+        if stop <= start:
+            return
+        spans.append((start - g0, stop - g0, start - p0, stop - p0))
+    (gx0, gx1, px0, px1), (gy0, gy1, py0, py1) = spans
+    grid[gy0:gy1, gx0:gx1] = patch[py0:py1, px0:px1]
+
+
+def _stitch_window(nodes, edges, weights, window_nodes, window_edges,
+                   window_weights, dirty_rect, rebuild_rect, mask, solver):
+    """Replace the part of a graph around ``dirty_rect`` with a window build.
+
+    Previous nodes inside ``rebuild_rect`` give way to the window's nodes
+    there. A previous edge survives when both ends do and its bounding box,
+    grown by the widest fallback margin (BRIDGE_MAX_MARGIN), stays clear of
+    ``dirty_rect``; an edge between surviving nodes that fails only the second
+    test is re-weighted on ``mask``. Candidates across the rebuild border are
+    generated and weighted like any other candidate. Returns the new
+    ``(nodes, edges, weights)`` arrays, surviving previous nodes first.
+    """
+    keep_old = ~_in_rect(nodes, rebuild_rect)
+    keep_new = _in_rect(window_nodes, rebuild_rect)
+    old_ids = np.flatnonzero(keep_old)
+    new_ids = np.flatnonzero(keep_new)
+    remap_old = np.full(len(nodes), -1, dtype=np.int64)
+    remap_old[old_ids] = np.arange(len(old_ids))
+    remap_new = np.full(len(window_nodes), -1, dtype=np.int64)
+    remap_new[new_ids] = len(old_ids) + np.arange(len(new_ids))
+    out_nodes = np.concatenate(
+        [nodes[old_ids], window_nodes[new_ids]]).astype(np.int32)
+    nodes_xy = [(int(x), int(y)) for x, y in out_nodes]
+
+    u, v = edges[:, 0], edges[:, 1]
+    both = keep_old[u] & keep_old[v]
+    dx0, dy0, dx1, dy1 = dirty_rect
+    touches = (
+        (np.minimum(nodes[u, 0], nodes[v, 0]) - BRIDGE_MAX_MARGIN < dx1)
+        & (np.maximum(nodes[u, 0], nodes[v, 0]) + BRIDGE_MAX_MARGIN >= dx0)
+        & (np.minimum(nodes[u, 1], nodes[v, 1]) - BRIDGE_MAX_MARGIN < dy1)
+        & (np.maximum(nodes[u, 1], nodes[v, 1]) + BRIDGE_MAX_MARGIN >= dy0))
+    retained = both & ~touches
+    out_edges = [np.column_stack((remap_old[u[retained]], remap_old[v[retained]]))]
+    out_weights = [weights[retained]]
+
+    # Long previous edges (bridges, backbone) whose path may cross the edit.
+    stale = [(int(remap_old[a]), int(remap_old[b]))
+             for a, b in edges[both & touches]]
+    if stale:
+        stale_edges, stale_weights = _weight_edges(
+            mask, nodes_xy, stale, set(stale), solver=solver)
+        out_edges.append(np.asarray(stale_edges, dtype=np.int64).reshape(-1, 2))
+        out_weights.append(np.asarray(stale_weights, dtype=np.float32))
+
+    wu, wv = window_edges[:, 0], window_edges[:, 1]
+    inner = keep_new[wu] & keep_new[wv]
+    out_edges.append(np.column_stack((remap_new[wu[inner]], remap_new[wv[inner]])))
+    out_weights.append(window_weights[inner])
+
+    # Seam: surviving nodes near the border on either side, candidates that
+    # cross it. Old ids precede new ones, so every crossing pair keeps u < v.
+    outer_ids = remap_old[np.flatnonzero(
+        keep_old & _in_rect(nodes, rebuild_rect, EDGE_MAX_DIST))]
+    border_ids = remap_new[new_ids[
+        ~_in_rect(window_nodes[new_ids], rebuild_rect, -EDGE_MAX_DIST)]]
+    seam_ids = np.concatenate([outer_ids, border_ids])
+    seam_xy = [nodes_xy[i] for i in seam_ids]
+    cand, detours, line_results = _candidate_edges(
+        seam_xy, [], mask=mask, return_local_detours=True,
+        return_line_results=True)
+    crossing = sorted(
+        pair for pair in cand
+        if (pair[0] < len(outer_ids)) != (pair[1] < len(outer_ids)))
+    seam_edges, seam_weights = _weight_edges(
+        mask, seam_xy, crossing, set(), detours, line_results, solver=solver)
+    out_edges.append(
+        seam_ids[np.asarray(seam_edges, dtype=np.int64).reshape(-1, 2)])
+    out_weights.append(np.asarray(seam_weights, dtype=np.float32))
+
+    return (out_nodes,
+            np.concatenate(out_edges).astype(np.int32).reshape(-1, 2),
+            np.concatenate(out_weights).astype(np.float32))
+
+
+def _dirty_region_base(mask, source, tile_digests, region_polygon,
+                       prune_region, timings, progress, log, edge_workers=1):
+    """Re-derive the base graph of an edited mask from its previous checkpoint.
+
+    ``source`` is ``_load_dirty_source``'s result for an earlier revision of
+    the mask and ``tile_digests`` the edited mask's ``_mask_tile_digests``.
+    Changed tiles are grouped into windows (``_dirty_windows``); each window
+    runs ``_build_base_graph`` on its context crop and is stitched into the
+    previous graph (``_stitch_window``). Component labels and ids,
+    connectivity repair and the label grid are then refreshed over the whole
+    map; the other sampling grids are patched from the windows.
+
+    The result is a valid graph of the new mask, not a byte-identical full
+    build: skeleton, deduplication and witness pruning only see the window.
+    Returns ``(artifact, topology_mask, graph_labels, graph_labels_origin)``,
+    or ``None`` when a full build is due: other dimensions, windows covering
+    more than DIRTY_MAX_WINDOW_FRACTION of the map, an automatic hit zone
+    that moved outside them, or DIRTY_MAX_GENERATIONS dirty builds in a row.
+    """
+    previous, previous_digests, generation = source
+    H, W = mask.shape
+    t = time.time()
+    if (tuple(int(v) for v in previous["mask_shape"]) != (H, W)
+            or previous_digests.shape != tile_digests.shape
+            or generation >= DIRTY_MAX_GENERATIONS):
+        return None
+    dirty = tile_digests != previous_digests
+    ds = _downsample_factor(H, W)
+    windows = _dirty_windows(dirty, H, W, math.lcm(ds, HITZONE_DS, SAMPLE_DS))
+    window_px = sum((x1 - x0) * (y1 - y0) for _, _, (x0, y0, x1, y1) in windows)
+    if window_px > DIRTY_MAX_WINDOW_FRACTION * H * W:
+        return None
+
+    previous_hitzone = np.asarray(previous["coarse_hitzone"], dtype=bool)
+    has_polygon = region_polygon is not None and len(region_polygon) > 0
+    region_full = None
+    if has_polygon:
+        region_full = _rasterize_region_full(region_polygon, H, W)
+        hz_footprint = hz_sample = previous_hitzone
+        hz_ds = HITZONE_DS
+    else:
+        hz_footprint, hz_sample, hz_ds = _hitzone(mask)
+        moved = hz_sample != previous_hitzone
+        for _, (x0, y0, x1, y1), _ in windows:
+            moved[y0 // hz_ds:-(-y1 // hz_ds), x0 // hz_ds:-(-x1 // hz_ds)] = False
+        if moved.any():
+            return None
+    topology_mask = mask
+    if region_full is not None and prune_region:
+        topology_mask = mask.copy()
+        topology_mask[~region_full] = IMPASSABLE
+    timings["dirty_diff"] = time.time() - t
+    log(f"dirty rebuild: {int(dirty.sum())} of {dirty.size} tiles changed, "
+        f"{len(windows)} window(s) over {window_px / (H * W) * 100:.1f}% of the map")
+    progress(13, "analysing")
+
+    t = time.time()
+    nodes = np.asarray(previous["nodes"], dtype=np.int32).reshape(-1, 2)
+    edges = np.asarray(previous["edges"], dtype=np.int32).reshape(-1, 2)
+    weights = np.asarray(previous["weights"], dtype=np.float32).reshape(-1)
+    coarse_origin = np.asarray(previous["coarse_origin"], dtype=np.int32)
+    grids = {name: np.array(previous[name])
+             for name in ("coarse_minval", "coarse_maxval", "coarse_clear")}
+    with _EdgePathSolver(topology_mask, workers=edge_workers) as solver:
+        for index, (dirty_rect, rebuild_rect, context) in enumerate(windows):
+            cx0, cy0, cx1, cy1 = context
+
+            def window_progress(percent, phase, current=None, total=None,
+                                index=index):
+                progress(13 + 71 * (index + percent / 100) / len(windows),
+                         phase, current, total)
+
+            hz_rows = slice(cy0 // hz_ds, -(-cy1 // hz_ds))
+            hz_cols = slice(cx0 // hz_ds, -(-cx1 // hz_ds))
+            window = _build_base_graph(
+                mask[cy0:cy1, cx0:cx1], region_polygon, prune_region, False,
+                {}, time.time(), window_progress, log,
+                edge_workers=edge_workers, downsample=ds,
+                hitzone=(hz_footprint[hz_rows, hz_cols],
+                         hz_sample[hz_rows, hz_cols], hz_ds),
+                region_raster=(region_full[cy0:cy1, cx0:cx1]
+                               if region_full is not None else None))[0]
+            # The context margin covers the clearance cap, so the window's
+            # grids are exact inside the rebuild box.
+            window_origin = window["coarse_origin"] + np.asarray([cx0, cy0])
+            for name, grid in grids.items():
+                _paste_cells(grid, coarse_origin, window[name], window_origin,
+                             rebuild_rect)
+            nodes, edges, weights = _stitch_window(
+                nodes, edges, weights,
+                window["nodes"] + np.asarray([cx0, cy0], dtype=np.int32),
+                window["edges"], window["weights"],
+                dirty_rect, rebuild_rect, topology_mask, solver)
+        timings["dirty_windows"] = time.time() - t
+
+        t = time.time()
+        struct8 = np.ones((3, 3), dtype=np.uint8)
+        labels_full, ncomp = _compact_label(mask, struct8)
+        graph_labels, graph_ncomp = labels_full, ncomp
+        graph_labels_origin = (0, 0)
+        if region_full is not None and prune_region:
+            ry0, ry1, rx0, rx1 = _region_bbox(region_full)
+            region_window = topology_mask[ry0:ry1, rx0:rx1]
+            if region_window.size:
+                graph_labels, graph_ncomp = _compact_label(region_window, struct8)
+            else:
+                graph_labels, graph_ncomp = np.zeros((0, 0), dtype=np.uint8), 0
+            graph_labels_origin = (rx0, ry0)
+        graph_comp_sizes = _component_sizes(graph_labels, graph_ncomp)
+        main_comp = (
+            int(graph_comp_sizes[1:].argmax()) + 1 if graph_ncomp > 0 else 0)
+        components = _labels_at(
+            graph_labels, graph_labels_origin, nodes[:, 0], nodes[:, 1])
+        edge_list, weight_list = _repair_connectivity(
+            topology_mask, [(int(x), int(y)) for x, y in nodes],
+            [(int(a), int(b)) for a, b in edges], weights.tolist(),
+            components, main_comp, solver=solver)
+    gx0, gy0 = (int(v) // SAMPLE_DS for v in coarse_origin)
+    gh, gw = grids["coarse_minval"].shape
+    coarse_labels = _coarse_label_grid(mask, labels_full)[
+        gy0:gy0 + gh, gx0:gx0 + gw].copy()
+    del labels_full
+    timings["dirty_refresh"] = time.time() - t
+
+    min_cost_per_px = _min_cost_per_px(mask)
+    graph_free_total = int((topology_mask != IMPASSABLE).sum())
+    stats = dict(previous["stats"])
+    stats.update({
+        "n_nodes": int(len(nodes)),
+        "n_edges": int(len(edge_list)),
+        "n_components": int(graph_ncomp),
+        "main_component_fraction": round(
+            float(graph_comp_sizes[main_comp]) / graph_free_total, 4)
+            if graph_free_total and main_comp else 0.0,
+        "free_fraction": round(int((mask != IMPASSABLE).sum()) / (H * W), 4),
+        "main_component_connectivity": None,
+        "region_component_connectivity": None,
+        "hitzone_sample_fraction": round(float(hz_sample.mean()), 4),
+        "min_cost_per_px": min_cost_per_px,
+        "raster_cache": None,
+        "tiled": None,
+        "dirty_rebuild": {
+            "generation": generation + 1,
+            "changed_tiles": int(dirty.sum()),
+            "windows": len(windows),
+            "window_fraction": round(window_px / (H * W), 4),
+        },
+    })
+    artifact = dict(previous)
+    artifact.update({
+        "nodes": nodes,
+        "edges": np.asarray(edge_list, dtype=np.int32).reshape(-1, 2),
+        "weights": np.asarray(weight_list, dtype=np.float32).reshape(-1),
+        "components": components,
+        "min_cost_per_px": np.float32(min_cost_per_px),
+        "coarse_labels": coarse_labels,
+        "coarse_hitzone": hz_sample.astype(np.uint8),
+        "stats": stats,
+        **grids,
+    })
+    progress(84, "repairing")
+    return artifact, topology_mask, graph_labels, graph_labels_origin
+
+
+def build_navgraph(mask_path, region_polygon=None, level_passages=None,
+                   verbose=False, prune_region=True,
+                   collect_diagnostics=False, progress_callback=None,
+                   reuse_base=False, raster_cache=None,
+                   memory_budget_mb=None, edge_workers=1):
+    """Build the navgraph artifact dict for one mask PNG.
+
+    ``region_polygon`` (optional) is a coach-drawn map-region polygon: a sequence
+    of full-res ``(x, y)`` vertices. When given it is the *authoritative* hit zone
+    (rasterized into ``coarse_hitzone`` and used to confine the open-area lattice);
+    the automatic ``_hitzone`` detection is used only as a fallback / suggestion
+    when no polygon is supplied. See the module "Off-map hit zone" note.
+
+    ``prune_region=False`` is a benchmark-only switch: it keeps the polygon as
+    the endpoint/hitzone authority while retaining the pre-WP-6.1 topology.
+    Production builds must leave it enabled.
+
+    ``collect_diagnostics=True`` enables graph-wide measurements used by debug
+    overlays. They never alter the artifact topology and are skipped in normal
+    production builds.
+
+    ``progress_callback`` (optional) receives JSON-friendly dictionaries with
+    a monotonic estimated ``percent`` and an internal ``phase``. During
+    candidate connection it also receives the exact processed ``current`` and
+    ``total`` node counts. The overall percentage is phase-weighted because
+    loading, raster analysis, edge weighting and serialization are not
+    node-based work.
+
+    ``reuse_base=True`` reads and writes the base checkpoint next to the mask
+    (``base_checkpoint_path``). When the mask bytes, clipped region and builder
+    constants match, every stage before passage topology is skipped, so a
+    passage-only edit re-runs just ``_apply_passage_topology`` and the final
+    edge sparsification. After a mask edit the checkpoint of the previous mask
+    still serves everything away from the changed tiles (see
+    ``_dirty_region_base``). ``stats["base_checkpoint"]`` records
+    ``hit``/``dirty``/``miss``.
+
+    ``raster_cache`` (optional ``RasterCache``) serves the mask-only raster
+    stages of a base build from disk; ``stats["raster_cache"]`` records the
+    per-stage ``hit``/``miss``.
+
+    ``memory_budget_mb`` (optional) bounds the raster stages: when the mask's
+    monolithic label/EDT peak would exceed half of it, they run tiled over halo
+    windows into scratch memmaps (see "Tiled raster stages"). The artifact is
+    identical either way; ``stats["tiled"]`` records the plan used.
+
+    ``edge_workers`` > 1 solves the bounded fallback paths of edge weighting
+    and connectivity repair on a process pool; results are merged in
+    candidate order, so the artifact matches a serial build.
+
+    Returns a dict with all arrays + stats (see module docstring). Computation
+    only, apart from the optional checkpoint; use ``save_navgraph()`` to persist.
+    """
+    if not _HAVE_SKIMAGE:
+        raise RuntimeError(
+            "scikit-image is required for navgraph skeletonization; add it to "
+            "requirements.txt."
+        )
+    t_start = time.time()
+    timings = {}
+
+    def _log(msg):
+        if verbose:
+            print(f"[navgraph] {msg}", flush=True)
+
+    def _progress(percent, phase, current=None, total=None):
+        if progress_callback is None:
+            return
+        payload = {
+            "percent": max(0, min(99, int(round(percent)))),
+            "phase": phase,
+        }
+        if current is not None:
+            payload["current"] = int(current)
+        if total is not None:
+            payload["total"] = int(total)
+        try:
+            keep_building = progress_callback(payload)
+            if keep_building is False:
+                raise NavgraphBuildCancelled()
+        except NavgraphBuildCancelled:
+            raise
+        except Exception as exc:  # progress reporting must never break a build
+            _log(f"progress callback failed: {exc!r}")
+
+    _progress(0, "starting")
+
+    # 1. Load mask.
+    t = time.time()
+    mask = _load_mask(mask_path)
+    H, W = mask.shape
+    timings["load"] = time.time() - t
+    _log(f"loaded {W}x{H} ({H*W/1e6:.1f} Mpx)")
+    _progress(4, "loading")
+
+    # Editor coordinates can overshoot the raster edge by a few pixels due to
+    # display scaling/rounding. Normalize before passages, revisions, hit-zone
+    # rasterization, and topology all consume the polygon so every stage uses
+    # the same bounded region.
+    if isinstance(region_polygon, (list, tuple)) and len(region_polygon) >= 3:
+        region_polygon = clip_region_polygon(region_polygon, W, H)
+
+    # Normalize the complete canonical document before skeletonization or any
+    # other expensive build stage. Structurally invalid geometry aborts the
+    # whole build. Valid passages outside this Infinity region are deliberately
+    # omitted as whole objects: they may belong to another game mode.
+    t = time.time()
+    effective_passages, ignored_passage_ids = filter_level_passages_for_region(
+        level_passages, region_polygon, W, H)
+    canonical_passages, build_passages = _normalize_passages_for_build(
+        effective_passages, W, H)
+    timings["passage_normalization"] = time.time() - t
+    _log(f"passages: {len(build_passages)} included, "
+         f"{len(ignored_passage_ids)} outside region")
+    _progress(7, "preparing")
+
+    use_checkpoint = reuse_base and not collect_diagnostics
+    mask_digest = None
+    if use_checkpoint or raster_cache is not None:
+        t = time.time()
+        mask_digest = mask_sha256(mask_path)
+        timings["mask_digest"] = time.time() - t
+
+    checkpoint_path = checkpoint_key = lineage = None
+    base = dirty_source = tile_digests = None
+    if use_checkpoint:
+        t = time.time()
+        checkpoint_path = base_checkpoint_path(mask_path)
+        checkpoint_key = _base_checkpoint_key(
+            mask_digest, region_polygon, W, H, prune_region)
+        lineage = _base_checkpoint_key(
+            None, region_polygon, W, H, prune_region)
+        base = _load_base_checkpoint(checkpoint_path, checkpoint_key)
+        if base is None:
+            tile_digests = _mask_tile_digests(mask)
+            dirty_source = _load_dirty_source(checkpoint_path, lineage)
+        timings["base_checkpoint"] = time.time() - t
+    graph_labels_origin = (0, 0)
+    scratch = None
+    dirty = None
+    if base is None and dirty_source is not None:
+        dirty = _dirty_region_base(
+            mask, dirty_source, tile_digests, region_polygon, prune_region,
+            timings, _progress, _log, edge_workers=edge_workers)
+    if dirty is not None:
+        # Mask edit: everything away from the changed tiles is reused from
+        # the previous checkpoint (see ``_dirty_region_base``).
+        artifact, topology_mask, graph_labels, graph_labels_origin = dirty
+        main_conn = None
+        if checkpoint_path:
+            t = time.time()
+            _save_base_checkpoint(
+                checkpoint_path, checkpoint_key, artifact, graph_labels,
+                graph_labels_origin, lineage=lineage,
+                tile_digests=tile_digests, generation=dirty_source[2] + 1)
+            timings["base_checkpoint_save"] = time.time() - t
+        base_checkpoint_state = "dirty"
+    elif base is None:
+        tile_plan = _tile_plan(
+            H, W, _downsample_factor(H, W),
+            int(memory_budget_mb or 0) * 1024 * 1024)
+        if tile_plan:
+            import tempfile
+
+            # Removed explicitly on success; on an exception the directory's
+            # finalizer deletes it once the frame is released.
+            scratch = tempfile.TemporaryDirectory(prefix="navgraph-tiles-")
+            _log(f"tiled raster stages: core={tile_plan['core']} px, "
+                 f"halo={tile_plan['halo']} px")
+        (artifact, topology_mask, graph_labels, graph_labels_origin,
+         main_conn) = _build_base_graph(
+            mask, region_polygon, prune_region, collect_diagnostics,
+            timings, t_start, _progress, _log,
+            raster_cache=raster_cache, mask_digest=mask_digest,
+            tile_plan=tile_plan, scratch_dir=scratch.name if scratch else None,
+            edge_workers=edge_workers)
+        artifact["stats"]["dirty_rebuild"] = None
+        if checkpoint_path:
+            t = time.time()
+            _save_base_checkpoint(
+                checkpoint_path, checkpoint_key, artifact, graph_labels,
+                graph_labels_origin, lineage=lineage,
+                tile_digests=tile_digests)
+            timings["base_checkpoint_save"] = time.time() - t
+        base_checkpoint_state = "miss" if checkpoint_path else "off"
+    else:
+        # Passage-only edit: the base graph, sampling grids and region labels
+        # are exactly what a full rebuild would recompute for these inputs.
+        artifact, graph_labels, graph_labels_origin = base
+        topology_mask = mask
+        if region_polygon is not None and len(region_polygon) > 0 and prune_region:
+            topology_mask = mask.copy()
+            topology_mask[~_rasterize_region_full(region_polygon, H, W)] = IMPASSABLE
+        main_conn = None
+        base_checkpoint_state = "hit"
+        _log("base checkpoint hit; rebuilding passage topology only")
+        _progress(84, "repairing")
+    stats = artifact["stats"]
+    stats["base_checkpoint"] = base_checkpoint_state
+    has_polygon = stats["region_polygon"] is not None
     if build_passages:
         passage_stats = _apply_passage_topology(
             artifact, topology_mask, build_passages, canonical_passages,
             region_polygon=region_polygon if has_polygon else None,
-            graph_labels=graph_labels)
+            graph_labels=graph_labels, graph_labels_origin=graph_labels_origin)
         stats.update(passage_stats)
         stats["n_nodes"] = int(len(artifact["nodes"]))
         stats["n_edges"] = int(len(artifact["edges"]))
@@ -3844,6 +5236,8 @@ def build_navgraph(mask_path, region_polygon=None, level_passages=None,
     _log(f"done in {stats['build_seconds']}s{diagnostic_suffix}")
     _progress(99, "finalizing")
 
+    if scratch is not None:
+        scratch.cleanup()
     return artifact
 
 
@@ -3920,7 +5314,7 @@ def _snap_bottleneck_nodes(mask, dist_full, node_yx, ds):
         choices = sorted(
             range(len(py)),
             key=lambda i: (
-                -float(dist_full[py[i], px[i]]),
+                -int(dist_full[py[i], px[i]]),
                 -int(mask[py[i], px[i]]),
                 (py[i] - center_y) ** 2 + (px[i] - center_x) ** 2,
                 int(py[i]), int(px[i]),
@@ -3967,6 +5361,302 @@ def _main_component_connectivity(nodes_arr, edges_arr, components, main_comp):
     return best / len(on_main)
 
 
+# =============================================================================
+# Base checkpoint (passage-only rebuilds)
+# =============================================================================
+
+def mask_sha256(mask_path):
+    """SHA-256 hex digest of the mask PNG bytes."""
+    digest = hashlib.sha256()
+    with open(mask_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _builder_fingerprint():
+    """Digest of every scalar tuning constant in this module.
+
+    A deploy that changes any builder constant must not reuse a base graph
+    built under the old values, so the fingerprint is part of every cache key.
+    """
+    items = sorted(
+        (name, value) for name, value in globals().items()
+        if name.isupper() and isinstance(value, (bool, int, float, str)))
+    return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()[:16]
+
+
+def base_checkpoint_path(mask_path):
+    base, _ = os.path.splitext(mask_path)
+    return base + ".navgraph.base.npz"
+
+
+def _base_checkpoint_key(mask_digest, region_polygon, map_width, map_height,
+                         prune_region):
+    """Checkpoint identity; ``mask_digest=None`` gives the lineage key that a
+    dirty-region rebuild of an edited mask matches instead."""
+    identity = {
+        "version": BASE_CHECKPOINT_VERSION,
+        "mask": mask_digest,
+        "region": region_revision(region_polygon, map_width, map_height) or "",
+        "prune_region": bool(prune_region),
+        "builder": _builder_fingerprint(),
+    }
+    return hashlib.sha256(
+        json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+_BASE_CHECKPOINT_ARRAYS = (
+    "nodes", "edges", "weights", "components", "mask_shape", "coarse_origin",
+    "coarse_minval", "coarse_maxval", "coarse_clear", "coarse_labels",
+    "coarse_hitzone",
+)
+
+
+def _save_base_checkpoint(path, key, artifact, graph_labels, origin=(0, 0),
+                          lineage="", tile_digests=None, generation=0):
+    """Persist the pre-passage base artifact plus its region labels.
+
+    ``graph_labels`` (a crop at ``origin``) is cropped further to its non-zero
+    bounding box (everything outside a pruned region is label 0) and stored in
+    the smallest unsigned dtype. The write is atomic and best-effort: a full or read-only volume
+    only costs the next passage edit a full build.
+
+    ``lineage``, ``tile_digests`` (see ``_mask_tile_digests``) and the dirty
+    rebuild ``generation`` let the next build after a mask edit reuse
+    everything outside the changed tiles (see ``_load_dirty_source``).
+    """
+    import tempfile
+
+    labels = np.asarray(graph_labels)
+    rows = np.flatnonzero(labels.any(axis=1))
+    cols = np.flatnonzero(labels.any(axis=0))
+    if rows.size:
+        labels = labels[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        origin = (int(origin[0]) + int(cols[0]), int(origin[1]) + int(rows[0]))
+    else:
+        labels = labels[:0, :0]
+        origin = (0, 0)
+    max_label = int(labels.max()) if labels.size else 0
+    label_dtype = (np.uint8 if max_label <= 0xFF
+                   else np.uint16 if max_label <= 0xFFFF else np.uint32)
+
+    out_dir = os.path.dirname(path) or "."
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".navgraph-base-", suffix=".npztmp", dir=out_dir)
+        with os.fdopen(fd, "wb") as handle:
+            np.savez(
+                handle,
+                key=np.asarray(key),
+                version=np.int32(artifact["version"]),
+                min_cost_per_px=np.float32(artifact["min_cost_per_px"]),
+                coarse_scale=np.int32(artifact["coarse_scale"]),
+                hitzone_scale=np.int32(artifact["hitzone_scale"]),
+                region_revision=np.asarray(artifact["region_revision"]),
+                stats=np.asarray(json.dumps(artifact["stats"])),
+                graph_labels=labels.astype(label_dtype, copy=False),
+                graph_labels_origin=np.asarray(origin, dtype=np.int32),
+                lineage=np.asarray(lineage),
+                tile_digests=np.asarray(
+                    tile_digests if tile_digests is not None else [],
+                    dtype=np.uint64),
+                generation=np.int32(generation),
+                **{name: artifact[name] for name in _BASE_CHECKPOINT_ARRAYS},
+            )
+        os.replace(tmp_path, path)
+        tmp_path = None
+    except OSError:
+        pass
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _load_base_checkpoint(path, key):
+    """Return ``(artifact, graph_labels, graph_labels_origin)`` or ``None``.
+
+    Any missing, unreadable or mismatched checkpoint is a miss; the caller then
+    runs the full build and overwrites it.
+    """
+    import zipfile
+
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["key"]) != key:
+                return None
+            artifact = _checkpoint_artifact(data)
+            graph_labels = data["graph_labels"]
+            origin = tuple(int(value) for value in data["graph_labels_origin"])
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    return artifact, graph_labels, origin
+
+
+def _load_dirty_source(path, lineage):
+    """Return ``(artifact, tile_digests, generation)`` of a checkpoint built
+    for an earlier revision of the same mask, or ``None``.
+
+    The checkpoint must share the ``lineage`` key (region, prune flag and
+    builder constants) and carry per-tile digests of the mask it was built for.
+    """
+    import zipfile
+
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["lineage"]) != lineage:
+                return None
+            tile_digests = data["tile_digests"]
+            if not tile_digests.size:
+                return None
+            artifact = _checkpoint_artifact(data)
+            generation = int(data["generation"])
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    return artifact, tile_digests, generation
+
+
+def _checkpoint_artifact(data):
+    artifact = {name: data[name] for name in _BASE_CHECKPOINT_ARRAYS}
+    artifact.update({
+        "version": int(data["version"]),
+        "min_cost_per_px": np.float32(data["min_cost_per_px"]),
+        "coarse_scale": np.int32(data["coarse_scale"]),
+        "hitzone_scale": np.int32(data["hitzone_scale"]),
+        "region_revision": str(data["region_revision"]),
+        "stats": json.loads(str(data["stats"])),
+    })
+    return artifact
+
+
+# =============================================================================
+# Raster cache (mask-derived intermediates)
+# =============================================================================
+
+class RasterCache:
+    """Size-bounded on-disk cache of mask-only raster stages.
+
+    The component labels, EDT, pruned skeleton and ÷SAMPLE_DS sampling grids
+    depend on nothing but the mask bytes and a handful of constants, yet they
+    dominate build time and peak memory. Region and passage iterations on one
+    map therefore reuse them. Entries are directories of ``.npy`` files named
+    by a SHA-256 over the mask digest, the stage and that stage's constants, so
+    an edited mask or a changed constant simply misses; nothing is invalidated
+    explicitly.
+
+    Large rasters are returned memory-mapped read-only. Every write is atomic
+    and best-effort (a full or read-only volume only costs the recomputation),
+    and after each store the least recently used entries are evicted until the
+    cache fits in ``max_bytes``. Each entry lists its arrays in a manifest; an
+    entry missing any of them (another process is evicting it) is a miss.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root, max_bytes=2 << 30):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+
+    def entry_key(self, mask_digest, stage, params):
+        identity = {
+            "version": RASTER_CACHE_VERSION,
+            "mask": mask_digest,
+            "stage": stage,
+            "params": params,
+        }
+        return hashlib.sha256(
+            json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def fetch(self, mask_digest, stage, params, compute, mmap=True):
+        """Return ``(arrays, hit)`` for one stage, computing it on a miss.
+
+        ``compute()`` returns a dict of named arrays; a hit returns the same
+        names loaded from disk (memory-mapped unless ``mmap=False``).
+        """
+        key = self.entry_key(mask_digest, stage, params)
+        arrays = self._load(key, mmap)
+        if arrays is not None:
+            return arrays, True
+        arrays = compute()
+        self._store(key, arrays)
+        return arrays, False
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _load(self, key, mmap):
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, self.MANIFEST), encoding="utf-8") as handle:
+                names = json.load(handle)["arrays"]
+            arrays = {
+                name: np.load(
+                    os.path.join(entry, name + ".npy"),
+                    mmap_mode="r" if mmap else None, allow_pickle=False)
+                for name in names
+            }
+            os.utime(entry)  # LRU recency
+        except (OSError, ValueError, KeyError, TypeError):
+            # Absent, partly evicted or unreadable: recompute. ``OSError``
+            # covers files removed between the manifest read and their load.
+            return None
+        return arrays
+
+    def _store(self, key, arrays):
+        import shutil
+        import tempfile
+
+        tmp_dir = None
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+            for name, value in arrays.items():
+                np.save(os.path.join(tmp_dir, name + ".npy"), np.asarray(value))
+            with open(os.path.join(tmp_dir, self.MANIFEST), "w", encoding="utf-8") as handle:
+                json.dump({"arrays": sorted(arrays)}, handle)
+            try:
+                os.rename(tmp_dir, self._entry_dir(key))
+                tmp_dir = None
+            except OSError:
+                pass  # a concurrent build stored the same entry first
+            self._evict(keep=key)
+        except OSError:
+            pass
+        finally:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self, keep=None):
+        """Delete least recently used entries until the cache fits."""
+        import shutil
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            path = self._entry_dir(name)
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            entries.append((mtime, name, size))
+            total += size
+        for _mtime, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self._entry_dir(name), ignore_errors=True)
+            total -= size
+
+
 # =============================================================================
 # Serialization
 # =============================================================================
@@ -4068,7 +5758,7 @@ def _attach_passage_topology(artifact, level_passages, map_width, map_height):
     return artifact
 
 
-def save_navgraph(artifact, mask_path, *, include_npz=True):
+def save_navgraph(artifact, mask_path, *, include_npz=True, staged=None):
     """Write the served ``.bin`` and optionally the debug ``.npz``.
 
     Both files are written to temporary siblings first and then atomically
@@ -4077,52 +5767,143 @@ def save_navgraph(artifact, mask_path, *, include_npz=True):
 
     ``include_npz=False`` is the production path: the full graph is debug/build
     data and is removed after the authoritative served binary is installed.
-    Returns ``(npz_path_or_none, bin_path)``.
+    Brotli/gzip copies of the binary (``NAVGRAPH_BIN_ENCODINGS``) are written
+    next to it so the serving path never compresses per request.
+
+    ``staged`` is a ``stage_navgraph`` result for this artifact; only the
+    renames are then left to do, which is what a caller holding a row lock
+    wants. Returns ``(npz_path_or_none, bin_path)``.
+    """
+    if staged is None:
+        staged = stage_navgraph(artifact, mask_path, include_npz=include_npz)
+    try:
+        return staged.install()
+    finally:
+        staged.discard()
+
+
+def stage_navgraph(artifact, mask_path, *, include_npz=True):
+    """Write ``save_navgraph``'s files as temporary siblings, not yet installed.
+
+    All the serialisation and compression happens here; call ``install()`` on
+    the result to publish and ``discard()`` to drop whatever was not installed.
     """
     import tempfile
 
     base, _ = os.path.splitext(mask_path)
-    npz_path = base + ".navgraph.npz"
-    bin_path = base + ".navgraph.bin"
+    staged = StagedNavgraph(base + ".navgraph.npz", base + ".navgraph.bin", include_npz)
 
     if "passage_revision" not in artifact:
         H, W = int(artifact["mask_shape"][0]), int(artifact["mask_shape"][1])
         _attach_passage_topology(artifact, level_passages=None, map_width=W, map_height=H)
 
-    out_dir = os.path.dirname(npz_path) or "."
-    tmp_npz = tmp_bin = None
+    out_dir = os.path.dirname(staged.npz_path) or "."
     try:
         # Pass an open handle (not a path) to ``savez_compressed`` so it writes
         # exactly where we point it — a bare path lacking ``.npz`` would get the
         # suffix appended, defeating the atomic rename.
         if include_npz:
-            fd, tmp_npz = tempfile.mkstemp(
+            fd, staged.tmp_npz = tempfile.mkstemp(
                 prefix=".navgraph-", suffix=".npztmp", dir=out_dir)
             with os.fdopen(fd, "wb") as handle:
                 _save_npz(handle, artifact)
 
-        fd, tmp_bin = tempfile.mkstemp(prefix=".navgraph-", suffix=".bintmp", dir=out_dir)
+        fd, staged.tmp_bin = tempfile.mkstemp(
+            prefix=".navgraph-", suffix=".bintmp", dir=out_dir)
         os.close(fd)
-        _write_bin(tmp_bin, artifact)
-
-        if include_npz:
-            os.replace(tmp_npz, npz_path)
-            tmp_npz = None
-        os.replace(tmp_bin, bin_path)
-        tmp_bin = None
-        if not include_npz:
+        _write_bin(staged.tmp_bin, artifact)
+        staged.tmp_encoded = _write_encoded_bins(staged.tmp_bin, out_dir)
+    except BaseException:
+        staged.discard()
+        raise
+    return staged
+
+
+class StagedNavgraph:
+    """Temporary files of one navgraph, written by ``stage_navgraph``."""
+
+    def __init__(self, npz_path, bin_path, include_npz):
+        self.npz_path = npz_path
+        self.bin_path = bin_path
+        self.include_npz = include_npz
+        self.tmp_npz = None
+        self.tmp_bin = None
+        self.tmp_encoded = {}
+
+    def install(self):
+        """Rename the staged files into place; ``(npz_path_or_none, bin_path)``."""
+        if self.include_npz:
+            os.replace(self.tmp_npz, self.npz_path)
+            self.tmp_npz = None
+        os.replace(self.tmp_bin, self.bin_path)
+        self.tmp_bin = None
+        # Siblings land after the binary; until they do, their old mtime no
+        # longer matches and the serving path falls back to identity.
+        for suffix, tmp_path in list(self.tmp_encoded.items()):
+            if tmp_path:
+                os.replace(tmp_path, self.bin_path + suffix)
+                self.tmp_encoded[suffix] = None
+            else:
+                try:
+                    os.remove(self.bin_path + suffix)
+                except FileNotFoundError:
+                    pass
+        if not self.include_npz:
             try:
-                os.remove(npz_path)
+                os.remove(self.npz_path)
             except FileNotFoundError:
                 pass
-    finally:
-        for leftover in (tmp_npz, tmp_bin):
+        return (self.npz_path if self.include_npz else None), self.bin_path
+
+    def discard(self):
+        """Remove every staged file that was not installed."""
+        for leftover in (self.tmp_npz, self.tmp_bin, *self.tmp_encoded.values()):
             if leftover and os.path.exists(leftover):
                 try:
                     os.remove(leftover)
                 except OSError:
                     pass
-    return (npz_path if include_npz else None), bin_path
+        self.tmp_npz = self.tmp_bin = None
+        self.tmp_encoded = {}
+
+
+def _write_encoded_bins(tmp_bin, out_dir):
+    """Compress ``tmp_bin`` into temporary siblings, one per encoding.
+
+    Returns ``{suffix: tmp_path_or_none}``; ``None`` marks an encoding whose
+    codec is unavailable, so a stale sibling from an older build is removed.
+    Every written copy gets ``tmp_bin``'s mtime, which survives ``os.replace``.
+    """
+    import gzip
+    import tempfile
+
+    with open(tmp_bin, "rb") as handle:
+        data = handle.read()
+    stat = os.stat(tmp_bin)
+    written = {}
+    try:
+        for coding, suffix in NAVGRAPH_BIN_ENCODINGS:
+            if coding == "br":
+                try:
+                    import brotli
+                except ImportError:  # pragma: no cover - dependency guard
+                    written[suffix] = None
+                    continue
+                payload = brotli.compress(data, quality=11)
+            else:
+                payload = gzip.compress(data, compresslevel=9, mtime=0)
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=".navgraph-", suffix=".bintmp" + suffix, dir=out_dir)
+            written[suffix] = tmp_path
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(payload)
+            os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    except BaseException:
+        for tmp_path in written.values():
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    return written
 
 
 def _save_npz(npz_file, artifact):
@@ -4266,6 +6047,173 @@ def _write_bin(bin_path, artifact):
         f.write(hitzone_bits.tobytes())
 
 
+
+class NavgraphView:
+    """Read-only, memory-mapped view of a served v6 ``.navgraph.bin``.
+
+    The header is validated against the exact payload length it implies, then
+    every array section is exposed as a zero-copy little-endian NumPy view of
+    the mapping: ``nodes`` (N, 2), ``edges`` (E, 2), ``weights``,
+    ``edge_kinds``, ``edge_passage``, ``passage_node_start`` /
+    ``passage_node_count`` and the packed ``sampleable_bits`` /
+    ``hitzone_bits``. ``sampleable`` and ``hitzone`` unpack those bitsets into
+    boolean grids; they are the only accessors that allocate.
+
+    Raises ``ValueError`` for anything ``read_bin_header`` would reject and for
+    truncated or overlong files. Use as a context manager, or call ``close()``;
+    views taken from a closed reader stay valid until they are released.
+    """
+
+    HEADER_BYTES = 80
+
+    def __init__(self, bin_path):
+        import mmap
+
+        self.path = bin_path
+        with open(bin_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self.HEADER_BYTES:
+                raise ValueError(f"{bin_path}: truncated navgraph header")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse(size)
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self, size):
+        buf = self._mmap
+        if buf[:4] != NAVGRAPH_MAGIC:
+            raise ValueError(f"{self.path}: bad navgraph magic")
+        (self.version,) = struct.unpack_from("<I", buf, 4)
+        if self.version != NAVGRAPH_VERSION:
+            raise ValueError(f"{self.path}: unsupported navgraph version {self.version}")
+        self.height, self.width = struct.unpack_from("<ii", buf, 8)
+        (self.min_cost_per_px,) = struct.unpack_from("<f", buf, 16)
+        self.node_count, self.edge_count = struct.unpack_from("<II", buf, 20)
+        self.coarse_scale, ch, cw = struct.unpack_from("<iii", buf, 28)
+        self.hitzone_scale, hh, hw = struct.unpack_from("<iii", buf, 40)
+        self.base_node_count, self.passage_count, passage_rev_len = (
+            struct.unpack_from("<III", buf, 52))
+        self.coarse_origin = struct.unpack_from("<ii", buf, 64)
+        region_rev_len, self.flags = struct.unpack_from("<II", buf, 72)
+        if (passage_rev_len > NAVGRAPH_REVISION_MAX_LEN
+                or region_rev_len > NAVGRAPH_REVISION_MAX_LEN):
+            raise ValueError(f"{self.path}: revision string too long")
+        if min(self.height, self.width, ch, cw, hh, hw) < 0:
+            raise ValueError(f"{self.path}: negative navgraph dimension")
+        if self.base_node_count > self.node_count:
+            raise ValueError(f"{self.path}: base_node_count exceeds node count")
+        self.coarse_shape = (ch, cw)
+        self.hitzone_shape = (hh, hw)
+
+        coord = "<u4" if self.flags & 1 else "<u2"
+        index = "<u4" if self.flags & 2 else "<u2"
+        N, E, P = self.node_count, self.edge_count, self.passage_count
+        sections = [
+            ("nodes", coord, N * 2),
+            ("edges", index, E * 2),
+            ("weights", "<f4", E),
+            ("edge_kinds", "<u1", E),
+            ("edge_passage", "<i4", E),
+            ("passage_node_start", index, P),
+            ("passage_node_count", index, P),
+            ("sampleable_bits", "<u1", (ch * cw + 7) // 8),
+            ("hitzone_bits", "<u1", (hh * hw + 7) // 8),
+        ]
+        offset = self.HEADER_BYTES + passage_rev_len + region_rev_len
+        expected = offset + sum(np.dtype(dt).itemsize * n for _, dt, n in sections)
+        if size != expected:
+            raise ValueError(
+                f"{self.path}: payload is {size} bytes, header implies {expected}")
+        try:
+            self.passage_revision = bytes(
+                buf[self.HEADER_BYTES:self.HEADER_BYTES + passage_rev_len]).decode("ascii")
+            self.region_revision = bytes(
+                buf[self.HEADER_BYTES + passage_rev_len:offset]).decode("ascii")
+        except UnicodeDecodeError as exc:
+            raise ValueError(f"{self.path}: non-ASCII revision string") from exc
+        for name, dtype, count in sections:
+            view = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+            offset += view.nbytes
+            setattr(self, name, view)
+        self.nodes = self.nodes.reshape(N, 2)
+        self.edges = self.edges.reshape(E, 2)
+
+    def close(self):
+        """Drop this reader's views and unmap once no caller still holds one."""
+        mapping, self._mmap = getattr(self, "_mmap", None), None
+        if mapping is None:
+            return
+        for name in ("nodes", "edges", "weights", "edge_kinds", "edge_passage",
+                     "passage_node_start", "passage_node_count",
+                     "sampleable_bits", "hitzone_bits"):
+            self.__dict__.pop(name, None)
+        try:
+            mapping.close()
+        except BufferError:
+            # Views handed out earlier still reference the mapping; it is
+            # unmapped when the last of them is garbage-collected.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def mask_shape(self):
+        return (self.height, self.width)
+
+    @property
+    def sampleable(self):
+        """Endpoint-sampleable coarse cells as a ``(ch, cw)`` bool grid."""
+        return _unpack_bits(self.sampleable_bits, self.coarse_shape)
+
+    @property
+    def hitzone(self):
+        """Polygon/automatic hit zone as a ``(hh, hw)`` bool grid."""
+        return _unpack_bits(self.hitzone_bits, self.hitzone_shape)
+
+    def passage_node_range(self, ordinal):
+        """Node indices of passage ``ordinal`` as a ``range``."""
+        start = int(self.passage_node_start[ordinal])
+        return range(start, start + int(self.passage_node_count[ordinal]))
+
+    def as_artifact(self):
+        """Artifact-shaped dict of the served arrays for debug tooling.
+
+        Keys follow the ``.npz`` layout; rasters that are never served
+        (coarse terrain grids, component labels) are absent.
+        """
+        return {
+            "version": np.int32(self.version),
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "weights": self.weights,
+            "edge_kinds": self.edge_kinds,
+            "edge_passage": self.edge_passage,
+            "passage_node_start": self.passage_node_start,
+            "passage_node_count": self.passage_node_count,
+            "base_node_count": np.int32(self.base_node_count),
+            "passage_revision": self.passage_revision,
+            "region_revision": self.region_revision,
+            "min_cost_per_px": np.float32(self.min_cost_per_px),
+            "mask_shape": np.array(self.mask_shape, dtype=np.int32),
+            "coarse_scale": np.int32(self.coarse_scale),
+            "coarse_origin": np.array(self.coarse_origin, dtype=np.int32),
+            "hitzone_scale": np.int32(self.hitzone_scale),
+            "coarse_hitzone": self.hitzone.astype(np.uint8),
+            "stats": {},
+        }
+
+
+def _unpack_bits(bits, shape):
+    count = int(shape[0]) * int(shape[1])
+    return np.unpackbits(bits, count=count, bitorder="little").astype(bool).reshape(shape)
+
+
 if __name__ == "__main__":  # pragma: no cover - manual smoke test
     import sys
     if len(sys.argv) < 2:
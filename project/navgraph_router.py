@@ -0,0 +1,1058 @@
+"""Server-side graph router over a served ``.navgraph.bin``.
+
+A Python port of the graph stage of
+``project/static/project/js/pathing/navgraph_router.js``: endpoint sampling
+from the artifact's sampleable bitset, endpoint snapping with local full-res
+A* stubs, graph A* over a CSR adjacency, and barrier-forced route
+alternatives (``computeRouteOptions``). Pair selection
+(``route_pair_selection.js``) and the full-resolution legal-spine/Theta*
+refinement stay in the browser; ``route_attempt`` stops where
+``generateOnePair`` hands the graph routes to selection.
+
+The port is numerically faithful, not just algorithmically similar, so the
+same seed gives the same pairs, snaps, node paths and barriers as the JS
+router (see ``scripts/navgraph_router_parity.py``):
+
+* ``make_rng`` is the same mulberry32 generator;
+* ``_js_hypot`` and ``_js_round`` reproduce V8's ``Math.hypot`` and
+  ``Math.round`` bit for bit;
+* A* distance tables are float32 (``array('f')``) like the JS
+  ``Float32Array`` tables, and ``_MinHeap`` is ``heap.js`` with its exact tie
+  order.
+
+Per-route time budgets are honoured when configured; parity runs disable them
+because they make results depend on wall time.
+"""
+
+import bisect
+import math
+import time
+from array import array
+
+import numpy as np
+
+from .navgraph import (
+    EDGE_KIND_PASSAGE,
+    IMPASSABLE,
+    PASSAGE_FAST_VALUE,
+    NavgraphView,
+    _load_mask,
+    _normalize_passages_for_build,
+    passage_revision,
+)
+
+
+BARRIER_DRAW_WIDTH_MASK_PX = 7
+
+# Graph-stage subset of the JS DEFAULT_CONFIG, same values, snake_case keys.
+DEFAULT_CONFIG = {
+    "clearance_min_px": 12,
+    "terrain_min_value": 200,
+    "endpoint_obstacle_window_px": 100,
+    "endpoint_uniform_mix": 0.30,
+    "dist_min_px": 500,
+    "dist_max_px": 1500,
+    "goal_sample_tries": 40,
+    "obstacle_min_run_px": 8,
+    "snap_max_dist_px": 200,
+    "snap_max_targets": 3,
+    "snap_astar_margin": 16,
+    "barrier_max_half_px": 60,
+    "barrier_step_px": 2,
+    "barrier_extend_max_half_px": 150,
+    "barrier_margin_px": 3,
+    "barrier_slide_samples": 32,
+    "barrier_slide_fraction": 0.05,
+    "barrier_fallback_samples": 30,
+    "barrier_anchor_min_area_px": 60,
+    "barrier_elongation_ratio": 8,
+    "barrier_flood_cap_px": 250,
+    "barrier_width_px": BARRIER_DRAW_WIDTH_MASK_PX,
+    "barrier_clear_node_dist_px": BARRIER_DRAW_WIDTH_MASK_PX,
+    "passage_barrier_overhang_px": 2,
+    "route_attempts": 5,
+    "primary_budget_ms": 400,
+    "extra_budget_ms": 200,
+}
+
+SNAP_MAX_EXPANSIONS = 200000
+_BUCKET_KEY_STRIDE = 100003
+_UINT32 = 0xFFFFFFFF
+
+
+def js_config(config):
+    """Camel-case a config dict for the JS router (``dist_min_px`` -> ``distMinPx``)."""
+    out = {}
+    for key, value in config.items():
+        head, *rest = key.split("_")
+        name = head + "".join(part[:1].upper() + part[1:] for part in rest)
+        out[name] = None if value is None or value == math.inf else value
+    return out
+
+
+def _now_ms():
+    return time.perf_counter() * 1000.0
+
+
+def _js_hypot(x, y):
+    """V8 ``Math.hypot(x, y)``: scaled Kahan sum, not correctly rounded."""
+    a, b = abs(x), abs(y)
+    largest = a if a > b else b
+    if largest == math.inf:
+        return math.inf
+    if largest == 0:
+        return 0.0
+    total = compensation = 0.0
+    for value in (a, b):
+        n = value / largest
+        summand = n * n - compensation
+        preliminary = total + summand
+        compensation = (preliminary - total) - summand
+        total = preliminary
+    return math.sqrt(total) * largest
+
+
+def _js_round(x):
+    """ECMAScript ``Math.round``: nearest integer, halves toward +infinity."""
+    r = math.floor(x)
+    return r + 1 if x - r >= 0.5 else r
+
+
+class Mulberry32:
+    """``makeRng``: the mulberry32 generator, returning floats in [0, 1)."""
+
+    def __init__(self, seed):
+        self._a = int(seed) & _UINT32
+
+    def __call__(self):
+        a = self._a = (self._a + 0x6D2B79F5) & _UINT32
+        t = ((a ^ (a >> 15)) * (1 | a)) & _UINT32
+        t = ((t + (((t ^ (t >> 7)) * (61 | t)) & _UINT32)) & _UINT32) ^ t
+        return ((t ^ (t >> 14)) & _UINT32) / 4294967296
+
+    def get_state(self):
+        return self._a
+
+    def set_state(self, state):
+        self._a = int(state) & _UINT32
+
+
+def make_rng(seed):
+    return Mulberry32(seed)
+
+
+class _MinHeap:
+    """``heap.js``: binary min-heap with the JS hole-moving tie order."""
+
+    __slots__ = ("_ps", "_vs")
+
+    def __init__(self):
+        self._ps = []
+        self._vs = []
+
+    def __len__(self):
+        return len(self._ps)
+
+    def push(self, priority, value):
+        ps, vs = self._ps, self._vs
+        i = len(ps)
+        ps.append(priority)
+        vs.append(value)
+        while i > 0:
+            parent = (i - 1) >> 1
+            if ps[parent] <= priority:
+                break
+            ps[i] = ps[parent]
+            vs[i] = vs[parent]
+            i = parent
+        ps[i] = priority
+        vs[i] = value
+
+    def pop(self):
+        ps, vs = self._ps, self._vs
+        root = vs[0]
+        last_priority = ps.pop()
+        last_value = vs.pop()
+        n = len(ps)
+        if n == 0:
+            return root
+        i = 0
+        half = n >> 1
+        while i < half:
+            child = i * 2 + 1
+            right = child + 1
+            if right < n and ps[right] < ps[child]:
+                child = right
+            if last_priority <= ps[child]:
+                break
+            ps[i] = ps[child]
+            vs[i] = vs[child]
+            i = child
+        ps[i] = last_priority
+        vs[i] = last_value
+        return root
+
+
+def _seg_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+    def orient(px, py, qx, qy, rx, ry):
+        value = (qy - py) * (rx - qx) - (qx - px) * (ry - qy)
+        return 1 if value > 1e-9 else -1 if value < -1e-9 else 0
+
+    o1 = orient(ax, ay, bx, by, cx, cy)
+    o2 = orient(ax, ay, bx, by, dx, dy)
+    o3 = orient(cx, cy, dx, dy, ax, ay)
+    o4 = orient(cx, cy, dx, dy, bx, by)
+    return o1 != o2 and o3 != o4
+
+
+def route_path_length(path):
+    return sum(
+        _js_hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:]))
+
+
+class NavgraphRouter:
+    """Routing state for one artifact + mask (JS ``buildState``).
+
+    ``artifact`` is a ``NavgraphView``; ``mask`` the full-resolution uint8
+    terrain array. Artifacts with serialized passages need the matching
+    ``level_passages`` document, as in ``attachSerializedPassages``.
+    """
+
+    def __init__(self, artifact, mask, config=None, level_passages=None):
+        cfg = dict(DEFAULT_CONFIG)
+        cfg.update(config or {})
+        if (cfg["clearance_min_px"] != DEFAULT_CONFIG["clearance_min_px"]
+                or cfg["terrain_min_value"] != DEFAULT_CONFIG["terrain_min_value"]):
+            raise ValueError(
+                "artifact sampling bitset does not match overridden endpoint thresholds")
+        self.cfg = cfg
+        self.artifact = artifact
+        self.width = W = int(artifact.width)
+        self.height = H = int(artifact.height)
+        mask = np.ascontiguousarray(mask, dtype=np.uint8)
+        if mask.shape != (H, W):
+            raise ValueError(f"mask shape {mask.shape} != artifact {(H, W)}")
+        self.mask = mask
+        self._pixels = memoryview(mask.reshape(-1))
+        self.node_count = N = int(artifact.node_count)
+        self.base_node_count = int(artifact.base_node_count)
+        self.nodes = np.asarray(artifact.nodes).tolist()
+        self.min_cost_per_px = float(artifact.min_cost_per_px)
+
+        self.hitzone_scale = int(artifact.hitzone_scale)
+        self.hitzone_shape = tuple(int(v) for v in artifact.hitzone_shape)
+        hitzone = artifact.hitzone
+        self._hitzone = hitzone.reshape(-1).tolist()
+
+        self.sample_cells = np.flatnonzero(artifact.sampleable.reshape(-1)).tolist()
+        self._build_endpoint_density(hitzone)
+
+        hh, hw = self.hitzone_shape
+        node_xy = np.asarray(artifact.nodes, dtype=np.int64).reshape(-1, 2)
+        hx = node_xy[:, 0] // self.hitzone_scale
+        hy = node_xy[:, 1] // self.hitzone_scale
+        inside = (hx >= 0) & (hy >= 0) & (hx < hw) & (hy < hh)
+        in_region = np.zeros(N, dtype=bool)
+        in_region[inside] = hitzone[hy[inside], hx[inside]]
+        in_region[self.base_node_count:] = True
+        self.node_in_region = in_region.tolist()
+
+        cell = max(1, cfg["snap_max_dist_px"])
+        self.bucket_cell = cell
+        self.buckets = {}
+        for i, (x, y) in enumerate(self.nodes):
+            key = (x // cell) * _BUCKET_KEY_STRIDE + (y // cell)
+            self.buckets.setdefault(key, []).append(i)
+
+        edges = np.asarray(artifact.edges).reshape(-1, 2)
+        self.edge_count = len(edges)
+        weights = np.asarray(artifact.weights, dtype=np.float32).astype(np.float64)
+        self.adjacency = [[] for _ in range(N)]
+        for e, ((u, v), w) in enumerate(zip(edges.tolist(), weights.tolist())):
+            self.adjacency[u].append((v, w, e))
+            self.adjacency[v].append((u, w, e))
+        self._edge_xy = node_xy[edges].reshape(-1, 4).astype(np.float64) if len(edges) \
+            else np.zeros((0, 4), dtype=np.float64)
+        self._edge_kinds = np.asarray(artifact.edge_kinds)
+        self._edge_passage = np.asarray(artifact.edge_passage)
+
+        self.passages = None
+        if level_passages is not None or self.base_node_count < N:
+            self._attach_passages(level_passages)
+        self._sig_memo = {}
+
+    # ------------------------------------------------------------------ setup
+
+    def _build_endpoint_density(self, hitzone):
+        """Cumulative obstacle-percentage scores of the sample cells."""
+        art = self.artifact
+        cfg = self.cfg
+        count = len(self.sample_cells)
+        self.density_cumulative = []
+        self.density_total = 0.0
+        if not count or cfg["endpoint_obstacle_window_px"] <= 0:
+            self.density_cumulative = [0.0] * count
+            return
+        W, H = self.width, self.height
+        ch, cw = (int(v) for v in art.coarse_shape)
+        scale = int(art.coarse_scale)
+        ox, oy = (int(v) for v in art.coarse_origin)
+        hh, hw = self.hitzone_shape
+        xs0 = ox + np.arange(cw, dtype=np.int64) * scale
+        ys0 = oy + np.arange(ch, dtype=np.int64) * scale
+        xs1 = np.minimum(W, xs0 + scale)
+        ys1 = np.minimum(H, ys0 + scale)
+        hx = np.floor((xs0 + (xs1 - xs0) / 2) / self.hitzone_scale).astype(np.int64)
+        hy = np.floor((ys0 + (ys1 - ys0) / 2) / self.hitzone_scale).astype(np.int64)
+        valid = ((hy >= 0) & (hy < hh))[:, None] & ((hx >= 0) & (hx < hw))[None, :]
+        mapped_cell = np.zeros((ch, cw), dtype=bool)
+        mapped_cell[valid] = hitzone[
+            np.clip(hy, 0, max(0, hh - 1))[:, None].repeat(cw, 1)[valid],
+            np.clip(hx, 0, max(0, hw - 1))[None, :].repeat(ch, 0)[valid]]
+
+        black_px = np.zeros((ch * scale, cw * scale), dtype=np.uint8)
+        y_end, x_end = min(H, oy + ch * scale), min(W, ox + cw * scale)
+        if y_end > oy and x_end > ox:
+            black_px[:y_end - oy, :x_end - ox] = self.mask[oy:y_end, ox:x_end] == IMPASSABLE
+        black = black_px.reshape(ch, scale, cw, scale).sum(axis=(1, 3), dtype=np.int64)
+        black = np.where(mapped_cell, black, 0)
+        mapped = np.where(mapped_cell, (ys1 - ys0)[:, None] * (xs1 - xs0)[None, :], 0)
+        black_integral = np.zeros((ch + 1, cw + 1), dtype=np.int64)
+        mapped_integral = np.zeros((ch + 1, cw + 1), dtype=np.int64)
+        black_integral[1:, 1:] = black.cumsum(axis=1).cumsum(axis=0)
+        mapped_integral[1:, 1:] = mapped.cumsum(axis=1).cumsum(axis=0)
+
+        half = max(1, math.ceil(cfg["endpoint_obstacle_window_px"] / (2 * scale)))
+        cells = np.asarray(self.sample_cells, dtype=np.int64)
+        cx, cy = cells % cw, cells // cw
+        x0, x1 = np.maximum(0, cx - half), np.minimum(cw, cx + half + 1)
+        y0, y1 = np.maximum(0, cy - half), np.minimum(ch, cy + half + 1)
+
+        def window(integral):
+            return (integral[y1, x1] - integral[y0, x1]
+                    - integral[y1, x0] + integral[y0, x0])
+
+        black_count = window(black_integral)
+        mapped_count = window(mapped_integral)
+        score = np.zeros(count, dtype=np.float64)
+        has_map = mapped_count > 0
+        score[has_map] = black_count[has_map] / mapped_count[has_map]
+        cumulative = np.cumsum(score)
+        self.density_cumulative = cumulative.tolist()
+        self.density_total = float(cumulative[-1])
+
+    def _attach_passages(self, level_passages):
+        """Index the artifact's passage ordinals (``attachSerializedPassages``)."""
+        art = self.artifact
+        if level_passages is None:
+            raise ValueError("artifact contains passage nodes; pass its level_passages")
+        revision = passage_revision(level_passages, self.width, self.height)
+        if revision != art.passage_revision:
+            raise ValueError(
+                f"passage document revision {revision} != artifact {art.passage_revision}")
+        _, passages = _normalize_passages_for_build(level_passages, self.width, self.height)
+        if len(passages) != int(art.passage_count):
+            raise ValueError(
+                f"passage document has {len(passages)} passages but artifact "
+                f"serialized {int(art.passage_count)}")
+        ordinal_ids = sorted(str(p["id"]) for p in passages)
+        node_to_ordinal = [-1] * self.node_count
+        for ordinal in range(int(art.passage_count)):
+            for node in art.passage_node_range(ordinal):
+                node_to_ordinal[node] = ordinal
+        # Every passage raster has interior (PASSAGE_FAST_VALUE) cells, the
+        # cheapest surface the JS heuristic scans the passage grids for.
+        min_cost = self.min_cost_per_px
+        if passages:
+            min_cost = min(min_cost, 255 - PASSAGE_FAST_VALUE)
+        self.passages = {
+            "ordinal_ids": ordinal_ids,
+            "width_by_id": {str(p["id"]): float(p["width"]) for p in passages},
+            "node_to_ordinal": node_to_ordinal,
+            "min_cost_per_px": min_cost,
+        }
+
+    # --------------------------------------------------------- pixel helpers
+
+    def _region_allowed(self, x, y):
+        hx = math.floor(x / self.hitzone_scale)
+        hy = math.floor(y / self.hitzone_scale)
+        hh, hw = self.hitzone_shape
+        return 0 <= hx < hw and 0 <= hy < hh and self._hitzone[hy * hw + hx] != 0
+
+    def line_cost(self, x0, y0, x1, y1):
+        """JS ``lineCost`` with the region gate: cost, or ``None`` if blocked."""
+        dx, dy = x1 - x0, y1 - y0
+        steps = int(max(abs(dx), abs(dy)))
+        if steps == 0:
+            return 0
+        seg = _js_hypot(dx, dy) / steps
+        sx, sy = dx / steps, dy / steps
+        W, pixels = self.width, self._pixels
+        cost = 0.0
+        for k in range(1, steps + 1):
+            xi = _js_round(x0 + sx * k)
+            yi = _js_round(y0 + sy * k)
+            if not self._region_allowed(xi, yi):
+                return None
+            val = pixels[yi * W + xi]
+            if val == IMPASSABLE:
+                return None
+            cost += seg * (255 - val)
+        return cost
+
+    def _astar_subgrid_cost(self, sub_x0, sub_y0, sub_w, sub_h, sx, sy, gx, gy,
+                            max_expansions=SNAP_MAX_EXPANSIONS, deadline=None):
+        """Cost of JS ``astarSubgrid(..., wantPath=false)``, or ``None``."""
+        lsx, lsy, lgx, lgy = sx - sub_x0, sy - sub_y0, gx - sub_x0, gy - sub_y0
+        if (lsx < 0 or lsy < 0 or lgx < 0 or lgy < 0
+                or lsx >= sub_w or lsy >= sub_h or lgx >= sub_w or lgy >= sub_h):
+            return None
+        W, pixels, allowed = self.width, self._pixels, self._region_allowed
+        if (pixels[sy * W + sx] == IMPASSABLE or pixels[gy * W + gx] == IMPASSABLE
+                or not allowed(sx, sy) or not allowed(gx, gy)):
+            return None
+        n = sub_w * sub_h
+        g = array("f", [math.inf]) * n
+        closed = bytearray(n)
+        start = lsy * sub_w + lsx
+        goal = lgy * sub_w + lgx
+        g[start] = 0.0
+        heap = _MinHeap()
+        heap.push(_js_hypot(lgx - lsx, lgy - lsy), start)
+        expansions = 0
+        offsets = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+        sqrt2 = math.sqrt(2)
+        while len(heap):
+            cur = heap.pop()
+            if closed[cur]:
+                continue
+            closed[cur] = 1
+            if cur == goal:
+                return g[cur]
+            expansions += 1
+            if expansions > max_expansions:
+                return None
+            if deadline is not None and (expansions & 1023) == 0 and _now_ms() > deadline:
+                return None
+            cx = cur % sub_w
+            cy = (cur - cx) // sub_w
+            gc = g[cur]
+            for dx, dy in offsets:
+                nx, ny = cx + dx, cy + dy
+                if nx < 0 or ny < 0 or nx >= sub_w or ny >= sub_h:
+                    continue
+                ni = ny * sub_w + nx
+                if closed[ni]:
+                    continue
+                val = pixels[(sub_y0 + ny) * W + sub_x0 + nx]
+                if val == IMPASSABLE or not allowed(sub_x0 + nx, sub_y0 + ny):
+                    continue
+                tentative = gc + (sqrt2 if dx and dy else 1) * (255 - val)
+                if tentative < g[ni]:
+                    g[ni] = tentative
+                    heap.push(tentative + _js_hypot(lgx - nx, lgy - ny), ni)
+        return None
+
+    # --------------------------------------------------------- pair sampling
+
+    def _pixel_in_cell(self, ci, rng):
+        art = self.artifact
+        cw = int(art.coarse_shape[1])
+        scale = int(art.coarse_scale)
+        W, H, pixels = self.width, self.height, self._pixels
+        terrain_min = self.cfg["terrain_min_value"]
+        cx = ci % cw
+        cy = (ci - cx) // cw
+        x0 = int(art.coarse_origin[0]) + cx * scale
+        y0 = int(art.coarse_origin[1]) + cy * scale
+        for _ in range(6):
+            px = min(W - 1, x0 + int(rng() * scale))
+            py = min(H - 1, y0 + int(rng() * scale))
+            if pixels[py * W + px] >= terrain_min:
+                return (px, py)
+        for dy in range(scale):
+            for dx in range(scale):
+                px, py = x0 + dx, y0 + dy
+                if px < W and py < H and pixels[py * W + px] >= terrain_min:
+                    return (px, py)
+        return None
+
+    def _sample_endpoint_cell(self, rng):
+        cells = self.sample_cells
+        total = self.density_total
+        if not total > 0 or rng() < self.cfg["endpoint_uniform_mix"]:
+            return cells[int(rng() * len(cells))]
+        target = rng() * total
+        cumulative = self.density_cumulative
+        return cells[bisect.bisect_right(cumulative, target, 0, len(cumulative) - 1)]
+
+    def crosses_obstacle(self, a, b, min_run_px):
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        steps = int(max(abs(dx), abs(dy)))
+        if steps == 0:
+            return False
+        sx, sy = dx / steps, dy / steps
+        W, pixels = self.width, self._pixels
+        run = max_run = 0
+        for k in range(1, steps + 1):
+            xi = _js_round(a[0] + sx * k)
+            yi = _js_round(a[1] + sy * k)
+            if pixels[yi * W + xi] == IMPASSABLE:
+                run += 1
+                max_run = max(max_run, run)
+            else:
+                run = 0
+        return max_run >= min_run_px
+
+    def sample_pair(self, rng):
+        """``(start, goal, dist)`` or ``{"reason": ...}`` on a prefilter reject."""
+        cfg = self.cfg
+        if len(self.sample_cells) < 2:
+            return {"reason": "empty"}
+        start = self._pixel_in_cell(self._sample_endpoint_cell(rng), rng)
+        if start is None:
+            return {"reason": "empty"}
+        goal, dist = None, 0.0
+        for _ in range(cfg["goal_sample_tries"]):
+            candidate = self._pixel_in_cell(self._sample_endpoint_cell(rng), rng)
+            if candidate is None:
+                continue
+            d = _js_hypot(candidate[0] - start[0], candidate[1] - start[1])
+            if cfg["dist_min_px"] <= d <= cfg["dist_max_px"]:
+                goal, dist = candidate, d
+                break
+        if goal is None:
+            return {"reason": "distance"}
+        if not self.crosses_obstacle(start, goal, cfg["obstacle_min_run_px"]):
+            return {"reason": "obstacle"}
+        return {"start": start, "goal": goal, "dist": dist}
+
+    # -------------------------------------------------------------- snapping
+
+    def snap_endpoint(self, pt, deadline=None):
+        """Up to ``snap_max_targets`` ``(node, cost)`` stubs from ``pt``."""
+        cfg = self.cfg
+        x, y = pt
+        cell = self.bucket_cell
+        bx, by = math.floor(x / cell), math.floor(y / cell)
+        candidates = []
+        for gx in range(bx - 1, bx + 2):
+            for gy in range(by - 1, by + 2):
+                for ni in self.buckets.get(gx * _BUCKET_KEY_STRIDE + gy, ()):
+                    if ni >= self.base_node_count or not self.node_in_region[ni]:
+                        continue
+                    nx, ny = self.nodes[ni]
+                    d = _js_hypot(nx - x, ny - y)
+                    if d <= cfg["snap_max_dist_px"]:
+                        candidates.append((ni, d))
+        candidates.sort(key=lambda item: item[1])
+        out = []
+        margin = cfg["snap_astar_margin"]
+        for ni, _ in candidates:
+            if len(out) >= cfg["snap_max_targets"]:
+                break
+            nx, ny = self.nodes[ni]
+            cost = self.line_cost(x, y, nx, ny)
+            if cost is None:
+                x0 = max(0, min(x, nx) - margin)
+                y0 = max(0, min(y, ny) - margin)
+                x1 = min(self.width, max(x, nx) + margin + 1)
+                y1 = min(self.height, max(y, ny) + margin + 1)
+                cost = self._astar_subgrid_cost(
+                    x0, y0, x1 - x0, y1 - y0, x, y, nx, ny, deadline=deadline)
+                if cost is None:
+                    continue
+            out.append((ni, cost))
+        return out
+
+    # -------------------------------------------------------------- graph A*
+
+    def graph_astar(self, goal_pt, start_snap, goal_snap, blocked_edges=None,
+                    deadline=None):
+        """``(node_path, cost)`` with virtual START=N / GOAL=N+1, or ``None``."""
+        N = self.node_count
+        START, GOAL = N, N + 1
+        g = array("f", [math.inf]) * (N + 2)
+        parent = [-1] * (N + 2)
+        closed = bytearray(N + 2)
+        goal_from = {}
+        for node, w in goal_snap:
+            goal_from[node] = w
+        gx, gy = goal_pt
+        h_cost = (self.passages["min_cost_per_px"] if self.passages
+                  else self.min_cost_per_px)
+        nodes, in_region, adjacency = self.nodes, self.node_in_region, self.adjacency
+        heap = _MinHeap()
+        g[START] = 0.0
+        heap.push(0, START)
+
+        def relax(to, tentative, source):
+            if to < N and not in_region[to]:
+                return
+            if closed[to] or tentative >= g[to]:
+                return
+            g[to] = tentative
+            parent[to] = source
+            if to == GOAL:
+                h = 0
+            else:
+                nx, ny = nodes[to]
+                h = _js_hypot(gx - nx, gy - ny) * h_cost
+            heap.push(tentative + h, to)
+
+        pops = 0
+        while len(heap):
+            if deadline is not None and (pops & 511) == 0 and _now_ms() > deadline:
+                return None
+            pops += 1
+            cur = heap.pop()
+            if closed[cur]:
+                continue
+            closed[cur] = 1
+            if cur == GOAL:
+                path = []
+                p = cur
+                while p != -1:
+                    path.append(p)
+                    p = parent[p]
+                path.reverse()
+                return path, g[GOAL]
+            gc = g[cur]
+            if cur == START:
+                for node, w in start_snap:
+                    relax(node, gc + w, cur)
+            else:
+                for to, w, e in adjacency[cur]:
+                    if blocked_edges and e in blocked_edges:
+                        continue
+                    relax(to, gc + w, cur)
+                if cur in goal_from:
+                    relax(GOAL, gc + goal_from[cur], cur)
+        return None
+
+    def _coord(self, node, start, goal):
+        if node == self.node_count:
+            return start
+        if node == self.node_count + 1:
+            return goal
+        return tuple(self.nodes[node])
+
+    def typed_route(self, node_path, start, goal):
+        """``(path, legs)``; legs are ``None`` without serialized passages."""
+        if not (self.passages and self.passages["ordinal_ids"]):
+            return [self._coord(n, start, goal) for n in node_path], None
+        N = self.node_count
+        node_to_ordinal = self.passages["node_to_ordinal"]
+        ordinal_ids = self.passages["ordinal_ids"]
+        legs = []
+        for source, target in zip(node_path, node_path[1:]):
+            surface, passage_id, direction = "base", None, None
+            if source < N and target < N:
+                of, ot = node_to_ordinal[source], node_to_ordinal[target]
+                if of >= 0 and of == ot:
+                    passage_id = ordinal_ids[of]
+                    surface = f"passage:{passage_id}"
+                    direction = "from-start" if source < target else "from-end"
+            leg = legs[-1] if legs else None
+            if (leg is None or leg["surface"] != surface
+                    or (surface != "base" and leg["direction"] != direction)):
+                leg = {"surface": surface, "passage_id": passage_id,
+                       "direction": direction, "points": []}
+                legs.append(leg)
+            for point in (self._coord(source, start, goal), self._coord(target, start, goal)):
+                if not leg["points"] or leg["points"][-1] != point:
+                    leg["points"].append(point)
+        path = []
+        for leg in legs:
+            for point in leg["points"]:
+                if not path or path[-1] != point:
+                    path.append(point)
+        return path, legs
+
+    # -------------------------------------------------------------- barriers
+
+    def in_significant_obstacle(self, x, y):
+        """JS ``inSignificantObstacle``: anchorable impassable component?"""
+        W, H, pixels = self.width, self.height, self._pixels
+        xi, yi = _js_round(x), _js_round(y)
+        if xi < 0 or yi < 0 or xi >= W or yi >= H:
+            return True
+        idx = yi * W + xi
+        if pixels[idx] != IMPASSABLE:
+            return False
+        cached = self._sig_memo.get(idx)
+        if cached is not None:
+            return cached
+        cfg = self.cfg
+        cap = cfg["barrier_flood_cap_px"] if cfg["barrier_flood_cap_px"] > 0 else 250
+        stack, visited, seen = [idx], [idx], {idx}
+        min_x = max_x = xi
+        min_y = max_y = yi
+        area = 0
+        capped = False
+        while stack:
+            p = stack.pop()
+            area += 1
+            px = p % W
+            py = (p - px) // W
+            min_x, max_x = min(min_x, px), max(max_x, px)
+            min_y, max_y = min(min_y, py), max(max_y, py)
+            if area >= cap:
+                capped = True
+                break
+            for dy in (-1, 0, 1):
+                ny = py + dy
+                if ny < 0 or ny >= H:
+                    continue
+                for dx in (-1, 0, 1):
+                    if dx == 0 and dy == 0:
+                        continue
+                    nx = px + dx
+                    if nx < 0 or nx >= W:
+                        continue
+                    q = ny * W + nx
+                    if q in seen or pixels[q] != IMPASSABLE:
+                        continue
+                    seen.add(q)
+                    visited.append(q)
+                    stack.append(q)
+        if capped:
+            significant = True
+        else:
+            max_dim = max(max_x - min_x + 1, max_y - min_y + 1)
+            significant = (area >= cfg["barrier_anchor_min_area_px"]
+                           or (max_dim * max_dim) / area >= cfg["barrier_elongation_ratio"])
+        for q in visited:
+            self._sig_memo[q] = significant
+        return significant
+
+    def find_barrier(self, path):
+        """JS ``findBarrier``: an anchored wall crossing ``path``, or ``None``."""
+        cfg = self.cfg
+        total = route_path_length(path)
+        if total < 1e-6:
+            return None
+        max_half, step = cfg["barrier_max_half_px"], cfg["barrier_step_px"]
+        margin, extend_max = cfg["barrier_margin_px"], cfg["barrier_extend_max_half_px"]
+        center = 0.5
+        sig = self.in_significant_obstacle
+
+        def first_hit(mx, my, px, py, sign, start, stop):
+            d = start
+            while d <= stop:
+                if sig(mx + sign * px * d, my + sign * py * d):
+                    return d
+                d += step
+            return None
+
+        def probe(frac):
+            target = total * frac
+            accum = 0
+            for a, b in zip(path, path[1:]):
+                seg_len = _js_hypot(b[0] - a[0], b[1] - a[1])
+                if accum + seg_len >= target:
+                    t = (target - accum) / (seg_len or 1)
+                    mx = a[0] + (b[0] - a[0]) * t
+                    my = a[1] + (b[1] - a[1]) * t
+                    norm = seg_len or 1
+                    px = -(b[1] - a[1]) / norm
+                    py = (b[0] - a[0]) / norm
+                    left = first_hit(mx, my, px, py, 1, step, max_half)
+                    right = first_hit(mx, my, px, py, -1, step, max_half)
+                    return {
+                        "frac": frac, "mx": mx, "my": my, "px": px, "py": py,
+                        "left_dist": max_half if left is None else left,
+                        "right_dist": max_half if right is None else right,
+                        "left_hit": left is not None, "right_hit": right is not None,
+                        "dist_from_prev": target - accum,
+                        "dist_to_next": accum + seg_len - target,
+                    }
+                accum += seg_len
+            return None
+
+        def extend(p, sign, dist, hit):
+            if hit:
+                return dist, True
+            d = first_hit(p["mx"], p["my"], p["px"], p["py"], sign, dist + step, extend_max)
+            return (dist, False) if d is None else (d, True)
+
+        def anchored_end(p, sign, info):
+            dist, anchored = info
+            if not anchored:
+                return None
+            extra = margin
+            while extra >= -1e-9:
+                x = p["mx"] + sign * p["px"] * (dist + extra)
+                y = p["my"] + sign * p["py"] * (dist + extra)
+                if sig(x, y):
+                    return x, y
+                extra -= step
+            return None
+
+        def effective(p):
+            if p is None:
+                return None
+            a = anchored_end(p, 1, extend(p, 1, p["left_dist"], p["left_hit"]))
+            b = anchored_end(p, -1, extend(p, -1, p["right_dist"], p["right_hit"]))
+            if a is None or b is None:
+                return None
+            wall = {"ax": a[0], "ay": a[1], "bx": b[0], "by": b[1],
+                    "enclosed": True, "route_fraction": p["frac"]}
+            wall["route_edge_crossings"] = sum(
+                1 for u, v in zip(path, path[1:])
+                if _seg_intersect(u[0], u[1], v[0], v[1],
+                                  wall["ax"], wall["ay"], wall["bx"], wall["by"]))
+            if wall["route_edge_crossings"] < 1:
+                return None
+            return wall
+
+        best_clear = best_enclosed = None
+        best_clear_score = best_enclosed_score = math.inf
+        min_frac = max(0, center - cfg["barrier_slide_fraction"])
+        max_frac = min(1, center + cfg["barrier_slide_fraction"])
+        samples = cfg["barrier_slide_samples"]
+        for s in range(samples + 1):
+            frac = min_frac + (max_frac - min_frac) * (s / samples)
+            p = probe(frac)
+            if p is None or not p["left_hit"] or not p["right_hit"]:
+                continue
+            score = (p["left_dist"] + p["right_dist"]) + abs(frac - center) * 1e-3
+            if (min(p["dist_from_prev"], p["dist_to_next"]) >= cfg["barrier_clear_node_dist_px"]
+                    and score < best_clear_score):
+                best_clear_score, best_clear = score, p
+            if score < best_enclosed_score:
+                best_enclosed_score, best_enclosed = score, p
+        wall = effective(best_clear) or effective(best_enclosed)
+        if wall:
+            return wall
+
+        fallback = cfg["barrier_fallback_samples"]
+        broad = [p for p in (probe(0.25 + 0.5 * (s / fallback)) for s in range(fallback + 1))
+                 if p is not None]
+        enclosed = sorted((p for p in broad if p["left_hit"] and p["right_hit"]),
+                          key=lambda p: abs(p["frac"] - center))
+        for p in enclosed:
+            wall = effective(p)
+            if wall:
+                return wall
+        for p in sorted(broad, key=lambda p: p["left_dist"] + p["right_dist"]):
+            wall = effective(p)
+            if wall:
+                return wall
+        return None
+
+    def blocked_by_barriers(self, barriers):
+        """Edge indices whose segment crosses a barrier stroke on its surface."""
+        blocked = set()
+        if not barriers or not self.edge_count:
+            return blocked
+        width = self.cfg["barrier_width_px"]
+        if not (isinstance(width, (int, float)) and math.isfinite(width) and width > 0):
+            width = BARRIER_DRAW_WIDTH_MASK_PX
+        half = width / 2
+        xy = self._edge_xy
+        edge_min_x = np.minimum(xy[:, 0], xy[:, 2])
+        edge_max_x = np.maximum(xy[:, 0], xy[:, 2])
+        edge_min_y = np.minimum(xy[:, 1], xy[:, 3])
+        edge_max_y = np.maximum(xy[:, 1], xy[:, 3])
+        passage_edge = self._edge_kinds == EDGE_KIND_PASSAGE
+        ordinal_ids = self.passages["ordinal_ids"] if self.passages else None
+
+        def intersects_stroke(x0, y0, x1, y1, b):
+            dx, dy = b["bx"] - b["ax"], b["by"] - b["ay"]
+            length = _js_hypot(dx, dy)
+            if length < 1e-9:
+                return False
+            ux, uy = dx / length, dy / length
+
+            def to_local(x, y):
+                rx, ry = x - b["ax"], y - b["ay"]
+                return rx * ux + ry * uy, -rx * uy + ry * ux
+
+            ax, ay = to_local(x0, y0)
+            cx, cy = to_local(x1, y1)
+            bounds = [0.0, 1.0]
+
+            def clip(p, q):
+                if abs(p) < 1e-12:
+                    return q >= 0
+                r = q / p
+                if p < 0:
+                    if r > bounds[1]:
+                        return False
+                    if r > bounds[0]:
+                        bounds[0] = r
+                else:
+                    if r < bounds[0]:
+                        return False
+                    if r < bounds[1]:
+                        bounds[1] = r
+                return True
+
+            ex, ey = cx - ax, cy - ay
+            return (clip(-ex, ax) and clip(ex, length - ax)
+                    and clip(-ey, ay + half) and clip(ey, half - ay))
+
+        for b in barriers:
+            surface = b.get("surface") or "base"
+            near = ~((edge_max_x < min(b["ax"], b["bx"]) - half)
+                     | (edge_min_x > max(b["ax"], b["bx"]) + half)
+                     | (edge_max_y < min(b["ay"], b["by"]) - half)
+                     | (edge_min_y > max(b["ay"], b["by"]) + half))
+            # Passage edges live on their passage's surface, every other edge
+            # (base and transition) on the base terrain.
+            if surface == "base":
+                if ordinal_ids is not None:
+                    near &= ~passage_edge
+            else:
+                passage_id = surface[len("passage:"):]
+                if ordinal_ids is None or passage_id not in ordinal_ids:
+                    continue
+                near &= passage_edge & (self._edge_passage == ordinal_ids.index(passage_id))
+            for e in np.flatnonzero(near).tolist():
+                if e in blocked:
+                    continue
+                x0, y0, x1, y1 = xy[e].tolist()
+                if intersects_stroke(x0, y0, x1, y1, b):
+                    blocked.add(e)
+        return blocked
+
+    def widen_passage_barrier(self, barrier):
+        surface = barrier.get("surface") or ""
+        if not surface.startswith("passage:") or not self.passages:
+            return barrier
+        width = self.passages["width_by_id"].get(surface[len("passage:"):])
+        if not width or not width > 0:
+            return barrier
+        overhang = self.cfg["passage_barrier_overhang_px"]
+        overhang = max(0, overhang) if math.isfinite(overhang) else 2
+        required = width + 2 * overhang
+        dx, dy = barrier["bx"] - barrier["ax"], barrier["by"] - barrier["ay"]
+        length = _js_hypot(dx, dy)
+        if not length > 1e-9 or length >= required:
+            barrier["passage_width_px"] = width
+            return barrier
+        mx = (barrier["ax"] + barrier["bx"]) / 2
+        my = (barrier["ay"] + barrier["by"]) / 2
+        half = required / 2
+        ux, uy = dx / length, dy / length
+        barrier.update({
+            "ax": mx - ux * half, "ay": my - uy * half,
+            "bx": mx + ux * half, "by": my + uy * half,
+            "passage_width_px": width, "passage_barrier_overhang_px": overhang,
+        })
+        return barrier
+
+    # ------------------------------------------------------- route options
+
+    def compute_route_options(self, start, goal, start_snap, goal_snap, start_time=None):
+        """Barrier-forced alternatives (JS ``computeRouteOptions``).
+
+        Returns ``{"paths", "barriers", "reason", "timed_out"}``; each path
+        record carries ``node_path``, ``path``, ``len``, ``cost``,
+        ``route_index``, ``barrier`` and ``typed_legs``.
+        """
+        cfg = self.cfg
+        start_time = _now_ms() if start_time is None else start_time
+        barriers, paths, seen = [], [], set()
+        timed_out = False
+        for attempt in range(cfg["route_attempts"]):
+            budget = cfg["primary_budget_ms"] if attempt < 2 else cfg["extra_budget_ms"]
+            base = start_time if attempt == 0 else _now_ms()
+            deadline = base + budget if budget is not None and math.isfinite(budget) else None
+            blocked = self.blocked_by_barriers(barriers)
+            result = self.graph_astar(goal, start_snap, goal_snap, blocked, deadline)
+            if result is None:
+                if deadline is not None and _now_ms() > deadline:
+                    timed_out = True
+                break
+            node_path, cost = result
+            if len(node_path) < 2:
+                break
+            signature = tuple(node_path)
+            if signature in seen:
+                break
+            seen.add(signature)
+            coords, legs = self.typed_route(node_path, start, goal)
+            record = {
+                "path": coords, "node_path": node_path, "len": route_path_length(coords),
+                "cost": cost, "route_index": attempt + 1, "barrier": None,
+                "typed_legs": legs,
+            }
+            paths.append(record)
+            if attempt >= cfg["route_attempts"] - 1:
+                break
+            barrier = self.find_barrier(coords)
+            if barrier is None:
+                break
+            if legs:
+                barrier["surface"] = self._barrier_surface(barrier, legs)
+            self.widen_passage_barrier(barrier)
+            barrier["attempt_index"] = record["route_index"]
+            record["barrier"] = barrier
+            barriers.append(barrier)
+        reason = "ok"
+        if not paths:
+            reason = "timeout" if timed_out else "unreachable"
+        elif len(paths) == 1:
+            reason = "timeout" if timed_out else "distinct"
+        return {"paths": paths, "barriers": barriers, "reason": reason, "timed_out": timed_out}
+
+    @staticmethod
+    def _barrier_surface(wall, legs):
+        for leg in legs:
+            for a, b in zip(leg["points"], leg["points"][1:]):
+                if _seg_intersect(a[0], a[1], b[0], b[1],
+                                  wall["ax"], wall["ay"], wall["bx"], wall["by"]):
+                    return leg["surface"]
+        return "base"
+
+    def route_attempt(self, rng):
+        """One graph-stage attempt of ``generateOnePair``.
+
+        Samples a pair, snaps both endpoints and computes the route options.
+        Returns a JSON-serializable record whose ``reason`` is the prefilter,
+        snap or route reason (``"ok"`` when at least two routes were found).
+        """
+        t0 = _now_ms()
+        pair = self.sample_pair(rng)
+        record = {"reason": pair.get("reason"), "start": None, "goal": None,
+                  "start_snap": [], "goal_snap": [], "routes": [], "barriers": []}
+        if record["reason"]:
+            record["ms"] = _now_ms() - t0
+            return record
+        start, goal = pair["start"], pair["goal"]
+        t_sample = _now_ms()
+        budget = self.cfg["primary_budget_ms"]
+        snap_deadline = (t_sample + budget
+                         if budget is not None and math.isfinite(budget) else None)
+        start_snap = self.snap_endpoint(start, snap_deadline)
+        goal_snap = self.snap_endpoint(goal, snap_deadline)
+        record.update({
+            "start": list(start), "goal": list(goal),
+            "start_snap": [list(s) for s in start_snap],
+            "goal_snap": [list(s) for s in goal_snap],
+        })
+        if not start_snap or not goal_snap:
+            record["reason"] = "snap"
+        else:
+            result = self.compute_route_options(
+                start, goal, start_snap, goal_snap, start_time=t_sample)
+            record["reason"] = result["reason"]
+            record["routes"] = [
+                {"node_path": r["node_path"], "cost": r["cost"], "len": r["len"]}
+                for r in result["paths"]]
+            record["barriers"] = [
+                {key: b.get(key) for key in ("ax", "ay", "bx", "by")}
+                | {"surface": b.get("surface") or "base"}
+                for b in result["barriers"]]
+        record["ms"] = _now_ms() - t0
+        return record
+
+
+def load_router(bin_path, mask_path, config=None, level_passages=None):
+    """Router over a served ``.navgraph.bin`` and its mask PNG."""
+    return NavgraphRouter(
+        NavgraphView(bin_path), _load_mask(mask_path),
+        config=config, level_passages=level_passages)
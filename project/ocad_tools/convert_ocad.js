@@ -2,6 +2,8 @@ const fs = require("fs");
 const os = require("os");
 const path = require("path");
 const sharp = require("sharp");
+const crypto = require("crypto");
+const readline = require("readline");
 const { execFile } = require("child_process");
 const { promisify } = require("util");
 const { DOMImplementation, XMLSerializer } = require("xmldom");
@@ -912,8 +914,27 @@ async function renderVisibleSvgToPng(svg, outPath, width, height) {
   return renderSvgWithSharp(svg, outPath);
 }
 
-async function main() {
-  const args = parseArgs(process.argv);
+// Worker mode keeps the last few parsed OCAD files, keyed by content, so an
+// analyse-then-import of the same upload (two temp files) parses it once.
+const ocadCache = new Map();
+const OCAD_CACHE_FILES = Math.max(0, Number(process.env.OCAD_WORKER_CACHE_FILES ?? 2) || 0);
+
+async function readOcadCached(input, useCache) {
+  if (!useCache || !OCAD_CACHE_FILES) return readOcad(input);
+  const digest = crypto.createHash("sha256").update(fs.readFileSync(input)).digest("hex");
+  if (ocadCache.has(digest)) {
+    const cached = ocadCache.get(digest);
+    ocadCache.delete(digest);
+    ocadCache.set(digest, cached);
+    return cached;
+  }
+  const ocadFile = await readOcad(input);
+  ocadCache.set(digest, ocadFile);
+  while (ocadCache.size > OCAD_CACHE_FILES) ocadCache.delete(ocadCache.keys().next().value);
+  return ocadFile;
+}
+
+async function convert(args, { useCache = false } = {}) {
   const input = args.input;
   const pngOut = args.png;
   const geojsonOut = args.geojson;
@@ -930,7 +951,7 @@ async function main() {
     throw new Error("OCAD scale factor must be a positive number");
   }
 
-  const ocadFile = await readOcad(input);
+  const ocadFile = await readOcadCached(input, useCache);
   const mapScale = getOcadMapScale(ocadFile);
   const bounds = ocadFile.getBounds();
   const widthUnits = bounds[2] - bounds[0];
@@ -979,7 +1000,7 @@ async function main() {
   const actualRouteSegments = Array.from(routeIndex.segments.values())
     .reduce((sum, entries) => sum + entries.length, 0);
 
-  process.stdout.write(JSON.stringify({
+  return {
     status: "ok",
     width,
     height,
@@ -998,7 +1019,32 @@ async function main() {
     mask_status: maskOut && !skipMask ? "generated" : "skipped",
     renderer: renderInfo?.renderer || null,
     renderer_binary: renderInfo?.binary || null,
-  }));
+  };
+}
+
+// --worker: one JSON request per stdin line ({"id", "args"} with the CLI
+// option names as keys), answered in order by one stdout line each
+// ({"id", "ok", "result"} or {"id", "ok": false, "error"}).
+async function runWorker() {
+  const lines = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+  for await (const line of lines) {
+    if (!line.trim()) continue;
+    let id = null;
+    let reply;
+    try {
+      const request = JSON.parse(line);
+      id = request.id ?? null;
+      reply = { id, ok: true, result: await convert(request.args || {}, { useCache: true }) };
+    } catch (error) {
+      reply = { id, ok: false, error: `${error.stack || error.message || error}` };
+    }
+    process.stdout.write(`${JSON.stringify(reply)}\n`);
+  }
+}
+
+async function main() {
+  if (process.argv.includes("--worker")) return runWorker();
+  process.stdout.write(JSON.stringify(await convert(parseArgs(process.argv))));
 }
 
 main().catch((error) => {
@@ -1,6 +1,11 @@
+import atexit
+import collections
 import json
 import os
+import selectors
 import subprocess
+import threading
+import time
 
 from django.conf import settings
 
@@ -9,6 +14,197 @@ class OcadConversionError(Exception):
     pass
 
 
+OCAD_CONVERTER_TIMEOUT = 180
+
+
+class _ConverterWorker:
+    """Long-lived ``convert_ocad.js --worker`` process.
+
+    Spawned on first use and fed one line-delimited JSON request at a time,
+    so Node start-up and the ``ocad2geojson`` load are paid once; the worker
+    also keeps recently parsed OCAD files, which makes the second call of an
+    analyse-then-import flow skip parsing. It is restarted after a crash,
+    a timeout or ``max_jobs`` requests, and stopped ``idle_seconds`` after
+    its last request so an idle web process does not keep the parsed files.
+    ``request`` returns ``None`` while another thread is using the worker so
+    the caller can run the converter one-shot instead of queueing behind it.
+    """
+
+    def __init__(self, command, cwd, max_jobs=50, idle_seconds=120):
+        self.command = list(command)
+        self.cwd = cwd
+        self.max_jobs = max(1, int(max_jobs))
+        self.idle_seconds = float(idle_seconds)
+        self._lock = threading.Lock()
+        self._timer = None
+        self._generation = 0
+        self._process = None
+        self._buffer = b""
+        self._stderr = collections.deque(maxlen=50)
+        self._jobs = 0
+        self._next_id = 0
+
+    def request(self, args, timeout=OCAD_CONVERTER_TIMEOUT):
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return self._request(args, timeout)
+        finally:
+            self._schedule_idle_stop()
+            self._lock.release()
+
+    def _schedule_idle_stop(self):
+        self._generation += 1
+        if self._process is None:
+            return
+        if self.idle_seconds <= 0:
+            self.stop()
+            return
+        self._timer = threading.Timer(
+            self.idle_seconds, self._stop_idle, args=(self._generation,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _stop_idle(self, generation):
+        # A busy worker re-arms the timer when its request finishes.
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if generation == self._generation:
+                self._timer = None
+                self.stop()
+        finally:
+            self._lock.release()
+
+    def _request(self, args, timeout):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        self._next_id += 1
+        line = json.dumps({"id": self._next_id, "args": args}) + "\n"
+        try:
+            try:
+                self._process.stdin.write(line.encode("utf-8"))
+                self._process.stdin.flush()
+            except OSError as exc:
+                raise OcadConversionError(
+                    "\n".join(self._stderr).strip() or f"OCAD converter worker exited: {exc}") from exc
+            reply = self._read_reply(time.monotonic() + timeout)
+        except BaseException:
+            self.stop()
+            raise
+        self._jobs += 1
+        if self._jobs >= self.max_jobs:
+            self.stop()
+        if reply.get("id") != self._next_id:
+            self.stop()
+            raise OcadConversionError("OCAD converter worker answered out of order")
+        if not reply.get("ok"):
+            raise OcadConversionError(reply.get("error") or "OCAD conversion failed")
+        return reply.get("result") or {}
+
+    def _start(self):
+        self.stop()
+        try:
+            process = subprocess.Popen(
+                self.command,
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as exc:
+            raise OcadConversionError(str(exc)) from exc
+        self._stderr.clear()
+        threading.Thread(
+            target=self._drain_stderr, args=(process.stderr,),
+            name="ocad-worker-stderr", daemon=True,
+        ).start()
+        self._process = process
+        self._buffer = b""
+        self._jobs = 0
+
+    def _drain_stderr(self, stream):
+        for raw in iter(stream.readline, b""):
+            self._stderr.append(raw.decode("utf-8", "replace").rstrip())
+
+    def _read_reply(self, deadline):
+        stdout = self._process.stdout
+        with selectors.DefaultSelector() as selector:
+            selector.register(stdout, selectors.EVENT_READ)
+            while b"\n" not in self._buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    raise OcadConversionError(
+                        f"OCAD conversion timed out after {OCAD_CONVERTER_TIMEOUT} seconds")
+                chunk = os.read(stdout.fileno(), 1 << 16)
+                if not chunk:
+                    self._process.wait(timeout=5)
+                    detail = "\n".join(self._stderr).strip()
+                    raise OcadConversionError(detail or "OCAD converter worker exited")
+                self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise OcadConversionError("OCAD converter returned invalid JSON") from exc
+
+    def stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for stream in (process.stdout, process.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+_converter_worker = None
+_converter_worker_lock = threading.Lock()
+
+
+def _converter_worker_for(command):
+    """The shared worker for ``command`` (replaced if the command changed)."""
+    global _converter_worker
+    with _converter_worker_lock:
+        worker = _converter_worker
+        if worker is None or worker.command != command:
+            if worker is not None:
+                worker.stop()
+            max_jobs = getattr(settings, "OCAD_WORKER_MAX_JOBS",
+                               os.environ.get("OCAD_WORKER_MAX_JOBS", "50"))
+            idle_seconds = getattr(settings, "OCAD_WORKER_IDLE_SECONDS",
+                                   os.environ.get("OCAD_WORKER_IDLE_SECONDS", "120"))
+            worker = _converter_worker = _ConverterWorker(
+                command, settings.BASE_DIR, max_jobs=int(max_jobs),
+                idle_seconds=float(idle_seconds))
+        return worker
+
+
+@atexit.register
+def _stop_converter_worker():
+    if _converter_worker is not None:
+        _converter_worker.stop()
+
+
+def _ocad_worker_enabled():
+    raw = getattr(settings, "OCAD_CONVERTER_WORKER", os.environ.get("OCAD_CONVERTER_WORKER", "1"))
+    return str(raw).strip().lower() not in ("0", "false", "no", "off", "")
+
+
 def _ocad_editor_scale_factor():
     raw = getattr(settings, "OCAD_EDITOR_SCALE_FACTOR", os.environ.get("OCAD_EDITOR_SCALE_FACTOR", "1"))
     try:
@@ -63,24 +259,26 @@ def _run_ocad_converter(
         if output_path:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    cmd = [
-        node_binary,
-        script_path,
-        "--input",
-        source_path,
-        "--scale-factor",
-        str(scale_factor),
-    ]
+    args = {"input": source_path, "scale-factor": str(scale_factor)}
     if png_path:
-        cmd.extend(["--png", png_path])
+        args["png"] = png_path
     if mask_path:
-        cmd.extend(["--mask", mask_path])
+        args["mask"] = mask_path
     if skip_mask:
-        cmd.extend(["--skip-mask", "true"])
+        args["skip-mask"] = "true"
     if mask_only:
-        cmd.extend(["--mask-only", "true"])
+        args["mask-only"] = "true"
     if course_only:
-        cmd.extend(["--course-only", "true"])
+        args["course-only"] = "true"
+
+    if _ocad_worker_enabled():
+        result = _converter_worker_for([node_binary, script_path, "--worker"]).request(args)
+        if result is not None:
+            return result
+
+    cmd = [node_binary, script_path]
+    for key, value in args.items():
+        cmd.extend([f"--{key}", value])
 
     try:
         completed = subprocess.run(
@@ -88,7 +286,7 @@ def _run_ocad_converter(
             cwd=settings.BASE_DIR,
             capture_output=True,
             text=True,
-            timeout=180,
+            timeout=OCAD_CONVERTER_TIMEOUT,
             check=False,
         )
     except (OSError, subprocess.TimeoutExpired) as exc:
@@ -1,28 +1,44 @@
-"""Concurrency gate for heavy background jobs (MEM-1).
+"""Memory-budget admission for heavy background jobs (MEM-1).
 
 Navgraph rebuilds (full-res mask + numpy/scipy/skimage arrays) and UNet mask
 generation (ONNX inference on images up to 16000x16000) are the two dominant
 memory consumers in the process. Railway bills per GB-minute and each container
-preloads two uvicorn workers, so letting several of these run concurrently
-multiplies peak RSS. This semaphore is created before Gunicorn forks its
-preloaded workers, so it lets at most one such job hold large arrays at a time
-*per container*; further jobs simply block in their (cheap) worker threads and
-start when the slot frees — nothing is rejected.
-
-A semaphore acquired inside the worker functions is used instead of a shared
-``ThreadPoolExecutor`` so each job keeps its existing thread daemon semantics:
-
-* navgraph builds stay ``daemon=True`` — safe to kill at interpreter exit,
-  because the build token plus the atomic publish step make an aborted build
-  invisible;
-* mask generation stays ``daemon=False`` — it must survive shutdown long
-  enough to finish writing the mask file, exactly as before.
-
-Executor threads are always non-daemon and joined at interpreter exit, which
-would additionally force shutdown to wait for *queued* navgraph builds; the
-semaphore avoids that. The production start command uses ``--preload`` so the
-semaphore is inherited by both web workers. A separate container/replica has
-its own gate, as expected for an in-process worker design.
+preloads two uvicorn workers, so letting several of these run at once without
+bound multiplies peak RSS.
+
+``HEAVY_JOBS`` admits jobs against a per-container memory budget
+(``HEAVY_JOB_MEMORY_BUDGET_MB``) instead of one global slot, so a 1 Mpx
+rebuild no longer waits behind a 16000x16000 inference when there is headroom:
+
+* every job declares its kind and size (megapixels); its peak footprint and
+  duration are estimated from per-kind coefficients, refined in-process by the
+  RSS and wall time measured on earlier jobs of that kind;
+* a job is admitted while the footprints of the running jobs plus its own stay
+  under the budget — or when nothing runs, so an oversized job still runs
+  alone. Small jobs may pass a large waiting one, but not once it has waited
+  ``HEAVY_JOB_STARVATION_SECONDS``; then nothing overtakes it until it starts;
+* a waiting job gets its queue position and an ETA (a replay of the queue
+  using the estimated durations) through ``on_wait``. Navgraph builds write
+  them to ``File.batch_progress``, mask generation publishes them on its SSE
+  stream.
+
+A budget of 0 keeps the old behaviour: one heavy job at a time.
+
+The queue lives in shared memory created before Gunicorn forks its preloaded
+workers, so the budget is enforced *per container* across both web workers,
+exactly as the former semaphore was. Entries of a process that died while
+queued or running are reaped on the next admission check. A separate
+container/replica has its own budget, as expected for an in-process worker
+design.
+
+Waiting happens inside the jobs' own threads, so each keeps its existing
+daemon semantics: navgraph builds stay ``daemon=True`` (the build token plus
+the atomic publish step make an aborted build invisible), mask generation
+stays ``daemon=False`` (it must finish writing the mask file).
+
+With ``NAVGRAPH_BUILD_MODE=queue`` navgraph builds leave the web process
+entirely (``services.navgraph_jobs`` / ``manage.py navgraph_worker``); the
+budget then only gates mask generation and the in-process fallback.
 
 ``_OCAD_CONVERSION_EXECUTOR`` (project/views.py) stays separate on purpose:
 OCAD conversions are comparatively light and must not queue behind a
@@ -30,7 +46,330 @@ long-running navgraph build.
 """
 
 import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+
+
+class HeavyJobCancelled(Exception):
+    """Raised by ``admit``/``acquire`` when ``on_wait`` gives up on a queued job."""
+
+
+@dataclass(frozen=True)
+class HeavyJobKind:
+    """Static footprint/duration model of one job kind (before any history)."""
+
+    base_mb: float
+    mb_per_mpx: float
+    seconds_per_mpx: float
+    base_seconds: float = 5.0
+
+
+JOB_KINDS = {
+    # Label/EDT/skeleton rasters plus graph arrays; tiled builds cap the
+    # raster part at NAVGRAPH_BUILD_JOB_MEMORY_MB (see navgraph_footprint_cap).
+    "navgraph": HeavyJobKind(base_mb=96, mb_per_mpx=40, seconds_per_mpx=6),
+    # Pillow's one-off decode of the source map (tile rows, class ids and the
+    # PNG are streamed through scratch files), plus a fixed ONNX
+    # session/activation footprint for the 2048 px tiles.
+    "mask": HeavyJobKind(base_mb=1024, mb_per_mpx=6, seconds_per_mpx=4),
+}
+
+# Weight of the newest measurement in the per-kind running averages.
+HISTORY_WEIGHT = 0.3
+# RSS growth under-reads when a job reuses memory freed by earlier ones, so
+# measured footprints may lower a kind's coefficient at most to this fraction.
+HISTORY_MB_FLOOR = 0.5
+RSS_SAMPLE_SECONDS = 0.25
+# A waiting job's on_wait also runs this often when nothing changed, so its
+# caller can notice it was superseded and withdraw it.
+WAIT_RECHECK_SECONDS = 30.0
+MAX_HEAVY_JOBS = 64
+
+_FREE, _WAITING, _RUNNING = 0, 1, 2
+# Per-entry fields of the shared queue table.
+_STATE, _TICKET, _PID, _MB, _SECONDS, _SINCE = range(6)
+_FIELDS = 6
+
+
+def _current_rss_mb():
+    """Current resident set size in MB, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "rb") as handle:
+            pages = int(handle.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class HeavyJobScheduler:
+    """Cross-process memory-budget admission (see the module docstring)."""
+
+    def __init__(self, budget_mb, *, starvation_seconds=300.0, kinds=None,
+                 max_jobs=MAX_HEAVY_JOBS, context=None):
+        ctx = context or multiprocessing.get_context()
+        self.budget_mb = max(0.0, float(budget_mb or 0))
+        self.starvation_seconds = float(starvation_seconds)
+        self.kinds = dict(JOB_KINDS if kinds is None else kinds)
+        self._max_jobs = max_jobs
+        self._cond = ctx.Condition(ctx.Lock())
+        self._table = ctx.RawArray("d", max_jobs * _FIELDS)
+        self._next_ticket = ctx.RawValue("d", 1.0)
+        # Measured history is per process: it only refines estimates.
+        self._history = {}
+        self._history_lock = threading.Lock()
+        self._local_running = 0
+        self._local_starts = 0
+
+    # ------------------------------------------------------------ estimates
+
+    def estimate(self, kind, mpx):
+        """``(footprint_mb, seconds)`` for a job of ``kind`` over ``mpx`` Mpx."""
+        model = self.kinds[kind]
+        with self._history_lock:
+            history = self._history.get(kind, {})
+        mb_per_mpx = max(history.get("mb_per_mpx", model.mb_per_mpx),
+                         model.mb_per_mpx * HISTORY_MB_FLOOR)
+        seconds_per_mpx = history.get("seconds_per_mpx", model.seconds_per_mpx)
+        mb = model.base_mb + mb_per_mpx * max(0.0, mpx)
+        if kind == "navgraph":
+            cap = navgraph_footprint_cap()
+            if cap:
+                mb = min(mb, cap)
+        return mb, model.base_seconds + seconds_per_mpx * max(0.0, mpx)
+
+    def record(self, kind, mpx, seconds, peak_mb=None):
+        """Fold a finished job's wall time (and exclusive RSS growth) into history."""
+        if mpx <= 0:
+            return
+        model = self.kinds[kind]
+        observed = {"seconds_per_mpx": max(0.0, seconds - model.base_seconds) / mpx}
+        if peak_mb is not None:
+            observed["mb_per_mpx"] = max(0.0, peak_mb - model.base_mb) / mpx
+        with self._history_lock:
+            history = self._history.setdefault(kind, {})
+            for key, value in observed.items():
+                old = history.get(key)
+                history[key] = value if old is None else (
+                    (1 - HISTORY_WEIGHT) * old + HISTORY_WEIGHT * value)
+
+    # ----------------------------------------------------- shared queue table
+
+    def _get(self, index, field):
+        return self._table[index * _FIELDS + field]
+
+    def _set(self, index, **fields):
+        offsets = {"state": _STATE, "ticket": _TICKET, "pid": _PID,
+                   "mb": _MB, "seconds": _SECONDS, "since": _SINCE}
+        for name, value in fields.items():
+            self._table[index * _FIELDS + offsets[name]] = value
+
+    def _entries(self, state):
+        return [i for i in range(self._max_jobs) if self._get(i, _STATE) == state]
+
+    def _reap_locked(self):
+        for index in range(self._max_jobs):
+            if self._get(index, _STATE) != _FREE and not _pid_alive(int(self._get(index, _PID))):
+                self._set(index, state=_FREE)
+
+    def _register_locked(self, mb, seconds):
+        for index in range(self._max_jobs):
+            if self._get(index, _STATE) == _FREE:
+                ticket = self._next_ticket.value
+                self._next_ticket.value = ticket + 1
+                self._set(index, state=_WAITING, ticket=ticket, pid=os.getpid(),
+                          mb=mb, seconds=seconds, since=time.time())
+                return index
+        return None
+
+    def _admissible_locked(self, index, now):
+        running = self._entries(_RUNNING)
+        if not running:
+            fits = True
+        elif self.budget_mb <= 0:
+            fits = False
+        else:
+            used = sum(self._get(i, _MB) for i in running)
+            fits = used + self._get(index, _MB) <= self.budget_mb
+        if not fits:
+            return False
+        ticket = self._get(index, _TICKET)
+        for other in self._entries(_WAITING):
+            if self._get(other, _TICKET) >= ticket:
+                continue
+            if self.budget_mb <= 0:
+                return False  # one at a time: strict arrival order
+            if now - self._get(other, _SINCE) >= self.starvation_seconds:
+                return False  # a starving job goes next
+        return True
+
+    def _queue_status_locked(self, index, now):
+        """``(position, eta_seconds)`` of a waiting entry: replay the queue."""
+        ticket = self._get(index, _TICKET)
+        ahead = sorted(
+            (self._get(i, _TICKET), i) for i in self._entries(_WAITING)
+            if self._get(i, _TICKET) <= ticket)
+        budget = self.budget_mb
+        ends = sorted(
+            (max(now, self._get(i, _SINCE) + self._get(i, _SECONDS)), self._get(i, _MB))
+            for i in self._entries(_RUNNING))
+        used = sum(mb for _, mb in ends)
+        t = now
+        start = now
+        for _, entry in ahead:
+            mb, seconds = self._get(entry, _MB), self._get(entry, _SECONDS)
+            while ends and (budget <= 0 or used + mb > budget):
+                end, freed = ends.pop(0)
+                t = max(t, end)
+                used -= freed
+            start = t
+            ends.append((t + seconds, mb))
+            ends.sort()
+            used += mb
+        return len(ahead), max(0, int(round(start - now)))
+
+    # --------------------------------------------------------------- public
+
+    def acquire(self, kind, mpx, *, on_wait=None, poll_seconds=2.0):
+        """Block until the job may start; returns an ``Admission`` to release.
+
+        ``on_wait(position, eta_seconds)`` is called outside the queue lock
+        whenever the position or (5 s-rounded) ETA changes, and at least every
+        ``WAIT_RECHECK_SECONDS``; returning ``False`` withdraws the job and
+        raises ``HeavyJobCancelled``.
+        """
+        mb, seconds = self.estimate(kind, mpx)
+        index = None
+        reported = None
+        reported_at = 0.0
+        try:
+            while True:
+                with self._cond:
+                    while True:
+                        self._reap_locked()
+                        now = time.time()
+                        if index is None:
+                            index = self._register_locked(mb, seconds)
+                        if index is not None and self._admissible_locked(index, now):
+                            self._set(index, state=_RUNNING, since=now)
+                            self._cond.notify_all()
+                            return Admission(self, index, kind, mpx)
+                        status = None
+                        if index is not None:
+                            position, eta = self._queue_status_locked(index, now)
+                            status = (position, 5 * round(eta / 5))
+                        if on_wait is not None and status is not None and (
+                                status != reported
+                                or time.monotonic() - reported_at >= WAIT_RECHECK_SECONDS):
+                            break
+                        self._cond.wait(poll_seconds)
+                reported, reported_at = status, time.monotonic()
+                if on_wait(*status) is False:
+                    raise HeavyJobCancelled()
+        except BaseException:
+            if index is not None:
+                with self._cond:
+                    self._set(index, state=_FREE)
+                    self._cond.notify_all()
+            raise
+
+    @contextmanager
+    def admit(self, kind, mpx, *, on_wait=None, poll_seconds=2.0):
+        """Context-manager form of ``acquire``."""
+        admission = self.acquire(kind, mpx, on_wait=on_wait, poll_seconds=poll_seconds)
+        try:
+            yield admission
+        finally:
+            admission.release()
+
+    def _release(self, index):
+        with self._cond:
+            self._set(index, state=_FREE)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """Running and waiting entries, for diagnostics and tests."""
+        with self._cond:
+            return {
+                name: sorted(
+                    (int(self._get(i, _TICKET)), round(self._get(i, _MB), 1))
+                    for i in self._entries(state))
+                for name, state in (("running", _RUNNING), ("waiting", _WAITING))
+            }
+
+
+class Admission:
+    """A running heavy job; ``release()`` frees its budget and records history.
+
+    While the job runs, a sampler thread tracks this process's RSS growth; it
+    is folded into the footprint history only when no other heavy job ran in
+    this process meanwhile, so concurrent jobs never inflate each other.
+    """
+
+    def __init__(self, scheduler, index, kind, mpx):
+        self._scheduler = scheduler
+        self._index = index
+        self._kind = kind
+        self._mpx = mpx
+        self._started = time.monotonic()
+        self._released = False
+        with scheduler._history_lock:
+            scheduler._local_running += 1
+            scheduler._local_starts += 1
+            self._exclusive = scheduler._local_running == 1
+            self._starts = scheduler._local_starts
+        self._rss_start = _current_rss_mb()
+        self._rss_peak = self._rss_start
+        self._stop = threading.Event()
+        self._sampler = None
+        if self._rss_start is not None:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            rss = _current_rss_mb()
+            if rss is not None and rss > self._rss_peak:
+                self._rss_peak = rss
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._stop.set()
+        scheduler = self._scheduler
+        scheduler._release(self._index)
+        with scheduler._history_lock:
+            scheduler._local_running -= 1
+            exclusive = self._exclusive and scheduler._local_starts == self._starts
+        peak = None
+        if exclusive and self._rss_start is not None:
+            peak = self._rss_peak - self._rss_start
+        scheduler.record(self._kind, self._mpx, time.monotonic() - self._started, peak)
+
+
+def navgraph_footprint_cap():
+    """Upper bound for a tiled navgraph build's estimate (0 = uncapped)."""
+    return max(0, int(getattr(settings, "NAVGRAPH_BUILD_JOB_MEMORY_MB", 0) or 0))
+
 
 # Created while Gunicorn's preloaded master imports the application, then
-# inherited by its worker processes. It is also safe to acquire from threads.
-HEAVY_JOB_SLOT = multiprocessing.BoundedSemaphore(1)
+# inherited by its worker processes. It is also safe to use from threads.
+HEAVY_JOBS = HeavyJobScheduler(
+    getattr(settings, "HEAVY_JOB_MEMORY_BUDGET_MB", 0),
+    starvation_seconds=getattr(settings, "HEAVY_JOB_STARVATION_SECONDS", 300),
+)
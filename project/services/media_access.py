@@ -1,17 +1,24 @@
 """Secure access, serving, and lifecycle helpers for uploaded media artifacts."""
 
+import hashlib
 import mimetypes
 import os
 import logging
+import re
 import threading
 import time
 
 from django.conf import settings
 from django.db.models import Q
-from django.http import FileResponse, HttpResponseNotFound
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotFound, StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date
 from django.utils.translation import gettext as _
 
-from ..models import File
+from ..models import File, NavgraphArtifact
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +32,15 @@ _NAVGRAPH_CURRENCY_CACHE_TTL = 5.0
 _navgraph_currency_cache = {}
 _navgraph_currency_cache_lock = threading.Lock()
 
+# Uploaded and converted maps are stored under a fresh ``{stamp}_{token}``
+# name and never rewritten, so browsers may keep them without revalidating.
+# Masks and navgraphs are rewritten in place and always revalidate.
+_TOKEN_MAP_NAME_RE = re.compile(r"^\d{8}_\d{6}_[0-9a-f]{12}\.[A-Za-z0-9]+$")
+_IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+_REVALIDATE_CACHE_CONTROL = "private, no-cache"
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_RANGE_CHUNK_SIZE = 64 * 1024
+
 
 def safe_media_filename(filename):
     filename = (filename or "").strip()
@@ -91,7 +107,132 @@ def user_can_access_file(request, file, *, require_published=False,
     return own or shared
 
 
-def serve_map_file(filename):
+def _accepted_encodings(request):
+    """Content codings the client accepts (``q=0`` entries excluded)."""
+    accepted = set()
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _sep, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = params.strip().lower()
+        if not coding or (q.startswith("q=") and q[2:].strip("0.") == ""):
+            continue
+        accepted.add(coding)
+    return accepted
+
+
+def _parse_range(header, size):
+    """``(start, end)`` for a single satisfiable byte range, ``False`` when
+    unsatisfiable, or ``None`` to ignore the header and serve the whole file."""
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match or (not match.group(1) and not match.group(2)):
+        # Malformed and multi-range requests get the full representation.
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return start, end
+
+
+def _iter_file_range(path, start, length):
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(_RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _serve_file(request, path, content_type, *, cache_control,
+                revision="", encodings=()):
+    """Serve ``path`` with validators, conditional GET and byte ranges.
+
+    The strong ETag hashes size, mtime, ``revision`` (artifact identity that
+    the stat alone may not capture) and the chosen content coding. ``encodings``
+    lists ``(coding, suffix)`` precompressed siblings; one is used only when
+    the client accepts it, no range is requested, and its mtime equals the
+    file's (written by the same build). Ranges are always served in identity.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return HttpResponseNotFound()
+
+    range_header = request.headers.get("Range", "")
+    body_path, coding = path, None
+    if encodings and not range_header:
+        accepted = _accepted_encodings(request)
+        for candidate, suffix in encodings:
+            if candidate not in accepted:
+                continue
+            try:
+                sibling = os.stat(path + suffix)
+            except OSError:
+                continue
+            if sibling.st_mtime_ns == stat.st_mtime_ns:
+                body_path, coding = path + suffix, candidate
+                break
+
+    digest = hashlib.sha256(
+        f"{stat.st_size}:{stat.st_mtime_ns}:{revision}".encode()).hexdigest()[:24]
+    etag = f'"{digest}-{coding}"' if coding else f'"{digest}"'
+    last_modified = int(stat.st_mtime)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": cache_control,
+        "X-Content-Type-Options": "nosniff",
+    }
+    if not coding:
+        headers["Accept-Ranges"] = "bytes"
+
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return _finish_file_response(conditional, headers, encodings)
+
+    byte_range = None
+    if range_header:
+        if_range = request.headers.get("If-Range")
+        if not if_range or if_range in (etag, headers["Last-Modified"]):
+            byte_range = _parse_range(range_header, stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+    elif byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_file_range(path, start, length), status=206,
+            content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        response["Content-Length"] = str(length)
+    else:
+        response = FileResponse(
+            open(body_path, "rb"), content_type=content_type,
+            filename=os.path.basename(path))
+        if coding:
+            response["Content-Encoding"] = coding
+    return _finish_file_response(response, headers, encodings)
+
+
+def _finish_file_response(response, headers, encodings):
+    for key, value in headers.items():
+        response[key] = value
+    if encodings:
+        patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def serve_map_file(request, filename):
     filename = safe_media_filename(filename)
     if not filename:
         return HttpResponseNotFound("Map not found.")
@@ -101,12 +242,13 @@ def serve_map_file(filename):
         return HttpResponseNotFound(f"Map '{filename}' not found.")
 
     content_type, _ = mimetypes.guess_type(filepath)
-    response = FileResponse(open(filepath, "rb"), content_type=content_type or "application/octet-stream")
-    response["X-Content-Type-Options"] = "nosniff"
-    return response
+    cache_control = (_IMMUTABLE_CACHE_CONTROL if _TOKEN_MAP_NAME_RE.match(filename)
+                     else _REVALIDATE_CACHE_CONTROL)
+    return _serve_file(request, filepath, content_type or "application/octet-stream",
+                       cache_control=cache_control)
 
 
-def serve_mask_file(file):
+def serve_mask_file(request, file):
     filename = safe_media_filename(file.map_file)
     if not filename:
         return HttpResponseNotFound("Mask not found.")
@@ -116,9 +258,8 @@ def serve_mask_file(file):
     if not os.path.isfile(filepath):
         return HttpResponseNotFound("Mask not found.")
 
-    response = FileResponse(open(filepath, "rb"), content_type="image/png")
-    response["X-Content-Type-Options"] = "nosniff"
-    return response
+    return _serve_file(request, filepath, "image/png",
+                       cache_control=_REVALIDATE_CACHE_CONTROL)
 
 
 def navgraph_artifact_paths(file):
@@ -134,23 +275,55 @@ def navgraph_artifact_paths(file):
     return bin_path, mask_path
 
 
-def delete_navgraph_artifacts(file):
+def navgraph_raster_cache():
+    """The shared ``RasterCache`` for navgraph builds, or ``None`` if disabled.
+
+    Entries are keyed by mask content rather than by File, so mask edits never
+    need to delete them; the size bound evicts whatever is no longer used.
+    """
+    max_mb = int(getattr(settings, "NAVGRAPH_RASTER_CACHE_MB", 0))
+    if max_mb <= 0:
+        return None
+    root = (getattr(settings, "NAVGRAPH_RASTER_CACHE_DIR", "")
+            or os.path.join(settings.MEDIA_ROOT, "navgraph_cache"))
+    from ..navgraph import RasterCache
+
+    return RasterCache(root, max_bytes=max_mb * 1024 * 1024)
+
+
+def delete_navgraph_artifacts(file, *, include_base_checkpoint=False):
     """Delete every persisted navgraph derivative for ``file``'s mask.
 
     Mask, region, and passage edits all invalidate the complete build. Removing
     the binary as well as the diagnostic NPZ/debug image makes that invalidation
     fail closed even if a future serving call accidentally omits a revision
     check. Missing files are intentionally harmless.
+
+    The ``NavgraphArtifact`` registry rows for the mask are deleted first.
+    The pre-passage base checkpoint is kept by default: passage edits hit it
+    again, and after a mask edit its per-tile digests let the next build
+    re-derive only the changed region. ``include_base_checkpoint=True``
+    removes it as well.
     """
     bin_path, _mask_path = navgraph_artifact_paths(file)
     if not bin_path:
         return
     base = bin_path[:-len(".navgraph.bin")]
-    for path in (
+    from ..navgraph import NAVGRAPH_BIN_ENCODINGS
+
+    # The artifact belongs to the mask, which several Files may share: drop
+    # every registry row that vouches for it before the files go away.
+    if file.map_file:
+        NavgraphArtifact.objects.filter(file__map_file=file.map_file).delete()
+    paths = [
         bin_path,
+        *(bin_path + suffix for _coding, suffix in NAVGRAPH_BIN_ENCODINGS),
         base + ".navgraph.npz",
         base + ".navgraph.debug.png",
-    ):
+    ]
+    if include_base_checkpoint:
+        paths.append(base + ".navgraph.base.npz")
+    for path in paths:
         try:
             os.remove(path)
         except FileNotFoundError:
@@ -208,6 +381,72 @@ def _navgraph_artifact_is_current_uncached(file, bin_path, mask_path,
     )
 
 
+def _registered_navgraph_artifact(file):
+    """``file``'s ``NavgraphArtifact`` row (``select_related``-friendly) or None."""
+    try:
+        return file.navgraph_artifact
+    except NavgraphArtifact.DoesNotExist:
+        return None
+
+
+def record_navgraph_artifact(file, bin_path, mask_path, *, stats=None):
+    """Register the artifact just published for ``file``; returns the row.
+
+    Call inside the transaction that decided the artifact is current for the
+    File's region and passages. Revisions and dimensions come from the binary
+    header, so the row describes exactly what is served. Returns ``None`` (and
+    drops any old row) when the binary cannot be read back.
+
+    The binary belongs to the mask, which other Files may share; their rows
+    vouched for the binary just replaced and are dropped, so their next
+    currency check runs in full against their own region and passages.
+    """
+    from ..navgraph import read_bin_header
+
+    if file.map_file:
+        NavgraphArtifact.objects.filter(
+            file__map_file=file.map_file).exclude(file_id=file.pk).delete()
+    stats = stats or {}
+    try:
+        mask_stat = os.stat(mask_path)
+        bin_stat = os.stat(bin_path)
+    except OSError:
+        header = None
+    else:
+        header = read_bin_header(bin_path)
+    if header is None:
+        NavgraphArtifact.objects.filter(file_id=file.pk).delete()
+        return None
+    row, _created = NavgraphArtifact.objects.update_or_create(
+        file_id=file.pk,
+        defaults={
+            "mask_size": mask_stat.st_size,
+            "mask_mtime_ns": mask_stat.st_mtime_ns,
+            "bin_size": bin_stat.st_size,
+            "bin_mtime_ns": bin_stat.st_mtime_ns,
+            "width": header["width"],
+            "height": header["height"],
+            "passage_revision": header["passage_revision"],
+            "region_revision": header["region_revision"],
+            "node_count": int(stats.get("n_nodes") or 0),
+            "edge_count": int(stats.get("n_edges") or 0),
+            "build_seconds": stats.get("build_seconds"),
+            "published_at": timezone.now(),
+        },
+    )
+    return row
+
+
+def forget_navgraph_artifacts(file_ids):
+    """Drop the registry rows of ``file_ids`` after their binary was rewritten
+    outside the publishing path (``manage.py build_navgraph``).
+
+    The next ``navgraph_artifact_is_current`` runs the full check and
+    re-registers each File whose artifact still matches it.
+    """
+    return NavgraphArtifact.objects.filter(file_id__in=list(file_ids)).delete()[0]
+
+
 def navgraph_artifact_is_current(file):
     """True when the on-disk ``.navgraph.bin`` matches ``file``'s canonical
     passage document + mask dimensions (CR 8.4).
@@ -216,7 +455,12 @@ def navgraph_artifact_is_current(file):
     reactivated and rebuilt, the old artifact is stale and must not be served or
     listed even via a direct URL. Any missing file, unreadable mask, or
     corruption is treated as not-current so a stale/broken artifact never
-    reaches a player."""
+    reaches a player.
+
+    A registered artifact whose mask and binary stats still match its
+    ``NavgraphArtifact`` row is current without further work. Otherwise (built
+    before the registry existed, by the CLI, or replaced out of band) the full
+    check runs and its result (re-)registers or drops the row."""
     if not file.infinite_enabled:
         return False
     bin_path, mask_path = navgraph_artifact_paths(file)
@@ -228,6 +472,38 @@ def navgraph_artifact_is_current(file):
     except OSError:
         return False
 
+    row = _registered_navgraph_artifact(file)
+    if row is not None and (
+            (row.mask_size, row.mask_mtime_ns, row.bin_size, row.bin_mtime_ns)
+            == (mask_stat.st_size, mask_stat.st_mtime_ns,
+                bin_stat.st_size, bin_stat.st_mtime_ns)):
+        return True
+
+    current = _navgraph_artifact_is_current_cached(
+        file, bin_path, mask_path, mask_stat, bin_stat)
+    if current:
+        record_navgraph_artifact(file, bin_path, mask_path)
+    elif row is not None:
+        NavgraphArtifact.objects.filter(pk=row.pk).delete()
+    return current
+
+
+def navgraph_artifact_is_listed(file):
+    """Cheap currency test for pickers that list many Files.
+
+    Trusts the registry for registered Files (load them with
+    ``select_related("navgraph_artifact")`` to keep the listing one query);
+    only unregistered Files fall back to ``navgraph_artifact_is_current``,
+    which registers them once their artifact checks out."""
+    if not file.infinite_enabled:
+        return False
+    if _registered_navgraph_artifact(file) is not None:
+        return True
+    return navgraph_artifact_is_current(file)
+
+
+def _navgraph_artifact_is_current_cached(file, bin_path, mask_path,
+                                         mask_stat, bin_stat):
     last_edited = getattr(file, 'last_edited', None)
     cache_key = (
         file.pk,
@@ -255,7 +531,7 @@ def navgraph_artifact_is_current(file):
     return current
 
 
-def serve_navgraph_file(file):
+def serve_navgraph_file(request, file):
     bin_path, _mask_path = navgraph_artifact_paths(file)
     if not bin_path or not os.path.isfile(bin_path):
         return HttpResponseNotFound("Navgraph not found.")
@@ -264,6 +540,11 @@ def serve_navgraph_file(file):
         # coach must reactivate infinite play to rebuild the locked revision.
         return HttpResponseNotFound(_("Navgraph is stale; rebuild required."))
 
-    response = FileResponse(open(bin_path, "rb"), content_type="application/octet-stream")
-    response["X-Content-Type-Options"] = "nosniff"
-    return response
+    from ..navgraph import NAVGRAPH_BIN_ENCODINGS, read_bin_header
+
+    header = read_bin_header(bin_path) or {}
+    revision = (f"{header.get('passage_revision', '')}"
+                f"/{header.get('region_revision', '')}")
+    return _serve_file(request, bin_path, "application/octet-stream",
+                       cache_control=_REVALIDATE_CACHE_CONTROL,
+                       revision=revision, encodings=NAVGRAPH_BIN_ENCODINGS)
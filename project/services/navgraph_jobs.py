@@ -0,0 +1,258 @@
+"""DB-backed queue for out-of-process navgraph builds.
+
+In the default ``thread`` mode ``toggle_infinite`` runs the build in a daemon
+thread of the web worker, admitted under the ``HEAVY_JOBS`` memory budget.
+That keeps a 75 Mpx build's GIL time and arrays inside a process that also
+serves requests, and a queued build disappears whenever gunicorn recycles the
+worker.
+
+With ``NAVGRAPH_BUILD_MODE=queue`` the view only records a
+``NavgraphBuildJob`` row and ``manage.py navgraph_worker`` runs the build in a
+child process. The File's ``batch_progress`` build token stays the single
+source of truth for *whether* a build may publish; the job row only records
+that it still has to run, so it survives restarts:
+
+* a worker heartbeats every job it holds; a ``running`` job whose heartbeat is
+  older than ``NAVGRAPH_BUILD_STALE_SECONDS`` (or that was held by a previous
+  incarnation of the same worker id) is put back in the queue;
+* after ``NAVGRAPH_BUILD_MAX_ATTEMPTS`` lost runs — typically an OOM kill — the
+  job and its ``batch_progress`` are marked failed instead of looping forever.
+
+Re-running a build is always safe: a superseded token no-ops, and publishing
+re-checks the region/passage revisions under a row lock.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from ..models import File, NavgraphBuildJob
+
+
+logger = logging.getLogger(__name__)
+
+
+def navgraph_build_queue_enabled():
+    return getattr(settings, 'NAVGRAPH_BUILD_MODE', 'thread') == 'queue'
+
+
+def navgraph_build_concurrency():
+    """Number of builds one worker container may run at once.
+
+    ``NAVGRAPH_BUILD_WORKERS`` is the upper bound; when a container memory
+    budget is configured it is additionally capped so that the expected peak
+    of every concurrent build fits into it. At least one build always runs.
+    """
+    workers = max(1, int(getattr(settings, 'NAVGRAPH_BUILD_WORKERS', 1)))
+    budget_mb = int(getattr(settings, 'NAVGRAPH_BUILD_MEMORY_BUDGET_MB', 0))
+    job_mb = max(1, int(getattr(settings, 'NAVGRAPH_BUILD_JOB_MEMORY_MB', 3072)))
+    if budget_mb > 0:
+        workers = min(workers, budget_mb // job_mb)
+    return max(1, workers)
+
+
+def enqueue_navgraph_build(file_id, build_token, enable_on_success=False):
+    """Record a build for ``navgraph_worker``; call inside the request's
+    transaction so the job and the ``building`` progress commit together."""
+    return NavgraphBuildJob.objects.create(
+        file_id=file_id,
+        build_token=build_token,
+        enable_on_success=bool(enable_on_success),
+    )
+
+
+def claim_navgraph_build_job(worker):
+    """Atomically move the oldest queued job to ``running`` for ``worker``.
+
+    ``skip_locked`` lets several worker containers poll the same table on
+    PostgreSQL; the conditional update additionally makes the claim safe on
+    backends that ignore ``select_for_update`` (SQLite in development).
+    """
+    with transaction.atomic():
+        job = (
+            NavgraphBuildJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=NavgraphBuildJob.STATUS_QUEUED)
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = NavgraphBuildJob.objects.filter(
+            id=job.id, status=NavgraphBuildJob.STATUS_QUEUED,
+        ).update(
+            status=NavgraphBuildJob.STATUS_RUNNING,
+            attempts=F('attempts') + 1,
+            worker=worker[:128],
+            claimed_at=now,
+            heartbeat_at=now,
+        )
+        if not claimed:
+            return None
+    job.refresh_from_db()
+    return job
+
+
+def heartbeat_navgraph_build_jobs(job_ids):
+    if not job_ids:
+        return 0
+    return NavgraphBuildJob.objects.filter(
+        id__in=list(job_ids), status=NavgraphBuildJob.STATUS_RUNNING,
+    ).update(heartbeat_at=timezone.now())
+
+
+def _owned_navgraph_build_job(claimed):
+    """Rows of ``claimed`` (a ``claim_navgraph_build_job`` result) that are
+    still running under that claim.
+
+    Once a job was requeued and claimed again, its ``worker``/``attempts`` no
+    longer match and the original claimant must leave it alone.
+    """
+    return NavgraphBuildJob.objects.filter(
+        id=claimed.id,
+        status=NavgraphBuildJob.STATUS_RUNNING,
+        worker=claimed.worker,
+        attempts=claimed.attempts,
+    )
+
+
+def finish_navgraph_build_job(claimed, error=''):
+    """Mark a job terminal once its child process returned.
+
+    ``claimed`` is the job as returned by ``claim_navgraph_build_job``; a job
+    that has since been requeued or claimed by another run is left untouched
+    and ``None`` is returned.
+
+    ``_rebuild_navgraph_for_file_locked`` reports build failures through
+    ``batch_progress`` rather than raising, so a failed build that still owns
+    its token is mirrored into the job row for the admin/worker log. A build
+    that raised instead also fails its ``batch_progress`` so the editor stops
+    waiting for it.
+    """
+    job = (
+        _owned_navgraph_build_job(claimed).select_related('file').first())
+    if job is None:
+        return None
+    if not error:
+        progress = job.file.batch_progress
+        if (
+            isinstance(progress, dict)
+            and progress.get('type') == 'navgraph_build'
+            and progress.get('build_token') == job.build_token
+            and progress.get('status') == 'failed'
+        ):
+            error = str(progress.get('error') or 'failed')
+    job.status = NavgraphBuildJob.STATUS_FAILED if error else NavgraphBuildJob.STATUS_DONE
+    job.error = error
+    job.finished_at = timezone.now()
+    if not _owned_navgraph_build_job(claimed).update(
+            status=job.status, error=job.error, finished_at=job.finished_at):
+        return None
+    if error:
+        _fail_navgraph_build_progress(job.file_id, job.build_token, job.finished_at)
+    return job
+
+
+def release_crashed_navgraph_build_job(claimed, error=''):
+    """Handle a job whose child process died (OOM kill, segfault).
+
+    Treated like a job lost by its worker: requeued while it has attempts
+    left, otherwise failed together with its ``batch_progress``. Like
+    ``finish_navgraph_build_job`` it only acts on a job ``claimed`` still owns.
+    """
+    max_attempts = max(1, int(getattr(settings, 'NAVGRAPH_BUILD_MAX_ATTEMPTS', 3)))
+    if claimed.attempts < max_attempts:
+        requeued = _owned_navgraph_build_job(claimed).update(
+            status=NavgraphBuildJob.STATUS_QUEUED,
+            worker='',
+            claimed_at=None,
+            heartbeat_at=None,
+        )
+        if not requeued:
+            return None
+        logger.info("requeued crashed navgraph build job %s: %s", claimed.id, error)
+        return NavgraphBuildJob.objects.filter(id=claimed.id).first()
+    logger.warning("navgraph build job %s crashed after %s attempts: %s",
+                   claimed.id, max_attempts, error)
+    return finish_navgraph_build_job(claimed, error=error or 'build process crashed')
+
+
+def requeue_stale_navgraph_build_jobs(worker=None):
+    """Return lost ``running`` jobs to the queue; fail those out of attempts.
+
+    Returns ``(requeued, failed)`` counts.
+    """
+    stale_seconds = int(getattr(settings, 'NAVGRAPH_BUILD_STALE_SECONDS', 120))
+    max_attempts = max(1, int(getattr(settings, 'NAVGRAPH_BUILD_MAX_ATTEMPTS', 3)))
+    now = timezone.now()
+    lost = Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=now - timedelta(seconds=stale_seconds))
+    if worker:
+        # Jobs recorded under our own worker id belong to a previous run of
+        # this worker that died before finishing them.
+        lost |= Q(worker=worker[:128])
+    stale = NavgraphBuildJob.objects.filter(status=NavgraphBuildJob.STATUS_RUNNING).filter(lost)
+
+    exhausted = list(stale.filter(attempts__gte=max_attempts).values_list('id', 'file_id', 'build_token'))
+    for job_id, file_id, build_token in exhausted:
+        NavgraphBuildJob.objects.filter(id=job_id).update(
+            status=NavgraphBuildJob.STATUS_FAILED,
+            error='worker lost the job too many times',
+            finished_at=now,
+        )
+        _fail_navgraph_build_progress(file_id, build_token, now)
+        logger.warning("navgraph build job %s failed after %s attempts", job_id, max_attempts)
+
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status=NavgraphBuildJob.STATUS_QUEUED,
+        worker='',
+        claimed_at=None,
+        heartbeat_at=None,
+    )
+    if requeued:
+        logger.info("requeued %s lost navgraph build job(s)", requeued)
+    return requeued, len(exhausted)
+
+
+def _fail_navgraph_build_progress(file_id, build_token, now):
+    """Mark a still-``building`` progress failed, unless a newer build owns it."""
+    return File.objects.filter(
+        id=file_id,
+        batch_progress__build_token=build_token,
+        batch_progress__status='building',
+    ).update(infinite_enabled=False, batch_progress={
+        'type': 'navgraph_build', 'status': 'failed',
+        'build_token': build_token,
+        'error': str(_('Building the map failed.')),
+        'updated_at': now.isoformat(),
+    })
+
+
+def init_navgraph_worker_process():
+    """``ProcessPoolExecutor`` initializer for spawned build processes."""
+    import django
+    django.setup()
+
+
+def run_navgraph_build_job(job_id):
+    """Run one queued build; executed inside a ``navgraph_worker`` child."""
+    from django.db import close_old_connections
+
+    close_old_connections()
+    try:
+        job = NavgraphBuildJob.objects.filter(id=job_id).first()
+        if job is None:
+            return
+        file_id = job.file_id
+        build_token = job.build_token
+        enable_on_success = job.enable_on_success
+    finally:
+        close_old_connections()
+    from ..views import _rebuild_navgraph_for_file_locked
+    _rebuild_navgraph_for_file_locked(
+        file_id, enable_on_success=enable_on_success, build_token=build_token)
@@ -5806,6 +5806,17 @@ function showInfinityConfirmDialog() {
     });
 }
 
+/* Status text for a heavy job (navgraph build, mask generation) waiting for
+   room in the server's memory budget: queue position and a rough ETA. */
+function heavyJobQueueText(progress = {}) {
+    let text = gettext("Waiting for a free build slot…");
+    const position = Number(progress.queue_position);
+    const eta = Number(progress.eta_seconds);
+    if (Number.isFinite(position) && position > 0) text += ` #${position}`;
+    if (Number.isFinite(eta) && eta > 0) text += ` (~${Math.max(1, Math.round(eta / 60))} min)`;
+    return text;
+}
+
 /* =========================================================
     NAVBAR INFINITY TOGGLE
     --------------------------------------------------------
@@ -5846,7 +5857,9 @@ const NavInfinity = (() => {
         if (!text) return;
         const current = Number(progress.current);
         const total = Number(progress.total);
-        if (progress.phase === "connect_nodes" && Number.isFinite(current) && total > 0) {
+        if (progress.phase === "queued" && progress.queue_position !== undefined) {
+            text.textContent = heavyJobQueueText(progress);
+        } else if (progress.phase === "connect_nodes" && Number.isFinite(current) && total > 0) {
             text.textContent = `${gettext("Connecting nodes…")} ${current} / ${total}`;
         } else {
             text.textContent = `${gettext("Building navigation graph…")} ${percent}%`;
@@ -6925,7 +6938,9 @@ async function startMaskGeneration(mapFile, scale, fileId = null) {
                                 }
                                 continue;
                             }
-                            if (d.current !== undefined) {
+                            if (d.queued) {
+                                text.textContent = heavyJobQueueText(d);
+                            } else if (d.current !== undefined) {
                                 const pct = Math.round((d.current / d.total) * 100);
                                 text.textContent = `${gettext('Generating mask…')} ${pct}%`;
                                 if (prog) prog.value = pct;
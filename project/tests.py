@@ -1,10 +1,15 @@
 import json
 import math
 import os
+import shutil
+import socket
+import sys
 import tempfile
+import time
 from datetime import timedelta
-from unittest import mock
+from unittest import mock, skipUnless
 
+from django.conf import settings
 from django.contrib.auth.models import Group, User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import SimpleTestCase, TestCase, override_settings
@@ -29,6 +34,72 @@ PASSAGE_ID_1 = '8cb8a384-c073-4a4d-9dce-b67e2c6de101'
 PASSAGE_ID_2 = '7b03b060-a710-4874-932f-cf4a2b425313'
 
 
+FAKE_OCAD_WORKER_JS = """
+const readline = require("readline");
+let jobs = 0;
+const lines = readline.createInterface({ input: process.stdin });
+lines.on("line", (line) => {
+  const { id, args } = JSON.parse(line);
+  if (args.input === "crash") process.exit(3);
+  if (args.input === "hang") return;
+  jobs += 1;
+  const reply = args.input === "bad"
+    ? { id, ok: false, error: "Error: unreadable OCAD" }
+    : { id, ok: true, result: { pid: process.pid, jobs, args } };
+  process.stdout.write(JSON.stringify(reply) + "\\n");
+});
+"""
+
+
+@skipUnless(shutil.which('node'), 'node is not installed')
+class OcadConverterWorkerTests(SimpleTestCase):
+    def setUp(self):
+        from project.ocad_tools.ocad import _ConverterWorker
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        script = os.path.join(directory, 'worker.js')
+        with open(script, 'w', encoding='utf-8') as handle:
+            handle.write(FAKE_OCAD_WORKER_JS)
+        self.worker = _ConverterWorker(['node', script], directory, max_jobs=3)
+        self.addCleanup(self.worker.stop)
+
+    def test_requests_reuse_one_process_until_max_jobs(self):
+        results = [self.worker.request({'input': f'{i}.ocd'}) for i in range(4)]
+
+        self.assertEqual([r['jobs'] for r in results], [1, 2, 3, 1])
+        self.assertEqual(len({r['pid'] for r in results[:3]}), 1)
+        self.assertNotEqual(results[3]['pid'], results[0]['pid'])
+        self.assertEqual(results[0]['args'], {'input': '0.ocd'})
+
+    def test_errors_crashes_and_timeouts_raise_and_recover(self):
+        from project.ocad_tools.ocad import OcadConversionError
+
+        first = self.worker.request({'input': 'a.ocd'})
+        with self.assertRaisesMessage(OcadConversionError, 'unreadable OCAD'):
+            self.worker.request({'input': 'bad'})
+        self.assertEqual(self.worker.request({'input': 'b.ocd'})['pid'], first['pid'])
+        with self.assertRaises(OcadConversionError):
+            self.worker.request({'input': 'crash'})
+        with self.assertRaisesMessage(OcadConversionError, 'timed out'):
+            self.worker.request({'input': 'hang'}, timeout=0.5)
+        self.assertNotEqual(self.worker.request({'input': 'c.ocd'})['pid'], first['pid'])
+
+    def test_idle_worker_is_stopped_and_restarted_on_demand(self):
+        self.worker.idle_seconds = 0.2
+        first = self.worker.request({'input': 'a.ocd'})
+        second = self.worker.request({'input': 'b.ocd'})
+        self.assertEqual(second['pid'], first['pid'])
+
+        time.sleep(0.6)
+        self.assertIsNone(self.worker._process)
+        self.assertNotEqual(self.worker.request({'input': 'c.ocd'})['pid'], first['pid'])
+
+    def test_busy_worker_defers_to_one_shot_run(self):
+        with self.worker._lock:
+            self.assertIsNone(self.worker.request({'input': 'a.ocd'}))
+
+
 class MaskDilationTests(SimpleTestCase):
     def test_impassable_outline_only_darkens_neighbouring_pixels(self):
         import numpy as np
@@ -56,6 +127,216 @@ class MaskDilationTests(SimpleTestCase):
                 f'const MASK_EXPANSION = {UNet.MASK_OUTLINE};', source.read())
 
 
+class MaskTileInferenceTests(SimpleTestCase):
+    class _PixelwiseSession:
+        """Fake ONNX session: class scores peak at round(red * 4)."""
+
+        def __init__(self):
+            self.batch_shapes = []
+
+        def get_inputs(self):
+            from types import SimpleNamespace
+            return [SimpleNamespace(shape=['batch', 3, 'height', 'width'])]
+
+        def run(self, _outputs, feeds):
+            import numpy as np
+            batch = feeds['input']
+            self.input_dtype = batch.dtype
+            self.batch_shapes.append(batch.shape)
+            centres = np.arange(5, dtype=np.float32)[None, :, None, None]
+            return [-np.abs(batch[:, :1] * 4 - centres)]
+
+    def test_batched_tiles_match_pixelwise_reference(self):
+        import numpy as np
+        rng = np.random.default_rng(3)
+        rgb = rng.integers(0, 256, (150, 170, 3), dtype=np.uint8)
+        session = self._PixelwiseSession()
+        engine = UNet._TileInferenceEngine(session, batch_size=3)
+        tiles = UNet._mask_tiles(150, 170, tile_size=64, overlap=12)
+        output = np.zeros((150, 170), dtype=np.uint8)
+        progress = []
+
+        engine.run(rgb, output, tiles, on_progress=progress.append)
+
+        expected = np.rint(rgb[..., 0].astype(np.float64) / 255.0 * 4).astype(np.uint8)
+        ties = np.isclose((rgb[..., 0] / 255.0 * 4) % 1, 0.5, atol=1e-4)
+        np.testing.assert_array_equal(output[~ties], expected[~ties])
+        self.assertEqual(progress[-1], len(tiles))
+        self.assertEqual(session.input_dtype, np.float32)
+        self.assertTrue(all(shape[0] <= 3 for shape in session.batch_shapes))
+        self.assertLess(len(session.batch_shapes), len(tiles))
+
+
+class MaskStreamingTests(SimpleTestCase):
+    def test_banded_png_matches_whole_image_mask(self):
+        import numpy as np
+        from PIL import Image
+        rng = np.random.default_rng(5)
+        classes = rng.integers(0, 36, (203, 117), dtype=np.uint8)
+        classes[rng.random(classes.shape) < 0.7] = 30
+        expected = UNet._add_impassable_outline(UNet._class_map_to_mask(classes))
+
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_stream.png')
+            UNet._write_mask_png(mask_path, classes, band_rows=16)
+            with Image.open(mask_path) as written:
+                self.assertEqual(written.mode, 'L')
+                pixels = np.asarray(written)
+            self.assertEqual(os.listdir(directory), ['mask_stream.png'])
+        np.testing.assert_array_equal(pixels, expected)
+
+    def test_class_lookup_table_matches_range_comparisons(self):
+        import numpy as np
+        classes = np.arange(256, dtype=np.uint8)
+        expected = np.full(256, 255, dtype=np.uint8)
+        expected[classes < 10] = UNet.MASK_IMPASSABLE
+        expected[(classes >= 10) & (classes < 22)] = 135
+        expected[(classes >= 22) & (classes < 26)] = 231
+        expected[(classes >= 26) & (classes < 28)] = 241
+        expected[classes == 28] = 242
+        expected[(classes >= 29) & (classes < 32)] = 243
+        expected[classes == 32] = 241
+        expected[classes == 33] = 243
+        expected[classes == 34] = UNet.MASK_IMPASSABLE
+
+        np.testing.assert_array_equal(UNet._class_map_to_mask(classes), expected)
+
+    def test_adaptive_png_filters_round_trip_rgb(self):
+        import io
+
+        import numpy as np
+        from PIL import Image
+        rng = np.random.default_rng(11)
+        rgb = rng.integers(0, 256, (40, 23, 3), dtype=np.uint8)
+        rgb[10:30] = rgb[10:11]
+        rgb[:, 5:15] = 200
+        buffer = io.BytesIO()
+
+        UNet._write_png_stream(
+            buffer, 23, 40, (rgb[y0:y0 + 7].reshape(-1, 69) for y0 in range(0, 40, 7)),
+            channels=3)
+
+        buffer.seek(0)
+        with Image.open(buffer) as written:
+            np.testing.assert_array_equal(np.asarray(written), rgb)
+
+    def test_row_streamed_inference_matches_whole_image(self):
+        import numpy as np
+        rng = np.random.default_rng(9)
+        rgb = rng.integers(0, 256, (150, 170, 3), dtype=np.uint8)
+        tiles = UNet._mask_tiles(150, 170, tile_size=64, overlap=12)
+        whole = np.zeros((150, 170), dtype=np.uint8)
+        streamed = np.zeros((150, 170), dtype=np.uint8)
+        session = MaskTileInferenceTests._PixelwiseSession()
+        UNet._TileInferenceEngine(session, batch_size=2).run(rgb, whole, tiles)
+        reads, progress = [], []
+
+        def read_rows(y0, y1):
+            reads.append((y0, y1))
+            return rgb[y0:y1]
+
+        def write_rows(y0, rows):
+            streamed[y0:y0 + len(rows)] = rows
+
+        UNet._TileInferenceEngine(session, batch_size=2).run_rows(
+            read_rows, write_rows, 170, tiles, on_progress=progress.append)
+
+        np.testing.assert_array_equal(streamed, whole)
+        self.assertEqual(len(reads), len({tile[:2] for tile in tiles}))
+        self.assertEqual(progress[-1], len(tiles))
+        self.assertEqual(progress, sorted(progress))
+
+
+    def test_failed_admission_still_ends_the_job(self):
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        job = UNet._MaskGenerationJob('mask-admission', {'file_id': 7}, loop)
+        with UNet._mask_generation_jobs_lock:
+            UNet._mask_generation_jobs['mask-admission'] = job
+        scheduler = mock.MagicMock()
+        scheduler.acquire.side_effect = RuntimeError('scheduler down')
+
+        with mock.patch.object(UNet, 'HEAVY_JOBS', scheduler):
+            UNet._run_mask_generation(
+                job=job, job_key='mask-admission', map_path='/nonexistent/map.png',
+                scale=0.71, mask_filename='mask_map.png', filename='map.png', file_id=7)
+
+        self.assertNotIn('mask-admission', UNet._mask_generation_jobs)
+        self.assertTrue(job.done)
+        self.assertIn('error', job.history[-1])
+
+
+class MaskTileCacheTests(SimpleTestCase):
+    def test_regeneration_only_infers_changed_tiles(self):
+        import numpy as np
+        rng = np.random.default_rng(13)
+        rgb = rng.integers(0, 256, (150, 170, 3), dtype=np.uint8)
+        tiles = UNet._mask_tiles(150, 170, tile_size=64, overlap=12)
+
+        def generate(image, root):
+            session = MaskTileInferenceTests._PixelwiseSession()
+            cache = UNet._MaskTileCache(root, 'file_1', ['model', 1.0], max_bytes=1 << 20)
+            output = np.zeros((150, 170), dtype=np.uint8)
+
+            def write_rows(y0, rows):
+                output[y0:y0 + len(rows)] = rows
+
+            UNet._TileInferenceEngine(session, batch_size=1).run_rows(
+                lambda y0, y1: image[y0:y1], write_rows, 170, tiles, tile_cache=cache)
+            cache.finish()
+            return output, len(session.batch_shapes), cache
+
+        with tempfile.TemporaryDirectory() as root:
+            first, inferred, _cache = generate(rgb, root)
+            self.assertEqual(inferred, len(tiles))
+            edited = rgb.copy()
+            edited[140:150, 168:170] = 255  # inside the corner tile only
+            second, inferred, cache = generate(edited, root)
+            self.assertEqual(inferred, 1)
+            self.assertEqual(cache.hits, len(tiles) - 1)
+            self.assertEqual(len(os.listdir(os.path.join(root, 'file_1'))), len(tiles))
+
+        reference = np.zeros((150, 170), dtype=np.uint8)
+        UNet._TileInferenceEngine(MaskTileInferenceTests._PixelwiseSession()).run(
+            edited, reference, tiles)
+        np.testing.assert_array_equal(second, reference)
+
+
+class MaskSessionCacheTests(SimpleTestCase):
+    def test_session_is_reused_until_idle_eviction(self):
+        loads = []
+
+        def loader(path):
+            loads.append(path)
+            return object()
+
+        cache = UNet._InferenceSessionCache('model.onnx', loader=loader)
+        with override_settings(MASK_SESSION_IDLE_SECONDS=3600):
+            with cache.session() as (first, first_load):
+                with cache.session() as (nested, nested_load):
+                    self.assertIs(nested, first)
+            with cache.session() as (again, again_load):
+                self.assertIs(again, first)
+            self.assertGreaterEqual(first_load, 0.0)
+            self.assertEqual((nested_load, again_load), (0.0, 0.0))
+            self.assertEqual(loads, ['model.onnx'])
+
+            # A timer armed before the last job must not evict a newer user.
+            stale_generation = cache._generation - 1
+            cache._evict_idle(stale_generation)
+            self.assertTrue(cache.loaded)
+            cache._evict_idle(cache._generation)
+            self.assertFalse(cache.loaded)
+
+        with override_settings(MASK_SESSION_IDLE_SECONDS=0):
+            with cache.session():
+                self.assertTrue(cache.loaded)
+            self.assertFalse(cache.loaded)
+        self.assertEqual(len(loads), 2)
+
+
 class PassageConnectorGridTests(SimpleTestCase):
     def test_connector_error_uses_sidebar_number_not_uuid(self):
         from project.navgraph import PassageConnectorError
@@ -87,6 +368,130 @@ class PassageConnectorGridTests(SimpleTestCase):
         mask[8, 4] = 0
         self.assertIsNone(_passage_connector_cost(mask, start, goal))
 
+    def test_line_kernel_matches_scalar_cost_for_any_chunking(self):
+        import numpy as np
+        from project.navgraph import _line_cost, _line_integrals
+
+        rng = np.random.default_rng(3)
+        mask = rng.choice(np.array([0, 135, 200, 243], dtype=np.uint8),
+                          size=(120, 160), p=[0.01, 0.2, 0.2, 0.59])
+        x0 = rng.integers(0, 160, 300)
+        y0 = rng.integers(0, 120, 300)
+        x1 = rng.integers(0, 160, 300)
+        y1 = rng.integers(0, 120, 300)
+        x1[:5], y1[:5] = x0[:5], y0[:5]
+
+        costs, blocked, counts = _line_integrals(mask, x0, y0, x1, y1)
+        for chunk in (1, 37, 1000):
+            again = _line_integrals(mask, x0, y0, x1, y1, chunk_samples=chunk)
+            np.testing.assert_array_equal(again[0], costs)
+            np.testing.assert_array_equal(again[2], counts)
+        for i in range(300):
+            scalar = _line_cost(mask, int(x0[i]), int(y0[i]), int(x1[i]), int(y1[i]))
+            self.assertEqual(scalar is None, bool(blocked[i]))
+            self.assertEqual(blocked[i], counts[i] > 0)
+            if scalar is not None:
+                self.assertEqual(scalar, costs[i])
+        self.assertTrue(blocked.any() and not blocked.all())
+        self.assertTrue((costs[:5] == 0.0).all())
+
+    def test_vectorized_shadowing_matches_scalar_geometry(self):
+        import numpy as np
+        from project.navgraph import (
+            _point_in_passage_body, _point_in_polygon,
+            _points_in_passage_body, _points_in_polygon,
+        )
+
+        points = [(10.0, 10.0), (40.0, 12.5), (42.0, 40.0), (15.0, 35.0)]
+        radius = 4.5
+        passage = {
+            "points": points, "radius": radius,
+            "body_bounds": (10.0 - radius, 10.0 - radius, 42.0 + radius, 40.0 + radius),
+        }
+        polygon = [(2.0, 2.0), (50.0, 4.0), (30.0, 25.0), (48.0, 48.0), (2.0, 45.0)]
+        ys, xs = np.mgrid[0:52, 0:52]
+        xs, ys = xs.ravel(), ys.ravel()
+
+        body = _points_in_passage_body(passage, xs, ys)
+        region = _points_in_polygon(xs, ys, polygon)
+        for x, y, in_body, in_region in zip(xs, ys, body, region):
+            self.assertEqual(in_body, _point_in_passage_body(passage, float(x), float(y)))
+            self.assertEqual(in_region, _point_in_polygon(x, y, polygon))
+        self.assertTrue(body.any() and region.any() and not region.all())
+
+    def test_grouped_edge_solves_match_single_target_solves(self):
+        import numpy as np
+        from project.navgraph import _weighted_edge_path, _weighted_edge_paths
+
+        mask = np.full((80, 80), 243, dtype=np.uint8)
+        mask[10:70, 40] = 0
+        mask[30:34, 20:60] = 135
+        source = (20, 40)
+        targets = [(60, 40, 40.0, 12, 3.0), (60, 44, 40.2, 12, 3.0),
+                   (58, 50, 39.3, 12, 3.0), (20, 75, 35.0, 4, 1.01)]
+
+        grouped = _weighted_edge_paths(mask, *source, targets)
+        single = [_weighted_edge_path(mask, *source, *target) for target in targets]
+
+        self.assertEqual(grouped, single)
+
+    def test_grouped_edge_solve_ignores_detours_through_neighbour_margins(self):
+        import numpy as np
+        from project.navgraph import _weighted_edge_path, _weighted_edge_paths
+
+        mask = np.full((80, 60), 243, dtype=np.uint8)
+        mask[36:45, 25] = 0
+        mask[38:43, 25] = 40
+        source = (10, 40)
+        # The narrow target's own box can only cross the slow strip; the wide
+        # target's box offers a cheaper way around the wall.
+        targets = [(40, 60, 36.1, 10, 3.0), (40, 40, 30.0, 2, 3.0)]
+
+        grouped = _weighted_edge_paths(mask, *source, targets)
+        single = [_weighted_edge_path(mask, *source, *target) for target in targets]
+
+        self.assertEqual(grouped, single)
+        self.assertIsNotNone(single[1])
+
+    def test_grouped_edge_solves_publish_the_per_target_artifact(self):
+        import numpy as np
+        from PIL import Image
+        from project import navgraph
+
+        rng = np.random.default_rng(21)
+        mask = rng.choice(np.array([243, 240, 235, 195], dtype=np.uint8),
+                          size=(420, 480), p=[0.7, 0.1, 0.1, 0.1])
+        for y, x in rng.integers(20, 400, size=(40, 2)):
+            if rng.random() < 0.5:
+                mask[y:y + 3, x:x + 60] = 0
+            else:
+                mask[y:y + 60, x:x + 3] = 0
+        mask[200:216, 40:440] = 243
+        document = {'version': 1, 'items': [
+            {'id': PASSAGE_ID_1, 'points': [[60, 208], [420, 208]], 'width': 10}]}
+        region = [[10, 10], [470, 10], [470, 410], [10, 410]]
+        grouped_solve = navgraph._weighted_edge_paths
+
+        def per_target(mask, xi, yi, targets):
+            return [grouped_solve(mask, xi, yi, [target])[0] for target in targets]
+
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_parity.png')
+            Image.fromarray(mask).save(mask_path)
+
+            def served_bytes(name):
+                path = os.path.join(directory, name)
+                navgraph._write_bin(path, navgraph.build_navgraph(
+                    mask_path, region_polygon=region, level_passages=document))
+                with open(path, 'rb') as handle:
+                    return handle.read()
+
+            grouped = served_bytes('grouped.bin')
+            with mock.patch.object(navgraph, '_weighted_edge_paths', per_target):
+                single = served_bytes('single.bin')
+
+        self.assertEqual(grouped, single)
+
     def test_endpoint_at_region_edge_can_connect_to_inward_base_nodes(self):
         from PIL import Image
         from project.navgraph import build_navgraph
@@ -114,6 +519,493 @@ class PassageConnectorGridTests(SimpleTestCase):
         self.assertEqual(artifact['stats']['unusable_endpoints'], [])
 
 
+class NavgraphBaseCheckpointTests(SimpleTestCase):
+    def test_passage_edit_reuses_base_and_matches_full_build(self):
+        import numpy as np
+        from PIL import Image
+        from project.navgraph import _write_bin, build_navgraph
+
+        def document(points, width):
+            return {'version': 1, 'items': [
+                {'id': PASSAGE_ID_1, 'points': points, 'width': width}]}
+
+        region = [[10, 10], [245, 10], [245, 245], [10, 245]]
+        edited = document([[60, 100], [180, 150]], 10)
+        mask = np.full((256, 256), 255, dtype=np.uint8)
+        mask[40:60, 30:200] = 0
+        mask[100:104, 20:120] = 135
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_checkpoint.png')
+            Image.fromarray(mask).save(mask_path)
+
+            first = build_navgraph(
+                mask_path, region_polygon=region,
+                level_passages=document([[60, 128], [180, 128]], 8),
+                reuse_base=True)
+            incremental = build_navgraph(
+                mask_path, region_polygon=region, level_passages=edited,
+                reuse_base=True)
+            full = build_navgraph(
+                mask_path, region_polygon=region, level_passages=edited)
+
+            def served_bytes(artifact, name):
+                path = os.path.join(directory, name)
+                _write_bin(path, artifact)
+                with open(path, 'rb') as handle:
+                    return handle.read()
+
+            self.assertEqual(first['stats']['base_checkpoint'], 'miss')
+            self.assertEqual(incremental['stats']['base_checkpoint'], 'hit')
+            self.assertEqual(
+                served_bytes(incremental, 'incremental.bin'),
+                served_bytes(full, 'full.bin'))
+
+            moved = build_navgraph(
+                mask_path, region_polygon=[[12, 10], [245, 10], [245, 245], [10, 245]],
+                level_passages=edited, reuse_base=True)
+            self.assertEqual(moved['stats']['base_checkpoint'], 'miss')
+
+    def test_mask_edit_rebuilds_only_around_changed_tiles(self):
+        import numpy as np
+        from PIL import Image
+        from project import navgraph
+        from project.navgraph import build_navgraph
+
+        region = [[4, 4], [507, 4], [507, 507], [4, 507]]
+        mask = np.full((512, 512), 243, dtype=np.uint8)
+        mask[100:110, 40:470] = 0
+        mask[200:420, 300:308] = 0
+        mask[380:384, 20:200] = 135
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(navgraph, 'DIRTY_TILE_PX', 64), \
+                mock.patch.object(navgraph, 'DIRTY_HALO_PX', 64), \
+                mock.patch.object(navgraph, 'DIRTY_MAX_WINDOW_FRACTION', 0.5):
+            mask_path = os.path.join(directory, 'mask_dirty.png')
+            Image.fromarray(mask).save(mask_path)
+            first = build_navgraph(mask_path, region_polygon=region, reuse_base=True)
+
+            mask[452:470, 452:490] = 0
+            Image.fromarray(mask).save(mask_path)
+            edited = build_navgraph(mask_path, region_polygon=region, reuse_base=True)
+            again = build_navgraph(mask_path, region_polygon=region, reuse_base=True)
+
+        self.assertEqual(first['stats']['base_checkpoint'], 'miss')
+        self.assertEqual(edited['stats']['base_checkpoint'], 'dirty')
+        self.assertEqual(edited['stats']['dirty_rebuild']['changed_tiles'], 1)
+        self.assertEqual(edited['stats']['dirty_rebuild']['generation'], 1)
+        self.assertEqual(again['stats']['base_checkpoint'], 'hit')
+        nodes = edited['nodes']
+        self.assertTrue((mask[nodes[:, 1], nodes[:, 0]] != 0).all())
+
+        def edge_set(artifact, keep):
+            points = [tuple(map(int, point)) for point in artifact['nodes']]
+            return {
+                (points[u], points[v]) for u, v in artifact['edges']
+                if keep(points[u]) and keep(points[v])}
+
+        # Far from the rebuild box [384, 512)² the graph is reused as is.
+        def far(point):
+            return point[0] < 220 or point[1] < 220
+
+        self.assertEqual(edge_set(edited, far), edge_set(first, far))
+
+
+class NavgraphRasterCacheTests(SimpleTestCase):
+    def _mask(self, directory):
+        import numpy as np
+        from PIL import Image
+
+        mask = np.full((256, 256), 255, dtype=np.uint8)
+        mask[40:60, 30:200] = 0
+        mask[100:104, 20:120] = 135
+        mask_path = os.path.join(directory, 'mask_rasters.png')
+        Image.fromarray(mask).save(mask_path)
+        return mask_path
+
+    def test_region_edit_reuses_mask_rasters(self):
+        from project.navgraph import RasterCache, _write_bin, build_navgraph
+
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = self._mask(directory)
+            cache = RasterCache(os.path.join(directory, 'cache'))
+            first = build_navgraph(
+                mask_path, region_polygon=[[10, 10], [245, 10], [245, 245], [10, 245]],
+                raster_cache=cache)
+            moved_region = [[20, 10], [245, 10], [245, 245], [10, 245]]
+            cached = build_navgraph(
+                mask_path, region_polygon=moved_region, raster_cache=cache)
+            uncached = build_navgraph(mask_path, region_polygon=moved_region)
+
+            def served_bytes(artifact, name):
+                path = os.path.join(directory, name)
+                _write_bin(path, artifact)
+                with open(path, 'rb') as handle:
+                    return handle.read()
+
+            stages = {'labels', 'edt', 'skeleton', 'sampling'}
+            self.assertEqual(first['stats']['raster_cache'], dict.fromkeys(stages, 'miss'))
+            self.assertEqual(cached['stats']['raster_cache'], dict.fromkeys(stages, 'hit'))
+            self.assertIsNone(uncached['stats']['raster_cache'])
+            self.assertEqual(
+                served_bytes(cached, 'cached.bin'),
+                served_bytes(uncached, 'uncached.bin'))
+
+    def test_partly_evicted_entry_is_a_miss(self):
+        import numpy as np
+        from project.navgraph import RasterCache
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = RasterCache(directory)
+            arrays = {'dist': np.arange(6, dtype=np.uint16), 'labels': np.ones(3, np.int32)}
+            cache.fetch('digest', 'edt', {}, lambda: arrays)
+            entry = os.path.join(directory, cache.entry_key('digest', 'edt', {}))
+            os.remove(os.path.join(entry, 'labels.npy'))
+
+            loaded, hit = cache.fetch('digest', 'edt', {}, lambda: arrays)
+
+        self.assertFalse(hit)
+        self.assertEqual(sorted(loaded), ['dist', 'labels'])
+
+    def test_cache_evicts_least_recently_used_entries(self):
+        from project.navgraph import RasterCache, build_navgraph
+
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = self._mask(directory)
+            cache_dir = os.path.join(directory, 'cache')
+            build_navgraph(mask_path, raster_cache=RasterCache(cache_dir, max_bytes=1))
+
+            entries = [name for name in os.listdir(cache_dir) if not name.startswith('.')]
+            self.assertEqual(len(entries), 1)
+
+
+
+class NavgraphTiledBuildTests(SimpleTestCase):
+    def test_default_job_budget_tiles_large_maps_only(self):
+        from project.navgraph import SKELETON_MAX_DS, _tile_plan
+
+        budget = settings.NAVGRAPH_BUILD_JOB_MEMORY_MB * 1024 * 1024
+        self.assertIsNone(_tile_plan(2900, 2970, SKELETON_MAX_DS, budget))  # ~8.6 Mpx
+        plan = _tile_plan(7500, 10000, SKELETON_MAX_DS, budget)  # 75 Mpx
+        self.assertIsNotNone(plan)
+        self.assertLess(plan['core'], 10000)
+
+    def test_tiled_labels_match_monolithic_numbering(self):
+        import numpy as np
+        import scipy.ndimage as ndi
+        from project.navgraph import _tiled_label
+
+        mask = (np.random.default_rng(3).random((301, 257)) < 0.55).astype(np.uint8) * 200
+        with tempfile.TemporaryDirectory() as scratch:
+            labels, ncomp = _tiled_label(mask, {'core': 37}, scratch)
+            expected, expected_n = ndi.label(mask != 0, structure=np.ones((3, 3)))
+            self.assertEqual(ncomp, expected_n)
+            self.assertTrue(np.array_equal(np.asarray(labels), expected))
+
+    def test_compact_labels_match_ndi_label_in_smallest_dtype(self):
+        import numpy as np
+        import scipy.ndimage as ndi
+        from project.navgraph import _compact_label, _labels_at
+
+        struct8 = np.ones((3, 3), dtype=np.uint8)
+        few = np.zeros((40, 60), dtype=np.uint8)
+        few[5:10, 5:20] = few[20:30, 30:50] = 243
+        many = np.zeros((64, 2048), dtype=np.uint8)
+        many[::2, ::2] = 243   # 32768 isolated pixels
+        for mask, dtype in ((few, np.uint8), (many, np.uint16)):
+            labels, ncomp = _compact_label(mask, struct8)
+            expected, expected_n = ndi.label(mask != 0, structure=struct8)
+            self.assertEqual(labels.dtype, dtype)
+            self.assertEqual(ncomp, expected_n)
+            self.assertTrue(np.array_equal(labels, expected))
+
+        # A crop at its origin reads as the full raster, 0 outside.
+        crop, _ = _compact_label(few[4:31, 4:51], struct8)
+        full, _ = ndi.label(few != 0, structure=struct8)
+        ys, xs = np.mgrid[0:40, 0:60]
+        self.assertTrue(np.array_equal(
+            _labels_at(crop, (4, 4), xs.ravel(), ys.ravel()), full.ravel()))
+
+    def test_capped_clearance_matches_exact_edt_below_cap(self):
+        import numpy as np
+        import scipy.ndimage as ndi
+        from project.navgraph import (
+            CLEARANCE_CAP_PX, CLEARANCE_SCALE, _capped_clearance, clearance_px,
+        )
+
+        mask = np.full((640, 900), 243, dtype=np.uint8)
+        rng = np.random.default_rng(5)
+        for y, x in rng.integers(0, 600, size=(12, 2)):
+            mask[y:y + 9, x:x + 25] = 0
+        exact = np.minimum(ndi.distance_transform_edt(mask != 0), CLEARANCE_CAP_PX)
+        self.assertGreater(exact.max(), CLEARANCE_CAP_PX - 1)
+
+        for window_px in (4096, 600):  # one window; split with halos
+            clearance = _capped_clearance(mask, window_px=window_px)
+            self.assertEqual(clearance.dtype, np.uint16)
+            self.assertLessEqual(np.abs(clearance_px(clearance) - exact).max(),
+                                 0.5 / CLEARANCE_SCALE + 1e-4)
+            # Whole-pixel thresholds and coarse_clear floors are unchanged.
+            self.assertTrue(np.array_equal(
+                clearance // CLEARANCE_SCALE, np.floor(exact).astype(np.uint16)))
+            for threshold in (8, 16, 80):
+                self.assertTrue(np.array_equal(
+                    clearance <= threshold * CLEARANCE_SCALE, exact <= threshold))
+
+    def test_tiled_build_matches_monolithic_artifact(self):
+        import numpy as np
+        from PIL import Image
+        from project.navgraph import _write_bin, build_navgraph
+
+        mask = np.full((700, 620), 243, dtype=np.uint8)
+        mask[60:660:90, 40:580] = 0
+        mask[:, 300:304] = 0
+        mask[400:440, 300:304] = 231
+        mask[200:500, 450:460] = 135
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_tiled.png')
+            Image.fromarray(mask).save(mask_path)
+            region = [[10, 10], [610, 10], [610, 690], [10, 690]]
+            monolithic = build_navgraph(mask_path, region_polygon=region)
+            tiled = build_navgraph(
+                mask_path, region_polygon=region, memory_budget_mb=1)
+
+            def served_bytes(artifact, name):
+                path = os.path.join(directory, name)
+                _write_bin(path, artifact)
+                with open(path, 'rb') as handle:
+                    return handle.read()
+
+            self.assertIsNone(monolithic['stats']['tiled'])
+            live = monolithic['stats']['live_raster_bytes']
+            # Unfiltered labels and clearance are gone once their stages ran.
+            self.assertLess(live['edges'], live['edt'])
+            self.assertEqual(live['edges'], live['nodes'])
+            self.assertEqual(tiled['stats']['tiled']['core'], 512)
+            self.assertEqual(
+                served_bytes(tiled, 'tiled.bin'),
+                served_bytes(monolithic, 'monolithic.bin'))
+
+
+
+class NavgraphParallelEdgeTests(SimpleTestCase):
+    def test_process_pool_weighting_matches_serial_build(self):
+        import numpy as np
+        from PIL import Image
+        from project import navgraph
+        from project.navgraph import _write_bin, build_navgraph
+
+        mask = np.full((256, 256), 243, dtype=np.uint8)
+        rng = np.random.default_rng(5)
+        for y, x in rng.integers(0, 250, size=(160, 2)):
+            mask[y:y + 2, x:x + 10] = 0
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_parallel.png')
+            Image.fromarray(mask).save(mask_path)
+            serial = build_navgraph(mask_path)
+            with mock.patch.object(navgraph, 'EDGE_PARALLEL_MIN_JOBS', 1):
+                parallel = build_navgraph(mask_path, edge_workers=2)
+
+            def served_bytes(artifact, name):
+                path = os.path.join(directory, name)
+                _write_bin(path, artifact)
+                with open(path, 'rb') as handle:
+                    return handle.read()
+
+            self.assertEqual(
+                served_bytes(parallel, 'parallel.bin'),
+                served_bytes(serial, 'serial.bin'))
+
+
+class NavgraphRedundancyPruningTests(SimpleTestCase):
+    def test_edge_sparsification_keeps_protected_edges_and_drops_duplicates(self):
+        import numpy as np
+        from project.navgraph import _sparsify_redundant_edges
+
+        edges = [(0, 1), (1, 2), (0, 2), (0, 2), (2, 3), (3, 4), (2, 4)]
+        weights = [1.0, 1.0, 1.9, 2.2, 1.0, 1.0, 1.9]
+        protected = [False] * 6 + [True]
+        kept_edges, kept_weights, kept, removed = _sparsify_redundant_edges(
+            edges, weights, protected_mask=protected, stretch=1.3)
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(kept.tolist(), [0, 1, 4, 5, 6])
+        self.assertEqual(kept_edges.tolist(), [[0, 1], [1, 2], [2, 3], [3, 4], [2, 4]])
+        self.assertTrue(np.array_equal(kept_weights, np.float32([1.0, 1.0, 1.0, 1.0, 1.9])))
+
+    def test_node_pruning_is_sequential(self):
+        import numpy as np
+        from project.navgraph import _prune_redundant_nodes
+
+        # Two parallel routes between protected ends 0 and 2: once node 1 is
+        # gone, node 3 is the only route left and must stay.
+        nodes = [(0, 0), (10, 0), (20, 0), (10, 5)]
+        edges = [(0, 1), (1, 2), (0, 3), (2, 3)]
+        weights = [10.0, 10.0, 11.0, 11.0]
+        new_nodes, new_edges, new_weights, components, removed = _prune_redundant_nodes(
+            nodes, edges, weights, np.zeros(4, dtype=np.int32), {0, 2},
+            stretch=1.3, radius=100)
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(new_nodes, [(0, 0), (20, 0), (10, 5)])
+        self.assertEqual(new_edges, [(0, 2), (1, 2)])
+        self.assertEqual(new_weights, [11.0, 11.0])
+        self.assertEqual(components.tolist(), [0, 0, 0])
+
+
+class NavgraphViewTests(SimpleTestCase):
+    def test_view_maps_served_arrays_without_npz(self):
+        import numpy as np
+        from PIL import Image
+        from project.navgraph import NavgraphView, build_navgraph, save_navgraph
+
+        mask = np.full((256, 256), 255, dtype=np.uint8)
+        mask[40:60, 30:200] = 0
+        document = {'version': 1, 'items': [
+            {'id': PASSAGE_ID_1, 'points': [[60, 128], [180, 128]], 'width': 8}]}
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_view.png')
+            Image.fromarray(mask).save(mask_path)
+            artifact = build_navgraph(
+                mask_path, region_polygon=[[10, 10], [245, 10], [245, 245], [10, 245]],
+                level_passages=document)
+            npz_path, bin_path = save_navgraph(artifact, mask_path, include_npz=False)
+            self.assertIsNone(npz_path)
+
+            with NavgraphView(bin_path) as view:
+                self.assertEqual(view.mask_shape, (256, 256))
+                self.assertEqual(view.passage_count, 1)
+                np.testing.assert_array_equal(view.nodes, artifact['nodes'])
+                np.testing.assert_array_equal(view.edges, artifact['edges'])
+                np.testing.assert_array_equal(view.weights, artifact['weights'])
+                np.testing.assert_array_equal(view.edge_kinds, artifact['edge_kinds'])
+                np.testing.assert_array_equal(view.hitzone, artifact['coarse_hitzone'] != 0)
+                self.assertEqual(
+                    list(view.passage_node_range(0)),
+                    list(range(int(artifact['base_node_count']), len(artifact['nodes']))))
+                self.assertFalse(view.weights.flags.owndata)
+                self.assertEqual(view.passage_revision, artifact['passage_revision'])
+
+            import brotli
+            import gzip
+            with open(bin_path, 'rb') as handle:
+                served = handle.read()
+            with open(bin_path + '.br', 'rb') as handle:
+                self.assertEqual(brotli.decompress(handle.read()), served)
+            with open(bin_path + '.gz', 'rb') as handle:
+                self.assertEqual(gzip.decompress(handle.read()), served)
+            self.assertEqual(os.stat(bin_path + '.br').st_mtime_ns,
+                             os.stat(bin_path).st_mtime_ns)
+
+            with open(bin_path, 'ab') as handle:
+                handle.write(b'\0')
+            with self.assertRaisesRegex(ValueError, 'header implies'):
+                NavgraphView(bin_path)
+
+
+    def test_staged_navgraph_installs_only_on_save(self):
+        import numpy as np
+        from PIL import Image
+        from project.navgraph import build_navgraph, save_navgraph, stage_navgraph
+
+        mask = np.full((96, 96), 243, dtype=np.uint8)
+        mask[30:40, 10:80] = 0
+        with tempfile.TemporaryDirectory() as directory:
+            mask_path = os.path.join(directory, 'mask_staged.png')
+            Image.fromarray(mask).save(mask_path)
+            artifact = build_navgraph(mask_path)
+
+            discarded = stage_navgraph(artifact, mask_path, include_npz=False)
+            discarded.discard()
+            self.assertEqual(os.listdir(directory), ['mask_staged.png'])
+
+            staged = stage_navgraph(artifact, mask_path, include_npz=False)
+            self.assertFalse(os.path.exists(staged.bin_path))
+            _, bin_path = save_navgraph(
+                artifact, mask_path, include_npz=False, staged=staged)
+
+            self.assertEqual(sorted(os.listdir(directory)), [
+                'mask_staged.navgraph.bin', 'mask_staged.navgraph.bin.br',
+                'mask_staged.navgraph.bin.gz', 'mask_staged.png'])
+            for suffix in ('.br', '.gz'):
+                self.assertEqual(os.stat(bin_path + suffix).st_mtime_ns,
+                                 os.stat(bin_path).st_mtime_ns)
+
+
+class NavgraphRouterTests(SimpleTestCase):
+    REGION = [[5, 5], [395, 5], [395, 295], [5, 295]]
+    CONFIG = {'dist_min_px': 150, 'dist_max_px': 400,
+              'primary_budget_ms': None, 'extra_budget_ms': None}
+
+    def _build(self, directory):
+        import numpy as np
+        from PIL import Image
+        from project.navgraph import build_navgraph, save_navgraph
+
+        mask = np.full((300, 400), 243, dtype=np.uint8)
+        mask[140:150, 40:360] = 0
+        mask[140:150, 190:215] = 243
+        mask[60:100, 100:140] = 120
+        mask[200:240, 250:300] = 0
+        mask_path = os.path.join(directory, 'mask_router.png')
+        Image.fromarray(mask).save(mask_path)
+        artifact = build_navgraph(mask_path, region_polygon=self.REGION)
+        _, bin_path = save_navgraph(artifact, mask_path, include_npz=False)
+        return bin_path, mask_path, mask
+
+    def test_graph_astar_finds_shortest_graph_path(self):
+        import numpy as np
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import dijkstra
+        from project.navgraph import NavgraphView
+        from project.navgraph_router import NavgraphRouter
+
+        with tempfile.TemporaryDirectory() as directory:
+            bin_path, _, mask = self._build(directory)
+            with NavgraphView(bin_path) as view:
+                router = NavgraphRouter(view, mask, config=self.CONFIG)
+                edges = np.asarray(view.edges, dtype=np.int64)
+                weights = np.asarray(view.weights, dtype=np.float64)
+                n = router.node_count
+                graph = coo_matrix((weights, (edges[:, 0], edges[:, 1])), shape=(n, n))
+                in_region = np.flatnonzero(router.node_in_region)
+                source, target = int(in_region[0]), int(in_region[-1])
+                expected = dijkstra(graph, directed=False, indices=source)[target]
+
+                node_path, cost = router.graph_astar(
+                    tuple(router.nodes[target]), [(source, 0.0)], [(target, 0.0)])
+                self.assertEqual(node_path[0], n)
+                self.assertEqual(node_path[-1], n + 1)
+                self.assertEqual(node_path[1:-1][0], source)
+                self.assertAlmostEqual(cost, expected, delta=expected * 1e-5)
+
+                blocked = {e for e in range(router.edge_count)
+                           if source in edges[e]}
+                self.assertIsNone(router.graph_astar(
+                    tuple(router.nodes[target]), [(source, 0.0)], [(target, 0.0)], blocked))
+
+    @skipUnless(shutil.which('node'), 'node is required for the JS router')
+    def test_route_attempts_match_browser_router(self):
+        from project.navgraph import NavgraphView
+        from project.navgraph_router import NavgraphRouter, make_rng
+
+        sys.path.insert(0, os.path.join(settings.BASE_DIR, 'scripts'))
+        try:
+            from navgraph_router_parity import compare_records, js_records
+        finally:
+            sys.path.pop(0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            bin_path, _, mask = self._build(directory)
+            with NavgraphView(bin_path) as view:
+                router = NavgraphRouter(view, mask, config=self.CONFIG)
+                rng = make_rng(11)
+                py = [router.route_attempt(rng) for _ in range(40)]
+            js = js_records(bin_path, mask, 11, 40, config=self.CONFIG)
+
+        self.assertEqual(compare_records(py, js), [])
+        self.assertTrue(any(record['reason'] == 'ok' for record in py))
+
+
 def level_passages_document(*, passage_id=PASSAGE_ID_1, width=24, points=None):
     return {
         'version': 1,
@@ -457,12 +1349,17 @@ class NavgraphInvalidationTests(TestCase):
     def test_successful_mask_edit_disables_infinite_play(self):
         with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
             artifact_paths = self._write_artifacts(media_root)
+            checkpoint_path = os.path.join(
+                media_root, 'masks', 'mask_enabled-map.navgraph.base.npz')
+            with open(checkpoint_path, 'wb') as checkpoint:
+                checkpoint.write(b'stale')
             response = self.client.post(reverse('save_mask'), {
                 'filename': self.file.map_file,
                 'file_id': str(self.file.id),
                 'file': SimpleUploadedFile('mask_enabled-map.png', b'updated mask', content_type='image/png'),
             })
             self.assertTrue(all(not os.path.exists(path) for path in artifact_paths))
+            self.assertTrue(os.path.exists(checkpoint_path))
 
         self.assertEqual(response.status_code, 200)
         self.assertFalse(response.json()['infinite_enabled'])
@@ -522,6 +1419,7 @@ class NavgraphInvalidationTests(TestCase):
                 mask_file.write(b'mask')
             with (
                 mock.patch('project.navgraph.build_navgraph', side_effect=invalidate_during_build),
+                mock.patch('project.navgraph.stage_navgraph'),
                 mock.patch('project.navgraph.save_navgraph'),
                 mock.patch('django.db.close_old_connections'),
             ):
@@ -1511,6 +2409,51 @@ class NavgraphServingGateTests(TestCase):
             self.assertEqual(response.status_code, 200)
             response.close()  # release the served .bin handle before cleanup
 
+    def test_served_artifact_supports_validators_ranges_and_precompression(self):
+        import brotli
+        document = level_passages_document()
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            file, _mask, bin_path = self._make_file(media_root, passages=document)
+            from project.navgraph import passage_revision
+            rev = passage_revision(normalize_level_passages(document), 8, 8)
+            _write_navgraph_bin(bin_path, rev, height=8, width=8)
+            with open(bin_path, 'rb') as handle:
+                served = handle.read()
+            with open(bin_path + '.br', 'wb') as handle:
+                handle.write(brotli.compress(served))
+            url = reverse('get_navgraph', args=[file.id])
+
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+            self.assertEqual(b''.join(response.streaming_content), served)
+            etag = response['ETag']
+            response.close()
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+            response = self.client.get(url, HTTP_RANGE='bytes=4-11')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes 4-11/{len(served)}')
+            self.assertEqual(b''.join(response.streaming_content), served[4:12])
+            response = self.client.get(url, HTTP_RANGE=f'bytes={len(served)}-')
+            self.assertEqual(response.status_code, 416)
+
+            # A sibling from another build (different mtime) is never served.
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertNotIn('Content-Encoding', response)
+            response.close()
+            stat = os.stat(bin_path)
+            os.utime(bin_path + '.br', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertEqual(brotli.decompress(b''.join(response.streaming_content)), served)
+            response.close()
+
     def test_artifact_currency_reuses_short_lived_result(self):
         document = level_passages_document()
         with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
@@ -1526,6 +2469,72 @@ class NavgraphServingGateTests(TestCase):
                             side_effect=AssertionError('cache miss')):
                 self.assertTrue(navgraph_artifact_is_current(file))
 
+    def test_registry_lists_maps_without_filesystem_checks(self):
+        from project.models import NavgraphArtifact
+        from project.services.media_access import (
+            delete_navgraph_artifacts, navgraph_artifact_is_current)
+
+        document = level_passages_document()
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            file, _mask, bin_path = self._make_file(media_root, passages=document)
+            from project.navgraph import passage_revision
+            rev = passage_revision(normalize_level_passages(document), 8, 8)
+            _write_navgraph_bin(bin_path, rev, height=8, width=8)
+
+            # An unregistered artifact is checked once and then registered.
+            self.assertTrue(navgraph_artifact_is_current(file))
+            row = NavgraphArtifact.objects.get(file=file)
+            self.assertEqual((row.width, row.height, row.passage_revision), (8, 8, rev))
+
+            with mock.patch('project.services.media_access._navgraph_artifact_is_current_uncached',
+                            side_effect=AssertionError('filesystem check')), \
+                    mock.patch('project.services.media_access.os.stat',
+                               side_effect=AssertionError('stat')):
+                # Session, user, profile and team lookups, then one map query.
+                with self.assertNumQueries(5):
+                    response = self.client.get(reverse('infinity_mask_maps'))
+            self.assertEqual([m['id'] for m in response.json()['maps']], [file.id])
+
+            # A binary replaced behind the registry's back is re-checked.
+            _write_navgraph_bin(bin_path, 'p1-staaaaaale0000', height=8, width=8)
+            os.utime(bin_path, ns=(row.bin_mtime_ns + 10**9, row.bin_mtime_ns + 10**9))
+            file.refresh_from_db()
+            self.assertFalse(navgraph_artifact_is_current(file))
+            self.assertFalse(NavgraphArtifact.objects.filter(file=file).exists())
+
+            _write_navgraph_bin(bin_path, rev, height=8, width=8)
+            file.refresh_from_db()
+            self.assertTrue(navgraph_artifact_is_current(file))
+            delete_navgraph_artifacts(file)
+            self.assertFalse(NavgraphArtifact.objects.filter(file=file).exists())
+            self.assertEqual(self.client.get(reverse('infinity_mask_maps')).json()['maps'], [])
+
+    def test_publishing_a_shared_mask_drops_the_other_files_rows(self):
+        from project.models import NavgraphArtifact
+        from project.services.media_access import (
+            navgraph_artifact_is_current, navgraph_artifact_is_listed,
+            record_navgraph_artifact)
+
+        document = level_passages_document()
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            file, mask_path, bin_path = self._make_file(media_root, passages=document)
+            sibling = File.objects.create(
+                name='Gate copy', team=self.team, map_file='gate-map.png',
+                has_mask=True, infinite_enabled=True,
+                level_passages=normalize_level_passages(document))
+            from project.navgraph import passage_revision
+            rev = passage_revision(normalize_level_passages(document), 8, 8)
+            _write_navgraph_bin(bin_path, rev, height=8, width=8)
+            self.assertTrue(navgraph_artifact_is_current(file))
+            self.assertTrue(navgraph_artifact_is_current(sibling))
+
+            # Publishing for one File replaces the binary the other's row vouched for.
+            _write_navgraph_bin(bin_path, 'p1-0therd0cument0', height=8, width=8)
+            record_navgraph_artifact(file, bin_path, mask_path)
+            self.assertFalse(NavgraphArtifact.objects.filter(file=sibling).exists())
+            sibling.refresh_from_db()
+            self.assertFalse(navgraph_artifact_is_listed(sibling))
+
     def test_stale_artifact_is_not_served(self):
         document = level_passages_document()
         with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
@@ -1656,7 +2665,9 @@ class NavgraphRebuildAuthorityTests(TestCase):
         _write_mask_png(os.path.join(masks_dir, 'mask_rebuild-map.png'))
         with (
             mock.patch('project.navgraph.build_navgraph', side_effect=side_effect),
-            mock.patch('project.navgraph.save_navgraph') as save_mock,
+            mock.patch('project.navgraph.stage_navgraph'),
+            mock.patch('project.navgraph.save_navgraph', return_value=(
+                None, os.path.join(masks_dir, 'mask_rebuild-map.navgraph.bin'))) as save_mock,
             mock.patch('django.db.close_old_connections'),
         ):
             project_views._rebuild_navgraph_for_file(
@@ -1674,6 +2685,44 @@ class NavgraphRebuildAuthorityTests(TestCase):
             self.assertTrue(self.file.infinite_enabled)
             self.assertEqual(self.file.batch_progress['status'], 'done')
 
+    def test_queued_build_reports_position_and_leaves_when_superseded(self):
+        from project.services.heavy_jobs import HeavyJobScheduler
+
+        scheduler = HeavyJobScheduler(0)
+        running = scheduler.acquire('mask', 1)
+        reports = []
+        real_admit = scheduler.admit
+
+        def admit(kind, mpx, *, on_wait, **kwargs):
+            def supersede_while_queued(position, eta):
+                self.assertTrue(on_wait(position, eta))
+                self.file.refresh_from_db()
+                reports.append(self.file.batch_progress)
+                File.objects.filter(id=self.file.id).update(batch_progress={
+                    'type': 'navgraph_build', 'status': 'building', 'build_token': 'tok-2',
+                })
+                return on_wait(position, eta)
+            return real_admit(kind, mpx, on_wait=supersede_while_queued, **kwargs)
+
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                with (
+                    mock.patch.object(project_views, 'HEAVY_JOBS', scheduler),
+                    mock.patch.object(scheduler, 'admit', side_effect=admit),
+                ):
+                    save_mock = self._run_build(media_root, AssertionError('built'))
+        finally:
+            running.release()
+
+        save_mock.assert_not_called()
+        self.assertEqual(reports[0]['phase'], 'queued')
+        self.assertEqual(reports[0]['queue_position'], 1)
+        self.assertEqual(reports[0]['build_token'], 'tok-1')
+        self.assertEqual(scheduler.snapshot(), {'running': [], 'waiting': []})
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.batch_progress['build_token'], 'tok-2')
+        self.assertFalse(self.file.infinite_enabled)
+
     def test_connector_failure_is_persisted_as_structured_passage_error(self):
         from project.navgraph import PassageConnectorError
 
@@ -1797,6 +2846,375 @@ class NavgraphRebuildAuthorityTests(TestCase):
             self.assertEqual(self.file.batch_progress['status'], 'building')
 
 
+class NavgraphBuildQueueTests(TestCase):
+    """Queue mode hands builds to ``navgraph_worker`` instead of a web thread."""
+
+    def setUp(self):
+        self.team = Team.objects.create(name='Queue Team')
+        self.trainer = User.objects.create_user(username='queue-trainer', password='pw')
+        Group.objects.create(name='Trainer').user_set.add(self.trainer)
+        profile = Profile.objects.create(user=self.trainer, active_team=self.team)
+        profile.teams.add(self.team)
+        self.client.force_login(self.trainer)
+        self.file = File.objects.create(
+            name='Queued mask', team=self.team, map_file='queue-map.png',
+            has_mask=True, infinite_region=[[8, 8], [24, 8], [24, 24], [8, 24]],
+        )
+
+    def _enqueue(self, token):
+        from project.services.navgraph_jobs import enqueue_navgraph_build
+        File.objects.filter(id=self.file.id).update(batch_progress={
+            'type': 'navgraph_build', 'status': 'building', 'build_token': token,
+        })
+        return enqueue_navgraph_build(self.file.id, token, enable_on_success=True)
+
+    @override_settings(NAVGRAPH_BUILD_MODE='queue')
+    def test_enable_in_queue_mode_records_job_without_thread(self):
+        from project.models import NavgraphBuildJob
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            _write_mask_png(
+                os.path.join(media_root, 'masks', 'mask_queue-map.png'), width=32, height=32)
+            with mock.patch.object(project_views, '_rebuild_navgraph_for_file') as thread_target:
+                response = self.client.post(
+                    reverse('toggle_infinite', args=[self.file.id]),
+                    data=json.dumps({'enabled': True}), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        thread_target.assert_not_called()
+        job = NavgraphBuildJob.objects.get(file=self.file)
+        self.assertEqual(job.build_token, response.json()['build_token'])
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_QUEUED)
+        self.assertTrue(job.enable_on_success)
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.batch_progress['phase'], 'queued')
+
+    def test_worker_once_runs_claimed_job_and_marks_it_done(self):
+        from django.core.management import call_command
+        from project.models import NavgraphBuildJob
+
+        job = self._enqueue('tok-q1')
+        with mock.patch.object(project_views, '_rebuild_navgraph_for_file_locked') as rebuild:
+            call_command('navgraph_worker', '--once', '--inline', stdout=mock.MagicMock())
+
+        rebuild.assert_called_once_with(
+            self.file.id, enable_on_success=True, build_token='tok-q1')
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(NAVGRAPH_BUILD_STALE_SECONDS=60, NAVGRAPH_BUILD_MAX_ATTEMPTS=2)
+    def test_lost_running_job_is_requeued_then_failed_after_max_attempts(self):
+        from project.models import NavgraphBuildJob
+        from project.services.navgraph_jobs import (
+            claim_navgraph_build_job, requeue_stale_navgraph_build_jobs,
+        )
+
+        job = self._enqueue('tok-q2')
+        claim_navgraph_build_job('worker-a')
+        old = timezone.now() - timedelta(minutes=5)
+        NavgraphBuildJob.objects.filter(id=job.id).update(heartbeat_at=old)
+        self.assertEqual(requeue_stale_navgraph_build_jobs(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_QUEUED)
+
+        claim_navgraph_build_job('worker-b')
+        # A restarted worker immediately reclaims jobs recorded under its id.
+        self.assertEqual(requeue_stale_navgraph_build_jobs(worker='worker-b'), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_FAILED)
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.batch_progress['status'], 'failed')
+        self.assertFalse(self.file.infinite_enabled)
+
+    @override_settings(NAVGRAPH_BUILD_STALE_SECONDS=60)
+    def test_superseded_claim_cannot_finish_the_job(self):
+        from project.models import NavgraphBuildJob
+        from project.services.navgraph_jobs import (
+            claim_navgraph_build_job, finish_navgraph_build_job,
+            requeue_stale_navgraph_build_jobs,
+        )
+
+        job = self._enqueue('tok-q5')
+        first = claim_navgraph_build_job('host:1')
+        NavgraphBuildJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(minutes=5))
+        requeue_stale_navgraph_build_jobs()
+        second = claim_navgraph_build_job('host:2')
+
+        self.assertIsNone(finish_navgraph_build_job(first, error='RuntimeError: late'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_RUNNING)
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.batch_progress['status'], 'building')
+
+        self.assertEqual(finish_navgraph_build_job(second).status,
+                         NavgraphBuildJob.STATUS_DONE)
+
+    def test_default_worker_id_leaves_other_local_workers_jobs_running(self):
+        from django.core.management import call_command
+        from project.models import NavgraphBuildJob
+        from project.services.navgraph_jobs import claim_navgraph_build_job
+
+        job = self._enqueue('tok-q6')
+        claim_navgraph_build_job(socket.gethostname())
+        call_command('navgraph_worker', '--once', '--inline', stdout=mock.MagicMock())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_RUNNING)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(NAVGRAPH_BUILD_MAX_ATTEMPTS=2)
+    def test_crashed_build_process_is_retried_then_fails_progress(self):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+        from django.core.management import call_command
+        from project.management.commands import navgraph_worker
+        from project.models import NavgraphBuildJob
+
+        executors = []
+
+        class CrashingExecutor:
+            def submit(self, fn, *args):
+                future = Future()
+                future.set_exception(BrokenProcessPool('child terminated abruptly'))
+                return future
+
+            def shutdown(self, wait=True):
+                pass
+
+        def executor(_self, _concurrency):
+            executors.append(CrashingExecutor())
+            return executors[-1]
+
+        job = self._enqueue('tok-q3')
+        with mock.patch.object(navgraph_worker.Command, '_executor', executor):
+            call_command('navgraph_worker', '--once', '--poll-interval', '0.1',
+                         stdout=mock.MagicMock(), stderr=mock.MagicMock())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('BrokenProcessPool', job.error)
+        self.assertEqual(len(executors), 3)
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.batch_progress['status'], 'failed')
+        self.assertEqual(self.file.batch_progress['build_token'], 'tok-q3')
+
+    def test_raising_inline_build_fails_progress_and_heartbeats(self):
+        from django.core.management import call_command
+        from project.management.commands import navgraph_worker
+        from project.models import NavgraphBuildJob
+
+        job = self._enqueue('tok-q4')
+
+        def slow_failure(*args, **kwargs):
+            time.sleep(0.35)
+            raise RuntimeError('boom')
+
+        with mock.patch.object(project_views, '_rebuild_navgraph_for_file_locked',
+                               side_effect=slow_failure), \
+                mock.patch.object(navgraph_worker, 'heartbeat_navgraph_build_jobs') as beat:
+            call_command('navgraph_worker', '--once', '--inline', '--poll-interval', '0.1',
+                         stdout=mock.MagicMock(), stderr=mock.MagicMock())
+
+        beat.assert_called_with([job.id])
+        job.refresh_from_db()
+        self.assertEqual(job.status, NavgraphBuildJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'RuntimeError: boom')
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.batch_progress['status'], 'failed')
+
+    @override_settings(NAVGRAPH_BUILD_WORKERS=4, NAVGRAPH_BUILD_MEMORY_BUDGET_MB=7000,
+                       NAVGRAPH_BUILD_JOB_MEMORY_MB=3000)
+    def test_concurrency_is_capped_by_memory_budget(self):
+        from project.services.navgraph_jobs import navgraph_build_concurrency
+        self.assertEqual(navgraph_build_concurrency(), 2)
+
+
+class HeavyJobSchedulerTests(SimpleTestCase):
+    """Memory-budget admission of navgraph builds and mask generation."""
+
+    def _scheduler(self, budget_mb, **kwargs):
+        from project.services.heavy_jobs import HeavyJobKind, HeavyJobScheduler
+        kinds = {'job': HeavyJobKind(base_mb=100, mb_per_mpx=100, seconds_per_mpx=10,
+                                     base_seconds=0)}
+        return HeavyJobScheduler(budget_mb, kinds=kinds, **kwargs)
+
+    def _acquire_in_thread(self, scheduler, mpx, **kwargs):
+        import threading
+        result = {}
+
+        def run():
+            try:
+                result['admission'] = scheduler.acquire('job', mpx, poll_seconds=0.02, **kwargs)
+            except Exception as exc:
+                result['error'] = exc
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread, result
+
+    def test_small_job_runs_beside_large_one_within_budget(self):
+        scheduler = self._scheduler(1000)
+        large = scheduler.acquire('job', 6)   # 700 MB
+        small = scheduler.acquire('job', 1)   # 200 MB
+        self.assertEqual(len(scheduler.snapshot()['running']), 2)
+        small.release()
+        large.release()
+        self.assertEqual(scheduler.snapshot(), {'running': [], 'waiting': []})
+
+    def test_over_budget_job_waits_and_reports_position_and_eta(self):
+        scheduler = self._scheduler(1000)
+        running = scheduler.acquire('job', 6)
+        reports = []
+        thread, result = self._acquire_in_thread(
+            scheduler, 6, on_wait=lambda position, eta: reports.append((position, eta)))
+        thread.join(0.3)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(reports[0][0], 1)
+        self.assertAlmostEqual(reports[0][1], 60, delta=5)  # the running job's 60 s estimate
+        running.release()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        result['admission'].release()
+
+    def test_on_wait_false_withdraws_the_job(self):
+        from project.services.heavy_jobs import HeavyJobCancelled
+        scheduler = self._scheduler(1000)
+        running = scheduler.acquire('job', 6)
+        with self.assertRaises(HeavyJobCancelled):
+            scheduler.acquire('job', 6, on_wait=lambda position, eta: False)
+        self.assertEqual(scheduler.snapshot()['waiting'], [])
+        running.release()
+
+    def test_zero_budget_runs_one_job_at_a_time(self):
+        scheduler = self._scheduler(0)
+        first = scheduler.acquire('job', 0.01)
+        thread, result = self._acquire_in_thread(scheduler, 0.01)
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        first.release()
+        thread.join(2)
+        self.assertIn('admission', result)
+        result['admission'].release()
+
+    def test_starving_job_is_not_overtaken(self):
+        scheduler = self._scheduler(1000, starvation_seconds=0)
+        running = scheduler.acquire('job', 6)
+        thread, result = self._acquire_in_thread(scheduler, 6)
+        thread.join(0.2)
+        small_thread, small = self._acquire_in_thread(scheduler, 1)
+        small_thread.join(0.2)
+        self.assertTrue(small_thread.is_alive(), 'small job overtook a starving one')
+        running.release()
+        thread.join(2)
+        result['admission'].release()
+        small_thread.join(2)
+        small['admission'].release()
+
+    def test_history_refines_duration_estimate(self):
+        scheduler = self._scheduler(1000)
+        self.assertEqual(scheduler.estimate('job', 2), (300, 20))
+        scheduler.record('job', 2, seconds=4)
+        self.assertLess(scheduler.estimate('job', 2)[1], 20)
+
+
+class ConvertMasksToGreyCommandTests(SimpleTestCase):
+    def test_lossless_masks_are_rewritten_with_their_mtime(self):
+        import numpy as np
+        from django.core.management import call_command
+        from io import StringIO
+        from PIL import Image
+
+        grey = np.tile(np.array([0, 135, 200, 243], dtype=np.uint8), (9, 5))
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            masks = os.path.join(media_root, 'masks')
+            os.makedirs(masks)
+            rgba = np.dstack([grey, grey, grey, np.full_like(grey, 255)])
+            Image.fromarray(rgba, 'RGBA').save(os.path.join(masks, 'mask_a.png'))
+            tinted = np.dstack([grey, grey, grey])
+            tinted[0, 0, 1] = 1
+            Image.fromarray(tinted, 'RGB').save(os.path.join(masks, 'mask_b.png'))
+            os.utime(os.path.join(masks, 'mask_a.png'), ns=(10**18, 10**18))
+
+            call_command('convert_masks_to_grey', '--dry-run', stdout=StringIO(), stderr=StringIO())
+            with Image.open(os.path.join(masks, 'mask_a.png')) as img:
+                self.assertEqual(img.mode, 'RGBA')
+
+            out, err = StringIO(), StringIO()
+            call_command('convert_masks_to_grey', stdout=out, stderr=err)
+
+            with Image.open(os.path.join(masks, 'mask_a.png')) as img:
+                self.assertEqual(img.mode, 'L')
+                np.testing.assert_array_equal(np.asarray(img), grey)
+            with Image.open(os.path.join(masks, 'mask_b.png')) as img:
+                self.assertEqual(img.mode, 'RGB')
+            self.assertEqual(os.stat(os.path.join(masks, 'mask_a.png')).st_mtime_ns, 10**18)
+            self.assertEqual(sorted(os.listdir(masks)), ['mask_a.png', 'mask_b.png'])
+        self.assertIn('Converted 1 mask(s), skipped 1', out.getvalue())
+        self.assertIn('mask_b.png', err.getvalue())
+
+
+class CompareMaskModelsCommandTests(SimpleTestCase):
+    class _RedClassSession:
+        """Fake ONNX session: class id = red // 8, or a constant class."""
+
+        def __init__(self, constant=None):
+            self.constant = constant
+
+        def get_inputs(self):
+            from types import SimpleNamespace
+            return [SimpleNamespace(shape=['batch', 3, 'height', 'width'])]
+
+        def run(self, _outputs, feeds):
+            import numpy as np
+            red = feeds['input'][:, :1] * 255
+            if self.constant is not None:
+                red = np.full_like(red, self.constant * 8)
+            centres = np.arange(36, dtype=np.float32)[None, :, None, None]
+            return [-np.abs(np.floor(red / 8) - centres)]
+
+    def _run(self, candidate_session, directory):
+        import numpy as np
+        from django.core.management import call_command
+        from io import StringIO
+        from PIL import Image
+
+        rng = np.random.default_rng(17)
+        map_path = os.path.join(directory, 'map.png')
+        Image.fromarray(rng.integers(0, 256, (120, 150, 3), dtype=np.uint8)).save(map_path)
+        variants = {}
+        for variant, session in (('float32', self._RedClassSession()),
+                                 ('int8', candidate_session)):
+            model_path = os.path.join(directory, f'{variant}.onnx')
+            open(model_path, 'wb').close()
+            variants[variant] = UNet._InferenceSessionCache(
+                model_path, loader=lambda _path, session=session: session)
+        out = StringIO()
+        with mock.patch.dict(UNet._variant_sessions, variants):
+            call_command('compare_mask_models', map_path,
+                         '--output', os.path.join(directory, 'report.json'), stdout=out)
+        with open(os.path.join(directory, 'report.json'), encoding='utf-8') as handle:
+            return out.getvalue(), json.load(handle)
+
+    def test_identical_variants_pass_the_gate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output, report = self._run(self._RedClassSession(), directory)
+
+        self.assertIn('Gate passed', output)
+        self.assertEqual(report['agreement'], 1.0)
+        self.assertEqual(report['failures'], [])
+        self.assertEqual(sum(row['pixels'] for row in report['classes'].values()), 120 * 150)
+
+    def test_disagreeing_candidate_fails_the_gate(self):
+        from django.core.management import CommandError
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, 'Gate failed'):
+                self._run(self._RedClassSession(constant=30), directory)
+
+
 class BuildNavgraphCommandAmbiguityTests(TestCase):
     """CR 8.4 item 5: shared-map ambiguity is skipped with a diagnostic."""
 
@@ -1828,6 +3246,27 @@ class BuildNavgraphCommandAmbiguityTests(TestCase):
         self.assertFalse(os.path.isfile(
             os.path.join(media_root, 'masks', 'mask_shared.navgraph.bin')))
 
+    def test_rebuild_drops_registry_rows_for_the_mask(self):
+        from django.core.management import call_command
+        from project.models import NavgraphArtifact
+        from project.services.media_access import navgraph_artifact_is_current
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            file = File.objects.create(
+                name='Registered', team=self.team, map_file='registered.png',
+                has_mask=True, infinite_enabled=True)
+            mask_path = os.path.join(media_root, 'masks', 'mask_registered.png')
+            _write_mask_png(mask_path, width=32, height=32)
+            call_command('build_navgraph', file=str(file.id), stdout=mock.MagicMock())
+            self.assertTrue(navgraph_artifact_is_current(file))
+            self.assertTrue(NavgraphArtifact.objects.filter(file=file).exists())
+
+            call_command('build_navgraph', file=str(file.id), force=True,
+                         stdout=mock.MagicMock())
+
+            self.assertFalse(NavgraphArtifact.objects.filter(file=file).exists())
+            self.assertTrue(navgraph_artifact_is_current(file))
+
     def test_default_build_is_binary_only_and_binary_is_fresh(self):
         from django.core.management import call_command
         from io import StringIO
@@ -1847,3 +3286,42 @@ class BuildNavgraphCommandAmbiguityTests(TestCase):
             call_command('build_navgraph', file=mask_path, stdout=second)
             self.assertIn('SKIP', second.getvalue())
             self.assertIn('up to date', second.getvalue())
+
+
+class BenchmarkNavgraphCommandTests(TestCase):
+    def test_report_and_baseline_regression_gate(self):
+        from django.core.management import CommandError, call_command
+        from io import StringIO
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            mask_path = os.path.join(media_root, 'masks', 'mask_bench.png')
+            _write_mask_png(mask_path, width=48, height=48)
+            prefix = os.path.join(media_root, 'reports', 'baseline')
+
+            call_command('benchmark_navgraph', mask_path, '--repeat', '2', '--inline',
+                         '--output', prefix, stdout=StringIO())
+            with open(prefix + '.json', encoding='utf-8') as handle:
+                report = json.load(handle)
+            summary = report['masks']['mask_bench.png']['summary']
+            self.assertEqual(summary['repeats'], 2)
+            self.assertIn('edges', summary['stages'])
+            self.assertGreater(summary['bin_bytes'], 0)
+            self.assertGreater(summary['tracemalloc_peak_mb'], 0)
+            with open(prefix + '.csv', encoding='utf-8') as handle:
+                self.assertEqual(len(handle.read().splitlines()), 2)
+            # The bin is built beside a scratch copy, never beside the mask.
+            self.assertFalse(os.path.exists(
+                os.path.join(media_root, 'masks', 'mask_bench.navgraph.bin')))
+
+            summary['bin_bytes'] //= 2
+            summary['n_nodes'] += 1
+            with open(prefix + '.json', 'w', encoding='utf-8') as handle:
+                json.dump(report, handle)
+            out = StringIO()
+            with self.assertRaisesRegex(CommandError, '1 regression'):
+                call_command('benchmark_navgraph', mask_path, '--repeat', '1', '--inline',
+                             '--no-tracemalloc', '--baseline', prefix + '.json',
+                             '--output', os.path.join(media_root, 'reports', 'new'),
+                             stdout=out)
+            self.assertIn('.bin size', out.getvalue())
+            self.assertIn('n_nodes', out.getvalue())
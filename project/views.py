@@ -26,9 +26,11 @@ import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 
-from .services.heavy_jobs import HEAVY_JOB_SLOT
+from .services.heavy_jobs import HEAVY_JOBS, HeavyJobCancelled
 from .services.media_access import (
     delete_navgraph_artifacts,
+    navgraph_raster_cache,
+    record_navgraph_artifact,
     safe_media_filename,
     serve_map_file,
     serve_mask_file,
@@ -659,7 +661,7 @@ def open_file(request, file_id):
 def get_map(request, filename):
     if not user_can_access_map_file(request, filename):
         return HttpResponseNotFound("Map not found.")
-    return serve_map_file(filename)
+    return serve_map_file(request, filename)
 
 
 @require_GET
@@ -667,7 +669,7 @@ def get_mask(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
     if not user_can_access_file(request, file):
         return HttpResponseNotFound("Mask not found.")
-    return serve_mask_file(file)
+    return serve_mask_file(request, file)
 
 
 @require_GET
@@ -675,7 +677,7 @@ def get_navgraph(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
     if not user_can_access_file(request, file):
         return HttpResponseNotFound("Navgraph not found.")
-    return serve_navgraph_file(file)
+    return serve_navgraph_file(request, file)
 
 
 @role_required('Trainer')
@@ -841,19 +843,58 @@ def region_suggest(request, file_id):
     return JsonResponse({'polygon': [], 'source': 'empty'})
 
 
+def _navgraph_job_mpx(file_id):
+    """Mask size of a File in megapixels, for heavy-job admission (0 if unknown)."""
+    file = File.objects.filter(id=file_id, deleted=False).only('map_file').first()
+    mask_path = _mask_path_for_file(file) if file else None
+    try:
+        width, height = _mask_dimensions(mask_path)
+    except Exception:
+        return 0.0
+    return width * height / 1e6
+
+
 def _rebuild_navgraph_for_file(file_id, enable_on_success=False, build_token=None):
     """Entry point for the background navgraph rebuild thread.
 
-    Waits for the process-wide heavy-job slot (``services.heavy_jobs``) so at
-    most one navgraph build or mask generation holds large arrays at a time;
-    queued builds simply start when the slot frees. The build-token check in
-    ``_rebuild_navgraph_for_file_locked`` runs only *after* the slot is
-    acquired, so a build superseded while queued still no-ops. Releasing after
-    the inner call returns also means the worker's frame — and the built
-    artifact it references — is gone before the next job starts allocating."""
-    with HEAVY_JOB_SLOT:
-        _rebuild_navgraph_for_file_locked(
-            file_id, enable_on_success=enable_on_success, build_token=build_token)
+    Waits for admission under the container's heavy-job memory budget
+    (``services.heavy_jobs``), estimated from the mask size. While queued, the
+    queue position and ETA are written to ``batch_progress`` (phase
+    ``queued``); a build whose token is superseded meanwhile leaves the queue
+    without running. The build-token check in
+    ``_rebuild_navgraph_for_file_locked`` still runs after admission. Releasing
+    after the inner call returns also means the worker's frame — and the built
+    artifact it references — is gone before its budget is handed on."""
+    from django.db import close_old_connections
+
+    def report_queue(position, eta_seconds):
+        if not build_token:
+            return True
+        updated = File.objects.filter(
+            id=file_id,
+            batch_progress__build_token=build_token,
+            batch_progress__status='building',
+        ).update(batch_progress={
+            'type': 'navgraph_build', 'status': 'building',
+            'build_token': build_token,
+            'percent': 0,
+            'phase': 'queued',
+            'queue_position': position,
+            'eta_seconds': eta_seconds,
+            'updated_at': timezone.now().isoformat(),
+        })
+        return bool(updated)
+
+    close_old_connections()
+    try:
+        mpx = _navgraph_job_mpx(file_id)
+        with HEAVY_JOBS.admit('navgraph', mpx, on_wait=report_queue):
+            _rebuild_navgraph_for_file_locked(
+                file_id, enable_on_success=enable_on_success, build_token=build_token)
+    except HeavyJobCancelled:
+        return
+    finally:
+        close_old_connections()
 
 
 def _rebuild_navgraph_for_file_locked(file_id, enable_on_success=False, build_token=None):
@@ -873,6 +914,7 @@ def _rebuild_navgraph_for_file_locked(file_id, enable_on_success=False, build_to
     served to players."""
     from django.db import close_old_connections
     close_old_connections()
+    staged = None
     try:
         file = File.objects.filter(id=file_id, deleted=False).first()
         if not file:
@@ -919,7 +961,7 @@ def _rebuild_navgraph_for_file_locked(file_id, enable_on_success=False, build_to
             return
         from .navgraph import (
             build_navgraph, filter_level_passages_for_region, save_navgraph,
-            passage_revision, region_revision,
+            passage_revision, region_revision, stage_navgraph,
         )
         # One coherent snapshot of everything the build depends on.
         region = file.infinite_region if isinstance(file.infinite_region, list) else None
@@ -967,13 +1009,22 @@ def _rebuild_navgraph_for_file_locked(file_id, enable_on_success=False, build_to
             # builder to abort at its next cooperative progress checkpoint.
             return False
 
+        # Passage-only edits reuse the persisted base graph for this exact mask
+        # and region, mask edits rebuild only around the changed tiles, and
+        # region edits still reuse the cached mask rasters.
         artifact = build_navgraph(
             mask_path, region_polygon=region, level_passages=passages,
-            progress_callback=report_progress)
+            progress_callback=report_progress, reuse_base=True,
+            raster_cache=navgraph_raster_cache(),
+            memory_budget_mb=settings.NAVGRAPH_BUILD_JOB_MEMORY_MB,
+            edge_workers=settings.NAVGRAPH_EDGE_WORKERS)
         H, W = int(artifact['mask_shape'][0]), int(artifact['mask_shape'][1])
         built_passage_revision = artifact['passage_revision']
         built_region_revision = artifact['stats'].get(
             'region_revision', region_revision(region, W, H))
+        # Serialise and compress (Brotli q11 takes seconds on large graphs)
+        # before taking the row lock; only the renames run under it.
+        staged = stage_navgraph(artifact, mask_path, include_npz=False)
         with transaction.atomic():
             file = File.objects.select_for_update().get(id=file_id)
             progress = file.batch_progress
@@ -1020,7 +1071,9 @@ def _rebuild_navgraph_for_file_locked(file_id, enable_on_success=False, build_to
                 file.save(update_fields=['infinite_enabled', 'batch_progress'])
                 return
             # Current: publish the artifact atomically, then flip the flag.
-            save_navgraph(artifact, mask_path, include_npz=False)
+            _npz_path, bin_path = save_navgraph(
+                artifact, mask_path, include_npz=False, staged=staged)
+            record_navgraph_artifact(file, bin_path, mask_path, stats=artifact['stats'])
             file.infinite_enabled = bool(enable_on_success)
             file.batch_progress = {
                 'type': 'navgraph_build', 'status': 'done',
@@ -1075,6 +1128,8 @@ def _rebuild_navgraph_for_file_locked(file_id, enable_on_success=False, build_to
                 batch_progress=failure,
             )
     finally:
+        if staged is not None:
+            staged.discard()
         close_old_connections()
 
 
@@ -1191,7 +1246,9 @@ def toggle_infinite(request, file_id):
       tightened in from the whole-map frame, else routes could run around the
       edge), then kicks off the navgraph build in the background. The
       ``infinite_enabled`` flag is *not* flipped here — the build thread flips it
-      only on success (see ``_rebuild_navgraph_for_file``). Returns
+      only on success (see ``_rebuild_navgraph_for_file``). With
+      ``NAVGRAPH_BUILD_MODE=queue`` the build is handed to ``navgraph_worker``
+      via a ``NavgraphBuildJob`` row instead of a web-worker thread. Returns
       ``{status:'building'}``; the editor polls ``navgraph_build_status``.
     * **Disable** — clears the flag immediately, no build."""
     import json as _json
@@ -1231,18 +1288,26 @@ def toggle_infinite(request, file_id):
 
         # Build the navgraph in the background; the flag flips on success only.
         import threading
+        from .services.navgraph_jobs import enqueue_navgraph_build, navgraph_build_queue_enabled
         build_token = uuid.uuid4().hex
-        File.objects.filter(id=file.id).update(batch_progress={
-            'type': 'navgraph_build', 'status': 'building',
-            'build_token': build_token,
-            'percent': 0,
-            'phase': 'starting',
-            'updated_at': tz.now().isoformat(),
-        }, infinite_enabled=False)
-        threading.Thread(
-            target=_rebuild_navgraph_for_file, args=(file.id,),
-            kwargs={'enable_on_success': True, 'build_token': build_token}, daemon=True,
-        ).start()
+        queued = navgraph_build_queue_enabled()
+        with transaction.atomic():
+            File.objects.filter(id=file.id).update(batch_progress={
+                'type': 'navgraph_build', 'status': 'building',
+                'build_token': build_token,
+                'percent': 0,
+                'phase': 'queued' if queued else 'starting',
+                'updated_at': tz.now().isoformat(),
+            }, infinite_enabled=False)
+            if queued:
+                # navgraph_worker picks the job up; the token contract is the
+                # same as for the in-process thread below.
+                enqueue_navgraph_build(file.id, build_token, enable_on_success=True)
+        if not queued:
+            threading.Thread(
+                target=_rebuild_navgraph_for_file, args=(file.id,),
+                kwargs={'enable_on_success': True, 'build_token': build_token}, daemon=True,
+            ).start()
 
         return JsonResponse({
             'status': 'building',
@@ -1929,6 +1994,8 @@ def save_mask(request):
                     temp_file.write(chunk)
             os.replace(temp_path, mask_path)
             temp_path = None
+        # The base checkpoint stays: the next build diffs it against the new
+        # mask and rebuilds only around the changed tiles.
         delete_navgraph_artifacts(file)
     finally:
         if temp_path and os.path.exists(temp_path):
@@ -5,7 +5,7 @@ from django.urls import reverse
 from django.views.decorators.http import require_GET, require_http_methods
 
 from project.services.media_access import (
-    navgraph_artifact_is_current,
+    navgraph_artifact_is_listed,
     serve_map_file,
     serve_mask_file,
     serve_navgraph_file,
@@ -182,13 +182,13 @@ def debug_user_route_files(request):
         File.objects
         .filter(deleted=False, has_mask=True)
         .exclude(map_file="")
-        .select_related("team")
+        .select_related("team", "navgraph_artifact")
         .order_by("-last_edited")
     )
     payload = []
     for file in files:
         passages = normalize_level_passages(file.level_passages)
-        route_ready = navgraph_artifact_is_current(file)
+        route_ready = navgraph_artifact_is_listed(file)
         payload.append({
             "id": file.id,
             "name": file.name,
@@ -214,21 +214,21 @@ def debug_user_route_file_map(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
     if not file.map_file:
         return JsonResponse({"error": "Map not found."}, status=404)
-    return serve_map_file(file.map_file)
+    return serve_map_file(request, file.map_file)
 
 
 @superuser_required
 @require_GET
 def debug_user_route_file_mask(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
-    return serve_mask_file(file)
+    return serve_mask_file(request, file)
 
 
 @superuser_required
 @require_GET
 def debug_user_route_file_navgraph(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
-    return serve_navgraph_file(file)
+    return serve_navgraph_file(request, file)
 
 
 @superuser_required
@@ -283,11 +283,11 @@ def debug_infinity_file_map(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
     if not file.map_file:
         return JsonResponse({"error": "Map not found."}, status=404)
-    return serve_map_file(file.map_file)
+    return serve_map_file(request, file.map_file)
 
 
 @superuser_required
 @require_GET
 def debug_infinity_file_mask(request, file_id):
     file = get_object_or_404(File, id=file_id, deleted=False)
-    return serve_mask_file(file)
+    return serve_mask_file(request, file)
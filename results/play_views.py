@@ -131,17 +131,18 @@ def infinite_mask_maps(request):
             qs = qs.filter(Q(team=active_team) | Q(team__shared_pool=True)).distinct()
         else:
             qs = qs.filter(team=active_team)
-    qs = qs.select_related('team').order_by('-last_edited')
+    qs = qs.select_related('team', 'navgraph_artifact').order_by('-last_edited')
 
-    from project.services.media_access import navgraph_artifact_is_current
+    from project.services.media_access import navgraph_artifact_is_listed
 
     maps = []
     for f in qs:
         # Existence alone is not enough: a passage/mask edit can leave a stale
         # artifact on disk whose baked revision no longer matches the file
-        # (CR 8.4). Only offer maps whose artifact is current for their canonical
-        # passages so the picker never serves the wrong topology.
-        if not navgraph_artifact_is_current(f):
+        # (CR 8.4). Only offer maps whose artifact is registered as current for
+        # their canonical passages so the picker never serves the wrong
+        # topology; the registry join keeps this off the filesystem.
+        if not navgraph_artifact_is_listed(f):
             continue
         maps.append({
             'id': f.id,
@@ -437,7 +438,7 @@ def get_file(request, file_id):
 def get_map(request, filename):  # noqa — kept before submit_result for logical grouping
     if not user_can_access_map_file(request, filename, require_published=True):
         return HttpResponseNotFound("Map not found.")
-    return serve_map_file(filename)
+    return serve_map_file(request, filename)
 
 
 @login_required
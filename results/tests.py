@@ -624,7 +624,7 @@ class InfinityDebugSecurityTests(TestCase):
         superuser = User.objects.create_superuser(username='route-admin', password='pw')
         self.client.force_login(superuser)
 
-        with patch('results.debug_views.navgraph_artifact_is_current', return_value=False):
+        with patch('results.debug_views.navgraph_artifact_is_listed', return_value=False):
             page_response = self.client.get(reverse('debug_user_routes'))
             list_response = self.client.get(reverse('debug_user_route_files'))
         passage_response = self.client.get(
@@ -0,0 +1,219 @@
+"""Micro-benchmark for the navgraph straight-line cost kernel.
+
+Compares ``project.navgraph._line_integrals`` (and the ``_line_cost`` /
+``_line_cost_batch`` wrappers built on it) against the previous
+implementations, kept below as ``_reference_line_cost`` and
+``_reference_line_cost_batch``, on candidate-edge-like segments drawn from
+real masks:
+
+* parity — blocked flags and blocked-sample counts must match exactly, costs
+  within ``--rtol`` (the kernel sums terrain in integers, the references in
+  floating point, so only last-bit differences are allowed); the scalar and
+  batch wrappers must agree bit for bit;
+* speed — wall time of the batch and scalar paths against the references.
+
+Usage:
+    python scripts/line_cost_benchmark.py media/masks/mask_X.png [more masks...]
+    python scripts/line_cost_benchmark.py --segments 200000 --scalar-segments 5000
+    python scripts/line_cost_benchmark.py            # synthetic 4000x3000 mask
+
+Exits with status 1 if any parity check fails.
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project.navgraph import (  # noqa: E402
+    EDGE_MAX_DIST,
+    IMPASSABLE,
+    _line_cost,
+    _line_cost_batch,
+    _load_mask,
+)
+
+
+def _reference_line_cost(mask, x0, y0, x1, y1):
+    """Per-pixel Python loop used before the shared kernel."""
+    dx = x1 - x0
+    dy = y1 - y0
+    steps = int(max(abs(dx), abs(dy)))
+    if steps == 0:
+        return 0.0
+    seg = math.hypot(dx, dy) / steps
+    sx = dx / steps
+    sy = dy / steps
+    cost = 0.0
+    for k in range(1, steps + 1):
+        xi = int(round(x0 + sx * k))
+        yi = int(round(y0 + sy * k))
+        val = mask[yi, xi]
+        if val == IMPASSABLE:
+            return None
+        cost += seg * (255 - int(val))
+    return cost
+
+
+def _reference_line_cost_batch(mask, x0_arr, y0_arr, x1_arr, y1_arr, chunk=4096):
+    """Dense ``(chunk, max_steps)`` batch used before the shared kernel."""
+    N = len(x0_arr)
+    H, W = mask.shape
+    x0 = np.asarray(x0_arr, dtype=np.float64)
+    y0 = np.asarray(y0_arr, dtype=np.float64)
+    x1 = np.asarray(x1_arr, dtype=np.float64)
+    y1 = np.asarray(y1_arr, dtype=np.float64)
+    costs = np.zeros(N, dtype=np.float64)
+    blocked = np.zeros(N, dtype=bool)
+    blocked_counts = np.zeros(N, dtype=np.int32)
+    for start in range(0, N, chunk):
+        end = min(start + chunk, N)
+        bx0 = x0[start:end]
+        by0 = y0[start:end]
+        dx = x1[start:end] - bx0
+        dy = y1[start:end] - by0
+        steps = np.maximum(np.abs(dx), np.abs(dy)).astype(np.int32)
+        max_s = int(steps.max()) if steps.size else 0
+        if max_s == 0:
+            continue
+        safe_s = np.where(steps > 0, steps, 1).astype(np.float64)
+        seg_len = np.hypot(dx, dy) / safe_s
+        sx = dx / safe_s
+        sy = dy / safe_s
+        k = np.arange(1, max_s + 1, dtype=np.float64)[None, :]
+        valid = k <= steps[:, None].astype(np.float64)
+        xi = np.clip(np.round(bx0[:, None] + sx[:, None] * k).astype(np.int32), 0, W - 1)
+        yi = np.clip(np.round(by0[:, None] + sy[:, None] * k).astype(np.int32), 0, H - 1)
+        vals = mask[yi, xi].astype(np.int32)
+        is_impass = valid & (vals == 0)
+        chunk_blocked = is_impass.any(axis=1)
+        contrib = np.where(valid & ~is_impass, seg_len[:, None] * (255 - vals), 0.0)
+        costs[start:end] = np.where(chunk_blocked, 0.0, contrib.sum(axis=1))
+        blocked[start:end] = chunk_blocked
+        blocked_counts[start:end] = is_impass.sum(axis=1, dtype=np.int32)
+    return costs, blocked, blocked_counts
+
+
+def _synthetic_mask(height=3000, width=4000, seed=0):
+    """Open terrain with building blocks, walls and slower vegetation patches."""
+    rng = np.random.default_rng(seed)
+    mask = np.full((height, width), 243, dtype=np.uint8)
+    for _ in range(height * width // 20000):
+        y, x = rng.integers(0, height - 40), rng.integers(0, width - 60)
+        h, w = rng.integers(4, 40), rng.integers(4, 60)
+        mask[y:y + h, x:x + w] = rng.choice([0, 0, 120, 200])
+    mask[::211, :] = 0
+    mask[::211, ::37] = 231
+    return mask
+
+
+def _candidate_segments(mask, count, seed=0):
+    """Segments between passable pixels, at most EDGE_MAX_DIST apart."""
+    rng = np.random.default_rng(seed)
+    H, W = mask.shape
+    ys, xs = np.nonzero(mask[::4, ::4])
+    pick = rng.integers(0, len(ys), count)
+    x0 = xs[pick] * 4
+    y0 = ys[pick] * 4
+    angle = rng.uniform(0.0, 2.0 * np.pi, count)
+    # Candidate lengths skew short: most k-NN edges are local.
+    length = EDGE_MAX_DIST * rng.beta(1.5, 3.0, count)
+    x1 = np.clip(np.round(x0 + length * np.cos(angle)), 0, W - 1).astype(np.int64)
+    y1 = np.clip(np.round(y0 + length * np.sin(angle)), 0, H - 1).astype(np.int64)
+    return x0.astype(np.int64), y0.astype(np.int64), x1, y1
+
+
+def _timed(fn, repeat):
+    best = math.inf
+    result = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def _benchmark(name, mask, args):
+    x0, y0, x1, y1 = _candidate_segments(mask, args.segments, seed=args.seed)
+    ref_t, (ref_costs, ref_blocked, ref_counts) = _timed(
+        lambda: _reference_line_cost_batch(mask, x0, y0, x1, y1), args.repeat)
+    new_t, (costs, blocked, counts) = _timed(
+        lambda: _line_cost_batch(mask, x0, y0, x1, y1, return_blocked_counts=True),
+        args.repeat)
+
+    rel = np.abs(costs - ref_costs) / np.maximum(ref_costs, 1.0)
+    failures = []
+    if not np.array_equal(blocked, ref_blocked):
+        failures.append(f"batch blocked flags differ on {int((blocked != ref_blocked).sum())} segments")
+    if not np.array_equal(counts, ref_counts):
+        failures.append(f"batch blocked counts differ on {int((counts != ref_counts).sum())} segments")
+    if rel.size and float(rel.max()) > args.rtol:
+        failures.append(f"batch cost rel. error {float(rel.max()):.3g} > {args.rtol:g}")
+
+    m = min(args.scalar_segments, len(x0))
+    scalar_args = [
+        (int(x0[i]), int(y0[i]), int(x1[i]), int(y1[i])) for i in range(m)
+    ]
+    ref_scalar_t, ref_scalar = _timed(
+        lambda: [_reference_line_cost(mask, *a) for a in scalar_args], args.repeat)
+    scalar_t, scalar = _timed(
+        lambda: [_line_cost(mask, *a) for a in scalar_args], args.repeat)
+    for i, (got, ref) in enumerate(zip(scalar, ref_scalar)):
+        if (got is None) != (ref is None):
+            failures.append(f"scalar blocked mismatch at segment {i}")
+            break
+        if got is not None and abs(got - ref) > args.rtol * max(ref, 1.0):
+            failures.append(f"scalar cost mismatch at segment {i}: {got!r} vs {ref!r}")
+            break
+        if (got is None) != bool(blocked[i]) or (got is not None and got != costs[i]):
+            failures.append(f"scalar and batch kernels disagree at segment {i}")
+            break
+
+    steps = np.maximum(np.abs(x1 - x0), np.abs(y1 - y0))
+    print(f"{name}: {mask.shape[1]}x{mask.shape[0]} px, {len(x0)} segments "
+          f"(mean {steps.mean():.1f} / max {int(steps.max())} steps, "
+          f"{int(blocked.sum())} blocked)")
+    print(f"  batch   reference {ref_t * 1e3:8.1f} ms   kernel {new_t * 1e3:8.1f} ms   "
+          f"x{ref_t / max(new_t, 1e-9):.2f}")
+    print(f"  scalar  reference {ref_scalar_t * 1e3:8.1f} ms   kernel {scalar_t * 1e3:8.1f} ms   "
+          f"x{ref_scalar_t / max(scalar_t, 1e-9):.2f}  ({m} segments)")
+    print(f"  max cost rel. error {float(rel.max()) if rel.size else 0.0:.3g}")
+    for failure in failures:
+        print(f"  PARITY FAILURE: {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Parity and speed of the navgraph line-cost kernel.")
+    parser.add_argument("masks", nargs="*",
+                        help="Mask PNGs (default: one synthetic mask).")
+    parser.add_argument("--segments", type=int, default=100000,
+                        help="Segments per mask for the batch path (default 100000).")
+    parser.add_argument("--scalar-segments", type=int, default=5000,
+                        help="Segments per mask for the scalar path (default 5000).")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timing repetitions; the best run is reported (default 3).")
+    parser.add_argument("--rtol", type=float, default=1e-12,
+                        help="Allowed relative cost difference (default 1e-12).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.masks:
+        inputs = [(os.path.basename(p), lambda p=p: _load_mask(p)) for p in args.masks]
+    else:
+        inputs = [("synthetic", _synthetic_mask)]
+
+    ok = True
+    for name, load in inputs:
+        ok = _benchmark(name, load(), args) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
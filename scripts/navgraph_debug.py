@@ -21,10 +21,15 @@ the 75 Mpx worst-case mask produces a small, viewable PNG.
 Usage:
     python scripts/navgraph_debug.py media/masks/mask_X.png [more masks...]
     python scripts/navgraph_debug.py media/masks/mask_X.png --pair 100,200,900,1200
+    python scripts/navgraph_debug.py media/masks/mask_X.png --raster-cache media/navgraph_cache
 
 Requires only Pillow + numpy (matplotlib is not assumed to be installed).
-If a mask has no ``.navgraph.npz`` artifact yet, it is built on the fly via
-``project.navgraph.build_navgraph`` / ``save_navgraph``.
+Without a ``.navgraph.npz`` the served ``.navgraph.bin`` is read through
+``project.navgraph.NavgraphView`` (coarse debug rasters are then absent). If a
+mask has neither artifact yet, it is built on the fly via
+``project.navgraph.build_navgraph`` / ``save_navgraph``; ``--raster-cache``
+(default: ``$NAVGRAPH_RASTER_CACHE_DIR``) lets those builds share the
+label/EDT/skeleton cache with the server.
 """
 
 import argparse
@@ -39,6 +44,8 @@ from PIL import Image, ImageDraw, ImageFont
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from project.navgraph import (  # noqa: E402
+    NavgraphView,
+    RasterCache,
     _hitzone,
     _load_mask,
     build_navgraph,
@@ -98,14 +105,25 @@ def _tint(bg_rgb, mask_bool, color, alpha):
     bg_rgb[mask_bool] = (sel * (1.0 - alpha) + col * alpha).clip(0, 255).astype(np.uint8)
 
 
-def _load_artifact(mask_path):
-    """Load the .navgraph.npz next to mask_path, building it if missing."""
+def _load_artifact(mask_path, raster_cache=None):
+    """Load the artifact next to mask_path, building it if missing.
+
+    The debug ``.npz`` is preferred; without it the served ``.navgraph.bin``
+    (what production writes) is mapped through ``NavgraphView``.
+    """
     base, _ = os.path.splitext(mask_path)
     npz_path = base + ".navgraph.npz"
+    bin_path = base + ".navgraph.bin"
+    if not os.path.isfile(npz_path) and os.path.isfile(bin_path):
+        try:
+            return NavgraphView(bin_path).as_artifact(), bin_path
+        except ValueError as exc:
+            print(f"[navgraph_debug] unreadable {bin_path} ({exc})")
     if not os.path.isfile(npz_path):
         print(f"[navgraph_debug] no artifact at {npz_path}; building...")
         artifact = build_navgraph(
-            mask_path, verbose=True, collect_diagnostics=True)
+            mask_path, verbose=True, collect_diagnostics=True,
+            raster_cache=raster_cache)
         save_navgraph(artifact, mask_path)
         return artifact, npz_path
     data = np.load(npz_path, allow_pickle=True)
@@ -382,15 +400,16 @@ def _render_overlay(mask_path, artifact, out_path, pair=None, show_shadowed=Fals
 
 
 def render_overlay_for_mask(mask_path, artifact=None, pair=None, out_path=None,
-                            show_shadowed=False):
+                            show_shadowed=False, raster_cache=None):
     """Render a ``.navgraph.debug.png`` overlay for ``mask_path``.
 
     ``artifact`` may be the in-memory dict returned by ``build_navgraph()`` or a
     loaded ``.navgraph.npz`` dict. If omitted, the artifact next to the mask is
-    loaded, building it only as the standalone script's fallback behavior.
+    loaded, building it only as the standalone script's fallback behavior
+    (through ``raster_cache`` when given).
     """
     if artifact is None:
-        artifact, _ = _load_artifact(mask_path)
+        artifact, _ = _load_artifact(mask_path, raster_cache=raster_cache)
     if out_path is None:
         base, _ = os.path.splitext(mask_path)
         out_path = base + ".navgraph.debug.png"
@@ -436,14 +455,20 @@ def main():
     parser.add_argument(
         "--show-shadowed", action="store_true",
         help="draw base nodes/edges removed beneath passage bodies in orange")
+    parser.add_argument(
+        "--raster-cache", default=os.environ.get("NAVGRAPH_RASTER_CACHE_DIR"),
+        help="raster cache directory used when an artifact must be built "
+             "(default: $NAVGRAPH_RASTER_CACHE_DIR; unset disables it)")
     args = parser.parse_args()
+    raster_cache = RasterCache(args.raster_cache) if args.raster_cache else None
 
     for mask_path in args.masks:
         if not os.path.isfile(mask_path):
             print(f"[navgraph_debug] SKIP missing file: {mask_path}")
             continue
         render_overlay_for_mask(
-            mask_path, pair=args.pair, show_shadowed=args.show_shadowed)
+            mask_path, pair=args.pair, show_shadowed=args.show_shadowed,
+            raster_cache=raster_cache)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+// Graph-stage records from the browser router, for scripts/navgraph_router_parity.py.
+// Runs samplePair -> snapEndpoint -> computeRouteOptions for --count attempts of
+// one seeded RNG with the route budgets disabled, and prints the JSON records
+// that project/navgraph_router.py's NavgraphRouter.route_attempt emits.
+//
+//   node scripts/navgraph_router_parity.mjs --bin X.navgraph.bin --mask-raw X.raw \
+//     --seed 1 --count 200 [--passages level-passages.json] [--config '{"distMinPx":300}']
+
+import fs from 'node:fs';
+import { performance } from 'node:perf_hooks';
+
+import {
+	attachSerializedPassages,
+	buildState,
+	computeRouteOptions,
+	loadArtifact,
+	makeRng,
+	samplePair,
+	snapEndpoint,
+} from '../project/static/project/js/pathing/navgraph_router.js';
+
+function parseArgs(argv) {
+	const args = {};
+	for (let i = 0; i < argv.length; i++) {
+		const token = argv[i];
+		if (!token.startsWith('--')) throw new Error(`unknown argument: ${token}`);
+		const value = argv[++i];
+		if (value === undefined) throw new Error(`${token} requires a value`);
+		args[token.slice(2)] = value;
+	}
+	return args;
+}
+
+function routeAttempt(state, rng) {
+	const t0 = performance.now();
+	const record = { reason: null, start: null, goal: null, start_snap: [], goal_snap: [], routes: [], barriers: [] };
+	const sp = samplePair(state, rng);
+	if (sp.reason) {
+		record.reason = sp.reason;
+		record.ms = performance.now() - t0;
+		return record;
+	}
+	const startSnap = snapEndpoint(state, sp.start, null);
+	const goalSnap = snapEndpoint(state, sp.goal, null);
+	record.start = [sp.start.x, sp.start.y];
+	record.goal = [sp.goal.x, sp.goal.y];
+	record.start_snap = startSnap.map((s) => [s.node, s.w]);
+	record.goal_snap = goalSnap.map((s) => [s.node, s.w]);
+	if (!startSnap.length || !goalSnap.length) {
+		record.reason = 'snap';
+	} else {
+		const result = computeRouteOptions(state, sp.start, sp.goal, startSnap, goalSnap);
+		record.reason = result.reason;
+		record.routes = result.paths.map((r) => ({ node_path: r.nodePath, cost: r.cost, len: r.len }));
+		record.barriers = result.barriers.map((b) => ({ ax: b.ax, ay: b.ay, bx: b.bx, by: b.by, surface: b.surface || 'base' }));
+	}
+	record.ms = performance.now() - t0;
+	return record;
+}
+
+const args = parseArgs(process.argv.slice(2));
+for (const key of ['bin', 'mask-raw']) {
+	if (!args[key]) throw new Error(`--${key} is required`);
+}
+const artifact = loadArtifact(fs.readFileSync(args.bin));
+const raw = fs.readFileSync(args['mask-raw']);
+if (raw.length !== artifact.W * artifact.H)
+	throw new Error(`mask has ${raw.length} bytes, artifact is ${artifact.W}x${artifact.H}`);
+const mask = new Uint8Array(raw.buffer, raw.byteOffset, raw.length);
+
+const config = JSON.parse(args.config || '{}');
+config.primaryBudgetMs = Infinity;
+config.extraBudgetMs = Infinity;
+const state = buildState(artifact, mask, config);
+if (args.passages) {
+	const document = JSON.parse(fs.readFileSync(args.passages, 'utf8').replace(/^﻿/, ''));
+	attachSerializedPassages(state, document);
+} else if (artifact.baseNodeCount < artifact.N) {
+	throw new Error('artifact contains passage nodes; pass --passages <level-passages.json>');
+}
+
+const rng = makeRng(Number(args.seed || 1));
+const count = Number(args.count || 100);
+const records = [];
+for (let i = 0; i < count; i++) records.push(routeAttempt(state, rng));
+process.stdout.write(JSON.stringify(records));
@@ -0,0 +1,160 @@
+"""Parity harness: Python graph router vs the browser router.
+
+Runs ``project.navgraph_router.NavgraphRouter.route_attempt`` and
+``scripts/navgraph_router_parity.mjs`` (the JS ``samplePair`` ->
+``snapEndpoint`` -> ``computeRouteOptions`` chain) with the same mulberry32
+seed and compares every attempt: rejection reason, sampled endpoints, snap
+stubs, route node paths, costs, lengths and barrier endpoints must be
+identical. Route time budgets are disabled on both sides so the comparison
+does not depend on wall time. Also reports per-attempt latency of both
+implementations.
+
+Usage:
+    python scripts/navgraph_router_parity.py --bin media/navgraphs/X.navgraph.bin \\
+        --mask media/masks/mask_X.png [--passages level-passages.json]
+    python scripts/navgraph_router_parity.py --seeds 1 2 3 --count 300
+    python scripts/navgraph_router_parity.py      # builds a synthetic 900x700 map
+
+``--config`` takes a JSON object of snake_case router overrides (for example
+``'{"dist_min_px": 300}'``); it is forwarded to the JS router camel-cased.
+Exits with status 1 on any mismatch, 2 when node is unavailable.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from project.navgraph import NavgraphView, _load_mask  # noqa: E402
+from project.navgraph_router import NavgraphRouter, js_config, make_rng  # noqa: E402
+
+JS_HARNESS = os.path.join(ROOT, "scripts", "navgraph_router_parity.mjs")
+PARITY_BUDGETS = {"primary_budget_ms": None, "extra_budget_ms": None}
+
+
+def _synthetic_build(directory):
+    """Blocks, walls and slow ground inside a region polygon; returns paths."""
+    from PIL import Image
+    from project.navgraph import build_navgraph, save_navgraph
+
+    rng = np.random.default_rng(7)
+    mask = np.full((700, 900), 243, dtype=np.uint8)
+    for _ in range(60):
+        y, x = rng.integers(20, 640), rng.integers(20, 840)
+        mask[y:y + rng.integers(6, 50), x:x + rng.integers(6, 70)] = rng.choice([0, 0, 120, 200])
+    mask[340:346, 100:800] = 0
+    mask[340:346, 440:470] = 243
+    mask_path = os.path.join(directory, "mask_parity.png")
+    Image.fromarray(mask).save(mask_path)
+    artifact = build_navgraph(
+        mask_path, region_polygon=[[10, 10], [890, 10], [890, 690], [10, 690]])
+    _, bin_path = save_navgraph(artifact, mask_path, include_npz=False)
+    return bin_path, mask_path
+
+
+def js_records(bin_path, mask, seed, count, config=None, passages_path=None):
+    """Route attempt records from the JS router (``navgraph_router_parity.mjs``)."""
+    with tempfile.NamedTemporaryFile(suffix=".raw", delete=False) as handle:
+        handle.write(np.ascontiguousarray(mask, dtype=np.uint8).tobytes())
+        raw_path = handle.name
+    try:
+        cmd = ["node", JS_HARNESS, "--bin", bin_path, "--mask-raw", raw_path,
+               "--seed", str(seed), "--count", str(count),
+               "--config", json.dumps(js_config(config or {}))]
+        if passages_path:
+            cmd += ["--passages", passages_path]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=ROOT)
+    finally:
+        os.unlink(raw_path)
+    return json.loads(out.stdout)
+
+
+def py_records(router, seed, count):
+    rng = make_rng(seed)
+    return [router.route_attempt(rng) for _ in range(count)]
+
+
+def compare_records(py, js):
+    """Human-readable differences between two record lists (empty when equal)."""
+    problems = []
+    if len(py) != len(js):
+        problems.append(f"{len(py)} Python records vs {len(js)} JS records")
+    for i, (a, b) in enumerate(zip(py, js)):
+        for key in ("reason", "start", "goal", "start_snap", "goal_snap", "routes", "barriers"):
+            if a[key] != b[key]:
+                problems.append(f"attempt {i}: {key} differs: {a[key]!r} vs {b[key]!r}")
+                break
+    return problems
+
+
+def _latency(records):
+    ms = np.array([r["ms"] for r in records], dtype=np.float64)
+    if not ms.size:
+        return "n/a"
+    return (f"mean {ms.mean():.2f} ms  p50 {np.percentile(ms, 50):.2f} ms  "
+            f"p95 {np.percentile(ms, 95):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python vs JS graph router parity.")
+    parser.add_argument("--bin", help="Served .navgraph.bin (default: synthetic build).")
+    parser.add_argument("--mask", help="Mask PNG matching --bin.")
+    parser.add_argument("--passages", help="Level passage document JSON for passage artifacts.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--count", type=int, default=100, help="Attempts per seed (default 100).")
+    parser.add_argument("--config", default="{}", help="JSON router overrides (snake_case).")
+    args = parser.parse_args()
+
+    if shutil.which("node") is None:
+        print("node is not on PATH; cannot run the JS router")
+        return 2
+    if bool(args.bin) != bool(args.mask):
+        parser.error("--bin and --mask go together")
+
+    config = dict(json.loads(args.config), **PARITY_BUDGETS)
+    level_passages = None
+    if args.passages:
+        with open(args.passages, encoding="utf-8-sig") as handle:
+            level_passages = json.load(handle)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bin_path, mask_path = args.bin, args.mask
+        if not bin_path:
+            bin_path, mask_path = _synthetic_build(directory)
+        mask = _load_mask(mask_path)
+        t0 = time.perf_counter()
+        router = NavgraphRouter(NavgraphView(bin_path), mask, config=config,
+                                level_passages=level_passages)
+        print(f"{os.path.basename(bin_path)}: {router.node_count} nodes, "
+              f"{router.edge_count} edges, state built in {time.perf_counter() - t0:.2f} s")
+
+        ok = True
+        for seed in args.seeds:
+            py = py_records(router, seed, args.count)
+            js = js_records(bin_path, mask, seed, args.count, config=config,
+                            passages_path=args.passages)
+            reasons = {}
+            for record in py:
+                reasons[record["reason"]] = reasons.get(record["reason"], 0) + 1
+            problems = compare_records(py, js)
+            print(f"seed {seed}: {len(py)} attempts {reasons}")
+            print(f"  python  {_latency(py)}")
+            print(f"  js      {_latency(js)}")
+            for problem in problems[:10]:
+                print(f"  MISMATCH {problem}")
+            ok = ok and not problems
+    print("parity OK" if ok else "parity FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())